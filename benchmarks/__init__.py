@@ -0,0 +1 @@
+"""Benchmarks for phial, runnable offline with :code:`python -m benchmarks.<name>`."""
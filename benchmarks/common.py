@@ -0,0 +1,62 @@
+"""Helpers shared by the benchmarks."""
+
+from collections.abc import Callable, Sequence
+from typing import Any
+
+from phial.utils import PERCENTILES, percentiles
+
+__all__ = [
+    "PERCENTILES",
+    "StubSocketClient",
+    "StubWebClient",
+    "format_seconds",
+    "format_table",
+    "percentiles",
+]
+
+
+class StubWebClient:
+    """
+    Stands in for :class:`slack_sdk.WebClient` without any network calls.
+
+    Every Web API method returns :code:`{"ok": True}` and counts the call.
+    """
+
+    def __init__(self) -> None:
+        self.calls: dict[str, int] = {}
+
+    def __getattr__(self, method: str) -> Callable[..., dict[str, Any]]:
+        if method.startswith("_"):
+            raise AttributeError(method)
+
+        def call(**_: object) -> dict[str, Any]:
+            self.calls[method] = self.calls.get(method, 0) + 1
+            return {"ok": True}
+
+        return call
+
+
+class StubSocketClient:
+    """Stands in for a Socket Mode client, discarding acknowledgements."""
+
+    def send_socket_mode_response(self, *_: object, **__: object) -> None:
+        """Discard an acknowledgement."""
+
+
+def format_table(headers: Sequence[str], rows: Sequence[Sequence[object]]) -> str:
+    """Format rows as a plain text table with right aligned columns."""
+    cells = [list(map(str, headers)), *([str(cell) for cell in row] for row in rows)]
+    widths = [max(len(row[i]) for row in cells) for i in range(len(headers))]
+    lines = [
+        "  ".join(cell.rjust(width) for cell, width in zip(row, widths, strict=True))
+        for row in cells
+    ]
+    lines.insert(1, "  ".join("-" * width for width in widths))
+    return "\n".join(lines)
+
+
+def format_seconds(seconds: float) -> str:
+    """Format a duration in microseconds, or milliseconds from 1ms."""
+    if seconds >= 1e-3:
+        return f"{seconds * 1e3:.1f}ms"
+    return f"{seconds * 1e6:.1f}us"
@@ -0,0 +1,215 @@
+"""
+Benchmark how quickly phial dispatches Socket Mode envelopes.
+
+Bots with 10, 100 and 1,000 commands, each with an alias, are sent a
+seeded mix of synthetic envelopes: commands near the start, middle and end
+of the command list, aliases, commands with arguments to validate, the
+help command and messages which match nothing. Web API calls go to a stub
+client, so the benchmark runs offline.
+
+Events per second and latency percentiles for each stage of handling a
+request, as recorded by :mod:`phial.tracing`, are reported::
+
+    python -m benchmarks.dispatch
+    python -m benchmarks.dispatch --commands 100 --events 50000 --json
+"""
+
+import argparse
+import json
+import logging
+import random
+from collections import defaultdict
+from collections.abc import Callable
+from time import perf_counter
+from typing import TYPE_CHECKING, Any, cast
+
+from slack_sdk.socket_mode.request import SocketModeRequest
+
+from benchmarks.common import (
+    PERCENTILES,
+    StubSocketClient,
+    StubWebClient,
+    format_seconds,
+    format_table,
+    percentiles,
+)
+from phial import Phial
+from phial.tracing import Span, Tracer
+
+if TYPE_CHECKING:
+    from slack_sdk.socket_mode import SocketModeClient
+
+COMMAND_COUNTS = (10, 100, 1000)
+
+
+class StageTracer(Tracer):
+    """Collects the duration of every span, by stage."""
+
+    def __init__(self) -> None:
+        self.durations: defaultdict[str, list[float]] = defaultdict(list)
+
+    def on_end(self, span: Span) -> None:
+        """Record a finished span."""
+        self.durations[span.name].append(span.duration)
+
+
+def _make_command(number: int) -> Callable[..., str]:
+    def with_arguments(name: str, count: int) -> str:
+        return f"{name} {count}"
+
+    def without_arguments() -> str:
+        return f"command {number}"
+
+    command = with_arguments if number % 2 else without_arguments
+    command.__name__ = f"command{number}"
+    return command
+
+
+def build_bot(commands: int) -> Phial:
+    """
+    Build a bot with a number of commands, each with an alias.
+
+    Odd numbered commands take a string and an integer argument.
+    """
+    bot = Phial("app-token", "bot-token")
+    bot.slack_client.web_client = cast("Any", StubWebClient())
+    for number in range(commands):
+        func = _make_command(number)
+        if number % 2:
+            bot.alias(f"alias{number} <name> <count>")(func)
+            bot.add_command(f"command{number} <name> <count>", func)
+        else:
+            bot.alias(f"alias{number}")(func)
+            bot.add_command(f"command{number}", func)
+    return bot
+
+
+def _command_text(number: int, rng: random.Random, *, alias: bool = False) -> str:
+    name = "alias" if alias else "command"
+    if number % 2:
+        return f"!{name}{number} user{rng.randrange(100)} {rng.randrange(1, 1000)}"
+    return f"!{name}{number}"
+
+
+def build_envelopes(commands: int, events: int, seed: int) -> list[SocketModeRequest]:
+    """
+    Build a seeded mix of synthetic message envelopes.
+
+    :param commands: The number of commands the bot has
+    :param events: The number of envelopes to build
+    :param seed: Seeds the mix, so runs can be compared
+    """
+    rng = random.Random(seed)  # noqa: S311
+    # The first, middle and last commands, as routing checks them in order
+    positions = [0, commands // 2, commands - 1]
+    texts: list[Callable[[], str]] = [
+        lambda: _command_text(rng.choice(positions), rng),
+        lambda: _command_text(rng.randrange(commands), rng),
+        lambda: _command_text(rng.randrange(commands), rng, alias=True),
+        lambda: "!help",
+        lambda: f"no command here {rng.randrange(1000)}",
+    ]
+    weights = [30, 30, 20, 5, 15]
+    envelopes = []
+    for number in range(events):
+        text = rng.choices(texts, weights)[0]()
+        envelopes.append(
+            SocketModeRequest(
+                type="events_api",
+                envelope_id=f"envelope-{number}",
+                payload={
+                    "event": {
+                        "type": "message",
+                        "channel": f"C{rng.randrange(20)}",
+                        "user": f"U{rng.randrange(200)}",
+                        "text": text,
+                        "ts": f"{number}.000000",
+                        "team": "T1",
+                    },
+                },
+            ),
+        )
+    return envelopes
+
+
+def run(commands: int, events: int, seed: int) -> dict[str, Any]:
+    """
+    Benchmark dispatching envelopes to a bot with a number of commands.
+
+    :returns: The events per second and each stage's latency percentiles
+    """
+    bot = build_bot(commands)
+    envelopes = build_envelopes(commands, events, seed)
+    client = cast("SocketModeClient", StubSocketClient())
+
+    # Warm up caches, such as the help text and compiled patterns
+    for envelope in envelopes[: min(100, events)]:
+        bot._handle_request(client, envelope)
+
+    tracer = StageTracer()
+    bot.add_tracer(tracer)
+    start = perf_counter()
+    for envelope in envelopes:
+        bot._handle_request(client, envelope)
+    elapsed = perf_counter() - start
+
+    return {
+        "commands": commands,
+        "events": events,
+        "seconds": elapsed,
+        "events_per_second": events / elapsed,
+        "stages": {
+            stage: {"count": len(durations), **percentiles(durations)}
+            for stage, durations in sorted(tracer.durations.items())
+        },
+    }
+
+
+def report(results: list[dict[str, Any]]) -> str:
+    """Format benchmark results as plain text tables."""
+    sections = []
+    for result in results:
+        rows = [
+            [
+                stage,
+                stats["count"],
+                *(format_seconds(stats.get(f"p{p}", 0)) for p in PERCENTILES),
+            ]
+            for stage, stats in result["stages"].items()
+        ]
+        table = format_table(
+            ["stage", "count", *(f"p{p}" for p in PERCENTILES)],
+            rows,
+        )
+        sections.append(
+            f"{result['commands']} commands: {result['events_per_second']:,.0f} "
+            f"events/s ({result['events']} events in {result['seconds']:.2f}s)\n"
+            f"{table}",
+        )
+    return "\n\n".join(sections)
+
+
+def main(argv: list[str] | None = None) -> None:
+    """Run the benchmark from the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--commands",
+        type=int,
+        nargs="+",
+        default=list(COMMAND_COUNTS),
+        help="the numbers of commands to benchmark bots with",
+    )
+    parser.add_argument("--events", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args(argv)
+
+    # Keep "command not found" warnings out of the results. Phial only adds
+    # its own handler when none is configured
+    logging.basicConfig(level=logging.ERROR)
+    results = [run(commands, args.events, args.seed) for commands in args.commands]
+    print(json.dumps(results, indent=2) if args.json else report(results))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+Benchmark how long building a message's Web API call takes.
+
+Messages with 1, 10 and 50 Block Kit blocks and as many attachments are
+built for sending, as :meth:`phial.Phial.send_message` does, with each
+JSON backend available. Each backend is run twice: building a new
+response for every send, which serializes its payload every time, and
+copying a template response with :meth:`phial.Response.replace`, which
+serializes it once. Nothing is sent, so the benchmark runs offline.
+
+Sends per second and build latency percentiles are reported::
+
+    python -m benchmarks.payloads
+    python -m benchmarks.payloads --blocks 10 --sends 50000 --json
+"""
+
+import argparse
+import importlib.util
+import json
+from time import perf_counter
+from typing import Any
+
+from benchmarks.common import PERCENTILES, format_seconds, format_table, percentiles
+from phial import Phial, Response
+
+BLOCK_COUNTS = (1, 10, 50)
+
+
+def available_backends() -> list[str]:
+    """Get the names of the JSON backends which can be imported."""
+    backends = ["json"]
+    if importlib.util.find_spec("orjson") is not None:
+        backends.append("orjson")
+    return backends
+
+
+def build_payload(blocks: int) -> tuple[list[dict[str, Any]], list[dict[str, Any]]]:
+    """Build a number of blocks and attachments, like a typical status message."""
+    return (
+        [
+            {
+                "type": "section",
+                "text": {"type": "mrkdwn", "text": f"*Service {number}* is healthy"},
+                "fields": [
+                    {"type": "mrkdwn", "text": f"*Latency*\n{number * 3}ms"},
+                    {"type": "mrkdwn", "text": f"*Uptime*\n{99.9 - number / 100}%"},
+                ],
+            }
+            for number in range(blocks)
+        ],
+        [
+            {"fallback": f"Check {number}", "color": "#36a64f", "ts": number}
+            for number in range(blocks)
+        ],
+    )
+
+
+def run(blocks: int, sends: int, backend: str, *, cached: bool) -> dict[str, Any]:
+    """
+    Benchmark building message calls with a JSON backend.
+
+    :param cached: Whether to copy a template response, rather than build a
+                   new one, for each send
+    :returns: The sends per second and build latency percentiles
+    """
+    bot = Phial("app-token", "bot-token", config={"jsonBackend": backend})
+    block_payload, attachments = build_payload(blocks)
+    template = Response(
+        "",
+        text="Status",
+        blocks=block_payload,
+        attachments=attachments,
+    )
+
+    def new_response(channel: str) -> Response:
+        if cached:
+            return template.replace(channel=channel)
+        return Response(
+            channel,
+            text="Status",
+            blocks=block_payload,
+            attachments=attachments,
+        )
+
+    channels = [f"C{number % 20}" for number in range(sends)]
+
+    durations = []
+    for channel in channels:
+        start = perf_counter()
+        _, kwargs = bot._build_message_call(new_response(channel))
+        durations.append(perf_counter() - start)
+    elapsed = sum(durations)
+
+    return {
+        "blocks": blocks,
+        "backend": backend,
+        "cached": cached,
+        "sends": sends,
+        "bytes": len(kwargs["blocks"]) + len(kwargs["attachments"]),
+        "sends_per_second": sends / elapsed,
+        "build": percentiles(durations),
+    }
+
+
+def report(results: list[dict[str, Any]]) -> str:
+    """Format benchmark results as a plain text table."""
+    rows = [
+        [
+            result["blocks"],
+            result["backend"],
+            "template" if result["cached"] else "new",
+            f"{result['bytes']:,}",
+            f"{result['sends_per_second']:,.0f}",
+            *(format_seconds(result["build"][f"p{p}"]) for p in PERCENTILES),
+        ]
+        for result in results
+    ]
+    return format_table(
+        [
+            "blocks",
+            "backend",
+            "response",
+            "bytes",
+            "sends/s",
+            *(f"p{p}" for p in PERCENTILES),
+        ],
+        rows,
+    )
+
+
+def main(argv: list[str] | None = None) -> None:
+    """Run the benchmark from the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--blocks",
+        type=int,
+        nargs="+",
+        default=list(BLOCK_COUNTS),
+        help="the numbers of blocks and attachments to benchmark messages with",
+    )
+    parser.add_argument("--sends", type=int, default=10000)
+    parser.add_argument(
+        "--backend",
+        nargs="+",
+        default=available_backends(),
+        help="the JSON backends to benchmark",
+    )
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args(argv)
+
+    results = [
+        run(blocks, args.sends, backend, cached=cached)
+        for blocks in args.blocks
+        for backend in args.backend
+        for cached in (False, True)
+    ]
+    print(json.dumps(results, indent=2) if args.json else report(results))
+
+
+if __name__ == "__main__":
+    main()
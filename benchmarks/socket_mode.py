@@ -0,0 +1,160 @@
+"""
+Benchmark a bot end to end over Socket Mode against a local fake Slack.
+
+A bot using the real Socket Mode client connects to
+:class:`tests.fake_slack.server.FakeSlack`, which sends it :code:`!echo` messages
+over a websocket and answers its Web API calls after a configurable
+latency, optionally rate limiting some and disconnecting the client.
+
+Events per second plus percentiles for the time from sending each envelope
+to it being acknowledged and to its reply being posted are reported::
+
+    python -m benchmarks.socket_mode
+    python -m benchmarks.socket_mode --events 5000 --latency 0.05 --json
+"""
+
+import argparse
+import json
+import logging
+import threading
+from time import perf_counter
+from typing import Any
+
+from benchmarks.common import PERCENTILES, format_seconds, format_table, percentiles
+from phial import Phial
+from tests.fake_slack.server import FakeSlack
+
+
+def build_bot(slack: FakeSlack, max_threads: int) -> Phial:
+    """Build a bot connected to a fake Slack with an echo command."""
+    bot = Phial(
+        "xapp-token",
+        "xoxb-token",
+        config={
+            "apiUrl": slack.api_url,
+            "handleSignals": False,
+            "maxThreads": max_threads,
+        },
+    )
+
+    @bot.command("echo <text>")
+    def echo(text: str) -> str:
+        return text
+
+    return bot
+
+
+def run(
+    events: int,
+    *,
+    latency: float = 0,
+    rate_limit_every: int | None = None,
+    disconnect_every: int | None = None,
+    max_threads: int = 4,
+    timeout: float = 60,
+) -> dict[str, Any]:
+    """
+    Benchmark a bot receiving a number of messages over Socket Mode.
+
+    :returns: The events per second and ack and reply latency percentiles
+    """
+    with FakeSlack(
+        latency=latency,
+        rate_limit_every=rate_limit_every,
+        disconnect_every=disconnect_every,
+    ) as slack:
+        bot = build_bot(slack, max_threads)
+        thread = threading.Thread(target=bot.run, daemon=True)
+        thread.start()
+        if not slack.wait_for_connection(timeout=timeout):
+            raise RuntimeError("The bot did not connect to the fake Slack")
+
+        # Each reply echoes its envelope's number, to match them up
+        start = perf_counter()
+        sent = {
+            str(number): slack.send_message(f"!echo {number}")
+            for number in range(events)
+        }
+        slack.wait_for_calls(len(sent), method="chat.postMessage", timeout=timeout)
+        elapsed = perf_counter() - start
+        bot.stop()
+        thread.join(timeout)
+
+    replies = {
+        call.params["text"]: call.received
+        for call in slack.calls
+        if call.method == "chat.postMessage"
+    }
+    acks = [
+        slack.acks[id_] - slack.sent[id_] for id_ in sent.values() if id_ in slack.acks
+    ]
+    reply_latencies = [
+        replies[text] - slack.sent[id_] for text, id_ in sent.items() if text in replies
+    ]
+    return {
+        "events": events,
+        "replies": len(reply_latencies),
+        "latency": latency,
+        "connections": slack.connections,
+        "seconds": elapsed,
+        "events_per_second": len(reply_latencies) / elapsed,
+        "ack": {"count": len(acks), **percentiles(acks)},
+        "reply": {"count": len(reply_latencies), **percentiles(reply_latencies)},
+    }
+
+
+def report(result: dict[str, Any]) -> str:
+    """Format benchmark results as a plain text table."""
+    rows = [
+        [
+            stage,
+            result[stage]["count"],
+            *(format_seconds(result[stage].get(f"p{p}", 0)) for p in PERCENTILES),
+        ]
+        for stage in ("ack", "reply")
+    ]
+    table = format_table(["stage", "count", *(f"p{p}" for p in PERCENTILES)], rows)
+    return (
+        f"{result['events_per_second']:,.0f} events/s ({result['replies']} of "
+        f"{result['events']} replied to in {result['seconds']:.2f}s over "
+        f"{result['connections']} connections)\n{table}"
+    )
+
+
+def main(argv: list[str] | None = None) -> None:
+    """Run the benchmark from the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--events", type=int, default=1000)
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=0,
+        help="seconds the fake Slack waits before answering each Web API call",
+    )
+    parser.add_argument(
+        "--rate-limit-every",
+        type=int,
+        help="rate limit every nth Web API call",
+    )
+    parser.add_argument(
+        "--disconnect-every",
+        type=int,
+        help="disconnect the client after every n envelopes",
+    )
+    parser.add_argument("--threads", type=int, default=4, help="the maxThreads config")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.ERROR)
+    result = run(
+        args.events,
+        latency=args.latency,
+        rate_limit_every=args.rate_limit_every,
+        disconnect_every=args.disconnect_every,
+        max_threads=args.threads,
+    )
+    print(json.dumps(result, indent=2) if args.json else report(result))
+
+
+if __name__ == "__main__":
+    main()
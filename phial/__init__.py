@@ -1,17 +1,28 @@
 """phial Slack Bot."""
 
+from phial.async_bot import AsyncPhial
 from phial.bot import Phial
 from phial.globals import command
 from phial.scheduler import Schedule
-from phial.wrappers import Attachment, Message, PhialResponse, Response
+from phial.wrappers import (
+    Attachment,
+    Channel,
+    Message,
+    PhialResponse,
+    Response,
+    User,
+)
 
 __version__ = "0.12.2"
 __all__ = [
+    "AsyncPhial",
     "Attachment",
+    "Channel",
     "Message",
     "Phial",
     "PhialResponse",
     "Response",
     "Schedule",
+    "User",
     "command",
 ]
@@ -0,0 +1,704 @@
+"""An asyncio flavoured version of phial."""
+
+import asyncio
+import inspect
+import signal
+from collections.abc import Callable, Coroutine, Iterable
+from functools import partial
+from time import monotonic
+from typing import TYPE_CHECKING, Any, TypeVar, cast
+
+from slack_sdk.socket_mode.request import SocketModeRequest
+from slack_sdk.socket_mode.response import SocketModeResponse
+
+from phial.bot import Phial, ShutdownReport, _call_in_process, _is_cacheable
+from phial.broadcast import BroadcastResult, ProgressCallback
+from phial.connections import AsyncConnectionPool
+from phial.directory import Directory
+from phial.errors import (
+    ArgumentTypeValidationError,
+    ArgumentValidationError,
+    ExecutionTimeoutError,
+)
+from phial.globals import _command_ctx_stack
+from phial.outbox import OutboxEntry
+from phial.profiling import DISPATCH
+from phial.tracing import _request_id
+from phial.utils import call_async, parse_slack_event, validate_kwargs
+from phial.workspaces import _team, envelope_team
+from phial.wrappers import (
+    Attachment,
+    Channel,
+    Command,
+    Message,
+    PhialResponse,
+    Response,
+    User,
+)
+
+if TYPE_CHECKING:  # pragma: no cover
+    from slack_sdk.socket_mode.aiohttp import SocketModeClient
+
+T = TypeVar("T")
+
+
+class AsyncPhial(Phial):
+    """
+    A version of :class:`Phial` built on asyncio.
+
+    It uses slack_sdk's aiohttp based Socket Mode and Web clients, so it
+    requires the :code:`async` extra to be installed::
+
+        pip install phial-slack[async]
+
+    Commands, middleware, the fallback command and scheduled jobs can be
+    either coroutine functions or regular functions. Regular functions are
+    run in a worker thread so they do not block other commands.
+
+    Registration works exactly the same as with :class:`Phial`.
+
+    :meth:`send_message`, :meth:`send_reaction`, :meth:`upload_attachment`,
+    :meth:`broadcast` and :meth:`stop` block until done, as with
+    :class:`Phial`, so can be called from regular functions, which run in
+    worker threads. Coroutines await the :code:`_async` versions instead,
+    such as :meth:`send_message_async`.
+
+    .. rubric:: Example
+
+    ::
+
+        bot = AsyncPhial('app-token', 'bot-token')
+
+        @bot.command('wait <seconds>')
+        async def wait(seconds: int) -> str:
+            await asyncio.sleep(seconds)
+            return "Done"
+
+        bot.run()
+    """
+
+    slack_client: "SocketModeClient | None"  # type: ignore[assignment]
+    connections: AsyncConnectionPool | None  # type: ignore[assignment]
+
+    def __init__(
+        self,
+        app_token: str,
+        bot_token: str,
+        *,
+        config: dict = Phial.default_config,
+    ) -> None:
+        super().__init__(app_token, bot_token, config=config)
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._in_flight_tasks: dict[asyncio.Task, SocketModeRequest] = {}
+        self._scheduler_task: asyncio.Task | None = None
+        self._outbox_task: asyncio.Task | None = None
+        self._shutdown_task: asyncio.Future[ShutdownReport] | None = None
+        self._disconnect_task: asyncio.Task | None = None
+
+    def _init_clients(self, app_token: str, bot_token: str) -> None:
+        try:
+            self.web_client = self._create_web_client(bot_token)
+        except ImportError as e:  # pragma: no cover
+            raise ImportError(
+                "AsyncPhial requires aiohttp. "
+                "Install it with 'pip install phial-slack[async]'",
+            ) from e
+        # The Socket Mode clients can only be created inside a running event
+        # loop, so they are created when the bot starts. See _connect.
+        self._app_token = app_token
+        self.slack_client = None
+
+    def _create_slack_client(  # type: ignore[override]
+        self,
+        app_token: str,
+        bot_token: str,
+    ) -> "SocketModeClient":  # pragma: no cover
+        from slack_sdk.socket_mode.aiohttp import SocketModeClient
+
+        return SocketModeClient(
+            app_token=app_token,
+            web_client=self._create_web_client(bot_token),
+            auto_reconnect_enabled=cast(bool, self.config["autoReconnect"]),
+        )
+
+    def _create_web_client(self, bot_token: str) -> Any:  # noqa: ANN401
+        from slack_sdk.web.async_client import AsyncWebClient
+
+        return AsyncWebClient(
+            token=bot_token,
+            base_url=cast(str, self.config.get("apiUrl") or AsyncWebClient.BASE_URL),
+        )
+
+    async def _connect(self) -> "SocketModeClient":  # pragma: no cover
+        count = int(cast(int, self.config["connections"]))
+        if count < 1:
+            raise ValueError("The connections config value must be at least 1")
+        tokens = [
+            (self._app_token, self.web_client.token),
+            *((ws.app_token, ws.web_client.token) for ws in self.workspaces),
+        ]
+        clients = [
+            self._create_slack_client(app_token, bot_token)
+            for app_token, bot_token in tokens
+            for _ in range(count)
+        ]
+        self.connections = AsyncConnectionPool(
+            clients,
+            stagger=float(cast(float, self.config["connectionStagger"])),
+            on_duplicate=lambda req: self._metrics.duplicate_envelopes.inc(req.type),
+        )
+        if self.recorder is not None:
+            self.connections.add_listener(self.recorder.listen_async)
+        self.connections.add_listener(self._handle_request_async)
+        await self.connections.connect()
+        self.slack_client = clients[0]
+        return clients[0]
+
+    def _web_client(self) -> Any:  # noqa: ANN401
+        workspace = self._current_workspace()
+        return self.web_client if workspace is None else workspace.web_client
+
+    async def _resolve_workspaces_async(self) -> None:
+        for workspace in self.workspaces:
+            if workspace.team is not None:
+                continue
+            try:
+                workspace.team = (await workspace.web_client.auth_test())["team_id"]
+            except Exception as e:
+                self.logger.error(f"Failed to look up a workspace's team ID: {e}")
+                continue
+            self._workspace_teams[cast(str, workspace.team)] = workspace
+
+    def _create_directory(self) -> Directory:
+        return Directory(
+            call_async=self._call_web_api,
+            ttl=float(cast(float, self.config["directoryTTL"])),
+        )
+
+    def _default_converters(self) -> dict[Any, Callable[[str], Any]]:
+        # Converters may return awaitables, which are awaited by
+        # _resolve_kwargs once the arguments have been validated
+        return {User: self.directory.user_async, Channel: self.directory.channel_async}
+
+    async def _run_middleware_async(
+        self,
+        message: Message | None,
+        event_type: str | None,
+        routes: dict[str, tuple[Command, dict[str, str]] | None],
+    ) -> Message | None:
+        """Run the middleware which applies to a message, in priority order."""
+        for stage in self.middleware_plan.stages:
+            if not message:
+                break
+            if not self._middleware_applies(stage, message, event_type, routes):
+                continue
+            with self._middleware_metrics(stage.name):
+                message = await call_async(partial(stage.func, message))
+            if not message:
+                self._metrics.middleware_short_circuits.inc(stage.name)
+        return message
+
+    @staticmethod
+    async def _resolve_kwargs(
+        command: Command,
+        raw_kwargs: dict[str, str],
+        kwargs: dict[str, Any],
+    ) -> dict[str, Any]:
+        """Await any arguments converted by coroutine converters."""
+        for name, value in kwargs.items():
+            if inspect.isawaitable(value):
+                try:
+                    kwargs[name] = await value
+                except ValueError as e:
+                    annotation = inspect.signature(command.func).parameters[name]
+                    raise ArgumentTypeValidationError(
+                        f"{raw_kwargs.get(name)} could not be converted to "
+                        f"{annotation.annotation.__name__}",
+                    ) from e
+        return kwargs
+
+    def send_message(self, message: Response) -> None:
+        """
+        Send a message to Slack, blocking until it's sent.
+
+        See :meth:`send_message_async`.
+
+        :param message: The message to be sent to Slack
+        """
+        self._run_on_loop(self.send_message_async(message))
+
+    async def send_message_async(self, message: Response) -> None:
+        """
+        Send a message to Slack.
+
+        :param message: The message to be sent to Slack
+        """
+        method, kwargs = self._build_message_call(message)
+        await self._queue_web_api_async(method, **kwargs)
+
+    def send_reaction(self, response: Response) -> None:
+        """
+        Send a reaction to a Slack Message, blocking until it's sent.
+
+        See :meth:`send_reaction_async`.
+
+        :param response: Response containing the reaction to be
+                         sent to Slack
+        """
+        self._run_on_loop(self.send_reaction_async(response))
+
+    async def send_reaction_async(self, response: Response) -> None:
+        """
+        Send a reaction to a Slack Message.
+
+        :param response: Response containing the reaction to be
+                         sent to Slack
+        """
+        await self._queue_web_api_async(
+            "reactions_add",
+            **self._build_reaction_call(response),
+        )
+
+    def upload_attachment(self, attachment: Attachment) -> None:
+        """
+        Upload a file to Slack, blocking until it's uploaded.
+
+        See :meth:`upload_attachment_async`.
+
+        :param attachment: The attachment to be uploaded to Slack
+        """
+        self._run_on_loop(self.upload_attachment_async(attachment))
+
+    async def upload_attachment_async(self, attachment: Attachment) -> None:
+        """
+        Upload a file to Slack.
+
+        :param attachment: The attachment to be uploaded to Slack
+        """
+        await self._queue_web_api_async(
+            "files_upload_v2",
+            **self._build_attachment_call(attachment),
+        )
+
+    def broadcast(
+        self,
+        response: Response,
+        channels: Iterable[str],
+        *,
+        on_progress: ProgressCallback | None = None,
+    ) -> BroadcastResult:
+        """
+        Send the same message to many channels, blocking until it's sent.
+
+        See :meth:`phial.Phial.broadcast`.
+        """
+        return self._run_on_loop(
+            self.broadcast_async(response, channels, on_progress=on_progress),
+        )
+
+    async def broadcast_async(
+        self,
+        response: Response,
+        channels: Iterable[str],
+        *,
+        on_progress: ProgressCallback | None = None,
+    ) -> BroadcastResult:
+        """
+        Send the same message to many channels.
+
+        See :meth:`phial.Phial.broadcast`.
+        """
+        method, kwargs = self._build_message_call(response)
+        return await self._broadcaster.broadcast_async(
+            self._call_web_api,
+            method,
+            kwargs,
+            channels,
+            on_progress=on_progress,
+        )
+
+    def profile(
+        self,
+        target: str,
+        invocations: int = 1,
+        *,
+        output: str | None = None,
+    ) -> None:
+        """
+        Profile a command or scheduled job.
+
+        Works the same as :meth:`Phial.profile`, except that only regular
+        functions can be profiled. Coroutines and the dispatch path share
+        the event loop's thread with every other request, so their profiles
+        would be meaningless.
+        """
+        funcs = [c.func for c in self.commands] + [j.func for j in self.scheduler.jobs]
+        coroutines = {f.__name__ for f in funcs if inspect.iscoroutinefunction(f)}
+        if target == DISPATCH or target in coroutines:
+            raise ValueError(f"{target} can not be profiled by AsyncPhial")
+        super().profile(target, invocations, output=output)
+
+    def _run_on_loop(self, coro: Coroutine[Any, Any, T]) -> T:
+        """
+        Run a coroutine on the bot's event loop, blocking until it's done.
+
+        Lets regular functions, which run in worker threads, use the bot's
+        async clients. Before the bot has started the coroutine is run on a
+        new event loop instead.
+        """
+        loop = self._loop
+        if loop is None or not loop.is_running():
+            return asyncio.run(coro)
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            coro.close()
+            raise RuntimeError(
+                "Blocking calls would deadlock the event loop, "
+                "await the _async version instead",
+            )
+        return asyncio.run_coroutine_threadsafe(coro, loop).result()
+
+    async def _queue_web_api_async(
+        self,
+        method: str,
+        /,
+        **kwargs: Any,  # noqa: ANN401
+    ) -> None:
+        """Call a Web API method, through the outbox if there is one."""
+        if self.outbox is None:
+            await self._call_web_api(method, **kwargs)
+        else:
+            # Writing to SQLite blocks, so is kept off the event loop
+            await asyncio.to_thread(self.outbox.put, method, kwargs, team=_team.get())
+
+    async def _send_from_outbox_async(self, entry: OutboxEntry) -> None:
+        team = _team.set(entry.team)
+        try:
+            await self._call_web_api(entry.method, **entry.kwargs)
+        finally:
+            _team.reset(team)
+
+    async def _call_web_api(
+        self,
+        method: str,
+        /,
+        **kwargs: Any,  # noqa: ANN401
+    ) -> Any:  # noqa: ANN401
+        """Call a Slack Web API method, recording its latency."""
+        with self._circuit(method), self._web_api_metrics(method):
+            return await getattr(self._web_client(), method)(**kwargs)
+
+    async def _send_response_async(
+        self,
+        response: PhialResponse,
+        original_channel: str,
+    ) -> None:
+        route = self._route_response(response, original_channel)
+        if route is not None:
+            method, payload = route
+            await getattr(self, f"{method}_async")(payload)
+
+    async def _handle_request_async(
+        self,
+        client: "SocketModeClient",
+        req: SocketModeRequest,
+    ) -> None:
+        if self._stopping.is_set():
+            # Leave the envelope unacknowledged so Slack delivers it again
+            return
+        self._loop = asyncio.get_running_loop()
+        task = asyncio.current_task()
+        if task is not None:
+            self._in_flight_tasks[task] = req
+        try:
+            await self._handle_request_internal_async(client, req)
+        except Exception as e:
+            self.logger.error(e)
+        finally:
+            if task is not None:
+                del self._in_flight_tasks[task]
+
+    async def _handle_request_internal_async(
+        self,
+        client: "SocketModeClient",
+        req: SocketModeRequest,
+    ) -> None:
+        request_id = _request_id.set(req.envelope_id)
+        team = _team.set(envelope_team(req))
+        try:
+            with self._trace("request", type=req.type):
+                await self._process_request_async(client, req)
+        finally:
+            _team.reset(team)
+            _request_id.reset(request_id)
+
+    async def _process_request_async(
+        self,
+        client: "SocketModeClient",
+        req: SocketModeRequest,
+    ) -> None:
+        # Acknowledge the request so it is not resent
+        with self._trace("ack"):
+            ack_response = SocketModeResponse(envelope_id=req.envelope_id)
+            await client.send_socket_mode_response(ack_response)
+        if self._is_duplicate(req) or req.type != "events_api":
+            return
+        if self.directory.handle_event(req.payload.get("event", {})):
+            return
+        message = parse_slack_event(req.payload)
+        if not message:
+            return
+        event_type = req.payload["event"].get("type")
+        routes: dict[str, tuple[Command, dict[str, str]] | None] = {}
+        intercepted = await self._run_middleware_async(message, event_type, routes)
+        plan = self._plan(intercepted, routes)
+        if plan is None:
+            return
+        message, command = plan.message, plan.command
+        if command is None:
+            if self.fallback_func is not None:
+                with self._trace("fallback"):
+                    response = await self._call_with_context(
+                        message,
+                        partial(self.fallback_func, message),
+                    )
+                await self._send_response_async(response, message.channel)
+            return
+        if plan.throttled is not None:
+            await self._send_response_async(plan.throttled, message.channel)
+            return
+
+        try:
+            with self._trace("arguments", command=command.pattern_string):
+                raw_kwargs = plan.kwargs or {}
+                kwargs = validate_kwargs(command.func, raw_kwargs, self.converters)
+                kwargs = await self._resolve_kwargs(command, raw_kwargs, kwargs)
+            with self._command_metrics(command):
+                response = await self._run_command_async(command, kwargs, message)
+        except (
+            ArgumentValidationError,
+            ArgumentTypeValidationError,
+            ExecutionTimeoutError,
+        ) as e:
+            response = self._command_failed(command, message, e)
+        finally:
+            self._log_command(command, message)
+        await self._send_response_async(response, message.channel)
+
+    async def _run_command_async(
+        self,
+        command: Command,
+        kwargs: dict[str, Any],
+        message: Message,
+    ) -> PhialResponse:
+        cache = command.cache
+        key = self._cache_key(command, kwargs, message) if cache is not None else None
+        if cache is None or key is None:
+            return await self._call_command_async(command, kwargs, message)
+
+        async def call() -> tuple[PhialResponse, Message]:
+            return await self._call_command_async(command, kwargs, message), message
+
+        (response, origin), hit = await cache.get_or_call_async(
+            key,
+            call,
+            store=_is_cacheable,
+        )
+        self._metrics.command_cache.inc(
+            command.pattern_string,
+            "hit" if hit else "miss",
+        )
+        return self._for_message(response, origin, message)
+
+    async def _call_command_async(
+        self,
+        command: Command,
+        kwargs: dict[str, Any],
+        message: Message,
+    ) -> PhialResponse:
+        timeout = self._get_command_timeout(command)
+        if command.executor == "process":
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(
+                self._get_process_pool(),
+                _call_in_process,
+                command.func,
+                kwargs,
+                message,
+            )
+            try:
+                return await asyncio.wait_for(future, timeout)
+            except TimeoutError as e:
+                raise ExecutionTimeoutError(
+                    f"Timed out after {timeout} seconds",
+                    stack="<running in a worker process>",
+                ) from e
+        func = self._command_callable(command, kwargs, message)
+        return await self._call_with_context(message, func, timeout=timeout)
+
+    @staticmethod
+    async def _call_with_context(
+        message: Message,
+        func: Callable[[], PhialResponse],
+        *,
+        timeout: float | None = None,
+    ) -> PhialResponse:
+        _command_ctx_stack.push(message)
+        try:
+            return cast(PhialResponse, await call_async(func, timeout=timeout))
+        finally:
+            _command_ctx_stack.pop()
+
+    def stop(self, timeout: float | None = None) -> ShutdownReport:
+        """
+        Stop the bot, blocking until in-flight work has finished.
+
+        See :meth:`stop_async`.
+        """
+        self._stopping.set()
+        return self._run_on_loop(self.stop_async(timeout))
+
+    async def stop_async(self, timeout: float | None = None) -> ShutdownReport:
+        """
+        Stop the bot, waiting for in-flight work to finish.
+
+        Works the same as :meth:`Phial.stop`, except that coroutines which
+        are still running when the timeout expires are cancelled.
+
+        :param timeout: The maximum number of seconds to wait for in-flight
+                        work. Defaults to the :code:`shutdownTimeout` config
+                        value
+
+        :returns: A :obj:`ShutdownReport` of any work that was abandoned
+        """
+        self._stopping.set()
+        if self._shutdown_task is None:
+            if timeout is None:
+                timeout = float(cast(float, self.config["shutdownTimeout"]))
+            # Later calls wait for the first to finish, rather than shutting
+            # down twice
+            self._shutdown_task = asyncio.ensure_future(self._shutdown_async(timeout))
+        self._shutdown_report = await asyncio.shield(self._shutdown_task)
+        return self._shutdown_report
+
+    async def _shutdown_async(self, timeout: float) -> ShutdownReport:
+        self.logger.info("Phial stopping, waiting for in-flight work to finish")
+        tasks = set(self._in_flight_tasks)
+        if self._scheduler_task is not None:
+            tasks.add(self._scheduler_task)
+        if tasks:
+            _, pending = await asyncio.wait(tasks, timeout=timeout)
+        else:
+            pending = set()
+        if self.handover is not None:
+            self.handover.release()
+
+        abandoned_requests = [
+            req.envelope_id
+            for task, req in self._in_flight_tasks.items()
+            if task in pending
+        ]
+        report = self._build_shutdown_report(abandoned_requests)
+        for task in pending:
+            task.cancel()
+        await self._stop_outbox_async(timeout)
+
+        if self._disconnect_task is not None:
+            await self._disconnect_task
+        for client in self._socket_clients():
+            await client.close()  # type: ignore[no-untyped-call]
+        if self._process_pool is not None:
+            self._process_pool.shutdown(wait=False, cancel_futures=True)
+        self._stop_metrics_server()
+        if self.watchdog is not None:
+            self.watchdog.stop()
+        if self.recorder is not None:
+            self.recorder.close()
+        return report
+
+    def _socket_clients(self) -> list["SocketModeClient"]:
+        clients = [self.slack_client] if self.slack_client is not None else []
+        if self.connections is not None:
+            self.connections.close()
+            clients = self.connections.clients
+        return clients
+
+    def _disconnect(self) -> None:
+        # Called from the event loop, so the connections are closed in a task
+        self._disconnect_task = asyncio.ensure_future(self._disconnect_async())
+
+    async def _disconnect_async(self) -> None:
+        for client in self._socket_clients():
+            client.auto_reconnect_enabled = False
+            await client.disconnect()  # type: ignore[no-untyped-call]
+
+    async def _stop_outbox_async(self, timeout: float) -> None:
+        if self.outbox is None:
+            return
+        self.outbox.stop(0)
+        if self._outbox_task is not None:
+            # Give the task the chance to send whatever is due
+            _, pending = await asyncio.wait([self._outbox_task], timeout=timeout)
+            for task in pending:
+                task.cancel()
+            # Let the task finish with the database before it's closed
+            await asyncio.gather(*pending, return_exceptions=True)
+        self._stop_outbox(monotonic())
+
+    async def _start_async(self) -> None:  # pragma: no cover
+        """
+        Start the bot.
+
+        When called will start the bot listening to messages from Slack,
+        until :meth:`stop` is called.
+        """
+        if self.config["workers"]:
+            raise ValueError("Worker processes are not supported by AsyncPhial")
+        self._loop = asyncio.get_running_loop()
+        self._serve_metrics()
+        self.recorder = self._create_recorder()
+        await self._resolve_workspaces_async()
+        if self.outbox is not None:
+            # Sends anything left in the outbox by a previous run
+            self._outbox_task = asyncio.create_task(
+                self.outbox.run_async(self._send_from_outbox_async),
+            )
+        await self._connect()
+        if self.handover is not None:
+            self.handover.announce()
+        if self.config["preloadDirectory"]:
+            try:
+                await self.directory.preload_async()
+            except Exception as e:
+                self.logger.error(f"Failed to preload the directory: {e}")
+
+        self.logger.info("Phial connected and running!")
+
+        while not self._stopping.is_set():
+            scheduler_idle = self._scheduler_task is None or self._scheduler_task.done()
+            if self._poll_handover() and scheduler_idle:
+                self._scheduler_task = asyncio.create_task(
+                    self.scheduler.run_pending_async(),
+                )
+            await asyncio.sleep(cast(float, self.config["loopDelay"]))
+
+    async def _run(self) -> None:  # pragma: no cover
+        if self.config["handleSignals"]:
+            loop = asyncio.get_running_loop()
+            for signum in (signal.SIGINT, signal.SIGTERM):
+                loop.add_signal_handler(signum, self._stopping.set)
+        await self._start_async()
+        await self.stop_async()
+
+    def run(self) -> None:  # pragma: no cover
+        """
+        Run the bot.
+
+        Blocks until the bot is stopped, either by awaiting
+        :meth:`stop_async` or, when the :code:`handleSignals` config value is
+        set, by sending the process SIGINT or SIGTERM.
+        """
+        asyncio.run(self._run())
@@ -1,30 +1,134 @@
 """The core of phial."""
 
-import json
+import copy
+import inspect
+import itertools
 import logging
-from collections.abc import Callable
-from concurrent.futures import Future, ThreadPoolExecutor
-from time import sleep
-from typing import cast
+import math
+import signal
+import threading
+from collections.abc import Callable, Collection, Hashable, Iterable, Iterator
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures import wait as wait_for_futures
+from contextlib import AbstractContextManager, contextmanager, nullcontext
+from functools import partial
+from time import monotonic, perf_counter
+from typing import TYPE_CHECKING, Any, NamedTuple, cast
 
 from slack_sdk.socket_mode import SocketModeClient
 from slack_sdk.socket_mode.request import SocketModeRequest
 from slack_sdk.socket_mode.response import SocketModeResponse
 from slack_sdk.web import WebClient
 
-from phial.commands import help_command
-from phial.errors import ArgumentTypeValidationError, ArgumentValidationError
+from phial.breaker import CircuitBreakers
+from phial.broadcast import Broadcaster, BroadcastResult, ProgressCallback
+from phial.commands import HelpIndex, help_command, profile_command
+from phial.connections import ConnectionPool
+from phial.directory import Directory
+from phial.errors import (
+    ArgumentTypeValidationError,
+    ArgumentValidationError,
+    ExecutionTimeoutError,
+)
 from phial.globals import _command_ctx_stack
+from phial.handover import Handover
+from phial.metrics import BotMetrics, MetricsRegistry
+from phial.middleware import Middleware, MiddlewarePlan
+from phial.outbox import Outbox, OutboxEntry
+from phial.payloads import JsonDumps, json_backend
+from phial.profiling import DISPATCH, Profiler
+from phial.ratelimit import RateLimiter
+from phial.replay import Recorder
 from phial.scheduler import Schedule, ScheduledJob, Scheduler
-from phial.utils import parse_slack_event, validate_kwargs
+from phial.tracing import Span, Tracer, _request_id
+from phial.utils import (
+    RateLimitedLogger,
+    TimeoutRunner,
+    parse_slack_event,
+    validate_kwargs,
+)
+from phial.watchdog import Watchdog
+from phial.workers import ChannelLanes, DirectoryEvent, Work, WorkerPool, receive
+from phial.workspaces import Workspace, _team, envelope_team
 from phial.wrappers import (  # fmt: off
     Attachment,
+    Channel,
     Command,
     Message,
     PhialResponse,
     Response,
+    User,
 )
 
+if TYPE_CHECKING:  # pragma: no cover
+    from http.server import ThreadingHTTPServer
+    from multiprocessing.connection import Connection
+
+
+def _call_in_process(
+    func: Callable[..., PhialResponse],
+    kwargs: dict[str, Any],
+    message: Message,
+) -> PhialResponse:
+    """
+    Run a command function inside a worker process.
+
+    The message is pushed onto the worker's context stack so
+    :data:`phial.command` works the same as it does in the bot's process.
+    """
+    _command_ctx_stack.push(message)
+    try:
+        return func(**kwargs)
+    finally:
+        _command_ctx_stack.pop()
+
+
+_NO_SPAN = nullcontext()
+
+
+def _is_cacheable(result: tuple[PhialResponse, Message]) -> bool:
+    # Files can only be read once, so can't be sent again
+    return not isinstance(result[0], Attachment)
+
+
+class DispatchPlan(NamedTuple):
+    """
+    What a message which made it through middleware should run.
+
+    Shared by the sync and async dispatch pipelines.
+    """
+
+    message: Message
+    #: The matching command, or None to run the fallback command
+    command: Command | None = None
+    kwargs: dict[str, str] | None = None
+    #: The reply to send instead of running a rate limited command
+    throttled: PhialResponse | None = None
+
+
+class ShutdownReport(NamedTuple):
+    """
+    A record of the work left unfinished when a bot stopped.
+
+    .. py:attribute:: abandoned_requests
+
+        The envelope IDs of requests that were still being handled.
+
+    .. py:attribute:: abandoned_jobs
+
+        The names of scheduled jobs that were still running.
+
+    """
+
+    abandoned_requests: list[str]
+    abandoned_jobs: list[str]
+
+    @property
+    def clean(self) -> bool:
+        """Whether all in-flight work finished before the bot stopped."""
+        return not self.abandoned_requests and not self.abandoned_jobs
+
 
 class Phial:
     """
@@ -43,6 +147,57 @@ class Phial:
         "autoReconnect": True,
         "loopDelay": 0.001,
         "maxThreads": 4,
+        "maxProcesses": None,
+        "commandTimeout": None,
+        "timeoutResponse": "Sorry, that command took too long to run",
+        "maxAbandonedThreads": 16,
+        "shutdownTimeout": 30,
+        "handleSignals": True,
+        "handoverPath": None,
+        "handoverInterval": 1,
+        "metricsPort": None,
+        "metricsHost": "127.0.0.1",
+        "registerProfileCommand": False,
+        "adminUsers": [],
+        "slowThreshold": None,
+        "slowSampleInterval": 0.05,
+        "slowReportInterval": 60,
+        "logRateLimit": 10,
+        "logRatePeriod": 60,
+        "preloadDirectory": False,
+        "directoryTTL": 3600,
+        "helpPageSize": 4000,
+        "rateLimit": None,
+        "rateLimitKey": "user",
+        "rateLimitResponse": (
+            "You're sending commands too quickly, try again in {retry_after} seconds"
+        ),
+        "recordPath": None,
+        "recordRedactText": False,
+        "recordRedactUsers": False,
+        "apiUrl": None,
+        "connections": 1,
+        "connectionStagger": 1,
+        "workers": 0,
+        "workerApp": None,
+        "outboxPath": None,
+        "outboxBatchSize": 100,
+        "outboxRetryDelay": 1,
+        "outboxMaxRetryDelay": 60,
+        "outboxMaxAttempts": 10,
+        "circuitBreaker": False,
+        "circuitErrorRate": 0.5,
+        "circuitMinCalls": 10,
+        "circuitWindow": 30,
+        "circuitSlowCall": None,
+        "circuitOpenSeconds": 5,
+        "circuitMaxOpenSeconds": 120,
+        "circuitProbes": 3,
+        "broadcastConcurrency": 8,
+        "broadcastRateLimit": (10, 1),
+        "broadcastChannelRateLimit": (1, 1),
+        "broadcastRetries": 3,
+        "jsonBackend": "json",
     }
 
     def __init__(
@@ -54,15 +209,98 @@ class Phial:
     ) -> None:
         self.config = dict(self.default_config)
         self.config.update(config)
-        self.slack_client = SocketModeClient(
-            app_token=app_token,
-            web_client=WebClient(token=bot_token),
-            auto_reconnect_enabled=cast(bool, self.config["autoReconnect"]),
-        )
+        self._init_clients(app_token, bot_token)
         self.commands: list[Command] = []
+        self._help_index: HelpIndex | None = None
         self.middleware_functions: list[Callable[[Message], Message | None]] = []
-        self.scheduler = Scheduler()
+        self._middleware: list[Middleware] = []
+        self._middleware_plan: MiddlewarePlan | None = None
+        #: The bot's metrics. See :mod:`phial.metrics`
+        self.metrics = MetricsRegistry()
+        self._metrics = BotMetrics(self.metrics)
+        self._metrics_server: ThreadingHTTPServer | None = None
+        self.tracers: list[Tracer] = []
+        #: Profiles commands, scheduled jobs and dispatch on demand
+        self.profiler = Profiler()
+        #: Logs slow commands and scheduled jobs, if :code:`slowThreshold`
+        #: is configured
+        self.watchdog: Watchdog | None = None
+        if self.config.get("slowThreshold"):
+            self.watchdog = Watchdog(
+                float(cast(float, self.config["slowThreshold"])),
+                interval=float(cast(float, self.config["slowSampleInterval"])),
+                report_interval=float(
+                    cast(float, self.config["slowReportInterval"]),
+                ),
+            )
+        #: Limits how often any command can be run, if :code:`rateLimit`
+        #: is configured
+        self.rate_limiter: RateLimiter | None = None
+        if self.config.get("rateLimit"):
+            limit, period = cast(tuple[int, float], self.config["rateLimit"])
+            self.rate_limiter = RateLimiter(
+                limit,
+                period,
+                key=cast(str, self.config["rateLimitKey"]),
+            )
+        #: Records envelopes for replaying, if :code:`recordPath` is
+        #: configured. Created when the bot starts
+        self.recorder: Recorder | None = None
+        #: Receives envelopes over :code:`connections` Socket Mode
+        #: connections. Created when the bot starts
+        self.connections: ConnectionPool | None = None
+        #: The workspaces served besides the one the bot was created for.
+        #: See :meth:`add_workspace`
+        self.workspaces: list[Workspace] = []
+        #: Handles messages in :code:`workers` worker processes, if
+        #: configured. Created when the bot starts. Rate limits and caches
+        #: are per worker, see :class:`phial.workers.WorkerPool`
+        self.workers: WorkerPool | None = None
+        self._workspace_teams: dict[str, Workspace] = {}
+        self._timeouts = TimeoutRunner(
+            int(cast(int, self.config["maxAbandonedThreads"])),
+            gauge=self._metrics.abandoned_threads,
+        )
+        self.scheduler = Scheduler(
+            metrics=self.metrics,
+            profiler=self.profiler,
+            watchdog=self.watchdog,
+            timeouts=self._timeouts,
+        )
         self.fallback_func: Callable[[Message], PhialResponse] | None = None
+        #: The workspace's users and channels. See :mod:`phial.directory`
+        self.directory = self._create_directory()
+        self.converters = self._default_converters()
+        self._process_pool: ProcessPoolExecutor | None = None
+        self._thread_pool: ThreadPoolExecutor | None = None
+        self._scheduler_future: Future | None = None
+        self._stopping = threading.Event()
+        self._in_flight: dict[int, SocketModeRequest] = {}
+        self._in_flight_changed = threading.Condition()
+        self._request_ids = itertools.count()
+        self._shutdown_lock = threading.Lock()
+        self._shutdown_report: ShutdownReport | None = None
+        self.handover: Handover | None = None
+        if self.config.get("handoverPath"):
+            self.handover = Handover(
+                cast(str, self.config["handoverPath"]),
+                interval=float(cast(float, self.config["handoverInterval"])),
+            )
+        #: Durably queues outbound messages, reactions and uploads, if
+        #: :code:`outboxPath` is configured. See :mod:`phial.outbox`
+        self.outbox = self._create_outbox()
+        #: Pause calls to failing Web API methods, if :code:`circuitBreaker`
+        #: is configured. See :mod:`phial.breaker`
+        self.breakers = self._create_breakers()
+        self._json_dumps: JsonDumps = json_backend(
+            cast(str | JsonDumps, self.config["jsonBackend"]),
+        )
+        self._broadcaster = Broadcaster(
+            concurrency=int(cast(int, self.config["broadcastConcurrency"])),
+            rate_limit=cast(tuple, self.config["broadcastRateLimit"]),
+            channel_rate_limit=cast(tuple, self.config["broadcastChannelRateLimit"]),
+            retries=int(cast(int, self.config["broadcastRetries"])),
+        )
         self.logger = logging.getLogger(__name__)
         if not self.logger.hasHandlers():  # pragma: nocover
             handler = logging.StreamHandler()
@@ -71,8 +309,141 @@ class Phial:
             self.logger.addHandler(handler)
             self.logger.propagate = False
             self.logger.setLevel(logging.INFO)
+        # Every unmatched message with the prefix is logged, so limit how
+        # often to keep floods of chatter from swamping the logs
+        self._not_found_log = RateLimitedLogger(
+            self.logger,
+            logging.WARNING,
+            int(cast(int, self.config["logRateLimit"])),
+            float(cast(float, self.config["logRatePeriod"])),
+        )
         self._register_standard_commands()
 
+    def _init_clients(self, app_token: str, bot_token: str) -> None:
+        self.slack_client = self._create_slack_client(app_token, bot_token)
+
+    def _create_slack_client(self, app_token: str, bot_token: str) -> SocketModeClient:
+        return SocketModeClient(
+            app_token=app_token,
+            web_client=self._create_web_client(bot_token),
+            auto_reconnect_enabled=cast(bool, self.config["autoReconnect"]),
+            # Worker processes do the handling, so envelopes are handed off
+            # from a single thread to keep them in the order they arrived
+            concurrency=1 if self.config["workers"] else 10,
+        )
+
+    def _create_web_client(self, bot_token: str) -> Any:  # noqa: ANN401
+        return WebClient(
+            token=bot_token,
+            base_url=cast(str, self.config.get("apiUrl") or WebClient.BASE_URL),
+        )
+
+    def _create_connections(self) -> ConnectionPool:
+        count = int(cast(int, self.config["connections"]))
+        if count < 1:
+            raise ValueError("The connections config value must be at least 1")
+        # Extra connections are for the same app, so reuse the first's tokens
+        app_token = self.slack_client.app_token
+        bot_token = cast(str, self.slack_client.web_client.token)
+        clients = [
+            self.slack_client,
+            *(
+                self._create_slack_client(app_token, bot_token)
+                for _ in range(count - 1)
+            ),
+        ]
+        for workspace in self.workspaces:
+            token = cast(str, workspace.web_client.token)
+            clients.extend(
+                self._create_slack_client(workspace.app_token, token)
+                for _ in range(count)
+            )
+        return ConnectionPool(
+            clients,
+            stagger=float(cast(float, self.config["connectionStagger"])),
+            on_duplicate=lambda req: self._metrics.duplicate_envelopes.inc(req.type),
+        )
+
+    def _create_workers(self) -> WorkerPool | None:
+        count = int(cast(int, self.config["workers"]))
+        if count < 1:
+            return None
+        if not self.config.get("workerApp"):
+            raise ValueError("The workerApp config value is needed to run workers")
+        return WorkerPool(cast(str, self.config["workerApp"]), count)
+
+    def _create_outbox(self) -> Outbox | None:
+        path = self.config.get("outboxPath")
+        if not path:
+            return None
+        return Outbox(
+            cast(str, path),
+            batch_size=int(cast(int, self.config["outboxBatchSize"])),
+            retry_delay=float(cast(float, self.config["outboxRetryDelay"])),
+            max_retry_delay=float(cast(float, self.config["outboxMaxRetryDelay"])),
+            max_attempts=int(cast(int, self.config["outboxMaxAttempts"])),
+        )
+
+    def _create_breakers(self) -> CircuitBreakers | None:
+        if not self.config["circuitBreaker"]:
+            return None
+        slow_call = self.config.get("circuitSlowCall")
+        return CircuitBreakers(
+            error_rate=float(cast(float, self.config["circuitErrorRate"])),
+            min_calls=int(cast(int, self.config["circuitMinCalls"])),
+            window=float(cast(float, self.config["circuitWindow"])),
+            slow_call=float(cast(float, slow_call)) if slow_call else None,
+            open_seconds=float(cast(float, self.config["circuitOpenSeconds"])),
+            max_open_seconds=float(cast(float, self.config["circuitMaxOpenSeconds"])),
+            probes=int(cast(int, self.config["circuitProbes"])),
+            on_change=self._metrics.circuit_breaker_changes.inc,
+        )
+
+    def _create_recorder(self) -> Recorder | None:
+        path = self.config.get("recordPath")
+        if not path:
+            return None
+        return Recorder(
+            cast(str, path),
+            redact_text=bool(self.config["recordRedactText"]),
+            redact_users=bool(self.config["recordRedactUsers"]),
+        )
+
+    def _create_directory(self) -> Directory:
+        return Directory(
+            self._call_web_api,
+            ttl=float(cast(float, self.config["directoryTTL"])),
+        )
+
+    def _default_converters(self) -> dict[Any, Callable[[str], Any]]:
+        return {User: self.directory.user, Channel: self.directory.channel}
+
+    def add_converter(self, annotation: Any, func: Callable[[str], Any]) -> None:  # noqa: ANN401
+        """
+        Register how to convert arguments for parameters with an annotation.
+
+        By default an argument is converted by calling its parameter's
+        annotation, so :code:`count: int` becomes :code:`int(count)`.
+        Parameters annotated with :class:`User` or :class:`Channel` are
+        looked up in :attr:`directory`.
+
+        :param annotation: The annotation to convert arguments for
+        :param func: Called with the argument's text, returning the
+                     converted value. Raise :obj:`ValueError` if the text
+                     can't be converted
+
+        .. rubric:: Example
+
+        ::
+
+            bot.add_converter(Project, projects.get_by_name)
+
+            @bot.command("deploy <project>")
+            def deploy(project: Project):
+                ...
+        """
+        self.converters[annotation] = func
+
     def add_command(
         self,
         pattern: str,
@@ -81,6 +452,13 @@ class Phial:
         help_text_override: str | None = None,
         case_sensitive: bool = False,
         hide_from_help_command: bool | None = False,
+        executor: str | None = None,
+        timeout: float | None = None,
+        cache_ttl: float | None = None,
+        cache_size: int = 128,
+        cache_scope: str | None = None,
+        rate_limit: tuple[int, float] | None = None,
+        rate_limit_key: str = "user",
     ) -> None:
         """
         Register a command with the bot.
@@ -110,6 +488,76 @@ class Phial:
                                        it generates.
 
                                        Defaults to False
+        :param executor: Where the command's function should be run.
+
+                         :obj:`None` runs it on the thread handling the
+                         message. :code:`'process'` runs it in a pool of
+                         worker processes, which keeps CPU heavy commands
+                         from starving the rest of the bot. Process
+                         commands must be module level functions, and
+                         their arguments and return value must be
+                         picklable.
+
+                         Defaults to None
+        :param timeout: The number of seconds the command may run for.
+
+                        If the command has not finished in time the
+                        :code:`timeoutResponse` config value is sent to
+                        the channel, a snapshot of the command's stack is
+                        logged, and the bot stops waiting for it.
+                        Coroutine commands run by :class:`AsyncPhial`
+                        are cancelled.
+
+                        Process commands can't be stopped once they've
+                        started, so one which times out keeps its worker
+                        process busy until it finishes. A command which
+                        never finishes takes one of the
+                        :code:`maxProcesses` workers for good.
+
+                        Defaults to the :code:`commandTimeout` config
+                        value, which is None (no limit) by default
+        :param cache_ttl: The number of seconds to cache the command's
+                          response for.
+
+                          Responses are cached by the command's arguments,
+                          and concurrent requests for a response which is
+                          not cached yet only run the command once.
+                          References to the original message's channel,
+                          timestamp and user in a cached :obj:`Response`
+                          are replaced with the requesting message's.
+                          Errors, timeouts and :obj:`Attachment` responses
+                          are not cached.
+
+                          Defaults to None, meaning responses are not
+                          cached
+        :param cache_size: The maximum number of responses to cache. The
+                           least recently used response is evicted once
+                           full.
+
+                           Defaults to 128
+        :param cache_scope: Who cached responses are shared between.
+                            :obj:`None` shares them between everyone,
+                            :code:`'user'` between messages from the same
+                            user and :code:`'channel'` between messages in
+                            the same channel.
+
+                            Defaults to None
+        :param rate_limit: The number of times the command may be run, and
+                           the period in seconds, e.g. :code:`(5, 60)`.
+
+                           Runs over the limit are not validated or run,
+                           and the :code:`rateLimitResponse` config value
+                           is sent to the user instead. The
+                           :code:`rateLimit` config value limits every
+                           command as well.
+
+                           Defaults to None, meaning the command is not
+                           rate limited
+        :param rate_limit_key: What the rate limit is counted by,
+                               :code:`'user'`, :code:`'channel'` or
+                               :code:`'team'`.
+
+                               Defaults to 'user'
 
         :raises ValueError: If command with the same pattern is already
                             registered
@@ -144,8 +592,16 @@ class Phial:
             help_text_override=help_text_override,
             case_sensitive=case_sensitive,
             hide_from_help_command=hide_from_help_command,
+            executor=executor,
+            timeout=timeout,
+            cache_ttl=cache_ttl,
+            cache_size=cache_size,
+            cache_scope=cache_scope,
+            rate_limit=rate_limit,
+            rate_limit_key=rate_limit_key,
         )
         self.commands.append(command)
+        self._help_index = None
         self.logger.debug(f"Command {pattern} added")
 
     def command(
@@ -155,6 +611,13 @@ class Phial:
         help_text_override: str | None = None,
         case_sensitive: bool = False,
         hide_from_help_command: bool | None = False,
+        executor: str | None = None,
+        timeout: float | None = None,
+        cache_ttl: float | None = None,
+        cache_size: int = 128,
+        cache_scope: str | None = None,
+        rate_limit: tuple[int, float] | None = None,
+        rate_limit_key: str = "user",
     ) -> Callable:
         """
         Register a command with the bot.
@@ -182,6 +645,32 @@ class Phial:
                                        it generates.
 
                                        Defaults to False
+        :param executor: Where the command's function should be run.
+                         See :meth:`add_command` for more information.
+
+                         Defaults to None
+        :param timeout: The number of seconds the command may run for.
+                        See :meth:`add_command` for more information.
+
+                        Defaults to the :code:`commandTimeout` config value
+        :param cache_ttl: The number of seconds to cache the command's
+                          response for. See :meth:`add_command` for more
+                          information.
+
+                          Defaults to None
+        :param cache_size: The maximum number of responses to cache.
+                           Defaults to 128
+        :param cache_scope: Who cached responses are shared between.
+                            See :meth:`add_command` for more information.
+
+                            Defaults to None
+        :param rate_limit: The number of times the command may be run, and
+                           the period in seconds. See :meth:`add_command`
+                           for more information.
+
+                           Defaults to None
+        :param rate_limit_key: What the rate limit is counted by.
+                               Defaults to 'user'
 
         .. rubric:: Example
 
@@ -195,6 +684,18 @@ class Phial:
                 def case_sensitive():
                     return "You typed caseSensitive"
 
+                @bot.command('report', executor='process')
+                def report():
+                    return build_large_report()
+
+                @bot.command('oncall', cache_ttl=30)
+                def oncall():
+                    return fetch_oncall_rota()
+
+                @bot.command('deploy', rate_limit=(1, 60))
+                def deploy():
+                    return start_deploy()
+
         """
 
         def decorator(f: Callable) -> Callable:
@@ -204,11 +705,53 @@ class Phial:
                 case_sensitive=case_sensitive,
                 help_text_override=help_text_override,
                 hide_from_help_command=hide_from_help_command,
+                executor=executor,
+                timeout=timeout,
+                cache_ttl=cache_ttl,
+                cache_size=cache_size,
+                cache_scope=cache_scope,
+                rate_limit=rate_limit,
+                rate_limit_key=rate_limit_key,
             )
             return f
 
         return decorator
 
+    @property
+    def middleware_plan(self) -> MiddlewarePlan:
+        """
+        The middleware to run on each message, in the order it runs.
+
+        It is rebuilt after middleware is added, or
+        :attr:`middleware_functions` is changed.
+        """
+        plan = self._middleware_plan
+        if plan is None or plan.is_stale(self.middleware_functions):
+            # Functions appended to middleware_functions directly have no filters
+            added = {id(m.func): m for m in self._middleware}
+            plan = self._middleware_plan = MiddlewarePlan(
+                [added.get(id(f)) or Middleware(f) for f in self.middleware_functions],
+            )
+        return plan
+
+    @property
+    def help_index(self) -> HelpIndex:
+        """
+        The rendered help text, built when first needed.
+
+        It is rebuilt after a command is added.
+        """
+        index = self._help_index
+        if index is None:
+            prefix = self.config.get("prefix") or ""
+            index = self._help_index = HelpIndex(
+                self.commands,
+                base_text=cast(str, self.config.get("baseHelpText", "")),
+                page_size=int(cast(int, self.config["helpPageSize"])),
+                page_hint=f"{prefix}help",
+            )
+        return index
+
     def alias(self, pattern: str) -> Callable:
         """
         Register an alias for a command.
@@ -288,7 +831,16 @@ class Phial:
 
         return decorator
 
-    def add_middleware(self, func: Callable[[Message], Message | None]) -> None:
+    def add_middleware(
+        self,
+        func: Callable[[Message], Message | None],
+        *,
+        channels: Collection[str] | None = None,
+        users: Collection[str] | None = None,
+        command_only: bool = False,
+        event_types: Collection[str] | None = None,
+        priority: int = 0,
+    ) -> None:
         """
         Add a middleware function to the bot.
 
@@ -296,10 +848,25 @@ class Phial:
         slack before the bot process the message itself. Returning :obj:`None`
         from a middleware function will prevent the bot from processing it.
 
+        Filters limit the messages a middleware function is passed, and
+        middleware which does not apply to a message is skipped without
+        being called.
+
         This method can be used as a decorator via :meth:`middleware`.
 
         :param middleware_func: The function to be added to the middleware
                                 pipeline
+        :param channels: Only run on messages in these channels.
+                         Defaults to every channel
+        :param users: Only run on messages from these users.
+                      Defaults to every user
+        :param command_only: Only run on messages which match a command.
+                             Defaults to False
+        :param event_types: Only run on these Slack event types,
+                            e.g. :code:`'app_mention'`. Defaults to every type
+        :param priority: Middleware with a lower priority runs first, and
+                         middleware with the same priority runs in the order
+                         it was added. Defaults to 0
 
         .. rubric :: Example
 
@@ -317,10 +884,29 @@ class Phial:
                 return message
 
         """
+        self._middleware.append(
+            Middleware(
+                func,
+                channels=channels,
+                users=users,
+                command_only=command_only,
+                event_types=event_types,
+                priority=priority,
+            ),
+        )
         self.middleware_functions.append(func)
+        self._middleware_plan = None
         self.logger.debug(f"Middleware {getattr(func, '__name__', repr(func))} added")
 
-    def middleware(self) -> Callable:
+    def middleware(
+        self,
+        *,
+        channels: Collection[str] | None = None,
+        users: Collection[str] | None = None,
+        command_only: bool = False,
+        event_types: Collection[str] | None = None,
+        priority: int = 0,
+    ) -> Callable:
         """
         Add a middleware function to the bot.
 
@@ -330,18 +916,178 @@ class Phial:
 
         ::
 
-            @bot.middleware()
+            @bot.middleware(channels=["C123"], priority=-1)
             def intercept(message):
                 return message
         """
 
         def decorator(f: Callable) -> Callable:
-            self.add_middleware(f)
+            self.add_middleware(
+                f,
+                channels=channels,
+                users=users,
+                command_only=command_only,
+                event_types=event_types,
+                priority=priority,
+            )
             return f
 
         return decorator
 
-    def add_scheduled(self, schedule: Schedule, func: Callable) -> None:
+    def add_workspace(
+        self,
+        app_token: str,
+        bot_token: str,
+        *,
+        team: str | None = None,
+    ) -> Workspace:
+        """
+        Serve another workspace from this bot.
+
+        Commands, middleware, scheduled jobs, caches and worker threads are
+        shared by every workspace, but each workspace gets its own
+        :code:`connections` Socket Mode connections. Web API calls made
+        while handling an envelope use the bot token of the workspace it
+        came from, and any others use the workspace the bot was created
+        for, unless made inside :meth:`workspace`. Workspaces must be added
+        before the bot starts.
+
+        :param app_token: The app-level token used to connect to Socket Mode
+        :param bot_token: The bot token for the workspace
+        :param team: The workspace's team ID. Defaults to None, meaning it
+                     is looked up with :code:`auth.test` when the bot starts
+        :returns: The workspace
+
+        .. rubric:: Example
+
+        ::
+
+            bot = Phial('app-token', 'bot-token')
+            bot.add_workspace('other-app-token', 'other-bot-token', team='T123')
+        """
+        workspace = Workspace(app_token, self._create_web_client(bot_token), team=team)
+        self.workspaces.append(workspace)
+        if team is not None:
+            self._workspace_teams[team] = workspace
+        return workspace
+
+    @contextmanager
+    def workspace(self, team: str) -> Iterator[None]:
+        """
+        Make Web API calls with the bot token of a workspace.
+
+        Envelopes are handled in the workspace they came from, so this is
+        for code which runs outside of a command, such as scheduled jobs.
+
+        :param team: The workspace's team ID
+
+        .. rubric:: Example
+
+        ::
+
+            @bot.scheduled(Schedule().every().day().at(9, 0))
+            def morning():
+                with bot.workspace('T123'):
+                    bot.send_message(Response(channel='C123', text='Morning'))
+        """
+        token = _team.set(team)
+        try:
+            yield
+        finally:
+            _team.reset(token)
+
+    def _current_workspace(self) -> Workspace | None:
+        # None means the workspace the bot was created for
+        team = _team.get()
+        return self._workspace_teams.get(team) if team is not None else None
+
+    def _web_client(self) -> Any:  # noqa: ANN401
+        workspace = self._current_workspace()
+        if workspace is None:
+            return self.slack_client.web_client
+        return workspace.web_client
+
+    def _resolve_workspaces(self) -> None:
+        for workspace in self.workspaces:
+            if workspace.team is not None:
+                continue
+            try:
+                workspace.team = workspace.web_client.auth_test()["team_id"]
+            except Exception as e:
+                self.logger.error(f"Failed to look up a workspace's team ID: {e}")
+                continue
+            self._workspace_teams[cast(str, workspace.team)] = workspace
+
+    def add_tracer(self, tracer: Tracer) -> None:
+        """
+        Add a tracer to the bot.
+
+        Tracers are told when each stage of handling a request starts and
+        ends. See :mod:`phial.tracing` for more information.
+
+        :param tracer: The tracer to be notified of spans
+
+        .. rubric:: Example
+
+        ::
+
+            class PrintTracer(Tracer):
+                def on_end(self, span):
+                    print(span.request_id, span.name, span.duration)
+
+            bot.add_tracer(PrintTracer())
+        """
+        self.tracers.append(tracer)
+
+    def _trace(self, name: str, **attributes: Any) -> Span | nullcontext:  # noqa: ANN401
+        """Time a stage of handling a request, if any tracers are registered."""
+        if not self.tracers:
+            return _NO_SPAN
+        return Span(name, attributes, self.tracers)
+
+    def profile(
+        self,
+        target: str,
+        invocations: int = 1,
+        *,
+        output: str | None = None,
+    ) -> None:
+        """
+        Profile a command, a scheduled job or the dispatch path.
+
+        The target is profiled with :mod:`cProfile` for the next
+        :code:`invocations` times it runs. A summary of the aggregated
+        stats is then logged and stored in :code:`bot.profiler.results`.
+        See :mod:`phial.profiling` for more information.
+
+        The :code:`registerProfileCommand` config value registers a hidden
+        :code:`profile <target> <invocations>` command which does the same.
+        It can only be used by the users in the :code:`adminUsers` config
+        value.
+
+        :param target: The name of a command's or scheduled job's function,
+                       or :code:`'dispatch'` to profile the handling of
+                       whole requests
+        :param invocations: The number of invocations to profile.
+                            Defaults to 1
+        :param output: A path to write the :mod:`pstats` data to once
+                       finished. Defaults to None
+
+        .. rubric:: Example
+
+        ::
+
+            bot.profile("report", 5, output="report.prof")
+        """
+        self.profiler.start(target, invocations, output=output)
+
+    def add_scheduled(
+        self,
+        schedule: Schedule,
+        func: Callable,
+        *,
+        timeout: float | None = None,
+    ) -> None:
         """
         Add a scheduled function to the bot.
 
@@ -350,6 +1096,11 @@ class Phial:
         :param schedule: The schedule used to run the function
         :param scheduled_func: The function to be run in accordance to the
                                schedule
+        :param timeout: The number of seconds the function may run for
+                        before it is abandoned and a snapshot of its stack
+                        is logged.
+
+                        Defaults to None, meaning no limit
 
         .. rubric:: Example
 
@@ -369,11 +1120,16 @@ class Phial:
                 bot.send_message(Response(text="Beep",
                                           channel="channel-id">))
         """
-        job = ScheduledJob(schedule, func)
+        job = ScheduledJob(schedule, func, timeout=timeout)
         self.scheduler.add_job(job)
         self.logger.debug(f"Schedule {getattr(func, '__name__', repr(func))} added")
 
-    def scheduled(self, schedule: Schedule) -> Callable:
+    def scheduled(
+        self,
+        schedule: Schedule,
+        *,
+        timeout: float | None = None,
+    ) -> Callable:
         """
         Register a scheduled function.
 
@@ -382,6 +1138,8 @@ class Phial:
 
         :param schedule: The schedule used to determine when the function
                          should be run
+        :param timeout: The number of seconds the function may run for.
+                        Defaults to None, meaning no limit
 
         .. rubric:: Example
 
@@ -394,7 +1152,7 @@ class Phial:
         """
 
         def decorator(f: Callable) -> Callable:
-            self.add_scheduled(schedule, f)
+            self.add_scheduled(schedule, f, timeout=timeout)
             return f
 
         return decorator
@@ -405,25 +1163,8 @@ class Phial:
 
         :param message: The message to be sent to Slack
         """
-        if message.ephemeral:
-            if message.user is None:
-                raise ValueError("User not provided for ephemeral message")
-            self.slack_client.web_client.chat_postEphemeral(
-                channel=message.channel,
-                text=message.text,
-                thread_ts=message.original_ts,
-                attachments=json.dumps(message.attachments),
-                user=message.user,
-                as_user=True,
-            )
-        else:
-            self.slack_client.web_client.chat_postMessage(
-                channel=message.channel,
-                text=message.text,
-                thread_ts=message.original_ts,
-                attachments=json.dumps(message.attachments),
-                as_user=True,
-            )
+        method, kwargs = self._build_message_call(message)
+        self._queue_web_api(method, **kwargs)
 
     def send_reaction(self, response: Response) -> None:
         """
@@ -432,15 +1173,7 @@ class Phial:
         :param response: Response containing the reaction to be
                          sent to Slack
         """
-        if response.original_ts is None or response.reaction is None:
-            raise ValueError(
-                "Original timestamp and reaction must be provided for reaction",
-            )
-        self.slack_client.web_client.reactions_add(
-            channel=response.channel,
-            timestamp=response.original_ts,
-            name=response.reaction,
-        )
+        self._queue_web_api("reactions_add", **self._build_reaction_call(response))
 
     def upload_attachment(self, attachment: Attachment) -> None:
         """
@@ -448,13 +1181,128 @@ class Phial:
 
         :param attachment: The attachment to be uploaded to Slack
         """
-        self.slack_client.web_client.files_upload_v2(
-            channels=attachment.channel,
-            filename=attachment.filename,
-            file=attachment.content,  # type: ignore
-            title=attachment.filename,
+        self._queue_web_api(
+            "files_upload_v2",
+            **self._build_attachment_call(attachment),
         )
 
+    def broadcast(
+        self,
+        response: Response,
+        channels: Iterable[str],
+        *,
+        on_progress: ProgressCallback | None = None,
+    ) -> BroadcastResult:
+        """
+        Send the same message to many channels, blocking until it's sent.
+
+        The message is built once and sent to several channels at a time,
+        within the :code:`broadcastRateLimit` and
+        :code:`broadcastChannelRateLimit` config values. Failed sends are
+        retried, and the result says which channels the message reached.
+        Messages are sent straight to Slack rather than through the outbox,
+        so the result is known when this returns.
+
+        .. code-block:: python
+
+            result = bot.broadcast(Response(channel="", text="Deploying"),
+                                   ["channel-1", "channel-2"])
+            if not result.ok:
+                print(result.failed)
+
+        :param response: The message to send. Its channel is replaced by
+                         each channel in turn
+        :param channels: The channels to send the message to
+        :param on_progress: Called with each channel's
+                            :class:`~phial.broadcast.ChannelDelivery` and
+                            the result so far. Defaults to None
+        :returns: How sending to each channel went
+        """
+        method, kwargs = self._build_message_call(response)
+        return self._broadcaster.broadcast(
+            self._call_web_api,
+            method,
+            kwargs,
+            channels,
+            on_progress=on_progress,
+        )
+
+    def _queue_web_api(self, method: str, /, **kwargs: Any) -> None:  # noqa: ANN401
+        """Call a Web API method, through the outbox if there is one."""
+        if self.outbox is None:
+            self._call_web_api(method, **kwargs)
+        else:
+            self.outbox.put(method, kwargs, team=_team.get())
+
+    def _send_from_outbox(self, entry: OutboxEntry) -> None:
+        team = _team.set(entry.team)
+        try:
+            self._call_web_api(entry.method, **entry.kwargs)
+        finally:
+            _team.reset(team)
+
+    def _call_web_api(self, method: str, /, **kwargs: Any) -> Any:  # noqa: ANN401
+        """Call a Slack Web API method, recording its latency."""
+        with self._circuit(method), self._web_api_metrics(method):
+            return getattr(self._web_client(), method)(**kwargs)
+
+    def _circuit(self, method: str) -> AbstractContextManager:
+        """Guard a Web API call with the method's circuit breaker, if enabled."""
+        if self.breakers is None:
+            return nullcontext()
+        return self.breakers[method].call()
+
+    @contextmanager
+    def _web_api_metrics(self, method: str) -> Iterator[None]:
+        start = perf_counter()
+        try:
+            with self._trace("slack_api", method=method):
+                yield
+        except Exception:
+            self._metrics.slack_api_errors.inc(method)
+            raise
+        finally:
+            self._metrics.slack_api_seconds.observe(perf_counter() - start, method)
+
+    def _build_message_call(self, message: Response) -> tuple[str, dict]:
+        kwargs = {
+            "channel": message.channel,
+            "text": message.text,
+            "thread_ts": message.original_ts,
+            "as_user": True,
+        }
+        for name in ("attachments", "blocks"):
+            # Left out rather than sent as "null" when there are none
+            payload = message.serialize(name, self._json_dumps)
+            if payload is not None:
+                kwargs[name] = payload
+        if message.ephemeral:
+            if message.user is None:
+                raise ValueError("User not provided for ephemeral message")
+            return "chat_postEphemeral", {**kwargs, "user": message.user}
+        return "chat_postMessage", kwargs
+
+    @staticmethod
+    def _build_reaction_call(response: Response) -> dict:
+        if response.original_ts is None or response.reaction is None:
+            raise ValueError(
+                "Original timestamp and reaction must be provided for reaction",
+            )
+        return {
+            "channel": response.channel,
+            "timestamp": response.original_ts,
+            "name": response.reaction,
+        }
+
+    @staticmethod
+    def _build_attachment_call(attachment: Attachment) -> dict:
+        return {
+            "channels": attachment.channel,
+            "filename": attachment.filename,
+            "file": attachment.content,
+            "title": attachment.filename,
+        }
+
     def _register_standard_commands(self) -> None:
         if "registerHelpCommand" in self.config and self.config["registerHelpCommand"]:
             # The command function has to be a lambda as we wish to delay
@@ -464,22 +1312,44 @@ class Phial:
                 lambda: help_command(self),
                 help_text_override="List all available commands",
             )
+            self.add_command(
+                "help <term>",
+                lambda term: help_command(self, term),
+                hide_from_help_command=True,
+            )
+        if self.config.get("registerProfileCommand"):
+            self.add_command(
+                "profile <target> <invocations>",
+                lambda target, invocations: profile_command(
+                    self,
+                    target,
+                    invocations,
+                ),
+                hide_from_help_command=True,
+            )
 
     def _send_response(self, response: PhialResponse, original_channel: str) -> None:
+        route = self._route_response(response, original_channel)
+        if route is not None:
+            method, payload = route
+            getattr(self, method)(payload)
+
+    @staticmethod
+    def _route_response(
+        response: PhialResponse,
+        original_channel: str,
+    ) -> tuple[str, Response | Attachment] | None:
+        """
+        Work out how a command's return value should be sent to Slack.
+
+        :returns: The name of the send method to use and the object to pass
+                  to it, or :obj:`None` if nothing should be sent
+        """
         if response is None:
-            return  # Do nothing if command function returns nothing
+            return None  # Do nothing if command function returns nothing
 
         if isinstance(response, str):
-            self.send_message(Response(text=response, channel=original_channel))
-
-        elif not isinstance(response, Response) and not isinstance(
-            response,
-            Attachment,
-        ):
-            raise ValueError(
-                "Only Response or Attachment objects can be "
-                "returned from command functions",
-            )
+            return "send_message", Response(text=response, channel=original_channel)
 
         if isinstance(response, Response):
             if response.original_ts and response.reaction and response.text:
@@ -489,109 +1359,740 @@ class Phial:
                     "Reaction, Text",
                 )
             if response.original_ts and response.reaction:
-                self.send_reaction(response)
-            elif response.text or response.attachments:
-                self.send_message(response)
+                return "send_reaction", response
+            if response.text or response.attachments or response.blocks:
+                return "send_message", response
+            return None
 
         if isinstance(response, Attachment):
-            self.upload_attachment(response)
+            return "upload_attachment", response
+
+        raise ValueError(
+            "Only Response or Attachment objects can be "
+            "returned from command functions",
+        )
 
     def _handle_request(self, client: SocketModeClient, req: SocketModeRequest) -> None:
+        if self._stopping.is_set():
+            # Leave the envelope unacknowledged so Slack delivers it again
+            return
+        request_id = next(self._request_ids)
+        with self._in_flight_changed:
+            self._in_flight[request_id] = req
         try:
             self._handle_request_internal(client, req)
         except Exception as e:
             self.logger.error(e)
+        finally:
+            with self._in_flight_changed:
+                del self._in_flight[request_id]
+                self._in_flight_changed.notify_all()
 
     def _handle_request_internal(
         self,
         client: SocketModeClient,
         req: SocketModeRequest,
+    ) -> None:
+        request_id = _request_id.set(req.envelope_id)
+        team = _team.set(envelope_team(req))
+        try:
+            with self._trace("request", type=req.type), self.profiler.profile(DISPATCH):
+                self._process_request(client, req)
+        finally:
+            _team.reset(team)
+            _request_id.reset(request_id)
+
+    def _is_duplicate(self, req: SocketModeRequest) -> bool:
+        # Slack can deliver an envelope on more than one connection. Only
+        # acknowledged envelopes are recorded, as Slack resends the others
+        if self.connections is not None and not self.connections.first_delivery(req):
+            return True
+        self._metrics.envelopes.inc(req.type)
+        return False
+
+    def _process_request(
+        self,
+        client: SocketModeClient,
+        req: SocketModeRequest,
     ) -> None:
         # Acknowledge the request so it is not resent
-        ack_response = SocketModeResponse(envelope_id=req.envelope_id)
-        client.send_socket_mode_response(ack_response)
-
-        if req.type != "events_api":
+        with self._trace("ack"):
+            ack_response = SocketModeResponse(envelope_id=req.envelope_id)
+            client.send_socket_mode_response(ack_response)
+        if self._is_duplicate(req) or req.type != "events_api":
+            return
+        event = req.payload.get("event", {})
+        if self.directory.handle_event(event):
+            if self.workers is not None:
+                self.workers.broadcast(DirectoryEvent(event))
             return
         message = parse_slack_event(req.payload)
+        if not message:
+            return
+        if self.workers is not None:
+            work = Work(message, event.get("type"), _team.get(), _request_id.get())
+            self.workers.submit(work)
+            return
+        self._dispatch(message, event.get("type"))
+
+    def _dispatch(self, message: Message, event_type: str | None) -> None:
+        """Run a parsed message through middleware, then any matching command."""
+        routes: dict[str, tuple[Command, dict[str, str]] | None] = {}
+        intercepted = self._run_middleware(message, event_type, routes)
+        plan = self._plan(intercepted, routes)
+        if plan is None:
+            return
+        message, command = plan.message, plan.command
+        if command is None:
+            if self.fallback_func is not None:
+                _command_ctx_stack.push(message)
+                try:
+                    with self._trace("fallback"):
+                        response = self.fallback_func(message)
+                finally:
+                    _command_ctx_stack.pop()
+                self._send_response(response, message.channel)
+            return
+        if plan.throttled is not None:
+            self._send_response(plan.throttled, message.channel)
+            return
 
-        # Run middleware functions
-        for func in self.middleware_functions:
-            if message:
-                self.logger.debug(f"Ran middleware: {func.__name__} on {message}")
-                message = func(message)
+        _command_ctx_stack.push(message)
+        try:
+            with self._trace("arguments", command=command.pattern_string):
+                kwargs = validate_kwargs(
+                    command.func,
+                    plan.kwargs or {},
+                    self.converters,
+                )
+            with self._command_metrics(command):
+                response = self._run_command(command, kwargs, message)
+        except (
+            ArgumentValidationError,
+            ArgumentTypeValidationError,
+            ExecutionTimeoutError,
+        ) as e:
+            response = self._command_failed(command, message, e)
+        finally:
+            self._log_command(command, message)
+            _command_ctx_stack.pop()
+        self._send_response(response, message.channel)
+
+    def _plan(
+        self,
+        message: Message | None,
+        routes: dict[str, tuple[Command, dict[str, str]] | None],
+    ) -> DispatchPlan | None:
+        """
+        Work out what a message which made it through middleware should run.
 
-        # If message has been intercepted or is a bot message return early
-        if not message or message.bot_id:
+        :returns: The plan, or None if the message should be ignored
+        """
+        # If message has been intercepted or should be ignored return early
+        if not message or not self._should_handle(message):
+            return None
+        match = self._route(message, routes)
+        if match is None:
+            self._not_found_log.log(
+                "Command %s not found",
+                message.text,
+                extra=self._log_fields(message),
+            )
+            return DispatchPlan(message)
+        command, kwargs = match
+        throttled = self._check_rate_limits(command, message)
+        return DispatchPlan(message, command, kwargs, throttled)
+
+    def _command_failed(
+        self,
+        command: Command,
+        message: Message,
+        error: Exception,
+    ) -> PhialResponse:
+        """Get the reply for a command given bad arguments, or which timed out."""
+        if isinstance(error, ExecutionTimeoutError):
+            return self._command_timed_out(command, message, error)
+        self._metrics.commands.inc(command.pattern_string, "invalid_arguments")
+        return str(error)
+
+    def _log_command(self, command: Command, message: Message) -> None:
+        if not self.logger.isEnabledFor(logging.DEBUG):
             return
+        self.logger.debug(
+            "Ran command: %s on %s",
+            command.func.__name__,
+            message,
+            extra=self._log_fields(message, command=command.pattern_string),
+        )
+
+    def _serve_worker(self, connection: "Connection") -> None:
+        """
+        Handle the messages submitted to a worker process until told to stop.
+
+        Messages run on the bot's worker threads, one at a time per channel.
+        """
+        thread_pool_size = int(cast(str, self.config["maxThreads"]))
+        self._thread_pool = ThreadPoolExecutor(thread_pool_size)
+        self._start_outbox()
+        lanes = ChannelLanes(self._thread_pool)
+        while (item := receive(connection)) is not None:
+            if isinstance(item, DirectoryEvent):
+                self.directory.handle_event(item.event)
+            else:
+                lanes.submit(item.message.channel, partial(self._handle_work, item))
+        lanes.wait()
+        self._thread_pool.shutdown()
+        timeout = float(cast(float, self.config["shutdownTimeout"]))
+        self._stop_outbox(monotonic() + timeout)
+
+    def _handle_work(self, work: Work) -> None:
+        request_id = _request_id.set(work.request_id)
+        team = _team.set(work.team)
+        try:
+            with self._trace("request", type="events_api"):
+                self._dispatch(work.message, work.event_type)
+        finally:
+            _team.reset(team)
+            _request_id.reset(request_id)
 
-        # If message should have a prefix but doesn't return early
-        if (
-            "prefix" in self.config
-            and self.config["prefix"] is not None
-            and self.config["prefix"] != ""
-            and isinstance(self.config["prefix"], str)
-            and not message.text.startswith(self.config["prefix"])
+    def _run_middleware(
+        self,
+        message: Message | None,
+        event_type: str | None,
+        routes: dict[str, tuple[Command, dict[str, str]] | None],
+    ) -> Message | None:
+        """Run the middleware which applies to a message, in priority order."""
+        for stage in self.middleware_plan.stages:
+            if not message:
+                break
+            if not self._middleware_applies(stage, message, event_type, routes):
+                continue
+            with self._middleware_metrics(stage.name):
+                message = stage.func(message)
+            if not message:
+                self._metrics.middleware_short_circuits.inc(stage.name)
+        return message
+
+    def _middleware_applies(
+        self,
+        stage: Middleware,
+        message: Message,
+        event_type: str | None,
+        routes: dict[str, tuple[Command, dict[str, str]] | None],
+    ) -> bool:
+        """Check whether a middleware's filters let it run on a message."""
+        if stage.filtered and not stage.applies(
+            message,
+            event_type,
+            partial(self._is_command, routes),
         ):
-            return
+            return False
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug(
+                "Ran middleware: %s on %s",
+                stage.name,
+                message,
+                extra=self._log_fields(message, middleware=stage.name),
+            )
+        return True
 
-        # If message has not been intercepted continue with standard message
-        # handling
-        for command in self.commands:
-            command_name = command.func.__name__
-            kwargs = command.pattern_matches(message)
-            if kwargs is not None:
-                try:
-                    kwargs = validate_kwargs(command.func, kwargs)
-                    _command_ctx_stack.push(message)
-                    response = command.func(**kwargs)
-                    self._send_response(response, message.channel)
-                    return
-                except (ArgumentValidationError, ArgumentTypeValidationError) as e:
-                    self._send_response(str(e), message.channel)
-                    return
-                finally:
-                    self.logger.debug(f"Ran command: {command_name} on {message}")
-                    _command_ctx_stack.pop()
+    @staticmethod
+    def _log_fields(message: Message, **fields: str) -> dict[str, Any]:
+        """
+        Build the structured fields attached to a message's log records.
 
-        # If we are here then no commands have matched
-        self.logger.warning(f"Command {message.text} not found")
-        if self.fallback_func is not None:
+        Building them costs a dictionary per record, so debug records check
+        the level before calling this.
+        """
+        return {
+            "request_id": _request_id.get(),
+            "channel": message.channel,
+            "user": message.user,
+            **fields,
+        }
+
+    @contextmanager
+    def _middleware_metrics(self, name: str) -> Iterator[None]:
+        """Record how long a middleware function took."""
+        start = perf_counter()
+        try:
+            with self._trace("middleware", middleware=name):
+                yield
+        finally:
+            self._metrics.middleware_seconds.observe(perf_counter() - start, name)
+
+    @contextmanager
+    def _command_metrics(self, command: Command) -> Iterator[None]:
+        """Record how long a command took and how it finished."""
+        start = perf_counter()
+        status = "error"
+        try:
+            with self._trace("command", command=command.pattern_string):
+                yield
+            status = "ok"
+        except ExecutionTimeoutError:
+            status = "timeout"
+            raise
+        finally:
+            name = command.pattern_string
+            self._metrics.command_seconds.observe(perf_counter() - start, name)
+            self._metrics.commands.inc(name, status)
+
+    def _run_command(
+        self,
+        command: Command,
+        kwargs: dict[str, Any],
+        message: Message,
+    ) -> PhialResponse:
+        cache = command.cache
+        key = self._cache_key(command, kwargs, message) if cache is not None else None
+        if cache is None or key is None:
+            return self._call_command(command, kwargs, message)
+        (response, origin), hit = cache.get_or_call(
+            key,
+            lambda: (self._call_command(command, kwargs, message), message),
+            store=_is_cacheable,
+        )
+        self._metrics.command_cache.inc(
+            command.pattern_string,
+            "hit" if hit else "miss",
+        )
+        return self._for_message(response, origin, message)
+
+    @staticmethod
+    def _cache_key(
+        command: Command,
+        kwargs: dict[str, Any],
+        message: Message,
+    ) -> Hashable | None:
+        """Build a command's cache key, or None if its arguments are unhashable."""
+        scope = None
+        if command.cache_scope == "user":
+            scope = message.user
+        elif command.cache_scope == "channel":
+            scope = message.channel
+        key = (message.team, scope, frozenset(kwargs.items()))
+        try:
+            hash(key)
+        except TypeError:
+            return None
+        return key
+
+    @staticmethod
+    def _for_message(
+        response: PhialResponse,
+        origin: Message,
+        message: Message,
+    ) -> PhialResponse:
+        """Point a response cached for one message at another message."""
+        if origin is message or not isinstance(response, Response):
+            return response
+        response = copy.copy(response)
+        if response.channel == origin.channel:
+            response.channel = message.channel
+        if response.original_ts == origin.timestamp:
+            response.original_ts = message.timestamp
+        if response.user == origin.user:
+            response.user = message.user
+        return response
+
+    def _call_command(
+        self,
+        command: Command,
+        kwargs: dict[str, Any],
+        message: Message,
+    ) -> PhialResponse:
+        timeout = self._get_command_timeout(command)
+        if command.executor == "process":
+            future = self._get_process_pool().submit(
+                _call_in_process,
+                command.func,
+                kwargs,
+                message,
+            )
             try:
-                _command_ctx_stack.push(message)
-                response = self.fallback_func(message)
-                self._send_response(response, message.channel)
-            finally:
-                _command_ctx_stack.pop()
+                return future.result(timeout)
+            except FutureTimeoutError as e:
+                future.cancel()
+                raise ExecutionTimeoutError(
+                    f"Timed out after {timeout} seconds",
+                    stack="<running in a worker process>",
+                ) from e
+        func = self._command_callable(command, kwargs, message)
+        if timeout is not None:
+            return self._timeouts.run(func, timeout)
+        return func()
+
+    def _command_callable(
+        self,
+        command: Command,
+        kwargs: dict[str, Any],
+        message: Message,
+    ) -> Callable[[], PhialResponse]:
+        """Bind a command's arguments, profiling and watching it if it's a function."""
+        func: Callable[[], PhialResponse] = partial(command.func, **kwargs)
+        if inspect.iscoroutinefunction(command.func):
+            # Coroutines share the event loop's thread, so can't be profiled
+            # or sampled on their own
+            return func
+        func = self.profiler.wrap(command.func.__name__, func)
+        if self.watchdog is not None:
+            func = self.watchdog.wrap(
+                f"Command {command.pattern_string}",
+                func,
+                message=message,
+            )
+        return func
+
+    def _get_command_timeout(self, command: Command) -> float | None:
+        if command.timeout is not None:
+            return command.timeout
+        timeout = self.config.get("commandTimeout")
+        return float(cast(float, timeout)) if timeout else None
+
+    def _check_rate_limits(
+        self,
+        command: Command,
+        message: Message,
+    ) -> PhialResponse | None:
+        """
+        Take a token from the command's and the bot's rate limits.
+
+        A token is only kept if both limits allow the message.
+
+        :returns: The response to send if the message is over either
+                  limit, otherwise :obj:`None`
+        """
+        limiter = command.rate_limiter
+        retry_after = 0.0
+        if limiter is not None:
+            retry_after = limiter.check(message)
+        if not retry_after and self.rate_limiter is not None:
+            retry_after = self.rate_limiter.check(message)
+            if retry_after and limiter is not None:
+                # The command won't run, so shouldn't use up its limit
+                limiter.release(getattr(message, limiter.key))
+        if not retry_after:
+            return None
+
+        self._metrics.commands.inc(command.pattern_string, "rate_limited")
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug(
+                "Rate limited command: %s on %s",
+                command.pattern_string,
+                message,
+                extra=self._log_fields(message, command=command.pattern_string),
+            )
+        text = cast(str | None, self.config.get("rateLimitResponse"))
+        return Response(
+            channel=message.channel,
+            text=text.format(retry_after=math.ceil(retry_after)) if text else None,
+            ephemeral=True,
+            user=message.user,
+        )
+
+    def _command_timed_out(
+        self,
+        command: Command,
+        message: Message,
+        error: ExecutionTimeoutError,
+    ) -> PhialResponse:
+        """Log a timed out command, returning the response to send."""
+        self.logger.error(
+            "Command %s %s on %s\n%s",
+            command.pattern_string,
+            error,
+            message,
+            error.stack,
+        )
+        return cast(PhialResponse, self.config.get("timeoutResponse") or None)
+
+    def _get_process_pool(self) -> ProcessPoolExecutor:
+        # Worker processes are only started once a process command is run
+        if self._process_pool is None:
+            max_processes = self.config["maxProcesses"]
+            self._process_pool = ProcessPoolExecutor(
+                int(cast(int, max_processes)) if max_processes else None,
+            )
+        return self._process_pool
+
+    def _should_handle(self, message: Message) -> bool:
+        """Check whether a message is one the bot should try to run."""
+        # Ignore messages sent by bots
+        if message.bot_id:
+            return False
+
+        # If message should have a prefix but doesn't ignore it
+        prefix = self.config.get("prefix")
+        return not (
+            prefix is not None
+            and prefix != ""
+            and isinstance(prefix, str)
+            and not message.text.startswith(prefix)
+        )
+
+    def _route(
+        self,
+        message: Message,
+        routes: dict[str, tuple[Command, dict[str, str]] | None],
+    ) -> tuple[Command, dict[str, str]] | None:
+        """
+        Match a message to a command, reusing an earlier match of its text.
+
+        Middleware which only runs on commands needs the match before the
+        rest of the middleware has run, so it is kept to avoid routing
+        the same text twice.
+        """
+        text = message.text
+        if text not in routes:
+            routes[text] = self._match_command(message)
+        return routes[text]
+
+    def _is_command(
+        self,
+        routes: dict[str, tuple[Command, dict[str, str]] | None],
+        message: Message,
+    ) -> bool:
+        return self._route(message, routes) is not None
+
+    def _match_command(self, message: Message) -> tuple[Command, dict[str, str]] | None:
+        """Find the first command matching the message and its raw arguments."""
+        start = perf_counter()
+        try:
+            with self._trace("routing"):
+                for command in self.commands:
+                    kwargs = command.pattern_matches(message)
+                    if kwargs is not None:
+                        return command, kwargs
+                return None
+        finally:
+            self._metrics.routing_seconds.observe(perf_counter() - start)
+
+    def stop(self, timeout: float | None = None) -> ShutdownReport:
+        """
+        Stop the bot, waiting for in-flight work to finish.
+
+        New requests from Slack are left unacknowledged, so Slack will
+        deliver them again, and no new scheduled jobs are started. The bot
+        then waits for in-flight commands and scheduled jobs to finish
+        before disconnecting from Slack.
+
+        Calling :meth:`stop` more than once returns the original report.
+
+        :param timeout: The maximum number of seconds to wait for in-flight
+                        work. Defaults to the :code:`shutdownTimeout` config
+                        value
+
+        :returns: A :obj:`ShutdownReport` of any work that was abandoned
+        """
+        self._stopping.set()
+        with self._shutdown_lock:
+            if self._shutdown_report is None:
+                if timeout is None:
+                    timeout = float(cast(float, self.config["shutdownTimeout"]))
+                self._shutdown_report = self._shutdown(timeout)
+            return self._shutdown_report
+
+    def _shutdown(self, timeout: float) -> ShutdownReport:
+        self.logger.info("Phial stopping, waiting for in-flight work to finish")
+        deadline = monotonic() + timeout
+        with self._in_flight_changed:
+            self._in_flight_changed.wait_for(
+                lambda: not self._in_flight,
+                timeout=timeout,
+            )
+            abandoned_requests = list(self._in_flight.values())
+        if self._scheduler_future is not None:
+            wait_for_futures(
+                [self._scheduler_future],
+                timeout=max(0, deadline - monotonic()),
+            )
+        self._stop_workers(deadline)
+        self._stop_outbox(deadline)
+        if self.handover is not None:
+            self.handover.release()
+
+        clients = [self.slack_client]
+        if self.connections is not None:
+            self.connections.close()
+            clients = self.connections.clients
+        for client in clients:
+            if abandoned_requests:
+                # close() waits for the listener threads, which are still busy
+                client.auto_reconnect_enabled = False
+                client.disconnect()
+            else:
+                client.close()
+        if self._thread_pool is not None:
+            self._thread_pool.shutdown(wait=False)
+        if self._process_pool is not None:
+            self._process_pool.shutdown(wait=False, cancel_futures=True)
+        self._stop_metrics_server()
+        if self.watchdog is not None:
+            self.watchdog.stop()
+        if self.recorder is not None:
+            self.recorder.close()
+
+        return self._build_shutdown_report(
+            [getattr(req, "envelope_id", repr(req)) for req in abandoned_requests],
+        )
+
+    def _stop_workers(self, deadline: float) -> None:
+        if self.workers is None:
+            return
+        killed = self.workers.stop(max(0, deadline - monotonic()))
+        if killed:
+            self.logger.error(f"Killed {killed} workers which did not stop in time")
+
+    def _start_outbox(self) -> None:
+        # Also sends anything left in the outbox by a previous run
+        if self.outbox is not None:
+            self.outbox.start(self._send_from_outbox)
+
+    def _stop_outbox(self, deadline: float) -> None:
+        if self.outbox is None:
+            return
+        left = self.outbox.stop(max(0, deadline - monotonic()))
+        if left:
+            self.logger.warning(
+                f"{left} outbound calls are still in the outbox, "
+                "they will be sent when the bot next starts",
+            )
+        self.outbox.close()
+
+    def _build_shutdown_report(self, abandoned_requests: list[str]) -> ShutdownReport:
+        report = ShutdownReport(
+            abandoned_requests=abandoned_requests,
+            abandoned_jobs=[
+                getattr(job.func, "__name__", repr(job.func))
+                for job in self.scheduler.running_jobs
+            ],
+        )
+        if report.clean:
+            self.logger.info("Phial stopped")
+        else:
+            self.logger.warning(
+                f"Phial stopped, abandoning requests {report.abandoned_requests} "
+                f"and scheduled jobs {report.abandoned_jobs}",
+            )
+        return report
+
+    def _serve_metrics(self) -> None:
+        port = self.config.get("metricsPort")
+        if port is None or self._metrics_server is not None:
+            return
+        host = cast(str, self.config.get("metricsHost") or "127.0.0.1")
+        self._metrics_server = self.metrics.serve(int(cast(int, port)), host)
+        self.logger.info(f"Serving metrics on http://{host}:{port}/metrics")
+
+    def _stop_metrics_server(self) -> None:
+        if self._metrics_server is not None:
+            self._metrics_server.shutdown()
+            self._metrics_server.server_close()
+            self._metrics_server = None
+
+    def _poll_handover(self) -> bool:
+        """
+        Check whether a new process has taken over from this one.
+
+        A superseded bot disconnects from Slack straight away, so every new
+        envelope goes to the new process, then stops.
+
+        :returns: Whether this process should run scheduled jobs
+        """
+        if self.handover is None:
+            return True
+        self.handover.poll()
+        if self.handover.superseded and not self._stopping.is_set():
+            self.logger.info("Phial handed over to a new process, stopping")
+            self._stopping.set()
+            self._disconnect()
+        return self.handover.owns_scheduler
+
+    def _disconnect(self) -> None:
+        """Close the Socket Mode connections, leaving in-flight work running."""
+        clients = [self.slack_client]
+        if self.connections is not None:
+            self.connections.close()
+            clients = self.connections.clients
+        for client in clients:
+            # close() waits for the listener threads, which may still be busy
+            client.auto_reconnect_enabled = False
+            client.disconnect()
+
+    def _handle_signal(self, signum: int, _: object) -> None:  # pragma: no cover
+        self.logger.info(f"Received {signal.Signals(signum).name}, stopping")
+        self._stopping.set()
+
+    def _install_signal_handlers(self) -> None:  # pragma: no cover
+        # Signal handlers can only be installed from the main thread
+        if threading.current_thread() is not threading.main_thread():
+            return
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, self._handle_signal)
 
     def _start(self) -> None:  # pragma: no cover
         """
         Start the bot.
 
-        When called will start the bot listening to messages from Slack
+        When called will start the bot listening to messages from Slack,
+        until :meth:`stop` is called.
         """
-        self.slack_client.socket_mode_request_listeners.append(self._handle_request)  # type: ignore
-        self.slack_client.connect()
+        self.recorder = self._create_recorder()
+        self._resolve_workspaces()
+        self._start_outbox()
+        self.workers = self._create_workers()
+        if self.workers is not None:
+            self.workers.start()
+        self.connections = self._create_connections()
+        if self.recorder is not None:
+            self.connections.add_listener(self.recorder)
+        self.connections.add_listener(self._handle_request)
+        self._serve_metrics()
+        self.connections.connect()
+        if self.handover is not None:
+            self.handover.announce()
+        if self.config["preloadDirectory"]:
+            try:
+                self.directory.preload()
+            except Exception as e:
+                self.logger.error(f"Failed to preload the directory: {e}")
 
         self.logger.info("Phial connected and running!")
 
         thread_pool_size = int(cast(str, self.config["maxThreads"]))
-        thread_pool = ThreadPoolExecutor(thread_pool_size)
-        run_pending_tasks: Future | None = None
+        self._thread_pool = ThreadPoolExecutor(thread_pool_size)
 
-        while True:
+        while not self._stopping.is_set():
             try:
-                if run_pending_tasks is None or run_pending_tasks.done():
-                    run_pending_tasks = thread_pool.submit(self.scheduler.run_pending)
+                scheduler_idle = (
+                    self._scheduler_future is None or self._scheduler_future.done()
+                )
+                if self._poll_handover() and scheduler_idle:
+                    self._scheduler_future = self._thread_pool.submit(
+                        self.scheduler.run_pending,
+                    )
+                if self.workers is not None:
+                    self.workers.check()
             except Exception as e:
                 self.logger.error(e)
-            sleep(cast(float, self.config["loopDelay"]))  # Help prevent high CPU usage.
+            # Help prevent high CPU usage.
+            self._stopping.wait(cast(float, self.config["loopDelay"]))
 
     def run(self) -> None:  # pragma: no cover
-        """Run the bot."""
+        """
+        Run the bot.
+
+        Blocks until the bot is stopped, either by calling :meth:`stop` or,
+        when the :code:`handleSignals` config value is set, by sending the
+        process SIGINT or SIGTERM.
+        """
+        if self.config["handleSignals"]:
+            self._install_signal_handlers()
         self._start()
         # TODO: Implement hot reload
         # if self.config["hotReload"]:
         # self._start()
         # else:
         #     self._start()
+        self.stop()
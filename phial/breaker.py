@@ -0,0 +1,195 @@
+"""Circuit breakers which stop calling Slack Web API methods while they fail."""
+
+import logging
+import random
+import threading
+from collections import deque
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from time import monotonic
+
+from phial.errors import CircuitOpenError
+from phial.outbox import retry_delay
+
+LOGGER = logging.getLogger("phial.bot.breaker")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    Stops calling a Web API method while it is failing or slow.
+
+    While closed, the outcome of every call in the last :code:`window`
+    seconds is tracked. Once at least :code:`min_calls` have been made and
+    :code:`error_rate` of them failed, the breaker opens and calls fail
+    fast with a :class:`phial.errors.CircuitOpenError` rather than waiting
+    on Slack. Errors Slack returns for bad requests, such as an unknown
+    channel, show Slack is working so aren't failures, while calls taking
+    longer than :code:`slow_call` seconds are.
+
+    After a jittered delay, which doubles each time the breaker opens
+    again, up to :code:`max_open_seconds`, the breaker is half-open and
+    lets :code:`probes` calls through. If they all succeed the breaker
+    closes, otherwise it opens again.
+
+    :param method: The Web API method
+    :param error_rate: The fraction of failed calls which opens the
+                       breaker. Defaults to 0.5
+    :param min_calls: The number of calls needed in the window before the
+                      breaker can open. Defaults to 10
+    :param window: The number of seconds of calls tracked. Defaults to 30
+    :param slow_call: The number of seconds after which a call counts as
+                      failed. Defaults to None, meaning calls are never
+                      too slow
+    :param open_seconds: The number of seconds the breaker first stays
+                         open for. Defaults to 5
+    :param max_open_seconds: The maximum number of seconds the breaker
+                             stays open for. Defaults to 120
+    :param probes: The number of calls let through while half-open.
+                   Defaults to 3
+    :param on_change: Called with the method and new state whenever the
+                      breaker changes state. Defaults to None
+    """
+
+    def __init__(
+        self,
+        method: str,
+        *,
+        error_rate: float = 0.5,
+        min_calls: int = 10,
+        window: float = 30,
+        slow_call: float | None = None,
+        open_seconds: float = 5,
+        max_open_seconds: float = 120,
+        probes: int = 3,
+        on_change: Callable[[str, str], None] | None = None,
+    ) -> None:
+        self.method = method
+        self.error_rate = error_rate
+        self.min_calls = min_calls
+        self.window = window
+        self.slow_call = slow_call
+        self.open_seconds = open_seconds
+        self.max_open_seconds = max_open_seconds
+        self.probes = probes
+        self.on_change = on_change
+        #: One of :data:`CLOSED`, :data:`OPEN` or :data:`HALF_OPEN`
+        self.state = CLOSED
+        self._calls: deque[tuple[float, bool]] = deque()
+        self._failures = 0
+        self._opened = 0
+        self._open_until = 0.0
+        self._probing = 0
+        self._probed = 0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def call(self) -> Iterator[None]:
+        """
+        Guard a call to the method, recording how it went.
+
+        :raises CircuitOpenError: If the breaker is open
+        """
+        probe = self._allow()
+        start = monotonic()
+        try:
+            yield
+        except Exception as e:
+            self._record(probe, failed=retry_delay(e) is not None)
+            raise
+        slow = self.slow_call is not None and monotonic() - start > self.slow_call
+        self._record(probe, failed=slow)
+
+    def _allow(self) -> bool:
+        """Check a call can be made, returning whether it's a probe."""
+        with self._lock:
+            now = monotonic()
+            if self.state == OPEN:
+                if now < self._open_until:
+                    raise CircuitOpenError(self.method, self._open_until - now)
+                self._change(HALF_OPEN)
+                self._probing = self._probed = 0
+            if self.state == HALF_OPEN:
+                if self._probing + self._probed >= self.probes:
+                    raise CircuitOpenError(self.method, self.open_seconds)
+                self._probing += 1
+                return True
+            return False
+
+    def _record(self, probe: bool, *, failed: bool) -> None:  # noqa: FBT001
+        with self._lock:
+            now = monotonic()
+            if probe:
+                self._probing -= 1
+                if self.state != HALF_OPEN:
+                    return
+                if failed:
+                    self._open(now)
+                else:
+                    self._probed += 1
+                    if self._probed >= self.probes:
+                        self._close()
+                return
+            if self.state != CLOSED:
+                # Started before the breaker opened
+                return
+            self._calls.append((now, failed))
+            self._failures += failed
+            while self._calls and self._calls[0][0] < now - self.window:
+                self._failures -= self._calls.popleft()[1]
+            calls = len(self._calls)
+            if calls >= self.min_calls and self._failures >= self.error_rate * calls:
+                self._open(now)
+
+    def _open(self, now: float) -> None:
+        delay = min(self.max_open_seconds, self.open_seconds * 2**self._opened)
+        # Jitter stops every process retrying Slack at the same moment
+        self._open_until = now + delay * random.uniform(0.5, 1)  # noqa: S311
+        self._opened += 1
+        self._calls.clear()
+        self._failures = 0
+        LOGGER.warning(
+            f"Calls to {self.method} are failing, pausing them for "
+            f"{self._open_until - now:.1f}s",
+        )
+        self._change(OPEN)
+
+    def _close(self) -> None:
+        self._opened = 0
+        LOGGER.info(f"Calls to {self.method} are working again")
+        self._change(CLOSED)
+
+    def _change(self, state: str) -> None:
+        self.state = state
+        if self.on_change is not None:
+            self.on_change(self.method, state)
+
+
+class CircuitBreakers:
+    """
+    A :class:`CircuitBreaker` for each Web API method, created when first called.
+
+    Takes the same keyword arguments as :class:`CircuitBreaker`.
+    """
+
+    def __init__(self, **options: object) -> None:
+        self.options = options
+        self._breakers: dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def __getitem__(self, method: str) -> CircuitBreaker:
+        breaker = self._breakers.get(method)
+        if breaker is None:
+            with self._lock:
+                breaker = self._breakers.setdefault(
+                    method,
+                    CircuitBreaker(method, **self.options),  # type: ignore[arg-type]
+                )
+        return breaker
+
+    def states(self) -> dict[str, str]:
+        """Get the state of each method's breaker."""
+        return {method: breaker.state for method, breaker in self._breakers.items()}
@@ -0,0 +1,291 @@
+"""Sends one message to many channels, within Slack's rate limits."""
+
+import asyncio
+import contextvars
+import logging
+import random
+import threading
+import time
+from collections.abc import Awaitable, Callable, Iterable
+from concurrent.futures import ThreadPoolExecutor
+from time import monotonic
+from typing import Any, NamedTuple
+
+from phial.outbox import retry_delay
+from phial.ratelimit import RateLimiter
+
+LOGGER = logging.getLogger("phial.bot.broadcast")
+
+SENT = "sent"
+FAILED = "failed"
+
+
+class ChannelDelivery(NamedTuple):
+    """How sending a broadcast to one channel went."""
+
+    channel: str
+    #: Either :data:`SENT` or :data:`FAILED`
+    status: str
+    attempts: int
+    error: str | None = None
+
+    @property
+    def retried(self) -> bool:
+        """Whether the message took more than one attempt."""
+        return self.attempts > 1
+
+
+class BroadcastResult:
+    """
+    The outcome of a broadcast, filled in as each channel is sent to.
+
+    :param channels: The channels being sent to
+    """
+
+    def __init__(self, channels: list[str]) -> None:
+        self.channels = channels
+        #: The delivery to each channel sent to so far, by channel
+        self.deliveries: dict[str, ChannelDelivery] = {}
+
+    def __repr__(self) -> str:
+        return (
+            f"<BroadcastResult {len(self.sent)} sent, {len(self.failed)} failed "
+            f"of {self.total}>"
+        )
+
+    @property
+    def total(self) -> int:
+        """The number of channels being sent to."""
+        return len(self.channels)
+
+    @property
+    def done(self) -> int:
+        """The number of channels sent to so far, successfully or not."""
+        return len(self.deliveries)
+
+    @property
+    def sent(self) -> list[str]:
+        """The channels the message was sent to."""
+        return [c for c, d in self.deliveries.items() if d.status == SENT]
+
+    @property
+    def failed(self) -> list[str]:
+        """The channels the message could not be sent to."""
+        return [c for c, d in self.deliveries.items() if d.status == FAILED]
+
+    @property
+    def retried(self) -> list[str]:
+        """The channels which took more than one attempt."""
+        return [c for c, d in self.deliveries.items() if d.retried]
+
+    @property
+    def ok(self) -> bool:
+        """Whether the message was sent to every channel."""
+        return len(self.sent) == self.total
+
+
+ProgressCallback = Callable[[ChannelDelivery, BroadcastResult], None]
+
+
+class Broadcaster:
+    """
+    Sends a Web API call to many channels concurrently.
+
+    Every send takes a token from a global rate limit and one for its
+    channel, which are shared by all broadcasts. Sends which fail because
+    Slack is unreachable, erroring or rate limiting are retried with
+    jittered exponential backoff, and a :code:`Retry-After` from Slack
+    pauses every send until it has passed.
+
+    :param concurrency: The maximum number of sends in flight per
+                        broadcast. Defaults to 8
+    :param rate_limit: The number of sends allowed per number of seconds,
+                       across all channels. Defaults to 10 a second
+    :param channel_rate_limit: The number of sends allowed per number of
+                               seconds to each channel. Defaults to one a
+                               second
+    :param retries: The number of times a failed send is retried.
+                    Defaults to 3
+    :param retry_delay: The number of seconds before the first retry.
+                        Defaults to 1
+    :param max_retry_delay: The maximum number of seconds between retries.
+                            Defaults to 30
+    """
+
+    def __init__(
+        self,
+        *,
+        concurrency: int = 8,
+        rate_limit: tuple[int, float] = (10, 1),
+        channel_rate_limit: tuple[int, float] = (1, 1),
+        retries: int = 3,
+        retry_delay: float = 1,
+        max_retry_delay: float = 30,
+    ) -> None:
+        if concurrency < 1:
+            raise ValueError("Concurrency must be at least 1")
+        self.concurrency = concurrency
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self._global = RateLimiter(*rate_limit, key="channel")
+        self._channels = RateLimiter(*channel_rate_limit, key="channel")
+        self._paused_until = 0.0
+
+    def broadcast(
+        self,
+        send: Callable[..., Any],
+        method: str,
+        kwargs: dict[str, Any],
+        channels: Iterable[str],
+        *,
+        on_progress: ProgressCallback | None = None,
+    ) -> BroadcastResult:
+        """
+        Make a Web API call once for each channel, blocking until done.
+
+        :param send: Makes the call, e.g. :code:`send(method, **kwargs)`
+        :param method: The Web API client method
+        :param kwargs: The method's arguments, with the channel replaced by
+                       each channel in turn
+        :param channels: The channels to send to. Duplicates are ignored
+        :param on_progress: Called with each channel's delivery and the
+                            result so far, one at a time. Defaults to None
+        :returns: The result for each channel
+        """
+        result = BroadcastResult(list(dict.fromkeys(channels)))
+        lock = threading.Lock()
+
+        def deliver(channel: str) -> None:
+            delivery = self._deliver(send, method, {**kwargs, "channel": channel})
+            with lock:
+                self._record(result, delivery, on_progress)
+
+        workers = max(1, min(self.concurrency, result.total))
+        with ThreadPoolExecutor(workers, thread_name_prefix="phial-broadcast") as pool:
+            for channel in result.channels:
+                # Keep the workspace being sent to
+                pool.submit(contextvars.copy_context().run, deliver, channel)
+        return result
+
+    async def broadcast_async(
+        self,
+        send: Callable[..., Awaitable[Any]],
+        method: str,
+        kwargs: dict[str, Any],
+        channels: Iterable[str],
+        *,
+        on_progress: ProgressCallback | None = None,
+    ) -> BroadcastResult:
+        """
+        Make a Web API call once for each channel with a coroutine function.
+
+        See :meth:`broadcast`.
+        """
+        result = BroadcastResult(list(dict.fromkeys(channels)))
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def deliver(channel: str) -> None:
+            async with semaphore:
+                delivery = await self._deliver_async(
+                    send,
+                    method,
+                    {**kwargs, "channel": channel},
+                )
+            self._record(result, delivery, on_progress)
+
+        await asyncio.gather(*(deliver(channel) for channel in result.channels))
+        return result
+
+    def _deliver(
+        self,
+        send: Callable[..., Any],
+        method: str,
+        kwargs: dict[str, Any],
+    ) -> ChannelDelivery:
+        channel = kwargs["channel"]
+        attempts = 0
+        while True:
+            while (wait := self._wait_time(channel)) > 0:
+                time.sleep(wait)
+            attempts += 1
+            try:
+                send(method, **kwargs)
+            except Exception as e:
+                delay = self._retry_delay(e, attempts)
+                if delay is None:
+                    return ChannelDelivery(channel, FAILED, attempts, str(e))
+                time.sleep(delay)
+            else:
+                return ChannelDelivery(channel, SENT, attempts)
+
+    async def _deliver_async(
+        self,
+        send: Callable[..., Awaitable[Any]],
+        method: str,
+        kwargs: dict[str, Any],
+    ) -> ChannelDelivery:
+        channel = kwargs["channel"]
+        attempts = 0
+        while True:
+            while (wait := self._wait_time(channel)) > 0:
+                await asyncio.sleep(wait)
+            attempts += 1
+            try:
+                await send(method, **kwargs)
+            except Exception as e:
+                delay = self._retry_delay(e, attempts)
+                if delay is None:
+                    return ChannelDelivery(channel, FAILED, attempts, str(e))
+                await asyncio.sleep(delay)
+            else:
+                return ChannelDelivery(channel, SENT, attempts)
+
+    def _wait_time(self, channel: str) -> float:
+        """Take rate limit tokens for a send, or get how long until they're free."""
+        paused = self._paused_until - monotonic()
+        if paused > 0:
+            return paused
+        # Check both limits first, so a send held back by its channel doesn't
+        # use up a token every other channel could have used
+        wait = max(self._global.wait_time(None), self._channels.wait_time(channel))
+        if wait:
+            return wait
+        wait = self._global.acquire(None)
+        if wait:
+            return wait
+        wait = self._channels.acquire(channel)
+        if wait:
+            # Another thread took the channel's token since it was checked
+            self._global.release(None)
+        return wait
+
+    def _retry_delay(self, error: Exception, attempts: int) -> float | None:
+        """Get how long to wait before retrying a failed send, or None to give up."""
+        slack_delay = retry_delay(error)
+        if slack_delay is None or attempts > self.retries:
+            return None
+        if slack_delay:
+            # Slack's rate limits are shared, so hold back every send
+            self._paused_until = max(self._paused_until, monotonic() + slack_delay)
+        backoff = min(self.max_retry_delay, self.retry_delay * 2 ** (attempts - 1))
+        # Jitter stops channels which failed together retrying in lockstep
+        return float(max(slack_delay, backoff * random.uniform(0.5, 1)))  # noqa: S311
+
+    @staticmethod
+    def _record(
+        result: BroadcastResult,
+        delivery: ChannelDelivery,
+        on_progress: ProgressCallback | None,
+    ) -> None:
+        result.deliveries[delivery.channel] = delivery
+        if delivery.status == FAILED:
+            LOGGER.warning(
+                f"Failed to broadcast to {delivery.channel} after "
+                f"{delivery.attempts} attempts: {delivery.error}",
+            )
+        if on_progress is not None:
+            try:
+                on_progress(delivery, result)
+            except Exception as e:
+                LOGGER.error(f"Broadcast progress callback failed: {e}")
@@ -0,0 +1,160 @@
+"""A time-limited, size-bounded cache for command results."""
+
+import asyncio
+import threading
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable, Hashable
+from concurrent.futures import Future
+from time import monotonic
+from typing import Generic, TypeVar
+
+V = TypeVar("V")
+
+_MISSING = object()
+
+
+class TTLCache(Generic[V]):
+    """
+    A least recently used cache whose entries expire.
+
+    Concurrent misses for the same key are de-duplicated: the first caller
+    runs the function and the others wait for its result, so a slow
+    function is only called once however many requests arrive for it.
+    Exceptions are passed to every waiting caller and are not cached.
+
+    :param ttl: The number of seconds an entry is valid for
+    :param maxsize: The maximum number of entries. The least recently used
+                    entry is evicted when the cache is full. Defaults to 128
+    """
+
+    def __init__(self, ttl: float, maxsize: int = 128) -> None:
+        if ttl <= 0:
+            raise ValueError("TTL must be greater than 0")
+        if maxsize < 1:
+            raise ValueError("Max size must be at least 1")
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries: OrderedDict[Hashable, tuple[float, V]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._in_flight: dict[Hashable, Future] = {}
+        self._in_flight_async: dict[Hashable, asyncio.Future] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable, default: object = None) -> V | object:
+        """
+        Get an entry from the cache.
+
+        :returns: The cached value, or :code:`default` if the key is not
+                  cached or has expired
+        """
+        with self._lock:
+            return self._get(key, default)
+
+    def _get(self, key: Hashable, default: object) -> V | object:
+        entry = self._entries.get(key)
+        if entry is None:
+            return default
+        expires, value = entry
+        if expires <= monotonic():
+            del self._entries[key]
+            return default
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: V) -> None:
+        """Add an entry to the cache, evicting the oldest if it is full."""
+        with self._lock:
+            self._entries[key] = (monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Remove every entry from the cache."""
+        with self._lock:
+            self._entries.clear()
+
+    def get_or_call(
+        self,
+        key: Hashable,
+        func: Callable[[], V],
+        *,
+        store: Callable[[V], bool] | None = None,
+    ) -> tuple[V, bool]:
+        """
+        Get an entry, calling a function to create it if it is missing.
+
+        :param key: The key of the entry
+        :param func: Called to create the value on a miss
+        :param store: Decides whether a created value should be cached.
+                      Defaults to caching every value
+
+        :returns: The value, and whether it came from the cache
+        """
+        with self._lock:
+            value = self._get(key, _MISSING)
+            if value is not _MISSING:
+                return value, True  # type: ignore[return-value]
+            future = self._in_flight.get(key)
+            leader = future is None
+            if future is None:
+                future = self._in_flight[key] = Future()
+
+        if not leader:
+            return future.result(), False
+
+        try:
+            value = func()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            if store is None or store(value):
+                self.set(key, value)
+            future.set_result(value)
+            return value, False
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+
+    async def get_or_call_async(
+        self,
+        key: Hashable,
+        func: Callable[[], Awaitable[V]],
+        *,
+        store: Callable[[V], bool] | None = None,
+    ) -> tuple[V, bool]:
+        """
+        Get an entry, awaiting a function to create it if it is missing.
+
+        The asyncio equivalent of :meth:`get_or_call`.
+        """
+        with self._lock:
+            value = self._get(key, _MISSING)
+        if value is not _MISSING:
+            return value, True  # type: ignore[return-value]
+
+        future = self._in_flight_async.get(key)
+        if future is not None:
+            return await asyncio.shield(future), False
+
+        future = self._in_flight_async[key] = asyncio.get_running_loop().create_future()
+        try:
+            value = await func()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Only waiting callers should see the exception
+            future.exception()
+            raise
+        else:
+            if store is None or store(value):
+                self.set(key, value)
+            future.set_result(value)
+            return value, False
+        finally:
+            del self._in_flight_async[key]
@@ -1,27 +1,155 @@
 """Standard commands provided by phial."""
 
+import re
+from bisect import bisect_left
 from typing import TYPE_CHECKING, cast
 
+from phial.globals import command as current_command
 from phial.utils import parse_help_text
 
 if TYPE_CHECKING:  # pragma: no cover
     from phial import Phial
+    from phial.wrappers import Command
 else:
     Phial = None
 
+_ARGUMENT = re.compile(r"<[^>]*>")
+_KEYWORD = re.compile(r"[a-z0-9]+")
+_FOOTER = "Page {} of {}, use {} <page> to see more\n"
 
-def help_command(bot: Phial) -> str:
-    """List all available commands."""
-    help_text = cast(str, bot.config.get("baseHelpText", ""))
-    if help_text:
-        help_text += "\n"
-    for command in bot.commands:
-        if command.hide_from_help_command:
-            continue
-        command_doc = command.help_text
-        if not command_doc:
+
+class HelpIndex:
+    """
+    The rendered help text of a bot's commands.
+
+    The text is split into pages which fit in a Slack message, and a
+    keyword index of each command's pattern and help text is built so
+    commands can be searched without rendering the help again.
+
+    :param commands: The commands to include. Hidden commands are skipped
+    :param base_text: Text to put at the start of the first page
+    :param page_size: The maximum number of characters per page
+    :param page_hint: How to ask for another page, e.g. :code:`'!help'`
+    """
+
+    def __init__(
+        self,
+        commands: "list[Command]",
+        *,
+        base_text: str = "",
+        page_size: int = 4000,
+        page_hint: str = "help",
+    ) -> None:
+        self.lines: list[str] = []
+        self._index: dict[str, set[int]] = {}
+        for command in commands:
+            if command.hide_from_help_command:
+                continue
             # If no help text default to blank string
-            command_doc = ""
-        command_help_text = parse_help_text(command_doc)
-        help_text += f"*{command.pattern_string}* - {command_help_text}\n"
-    return help_text
+            help_text = parse_help_text(command.help_text or "")
+            number = len(self.lines)
+            self.lines.append(f"*{command.pattern_string}* - {help_text}\n")
+            pattern = _ARGUMENT.sub(" ", command.pattern_string)
+            for keyword in _KEYWORD.findall(f"{pattern} {help_text}".lower()):
+                self._index.setdefault(keyword, set()).add(number)
+        self._keywords = sorted(self._index)
+        self.pages = self._paginate(base_text, page_size, page_hint)
+
+    def _paginate(self, base_text: str, page_size: int, page_hint: str) -> list[str]:
+        header = f"{base_text}\n" if base_text else ""
+        # Leave room for the footer pointing at the next page
+        limit = page_size - len(_FOOTER.format(1, 1, page_hint)) - 10
+        pages: list[str] = []
+        page = header
+        for line in self.lines:
+            if page and len(page) + len(line) > limit:
+                pages.append(page)
+                page = ""
+            page += line
+        pages.append(page)
+        if len(pages) > 1:
+            pages = [
+                page + _FOOTER.format(number, len(pages), page_hint)
+                for number, page in enumerate(pages, start=1)
+            ]
+        return pages
+
+    def page(self, number: int) -> str:
+        """
+        Get a page of the help text.
+
+        :param number: The page number, starting at 1
+        :raises ValueError: If the page does not exist
+        """
+        if not 1 <= number <= len(self.pages):
+            raise ValueError(f"There are only {len(self.pages)} pages of help")
+        return self.pages[number - 1]
+
+    def search(self, term: str) -> list[str]:
+        """
+        Find the commands matching a search term.
+
+        A command matches if every word in the term starts one of the words
+        in its pattern or help text.
+
+        :returns: The help lines of the matching commands
+        """
+        matches: set[int] | None = None
+        for word in _KEYWORD.findall(term.lower()):
+            start = bisect_left(self._keywords, word)
+            found: set[int] = set()
+            for keyword in self._keywords[start:]:
+                if not keyword.startswith(word):
+                    break
+                found |= self._index[keyword]
+            matches = found if matches is None else matches & found
+        return [self.lines[number] for number in sorted(matches or ())]
+
+
+def help_command(bot: Phial, term: str | None = None) -> str:
+    """
+    List all available commands.
+
+    A numeric term shows that page of the help, any other term lists the
+    commands matching it.
+    """
+    index = bot.help_index
+    if term is None:
+        return index.page(1)
+    if term.isdigit():
+        try:
+            return index.page(int(term))
+        except ValueError as e:
+            return str(e)
+    matches = index.search(term)
+    if not matches:
+        return f"No commands found matching {term}"
+    return "".join(matches)
+
+
+def profile_command(bot: Phial, target: str, invocations: str) -> str | None:
+    """
+    Profile a command, scheduled job or the dispatch path.
+
+    Passing :code:`stop` as the number of invocations stops profiling early
+    and returns the summary. Messages from users who are not in the
+    :code:`adminUsers` config value are ignored.
+    """
+    if current_command.user not in cast(list, bot.config.get("adminUsers", [])):
+        return None
+    if invocations == "stop":
+        summary = bot.profiler.stop(target) or bot.profiler.results.get(target)
+        if summary is None:
+            return f"{target} has not been profiled"
+        return f"```{summary}```"
+    try:
+        count = int(invocations)
+    except ValueError:
+        count = 0
+    if count < 1:
+        return "The number of invocations must be a positive whole number"
+    try:
+        bot.profile(target, count)
+    except ValueError as e:
+        return str(e)
+    return f"Profiling the next {count} invocations of {target}"
@@ -0,0 +1,272 @@
+"""Spreads Socket Mode intake over several connections to the same app."""
+
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable, Sequence
+from functools import partial
+from time import monotonic
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:  # pragma: no cover
+    from slack_sdk.socket_mode.aiohttp import SocketModeClient as AsyncSocketModeClient
+    from slack_sdk.socket_mode.builtin import SocketModeClient
+    from slack_sdk.socket_mode.request import SocketModeRequest
+
+LOGGER = logging.getLogger("phial.bot.connections")
+
+RequestListener = Callable[["SocketModeClient", "SocketModeRequest"], None]
+AsyncRequestListener = Callable[
+    ["AsyncSocketModeClient", "SocketModeRequest"],
+    Awaitable[None],
+]
+
+
+class EnvelopeDeduper:
+    """
+    Remembers recent envelope IDs, so envelopes are only handled once.
+
+    Slack may deliver an envelope on more than one connection, and retries
+    envelopes whose acknowledgement it did not receive.
+
+    :param size: The number of envelope IDs to remember. Defaults to 10,000
+    """
+
+    def __init__(self, size: int = 10_000) -> None:
+        self.size = size
+        self._seen: OrderedDict[str, None] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._seen)
+
+    def first(self, envelope_id: str) -> bool:
+        """Record an envelope ID, returning whether it is the first time it's seen."""
+        with self._lock:
+            if envelope_id in self._seen:
+                return False
+            self._seen[envelope_id] = None
+            if len(self._seen) > self.size:
+                self._seen.popitem(last=False)
+            return True
+
+
+class BaseConnectionPool:
+    """The connection bookkeeping shared by the sync and async pools."""
+
+    def __init__(
+        self,
+        clients: Sequence[Any],
+        *,
+        stagger: float,
+        dedupe_size: int,
+        on_duplicate: Callable[["SocketModeRequest"], None] | None,
+    ) -> None:
+        if not clients:
+            raise ValueError("A connection pool needs at least one client")
+        #: The Socket Mode clients, the first of which connects first
+        self.clients = list(clients)
+        self.stagger = stagger
+        self.deduper = EnvelopeDeduper(dedupe_size)
+        self.on_duplicate = on_duplicate
+        #: The number of duplicate envelopes dropped
+        self.duplicates = 0
+        #: The number of times a client has connected, including the first
+        self.connects = 0
+        self._last_connect = float("-inf")
+
+    def first_delivery(self, req: "SocketModeRequest") -> bool:
+        """
+        Record an acknowledged envelope, returning whether to handle it.
+
+        Envelopes are only recorded once acknowledged, as Slack delivers
+        envelopes whose acknowledgement failed again.
+        """
+        if self.deduper.first(req.envelope_id):
+            return True
+        self.duplicates += 1
+        if self.on_duplicate is not None:
+            self.on_duplicate(req)
+        LOGGER.debug(f"Dropped duplicate envelope {req.envelope_id}")
+        return False
+
+    def _stagger_delay(self) -> float:
+        # A lone connection reconnects straight away
+        if len(self.clients) == 1:
+            return 0
+        return max(0, self._last_connect + self.stagger - monotonic())
+
+
+class ConnectionPool(BaseConnectionPool):
+    """
+    Receives envelopes for one app over several Socket Mode connections.
+
+    Every connection feeds the same listeners, and :meth:`first_delivery`
+    tells them whether an envelope has already been received on another
+    connection, so it can be acknowledged on each but only handled once.
+    Connections are opened :code:`stagger` seconds apart and reconnect one
+    at a time, so while one reconnects the others keep receiving envelopes,
+    and Slack's periodic refreshes don't hit every connection at once.
+
+    :param clients: The Socket Mode clients, one per connection
+    :param stagger: The minimum number of seconds between connections
+                    being opened. Defaults to 1
+    :param dedupe_size: The number of envelope IDs remembered to drop
+                        duplicates. Defaults to 10,000
+    :param on_duplicate: Called with each duplicate envelope dropped.
+                         Defaults to None
+    """
+
+    def __init__(
+        self,
+        clients: Sequence["SocketModeClient"],
+        *,
+        stagger: float = 1,
+        dedupe_size: int = 10_000,
+        on_duplicate: Callable[["SocketModeRequest"], None] | None = None,
+    ) -> None:
+        super().__init__(
+            clients,
+            stagger=stagger,
+            dedupe_size=dedupe_size,
+            on_duplicate=on_duplicate,
+        )
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        for client in self.clients:
+            # Reconnects are triggered by the client's own threads, so gate
+            # them through the pool
+            client.connect_to_new_endpoint = partial(
+                self._reconnect,
+                client.connect_to_new_endpoint,
+            )
+
+    def add_listener(self, listener: RequestListener) -> None:
+        """Call a function with the client and request of every envelope."""
+        for client in self.clients:
+            client.socket_mode_request_listeners.append(listener)
+
+    def connect(self) -> None:
+        """
+        Open the first connection, then the rest in the background.
+
+        Returns once the first connection is open.
+        """
+        first, *rest = self.clients
+        self._connect(first.connect)
+        if rest:
+            threading.Thread(
+                target=self._connect_rest,
+                args=(rest,),
+                name="phial-connections",
+                daemon=True,
+            ).start()
+
+    def close(self) -> None:
+        """Stop opening connections. Clients are closed separately."""
+        self._closed.set()
+
+    def _connect_rest(self, clients: list["SocketModeClient"]) -> None:
+        for client in clients:
+            try:
+                self._connect(client.connect)
+            except Exception as e:
+                LOGGER.error(f"Failed to open a Socket Mode connection: {e}")
+
+    def _connect(self, connect: Callable[[], None]) -> None:
+        with self._lock:
+            if self._closed.wait(self._stagger_delay()):
+                return
+            connect()
+            self._last_connect = monotonic()
+            self.connects += 1
+
+    def _reconnect(
+        self,
+        connect_to_new_endpoint: Callable[[bool], None],
+        force: bool = False,  # noqa: FBT001, FBT002
+    ) -> None:
+        self._connect(partial(connect_to_new_endpoint, force))
+
+
+class AsyncConnectionPool(BaseConnectionPool):
+    """
+    An asyncio version of :class:`ConnectionPool` for aiohttp clients.
+
+    :param clients: The aiohttp Socket Mode clients, one per connection
+    :param stagger: The minimum number of seconds between connections
+                    being opened. Defaults to 1
+    :param dedupe_size: The number of envelope IDs remembered to drop
+                        duplicates. Defaults to 10,000
+    :param on_duplicate: Called with each duplicate envelope dropped.
+                         Defaults to None
+    """
+
+    def __init__(
+        self,
+        clients: Sequence["AsyncSocketModeClient"],
+        *,
+        stagger: float = 1,
+        dedupe_size: int = 10_000,
+        on_duplicate: Callable[["SocketModeRequest"], None] | None = None,
+    ) -> None:
+        super().__init__(
+            clients,
+            stagger=stagger,
+            dedupe_size=dedupe_size,
+            on_duplicate=on_duplicate,
+        )
+        self._lock = asyncio.Lock()
+        self._closed = False
+        self._connect_task: asyncio.Task | None = None
+        for client in self.clients:
+            client.connect_to_new_endpoint = partial(
+                self._reconnect,
+                client.connect_to_new_endpoint,
+            )
+
+    def add_listener(self, listener: AsyncRequestListener) -> None:
+        """Await a function with the client and request of every envelope."""
+        for client in self.clients:
+            client.socket_mode_request_listeners.append(listener)
+
+    async def connect(self) -> None:
+        """
+        Open the first connection, then the rest in the background.
+
+        Returns once the first connection is open.
+        """
+        first, *rest = self.clients
+        await self._connect(first.connect)
+        if rest:
+            self._connect_task = asyncio.create_task(self._connect_rest(rest))
+
+    def close(self) -> None:
+        """Stop opening connections. Clients are closed separately."""
+        self._closed = True
+        if self._connect_task is not None:
+            self._connect_task.cancel()
+
+    async def _connect_rest(self, clients: list["AsyncSocketModeClient"]) -> None:
+        for client in clients:
+            try:
+                await self._connect(client.connect)
+            except Exception as e:
+                LOGGER.error(f"Failed to open a Socket Mode connection: {e}")
+
+    async def _connect(self, connect: Callable[[], Awaitable[None]]) -> None:
+        async with self._lock:
+            await asyncio.sleep(self._stagger_delay())
+            if self._closed:
+                return
+            await connect()
+            self._last_connect = monotonic()
+            self.connects += 1
+
+    async def _reconnect(
+        self,
+        connect_to_new_endpoint: Callable[[bool], Awaitable[None]],
+        force: bool = False,  # noqa: FBT001, FBT002
+    ) -> None:
+        await self._connect(partial(connect_to_new_endpoint, force))
@@ -0,0 +1,259 @@
+"""A cached directory of a workspace's users and channels."""
+
+import logging
+import re
+from collections.abc import AsyncIterator, Awaitable, Callable, Iterator
+from typing import Any
+
+from slack_sdk.errors import SlackApiError
+
+from phial.cache import TTLCache
+from phial.wrappers import Channel, User
+
+LOGGER = logging.getLogger("phial.bot.directory")
+
+_MENTION = re.compile(r"^<[@#]([A-Z0-9]+)(?:\|[^>]*)?>$")
+
+#: Events which update the directory
+DIRECTORY_EVENTS = frozenset(
+    ("user_change", "team_join", "channel_created", "channel_rename"),
+)
+
+_USER_LIST: tuple[str, str, dict] = ("users_list", "members", {})
+_CHANNEL_LIST = (
+    "conversations_list",
+    "channels",
+    {"types": "public_channel,private_channel", "exclude_archived": True},
+)
+
+
+def parse_id(value: str) -> str:
+    """
+    Get the ID from a user mention or channel link.
+
+    :code:`<@U123>`, :code:`<@U123|name>` and :code:`<#C123|general>` are
+    all accepted, as are plain IDs.
+    """
+    match = _MENTION.match(value.strip())
+    return match.group(1) if match else value.strip()
+
+
+def _not_found(error: SlackApiError) -> bool:
+    return error.response.get("error") in ("user_not_found", "channel_not_found")
+
+
+class Directory:
+    """
+    Looks up a workspace's users and channels, caching them in memory.
+
+    Lookups which miss the cache call :code:`users.info` or
+    :code:`conversations.info`, and concurrent lookups of the same ID share
+    one call. :meth:`preload` fills the cache with paginated
+    :code:`users.list` and :code:`conversations.list` calls, and
+    :meth:`handle_event` keeps it up to date as users and channels change.
+
+    :param call: Calls a Slack Web API method, e.g.
+                 :code:`call("users_info", user="U123")`
+    :param call_async: The asyncio equivalent of :code:`call`
+    :param ttl: The number of seconds an entry is cached for.
+                Defaults to 3600
+    :param maxsize: The maximum number of users, and of channels, to cache.
+                    Defaults to 10000
+    :param page_size: The number of results to request per page when
+                      preloading. Defaults to 200
+    """
+
+    def __init__(
+        self,
+        call: Callable[..., Any] | None = None,
+        *,
+        call_async: Callable[..., Awaitable[Any]] | None = None,
+        ttl: float = 3600,
+        maxsize: int = 10000,
+        page_size: int = 200,
+    ) -> None:
+        self._call = call
+        self._call_async = call_async
+        self.page_size = page_size
+        self._users: TTLCache[User] = TTLCache(ttl, maxsize)
+        self._channels: TTLCache[Channel] = TTLCache(ttl, maxsize)
+
+    def get_user(self, user_id: str) -> User | None:
+        """Get a user from the cache, without calling Slack."""
+        return self._users.get(parse_id(user_id))  # type: ignore[return-value]
+
+    def get_channel(self, channel_id: str) -> Channel | None:
+        """Get a channel from the cache, without calling Slack."""
+        return self._channels.get(parse_id(channel_id))  # type: ignore[return-value]
+
+    def user(self, user_id: str) -> User:
+        """
+        Look up a user.
+
+        :param user_id: A user ID or mention
+        :raises ValueError: If the user does not exist
+        """
+        user_id = parse_id(user_id)
+        user, _ = self._users.get_or_call(user_id, lambda: self._fetch_user(user_id))
+        return user
+
+    def channel(self, channel_id: str) -> Channel:
+        """
+        Look up a channel.
+
+        :param channel_id: A channel ID or link
+        :raises ValueError: If the channel does not exist
+        """
+        channel_id = parse_id(channel_id)
+        channel, _ = self._channels.get_or_call(
+            channel_id,
+            lambda: self._fetch_channel(channel_id),
+        )
+        return channel
+
+    async def user_async(self, user_id: str) -> User:
+        """Look up a user. The asyncio equivalent of :meth:`user`."""
+        user_id = parse_id(user_id)
+        user, _ = await self._users.get_or_call_async(
+            user_id,
+            lambda: self._fetch_user_async(user_id),
+        )
+        return user
+
+    async def channel_async(self, channel_id: str) -> Channel:
+        """Look up a channel. The asyncio equivalent of :meth:`channel`."""
+        channel_id = parse_id(channel_id)
+        channel, _ = await self._channels.get_or_call_async(
+            channel_id,
+            lambda: self._fetch_channel_async(channel_id),
+        )
+        return channel
+
+    def preload(self) -> None:
+        """Load every user and channel in the workspace into the cache."""
+        for data in self._list(*_USER_LIST):
+            self._users.set(data["id"], User.from_slack(data))
+        for data in self._list(*_CHANNEL_LIST):
+            self._channels.set(data["id"], Channel.from_slack(data))
+        self._log_preloaded()
+
+    async def preload_async(self) -> None:
+        """Load every user and channel. The asyncio equivalent of :meth:`preload`."""
+        async for data in self._list_async(*_USER_LIST):
+            self._users.set(data["id"], User.from_slack(data))
+        async for data in self._list_async(*_CHANNEL_LIST):
+            self._channels.set(data["id"], Channel.from_slack(data))
+        self._log_preloaded()
+
+    def handle_event(self, event: dict) -> bool:
+        """
+        Update the cache from a Slack event.
+
+        Handles :code:`user_change`, :code:`team_join`,
+        :code:`channel_created` and :code:`channel_rename` events.
+
+        :returns: Whether the event updated the directory
+        """
+        event_type = event.get("type")
+        if event_type not in DIRECTORY_EVENTS:
+            return False
+        if event_type in ("user_change", "team_join"):
+            user = User.from_slack(event["user"])
+            self._users.set(user.id, user)
+            return True
+
+        data = event["channel"]
+        existing = self.get_channel(data["id"])
+        if existing is not None and event_type == "channel_rename":
+            channel = Channel(
+                existing.id,
+                data.get("name", existing.name),
+                is_private=existing.is_private,
+                topic=existing.topic,
+            )
+        else:
+            channel = Channel.from_slack(data)
+        self._channels.set(channel.id, channel)
+        return True
+
+    def _log_preloaded(self) -> None:
+        LOGGER.info(
+            "Directory loaded %d users and %d channels",
+            len(self._users),
+            len(self._channels),
+        )
+
+    def _fetch_user(self, user_id: str) -> User:
+        try:
+            response = self._get_call()("users_info", user=user_id)
+        except SlackApiError as e:
+            if _not_found(e):
+                raise ValueError(f"Unknown user {user_id}") from e
+            raise
+        return User.from_slack(response["user"])
+
+    def _fetch_channel(self, channel_id: str) -> Channel:
+        try:
+            response = self._get_call()("conversations_info", channel=channel_id)
+        except SlackApiError as e:
+            if _not_found(e):
+                raise ValueError(f"Unknown channel {channel_id}") from e
+            raise
+        return Channel.from_slack(response["channel"])
+
+    async def _fetch_user_async(self, user_id: str) -> User:
+        try:
+            response = await self._get_call_async()("users_info", user=user_id)
+        except SlackApiError as e:
+            if _not_found(e):
+                raise ValueError(f"Unknown user {user_id}") from e
+            raise
+        return User.from_slack(response["user"])
+
+    async def _fetch_channel_async(self, channel_id: str) -> Channel:
+        try:
+            response = await self._get_call_async()(
+                "conversations_info",
+                channel=channel_id,
+            )
+        except SlackApiError as e:
+            if _not_found(e):
+                raise ValueError(f"Unknown channel {channel_id}") from e
+            raise
+        return Channel.from_slack(response["channel"])
+
+    def _list(self, method: str, key: str, kwargs: dict) -> Iterator[dict]:
+        call = self._get_call()
+        cursor = None
+        while True:
+            response = call(method, limit=self.page_size, cursor=cursor, **kwargs)
+            yield from response.get(key, [])
+            cursor = response.get("response_metadata", {}).get("next_cursor")
+            if not cursor:
+                return
+
+    async def _list_async(
+        self,
+        method: str,
+        key: str,
+        kwargs: dict,
+    ) -> AsyncIterator[dict]:
+        call = self._get_call_async()
+        cursor = None
+        while True:
+            response = await call(method, limit=self.page_size, cursor=cursor, **kwargs)
+            for data in response.get(key, []):
+                yield data
+            cursor = response.get("response_metadata", {}).get("next_cursor")
+            if not cursor:
+                return
+
+    def _get_call(self) -> Callable[..., Any]:
+        if self._call is None:
+            raise RuntimeError("Directory has no Web API client, use the async methods")
+        return self._call
+
+    def _get_call_async(self) -> Callable[..., Awaitable[Any]]:
+        if self._call_async is None:
+            raise RuntimeError("Directory has no async Web API client")
+        return self._call_async
@@ -9,3 +9,31 @@ class ArgumentValidationError(Exception):
 class ArgumentTypeValidationError(ArgumentValidationError):
     """Exception indicating argument type validation has failed."""
 
+
+class ExecutionTimeoutError(TimeoutError):
+    """
+    Exception indicating a command or scheduled job ran for too long.
+
+    :param stack: A snapshot of the stack of the function at the point
+                  it timed out
+    """
+
+    def __init__(self, message: str, *, stack: str = "") -> None:
+        super().__init__(message)
+        self.stack = stack
+
+
+class CircuitOpenError(Exception):
+    """
+    Exception indicating calls to a failing Slack Web API method are paused.
+
+    :param method: The Web API method
+    :param retry_after: The number of seconds until calls are tried again
+    """
+
+    def __init__(self, method: str, retry_after: float) -> None:
+        super().__init__(
+            f"Calls to {method} are paused for {retry_after:.1f}s as it is failing",
+        )
+        self.method = method
+        self.retry_after = retry_after
@@ -0,0 +1,156 @@
+"""Coordinates handing a running bot over to a new process."""
+
+import logging
+import os
+import sys
+from pathlib import Path
+from time import monotonic
+
+LOGGER = logging.getLogger("phial.bot.handover")
+
+
+def _pid_alive(pid: int) -> bool:
+    if sys.platform == "win32":  # pragma: no cover
+        # Signal 0 is CTRL_C_EVENT on Windows, so assume the process is alive
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:  # pragma: no cover
+        return True
+    return True
+
+
+def _start_time(pid: int) -> int | None:
+    """Get when a process started, in clock ticks since boot, if known."""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            stat = f.read()
+    except OSError:
+        return None
+    # The command name can contain spaces, so fields are counted after it
+    return int(stat.rsplit(")", 1)[1].split()[19])
+
+
+class Handover:
+    """
+    Hands a bot over between processes during a rolling deploy.
+
+    Slack allows several Socket Mode connections per app, so the incoming
+    process connects and starts handling envelopes before the outgoing
+    process stops. The two processes coordinate through files in a shared
+    directory:
+
+    * Once connected, the incoming process announces it is ready by writing
+      its PID to the :code:`owner` file.
+    * The outgoing process notices it has been superseded, stops running
+      scheduled jobs and closes its Socket Mode connections, so Slack
+      delivers every new envelope to the incoming process. In-flight
+      commands are then allowed to finish.
+    * Once the outgoing process's scheduler has finished it writes a
+      :code:`released-<pid>` marker, and only then does the incoming
+      process start running scheduled jobs. If the outgoing process dies
+      without releasing, the incoming process takes over the scheduler
+      when it notices the process has gone.
+
+    :param path: The directory used to coordinate the handover. It must be
+                 shared by both processes
+    :param interval: The minimum number of seconds between checks of the
+                     handover files. Defaults to 1
+    :param pid: The PID of this process. Defaults to :func:`os.getpid`
+    """
+
+    def __init__(
+        self,
+        path: str | os.PathLike,
+        *,
+        interval: float = 1,
+        pid: int | None = None,
+    ) -> None:
+        self.path = Path(path)
+        self.interval = interval
+        self.pid = pid if pid is not None else os.getpid()
+        #: The PID of the process this process took over from
+        self.previous_owner: int | None = None
+        #: Whether another process has taken over from this process
+        self.superseded = False
+        #: Whether this process should run scheduled jobs
+        self.owns_scheduler = False
+        self._next_poll = 0.0
+
+    @property
+    def _owner_file(self) -> Path:
+        return self.path / "owner"
+
+    def _released_file(self, pid: int) -> Path:
+        return self.path / f"released-{pid}"
+
+    def owner(self) -> int | None:
+        """
+        Get the PID of the process which currently owns the bot.
+
+        :returns: The PID, or :obj:`None` if no process has claimed the bot
+        """
+        try:
+            return int(self._owner_file.read_text())
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def announce(self) -> None:
+        """
+        Announce this process is ready to take over the bot.
+
+        Should be called once this process is connected to Slack.
+        """
+        self.path.mkdir(parents=True, exist_ok=True)
+        owner = self.owner()
+        self.previous_owner = owner if owner != self.pid else None
+        temp_file = self.path / f"owner.{self.pid}.tmp"
+        temp_file.write_text(str(self.pid))
+        temp_file.replace(self._owner_file)
+        LOGGER.info(f"Process {self.pid} ready, taking over from {owner}")
+        self.poll(force=True)
+
+    def poll(self, *, force: bool = False) -> None:
+        """
+        Check the handover files for changes.
+
+        Updates :attr:`superseded` and :attr:`owns_scheduler`. Checks are
+        skipped if the last one was less than :attr:`interval` seconds ago.
+
+        :param force: Check even if the last check was recent
+        """
+        now = monotonic()
+        if not force and now < self._next_poll:
+            return
+        self._next_poll = now + self.interval
+
+        if self.superseded:
+            return
+        owner = self.owner()
+        if owner is not None and owner != self.pid:
+            LOGGER.info(f"Process {self.pid} superseded by process {owner}")
+            self.superseded = True
+            self.owns_scheduler = False
+            return
+
+        if not self.owns_scheduler and self._previous_owner_released():
+            self.owns_scheduler = True
+            LOGGER.info(f"Process {self.pid} now owns the scheduler")
+
+    def _previous_owner_released(self) -> bool:
+        previous = self.previous_owner
+        if previous is None:
+            return True
+        released_file = self._released_file(previous)
+        if released_file.exists():
+            released_file.unlink(missing_ok=True)
+            return True
+        return not _pid_alive(previous)
+
+    def release(self) -> None:
+        """Let the process which superseded this one take over the scheduler."""
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._released_file(self.pid).touch()
+        self.owns_scheduler = False
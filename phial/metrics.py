@@ -0,0 +1,407 @@
+"""Lightweight metrics for phial, exposed in the Prometheus text format."""
+
+import threading
+from bisect import bisect_left
+from collections.abc import Iterator, Sequence
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from time import perf_counter
+
+#: Default histogram buckets, in seconds
+DEFAULT_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+    30,
+    60,
+)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n")
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+class _Metric:
+    type_name = ""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _format_labels(
+        self,
+        labels: tuple[str, ...],
+        extra: tuple[tuple[str, str], ...] = (),
+    ) -> str:
+        pairs = [*zip(self.labelnames, labels, strict=False), *extra]
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+    def collect(self) -> Iterator[str]:
+        """Yield the metric's lines in the Prometheus text format."""
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} {self.type_name}"
+
+
+class Counter(_Metric):
+    """
+    A value which only goes up.
+
+    :param name: The name of the metric
+    :param documentation: A description of the metric
+    :param labelnames: The names of the metric's labels
+    """
+
+    type_name = "counter"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        """
+        Increase the counter.
+
+        :param labels: The values of the metric's labels, in order
+        :param amount: The amount to increase the counter by
+        """
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels: str) -> float:
+        """Get the counter's current value for a set of labels."""
+        return self._values.get(labels, 0)
+
+    def collect(self) -> Iterator[str]:
+        """Yield the metric's lines in the Prometheus text format."""
+        yield from super().collect()
+        with self._lock:
+            values = list(self._values.items())
+        for labels, value in values:
+            yield f"{self.name}{self._format_labels(labels)} {_format_value(value)}"
+
+
+class Gauge(Counter):
+    """
+    A value which can go up and down.
+
+    :param name: The name of the metric
+    :param documentation: A description of the metric
+    :param labelnames: The names of the metric's labels
+    """
+
+    type_name = "gauge"
+
+    def set(self, value: float, *labels: str) -> None:
+        """
+        Set the gauge.
+
+        :param value: The gauge's new value
+        :param labels: The values of the metric's labels, in order
+        """
+        with self._lock:
+            self._values[labels] = value
+
+
+class _HistogramState:
+    __slots__ = ("counts", "sum")
+
+    def __init__(self, size: int) -> None:
+        self.counts = [0] * size
+        self.sum = 0.0
+
+
+class Histogram(_Metric):
+    """
+    A distribution of observed values, such as latencies.
+
+    :param name: The name of the metric
+    :param documentation: A description of the metric
+    :param labelnames: The names of the metric's labels
+    :param buckets: The upper bounds of the histogram's buckets
+    """
+
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values: dict[tuple[str, ...], _HistogramState] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        """
+        Record an observation.
+
+        :param value: The observed value
+        :param labels: The values of the metric's labels, in order
+        """
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                state = self._values[labels] = _HistogramState(len(self.buckets) + 1)
+            state.counts[index] += 1
+            state.sum += value
+
+    @contextmanager
+    def time(self, *labels: str) -> Iterator[None]:
+        """
+        Observe how long a block of code takes to run.
+
+        ::
+
+            with histogram.time("label"):
+                do_work()
+        """
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(perf_counter() - start, *labels)
+
+    def count(self, *labels: str) -> int:
+        """Get the number of observations for a set of labels."""
+        state = self._values.get(labels)
+        return sum(state.counts) if state else 0
+
+    def sum(self, *labels: str) -> float:
+        """Get the sum of all observations for a set of labels."""
+        state = self._values.get(labels)
+        return state.sum if state else 0.0
+
+    def collect(self) -> Iterator[str]:
+        """Yield the metric's lines in the Prometheus text format."""
+        yield from super().collect()
+        with self._lock:
+            values = [
+                (labels, list(state.counts), state.sum)
+                for labels, state in self._values.items()
+            ]
+        bounds = [*self.buckets, float("inf")]
+        for labels, counts, total in values:
+            cumulative = 0
+            for bound, count in zip(bounds, counts, strict=True):
+                cumulative += count
+                bucket_labels = self._format_labels(
+                    labels,
+                    (("le", _format_value(bound)),),
+                )
+                yield f"{self.name}_bucket{bucket_labels} {cumulative}"
+            label_text = self._format_labels(labels)
+            yield f"{self.name}_sum{label_text} {_format_value(total)}"
+            yield f"{self.name}_count{label_text} {cumulative}"
+
+
+class MetricsRegistry:
+    """
+    A collection of metrics.
+
+    Asking for a metric which already exists returns the existing metric,
+    so different parts of phial can share one registry.
+    """
+
+    def __init__(self) -> None:
+        self._metrics: dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is None:
+                self._metrics[metric.name] = metric
+                return metric
+        if type(existing) is not type(metric):
+            raise ValueError(
+                f"Metric {metric.name} already registered as a {existing.type_name}",
+            )
+        return existing
+
+    def counter(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+    ) -> Counter:
+        """
+        Get or create a :class:`Counter`.
+
+        :raises ValueError: If a different type of metric has the same name
+        """
+        return self._get_or_create(  # type: ignore[return-value]
+            Counter(name, documentation, labelnames),
+        )
+
+    def gauge(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+    ) -> Gauge:
+        """
+        Get or create a :class:`Gauge`.
+
+        :raises ValueError: If a different type of metric has the same name
+        """
+        return self._get_or_create(  # type: ignore[return-value]
+            Gauge(name, documentation, labelnames),
+        )
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        """
+        Get or create a :class:`Histogram`.
+
+        :raises ValueError: If a different type of metric has the same name
+        """
+        return self._get_or_create(  # type: ignore[return-value]
+            Histogram(name, documentation, labelnames, buckets),
+        )
+
+    def render(self) -> str:
+        """Render every metric in the Prometheus text format."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = [line for metric in metrics for line in metric.collect()]
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+        """
+        Serve the metrics over HTTP from a background thread.
+
+        The metrics are available from :code:`/metrics`.
+
+        :param port: The port to listen on. 0 picks a free port
+        :param host: The address to listen on. Defaults to localhost only
+
+        :returns: The running server. Call :code:`shutdown()` to stop it
+        """
+        registry = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:  # noqa: N802
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = registry.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args: object) -> None:
+                pass  # Don't log every scrape
+
+        server = ThreadingHTTPServer((host, port), MetricsHandler)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        return server
+
+
+class BotMetrics:
+    """
+    The metrics recorded by :class:`phial.Phial`.
+
+    :param registry: The registry to create the metrics in
+    """
+
+    def __init__(self, registry: MetricsRegistry) -> None:
+        self.envelopes = registry.counter(
+            "phial_envelopes_total",
+            "Socket Mode envelopes received, by type",
+            ("type",),
+        )
+        self.duplicate_envelopes = registry.counter(
+            "phial_duplicate_envelopes_total",
+            "Envelopes dropped as already received on another connection, by type",
+            ("type",),
+        )
+        self.routing_seconds = registry.histogram(
+            "phial_routing_seconds",
+            "Time spent matching messages to commands",
+        )
+        self.middleware_seconds = registry.histogram(
+            "phial_middleware_seconds",
+            "Time spent in each middleware function",
+            ("middleware",),
+        )
+        self.middleware_short_circuits = registry.counter(
+            "phial_middleware_short_circuits_total",
+            "Messages stopped by each middleware function",
+            ("middleware",),
+        )
+        self.command_seconds = registry.histogram(
+            "phial_command_seconds",
+            "Time spent running each command",
+            ("command",),
+        )
+        self.commands = registry.counter(
+            "phial_commands_total",
+            "Commands run, by command and outcome",
+            ("command", "status"),
+        )
+        self.abandoned_threads = registry.gauge(
+            "phial_abandoned_threads",
+            "Timed out commands and scheduled jobs still running in the background",
+        )
+        self.command_cache = registry.counter(
+            "phial_command_cache_total",
+            "Command result cache lookups, by command and result",
+            ("command", "result"),
+        )
+        self.slack_api_seconds = registry.histogram(
+            "phial_slack_api_seconds",
+            "Slack Web API call latency, by method",
+            ("method",),
+        )
+        self.slack_api_errors = registry.counter(
+            "phial_slack_api_errors_total",
+            "Failed Slack Web API calls, by method",
+            ("method",),
+        )
+        self.circuit_breaker_changes = registry.counter(
+            "phial_circuit_breaker_changes_total",
+            "Slack Web API circuit breaker state changes, by method and new state",
+            ("method", "state"),
+        )
@@ -0,0 +1,129 @@
+"""Middleware filters and the order middleware runs in."""
+
+from collections.abc import Callable, Collection, Sequence
+
+from phial.wrappers import Message
+
+MiddlewareFunc = Callable[[Message], Message | None]
+
+
+class Middleware:
+    """
+    A middleware function and the messages it applies to.
+
+    Filters are checked against the message as it reaches the middleware,
+    so they see any changes made by the middleware which ran before it.
+
+    :param func: The middleware function
+    :param channels: Only run on messages in these channels.
+                     Defaults to every channel
+    :param users: Only run on messages from these users.
+                  Defaults to every user
+    :param command_only: Only run on messages which match a command.
+                         Defaults to False
+    :param event_types: Only run on these Slack event types,
+                        e.g. :code:`'app_mention'`. Defaults to every type
+    :param priority: Middleware with a lower priority runs first, and
+                     middleware with the same priority runs in the order it
+                     was added. Defaults to 0
+    """
+
+    __slots__ = (
+        "channels",
+        "command_only",
+        "event_types",
+        "filtered",
+        "func",
+        "name",
+        "priority",
+        "users",
+    )
+
+    def __init__(
+        self,
+        func: MiddlewareFunc,
+        *,
+        channels: Collection[str] | None = None,
+        users: Collection[str] | None = None,
+        command_only: bool = False,
+        event_types: Collection[str] | None = None,
+        priority: int = 0,
+    ) -> None:
+        self.func = func
+        self.name: str = getattr(func, "__name__", repr(func))
+        self.channels = frozenset(channels) if channels is not None else None
+        self.users = frozenset(users) if users is not None else None
+        self.command_only = command_only
+        self.event_types = frozenset(event_types) if event_types is not None else None
+        self.priority = priority
+        #: Whether the middleware only applies to some messages
+        self.filtered = (
+            self.channels is not None
+            or self.users is not None
+            or command_only
+            or self.event_types is not None
+        )
+
+    def __repr__(self) -> str:
+        return f"<Middleware: {self.name} priority {self.priority}>"
+
+    def applies(
+        self,
+        message: Message,
+        event_type: str | None,
+        is_command: Callable[[Message], bool],
+    ) -> bool:
+        """
+        Check whether the middleware should run on a message.
+
+        :param message: The message
+        :param event_type: The type of the Slack event the message came from
+        :param is_command: Checks whether a message matches a command. Only
+                           called if the middleware is :code:`command_only`
+        """
+        if self.channels is not None and message.channel not in self.channels:
+            return False
+        if self.users is not None and message.user not in self.users:
+            return False
+        if self.event_types is not None and event_type not in self.event_types:
+            return False
+        return not self.command_only or is_command(message)
+
+
+class MiddlewarePlan:
+    """
+    The middleware to run on each message, in the order it runs.
+
+    Built once from the bot's middleware and rebuilt when middleware is
+    added, so messages do not pay for sorting. Unfiltered middleware runs
+    without any checks, and filtered middleware is skipped without being
+    called when its filters do not match.
+
+    :param middleware: The middleware, in the order it was added
+    """
+
+    __slots__ = ("funcs", "stages")
+
+    def __init__(self, middleware: list[Middleware]) -> None:
+        #: The functions the plan was built from, in the order they were added
+        self.funcs = tuple(m.func for m in middleware)
+        # sorted is stable, so equal priorities keep the order they were added
+        self.stages: tuple[Middleware, ...] = tuple(
+            sorted(middleware, key=lambda m: m.priority),
+        )
+
+    def __len__(self) -> int:
+        return len(self.stages)
+
+    def is_stale(self, funcs: Sequence[MiddlewareFunc]) -> bool:
+        """
+        Check whether the plan was built from different middleware functions.
+
+        Functions are compared by identity, so replacing or reordering them
+        makes the plan stale, not just adding or removing them.
+
+        :param funcs: The bot's current middleware functions
+        """
+        return len(funcs) != len(self.funcs) or any(
+            func is not built for func, built in zip(funcs, self.funcs, strict=True)
+        )
@@ -0,0 +1,525 @@
+"""A durable queue of outbound Web API calls, so replies survive crashes."""
+
+import asyncio
+import json
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+from collections.abc import Awaitable, Callable
+from time import monotonic
+from typing import Any, NamedTuple
+
+from slack_sdk.errors import SlackApiError, SlackClientError
+
+from phial.errors import CircuitOpenError
+from phial.handover import _pid_alive, _start_time
+
+LOGGER = logging.getLogger("phial.bot.outbox")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    owner TEXT NOT NULL,
+    team TEXT,
+    channel TEXT,
+    method TEXT NOT NULL,
+    params TEXT NOT NULL,
+    file BLOB,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    due REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS outbox_owner ON outbox (owner, id);
+CREATE INDEX IF NOT EXISTS outbox_channel ON outbox (owner, team, channel, id);
+CREATE TABLE IF NOT EXISTS dead_letters (
+    id INTEGER PRIMARY KEY,
+    team TEXT,
+    method TEXT NOT NULL,
+    params TEXT NOT NULL,
+    file BLOB,
+    attempts INTEGER NOT NULL,
+    error TEXT NOT NULL,
+    failed REAL NOT NULL
+);
+"""
+
+# Calls in the same channel are sent in order, so a call is held back while
+# an earlier one in its channel is waiting to be retried
+_DUE = """
+SELECT id, method, params, file, team, attempts FROM outbox
+WHERE owner = ? AND due <= ? AND NOT EXISTS (
+    SELECT 1 FROM outbox AS earlier
+    WHERE earlier.owner = outbox.owner
+    AND earlier.team IS outbox.team
+    AND earlier.channel IS outbox.channel
+    AND earlier.id < outbox.id
+    AND earlier.due > ?
+)
+ORDER BY id LIMIT ?
+"""
+
+# Only the first call in each channel can be waiting to be retried
+_NEXT_DUE = """
+SELECT MIN(due) FROM outbox
+WHERE owner = ? AND NOT EXISTS (
+    SELECT 1 FROM outbox AS earlier
+    WHERE earlier.owner = outbox.owner
+    AND earlier.team IS outbox.team
+    AND earlier.channel IS outbox.channel
+    AND earlier.id < outbox.id
+)
+"""
+
+# Errors raised before a call reaches Slack, which retrying won't fix
+_CLIENT_ERRORS = (SlackClientError, TypeError, ValueError, LookupError)
+
+
+def _params(values: list[Any]) -> str:
+    return ", ".join("?" * len(values))
+
+
+def _owner(pid: int) -> str:
+    """Identify a process by its PID and, where known, when it started."""
+    started = _start_time(pid)
+    return f"{pid}:{'' if started is None else started}"
+
+
+def _owner_alive(owner: str) -> bool:
+    pid, _, started = owner.partition(":")
+    if not _pid_alive(int(pid)):
+        return False
+    # The PID may since have been reused by another process
+    return not started or str(_start_time(int(pid))) == started
+
+
+class OutboxEntry(NamedTuple):
+    """A Web API call waiting in the outbox."""
+
+    id: int
+    method: str
+    kwargs: dict[str, Any]
+    team: str | None
+    attempts: int
+
+
+class DeadLetter(NamedTuple):
+    """A Web API call the outbox gave up on."""
+
+    entry: OutboxEntry
+    error: str
+
+
+def _channel(kwargs: dict[str, Any]) -> str | None:
+    # files_upload_v2 takes channels, every other method sent takes channel
+    channel = kwargs.get("channel", kwargs.get("channels"))
+    return None if channel is None else str(channel)
+
+
+def _entry(
+    id_: int,
+    method: str,
+    params: str,
+    file: bytes | None,
+    team: str | None,
+    attempts: int,
+) -> OutboxEntry:
+    kwargs = json.loads(params)
+    if file is not None:
+        kwargs["file"] = file
+    return OutboxEntry(id_, method, kwargs, team, attempts)
+
+
+def retry_delay(error: Exception) -> float | None:
+    """
+    Get how long Slack asked to wait before retrying a failed call.
+
+    :returns: The number of seconds from a :code:`Retry-After` header, 0 if
+              the call can be retried after backing off, or None if
+              retrying won't help, such as when a channel doesn't exist or
+              the call's arguments are invalid
+    """
+    if isinstance(error, CircuitOpenError):
+        return error.retry_after
+    if not isinstance(error, SlackApiError):
+        if isinstance(error, _CLIENT_ERRORS):
+            return None
+        # Connection errors and timeouts
+        return 0
+    status = error.response.status_code
+    if status == 429:
+        return float(error.response.headers.get("Retry-After", 0))
+    if status >= 500:
+        return 0
+    return None
+
+
+class Outbox:
+    """
+    Writes outbound Web API calls to a SQLite database before sending them.
+
+    Calls are committed to the database's write-ahead log before
+    :meth:`put` returns, so they survive the process crashing. A delivery
+    thread sends them in batches, in the order they were put. Calls which
+    fail because Slack is unreachable, erroring or rate limiting are
+    retried with exponential backoff, holding back the later calls in the
+    same channel to keep replies in order. Calls in other channels carry
+    on. Calls which can never succeed, because Slack rejects them outright
+    or their arguments are invalid, and calls which fail
+    :code:`max_attempts` times, are logged and moved to a dead letter
+    table, see :meth:`dead_letters`.
+
+    Each call is removed from the database as soon as it has been sent, so
+    a crash part way through a batch only risks sending the call which was
+    in flight twice.
+
+    Several processes can share a database. Each delivers the calls it put,
+    and calls left by processes which have died are adopted and sent by
+    the next process to start, or any process already running. Processes
+    are told apart by their PID and, on Linux, when they started, so calls
+    left by a process whose PID has been reused are still adopted.
+
+    :param path: The database file
+    :param batch_size: The maximum number of calls read per batch.
+                       Defaults to 100
+    :param retry_delay: The number of seconds before the first retry.
+                        Defaults to 1
+    :param max_retry_delay: The maximum number of seconds between retries.
+                            Defaults to 60
+    :param adopt_interval: The number of seconds between checks for calls
+                           left by processes which have died. Defaults
+                           to 10
+    :param max_attempts: The number of times a call is tried before giving
+                         up on it. Defaults to 10
+    :param pid: The PID of this process. Defaults to :func:`os.getpid`
+    """
+
+    def __init__(
+        self,
+        path: str | os.PathLike,
+        *,
+        batch_size: int = 100,
+        retry_delay: float = 1,
+        max_retry_delay: float = 60,
+        adopt_interval: float = 10,
+        max_attempts: int = 10,
+        pid: int | None = None,
+    ) -> None:
+        if max_attempts < 1:
+            raise ValueError("Max attempts must be at least 1")
+        self.path = path
+        self.batch_size = batch_size
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.adopt_interval = adopt_interval
+        self.max_attempts = max_attempts
+        self.pid = os.getpid() if pid is None else pid
+        self._owner = _owner(self.pid)
+        #: The number of calls delivered
+        self.delivered = 0
+        #: The number of calls given up on and moved to the dead letters
+        self.dropped = 0
+        self._db = sqlite3.connect(
+            path,
+            timeout=30,
+            isolation_level=None,
+            check_same_thread=False,
+        )
+        self._db.execute("PRAGMA journal_mode=WAL")
+        # A commit is durable once in the log, which survives the process
+        # crashing, without waiting for a sync to disk
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._close_when_stopped = False
+        self._last_adopted = float("-inf")
+
+    def __len__(self) -> int:
+        with self._lock:
+            (count,) = self._db.execute(
+                "SELECT COUNT(*) FROM outbox WHERE owner = ?",
+                (self._owner,),
+            ).fetchone()
+        return int(count)
+
+    def put(
+        self,
+        method: str,
+        kwargs: dict[str, Any],
+        *,
+        team: str | None = None,
+    ) -> int:
+        """
+        Durably queue a Web API call.
+
+        A :code:`file` argument is read into the database, so the call can
+        be sent after the file has been closed.
+
+        :param method: The Web API client method, e.g. :code:`chat_postMessage`
+        :param kwargs: The method's arguments
+        :param team: The workspace to make the call in. Defaults to None,
+                     meaning the workspace the bot was created for
+        :returns: The call's ID
+        """
+        params = dict(kwargs)
+        file = params.pop("file", None)
+        if file is not None and hasattr(file, "read"):
+            file = file.read()
+        if isinstance(file, str):
+            file = file.encode()
+        with self._lock:
+            cursor = self._db.execute(
+                "INSERT INTO outbox (owner, team, channel, method, params, file, due) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    self._owner,
+                    team,
+                    _channel(params),
+                    method,
+                    json.dumps(params),
+                    file,
+                    time.time(),
+                ),
+            )
+        self._wakeup.set()
+        return int(cursor.lastrowid or 0)
+
+    def due(self) -> list[OutboxEntry]:
+        """
+        Get the next batch of calls to send, in order.
+
+        Calls behind one in the same channel which is still waiting to be
+        retried are left out, so calls are never sent ahead of an earlier
+        one in their channel.
+        """
+        if monotonic() - self._last_adopted >= self.adopt_interval:
+            self.adopt()
+        now = time.time()
+        with self._lock:
+            rows = self._db.execute(
+                _DUE,
+                (self._owner, now, now, self.batch_size),
+            ).fetchall()
+        return [_entry(*row) for row in rows]
+
+    def next_delay(self) -> float | None:
+        """Get the number of seconds until the next call is due, or None if none are."""
+        with self._lock:
+            (due,) = self._db.execute(_NEXT_DUE, (self._owner,)).fetchone()
+        return None if due is None else max(0, due - time.time())
+
+    def dead_letters(self) -> list[DeadLetter]:
+        """Get the calls which were given up on, oldest first."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id, method, params, file, team, attempts, error "
+                "FROM dead_letters ORDER BY id",
+            ).fetchall()
+        return [DeadLetter(_entry(*row[:-1]), row[-1]) for row in rows]
+
+    def adopt(self) -> int:
+        """
+        Take over the calls left by processes which have died.
+
+        :returns: The number of calls adopted
+        """
+        self._last_adopted = monotonic()
+        with self._lock:
+            owners = [
+                owner
+                for (owner,) in self._db.execute(
+                    "SELECT DISTINCT owner FROM outbox WHERE owner != ?",
+                    (self._owner,),
+                )
+            ]
+            dead = [owner for owner in owners if not _owner_alive(owner)]
+            if not dead:
+                return 0
+            # The adopted calls were put first, so keep them ahead of ours
+            cursor = self._db.execute(
+                f"UPDATE outbox SET owner = ? WHERE owner IN ({_params(dead)})",  # noqa: S608
+                (self._owner, *dead),
+            )
+        LOGGER.info(f"Adopted {cursor.rowcount} outbound calls from stopped processes")
+        return cursor.rowcount
+
+    def deliver(self, send: Callable[[OutboxEntry], Any]) -> int:
+        """
+        Send the next batch of calls.
+
+        :param send: Makes a call, raising an exception if it fails
+        :returns: The number of calls sent or dropped
+        """
+        done = 0
+        # Channels with a call waiting to be retried
+        held: set[tuple[str | None, str | None]] = set()
+        for entry in self.due():
+            key = (entry.team, _channel(entry.kwargs))
+            if key in held:
+                continue
+            try:
+                send(entry)
+            except Exception as e:
+                if not self._failed(entry, e):
+                    held.add(key)
+                    continue
+            else:
+                self._sent(entry)
+            done += 1
+        return done
+
+    async def deliver_async(self, send: Callable[[OutboxEntry], Awaitable[Any]]) -> int:
+        """
+        Send the next batch of calls with a coroutine function.
+
+        :param send: Makes a call, raising an exception if it fails
+        :returns: The number of calls sent or dropped
+        """
+        done = 0
+        held: set[tuple[str | None, str | None]] = set()
+        for entry in self.due():
+            key = (entry.team, _channel(entry.kwargs))
+            if key in held:
+                continue
+            try:
+                await send(entry)
+            except Exception as e:
+                if not self._failed(entry, e):
+                    held.add(key)
+                    continue
+            else:
+                self._sent(entry)
+            done += 1
+        return done
+
+    def start(self, send: Callable[[OutboxEntry], Any]) -> None:
+        """Send calls in a background thread, including any left from before."""
+        self._thread = threading.Thread(
+            target=self._run,
+            args=(send,),
+            name="phial-outbox",
+            daemon=True,
+        )
+        self._thread.start()
+
+    async def run_async(self, send: Callable[[OutboxEntry], Awaitable[Any]]) -> None:
+        """Send calls until stopped, including any left from before."""
+        while not self._stopping.is_set():
+            try:
+                if await self.deliver_async(send):
+                    continue
+            except Exception as e:
+                LOGGER.error(f"Failed to deliver outbound calls: {e}")
+            await asyncio.to_thread(self._wait)
+        # Send whatever is due before stopping
+        while await self.deliver_async(send):
+            pass
+
+    def stop(self, timeout: float) -> int:
+        """
+        Stop sending calls, first sending any that are due.
+
+        Calls which are not sent in time, or are waiting to be retried,
+        stay in the database to be sent when the bot next starts.
+
+        :param timeout: The number of seconds to spend sending due calls
+        :returns: The number of calls left in the outbox
+        """
+        self._stopping.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        return len(self)
+
+    def close(self) -> None:
+        """
+        Close the database.
+
+        If the delivery thread is still sending, after :meth:`stop` timed
+        out, the database is closed once it finishes instead.
+        """
+        thread = self._thread
+        with self._lock:
+            if (
+                thread is not None
+                and thread.is_alive()
+                and thread is not threading.current_thread()
+            ):
+                self._close_when_stopped = True
+                return
+            self._db.close()
+
+    def _run(self, send: Callable[[OutboxEntry], Any]) -> None:
+        while not self._stopping.is_set():
+            try:
+                if self.deliver(send):
+                    continue
+            except Exception as e:
+                LOGGER.error(f"Failed to deliver outbound calls: {e}")
+            self._wait()
+        # Send whatever is due before stopping
+        try:
+            while self.deliver(send):
+                pass
+        finally:
+            with self._lock:
+                if self._close_when_stopped:
+                    self._db.close()
+
+    def _wait(self) -> None:
+        delay = self.next_delay()
+        timeout = (
+            self.adopt_interval if delay is None else min(delay, self.adopt_interval)
+        )
+        if self._wakeup.wait(timeout):
+            self._wakeup.clear()
+
+    def _failed(self, entry: OutboxEntry, error: Exception) -> bool:
+        """Record a failed call, returning whether it was given up on."""
+        delay = retry_delay(error)
+        if delay is None:
+            LOGGER.error(f"Dropped outbound {entry.method} call: {error}")
+            self._dead_letter(entry, error)
+            return True
+        if entry.attempts + 1 >= self.max_attempts:
+            LOGGER.error(
+                f"Dropped outbound {entry.method} call after "
+                f"{entry.attempts + 1} attempts: {error}",
+            )
+            self._dead_letter(entry, error)
+            return True
+        backoff = min(self.max_retry_delay, self.retry_delay * 2**entry.attempts)
+        # Jitter stops processes sharing a rate limit retrying in lockstep
+        delay = max(delay, backoff * random.uniform(0.5, 1))  # noqa: S311
+        LOGGER.warning(
+            f"Outbound {entry.method} call failed, retrying in {delay:.1f}s: {error}",
+        )
+        with self._lock:
+            self._db.execute(
+                "UPDATE outbox SET attempts = attempts + 1, due = ? WHERE id = ?",
+                (time.time() + delay, entry.id),
+            )
+        return False
+
+    def _sent(self, entry: OutboxEntry) -> None:
+        self.delivered += 1
+        with self._lock:
+            self._db.execute("DELETE FROM outbox WHERE id = ?", (entry.id,))
+
+    def _dead_letter(self, entry: OutboxEntry, error: Exception) -> None:
+        self.dropped += 1
+        # The call is moved in one transaction, so is never in both tables
+        with self._lock, self._db:
+            self._db.execute("BEGIN")
+            self._db.execute(
+                "INSERT OR REPLACE INTO dead_letters "
+                "(id, team, method, params, file, attempts, error, failed) "
+                "SELECT id, team, method, params, file, attempts + 1, ?, ? "
+                "FROM outbox WHERE id = ?",
+                (str(error), time.time(), entry.id),
+            )
+            self._db.execute("DELETE FROM outbox WHERE id = ?", (entry.id,))
@@ -0,0 +1,51 @@
+"""Serializes message attachments and blocks to JSON for the Web API."""
+
+import importlib
+import json
+from collections.abc import Callable
+from typing import Any
+
+#: Serializes a value to a JSON string
+JsonDumps = Callable[[Any], str]
+
+#: The JSON backends which can be chosen by name
+JSON_BACKENDS = ("json", "orjson")
+
+
+def dumps(value: Any) -> str:  # noqa: ANN401
+    """Serialize a value to compact JSON with the standard library."""
+    return json.dumps(value, separators=(",", ":"))
+
+
+def _orjson_dumps() -> JsonDumps:
+    try:
+        orjson = importlib.import_module("orjson")
+    except ImportError as e:
+        raise ImportError(
+            "The orjson JSON backend requires orjson. "
+            "Install it with 'pip install phial-slack[orjson]'",
+        ) from e
+    orjson_dumps = orjson.dumps
+
+    def dumps(value: Any) -> str:  # noqa: ANN401
+        return str(orjson_dumps(value).decode())
+
+    return dumps
+
+
+def json_backend(backend: str | JsonDumps) -> JsonDumps:
+    """
+    Get the function used to serialize payloads.
+
+    :param backend: :code:`'json'` for the standard library, :code:`'orjson'`
+                    for the faster `orjson <https://github.com/ijl/orjson>`_,
+                    or a function which serializes a value to a JSON string
+    :returns: The serializing function
+    """
+    if callable(backend):
+        return backend
+    if backend == "json":
+        return dumps
+    if backend == "orjson":
+        return _orjson_dumps()
+    raise ValueError(f"Unknown JSON backend {backend}")
@@ -0,0 +1,199 @@
+"""On-demand profiling of commands, scheduled jobs and request handling."""
+
+import cProfile
+import io
+import logging
+import pstats
+import threading
+from collections.abc import Callable, Iterator
+from contextlib import AbstractContextManager, contextmanager, nullcontext
+from typing import TypeVar
+
+LOGGER = logging.getLogger("phial.bot.profiling")
+
+#: The target used to profile the whole of request handling
+DISPATCH = "dispatch"
+
+_NOT_PROFILING = nullcontext()
+
+# Python 3.12+ can only run one profiler per process, so only one profile is
+# enabled at a time, whichever Profiler it belongs to
+_ENABLED = threading.Lock()
+
+T = TypeVar("T")
+
+
+class _Session:
+    __slots__ = ("invocations", "lock", "output", "profile", "remaining")
+
+    def __init__(self, invocations: int, output: str | None) -> None:
+        self.invocations = invocations
+        self.remaining = invocations
+        self.output = output
+        self.profile = cProfile.Profile()
+        # Held while profiling, so stopping early waits for the invocation
+        self.lock = threading.Lock()
+
+
+class Profiler:
+    """
+    Profiles a command, a scheduled job or the dispatch path on demand.
+
+    A target is profiled with :mod:`cProfile` for a number of invocations,
+    after which the aggregated stats are summarised, logged and optionally
+    written to disk. When nothing is being profiled the only cost is a
+    dictionary check.
+
+    Targets are either the name of a command's or scheduled job's function,
+    or :data:`DISPATCH` to profile the handling of whole requests. While
+    the dispatch path is being profiled commands run on the same thread are
+    profiled as part of it.
+
+    As Python can only run one profiler at a time, only one invocation is
+    profiled at a time, across all targets. Invocations which overlap it run
+    unprofiled and are not counted. If another profiling tool is already
+    active a warning is logged and the invocation runs unprofiled.
+
+    :param summary_lines: The number of functions to include in summaries
+    """
+
+    def __init__(self, *, summary_lines: int = 25) -> None:
+        self.summary_lines = summary_lines
+        #: Summaries of finished profiling sessions, keyed by target
+        self.results: dict[str, str] = {}
+        self._sessions: dict[str, _Session] = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @property
+    def active(self) -> bool:
+        """Whether any targets are being profiled."""
+        return bool(self._sessions)
+
+    def start(
+        self,
+        target: str,
+        invocations: int = 1,
+        *,
+        output: str | None = None,
+    ) -> None:
+        """
+        Start profiling a target.
+
+        Starting a target which is already being profiled restarts it.
+
+        :param target: The name of a command's or scheduled job's function,
+                       or :data:`DISPATCH`
+        :param invocations: The number of invocations to profile
+        :param output: A path to write the :mod:`pstats` data to once
+                       finished. Defaults to None
+        """
+        if invocations < 1:
+            raise ValueError("Invocations must be at least 1")
+        with self._lock:
+            self._sessions[target] = _Session(invocations, output)
+        LOGGER.info(f"Profiling {target} for {invocations} invocations")
+
+    def stop(self, target: str) -> str | None:
+        """
+        Stop profiling a target early.
+
+        :returns: A summary of the invocations profiled so far, or
+                  :obj:`None` if the target was not being profiled
+        """
+        with self._lock:
+            session = self._sessions.pop(target, None)
+        if session is None:
+            return None
+        with session.lock:
+            return self._finish(target, session)
+
+    def profile(self, target: str) -> AbstractContextManager[None]:
+        """
+        Profile a block of code if the target is being profiled.
+
+        ::
+
+            with profiler.profile("report"):
+                report()
+        """
+        if not self._sessions or target not in self._sessions:
+            return _NOT_PROFILING
+        return self._profile(target)
+
+    def wrap(self, target: str, func: Callable[[], T]) -> Callable[[], T]:
+        """
+        Profile a function if the target is being profiled.
+
+        Unlike :meth:`profile` the function is profiled on whichever thread
+        ends up calling it, such as the worker thread used for timeouts.
+
+        :returns: The function, wrapped only if the target is being profiled
+        """
+        if not self._sessions or target not in self._sessions:
+            return func
+
+        def profiled() -> T:
+            with self._profile(target):
+                return func()
+
+        return profiled
+
+    @contextmanager
+    def _profile(self, target: str) -> Iterator[None]:
+        session = self._sessions.get(target)
+        if session is None or getattr(self._local, "profiling", False):
+            yield
+            return
+
+        if not _ENABLED.acquire(blocking=False):
+            yield
+            return
+        try:
+            with session.lock:
+                if session.remaining <= 0 or not self._enable(target, session):
+                    yield
+                    return
+                self._local.profiling = True
+                try:
+                    yield
+                finally:
+                    session.profile.disable()
+                    self._local.profiling = False
+                    session.remaining -= 1
+                    if session.remaining == 0:
+                        with self._lock:
+                            if self._sessions.get(target) is session:
+                                del self._sessions[target]
+                        self._finish(target, session)
+        finally:
+            _ENABLED.release()
+
+    @staticmethod
+    def _enable(target: str, session: _Session) -> bool:
+        try:
+            session.profile.enable()
+        except ValueError as e:
+            # Raised when another profiling tool is active on Python 3.12+
+            LOGGER.warning(f"Could not profile {target}: {e}")
+            return False
+        return True
+
+    def _finish(self, target: str, session: _Session) -> str:
+        done = session.invocations - session.remaining
+        stream = io.StringIO()
+        try:
+            stats = pstats.Stats(session.profile, stream=stream)
+        except TypeError:
+            summary = f"Profile of {target}: no invocations recorded"
+        else:
+            if session.output is not None:
+                stats.dump_stats(session.output)
+            stats.sort_stats(pstats.SortKey.CUMULATIVE)
+            stats.print_stats(self.summary_lines)
+            summary = (
+                f"Profile of {target} over {done} invocations\n{stream.getvalue()}"
+            )
+        self.results[target] = summary
+        LOGGER.info(summary)
+        return summary
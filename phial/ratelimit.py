@@ -0,0 +1,150 @@
+"""Token bucket rate limiting of commands by user, channel or team."""
+
+import threading
+from collections import OrderedDict
+from time import monotonic
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:  # pragma: no cover
+    from phial.wrappers import Message
+
+#: What a rate limit can be counted by
+RATE_LIMIT_KEYS = ("user", "channel", "team")
+
+
+class _Stripe:
+    __slots__ = ("buckets", "lock")
+
+    def __init__(self) -> None:
+        # Maps a key to its tokens and when they were last updated, least
+        # recently used first so idle keys can be evicted from the front
+        self.buckets: OrderedDict[str | None, tuple[float, float]] = OrderedDict()
+        self.lock = threading.Lock()
+
+
+class RateLimiter:
+    """
+    Limits how often each user, channel or team can do something.
+
+    Each key gets a token bucket holding up to :code:`burst` tokens which
+    refills at :code:`limit` tokens every :code:`period` seconds, and every
+    request takes a token. Buckets are spread over several independently
+    locked stripes so threads rarely wait for each other, and a bucket is
+    evicted once it has been idle long enough to have refilled, so memory
+    only grows with the keys active in the last period.
+
+    :param limit: The number of requests allowed per period
+    :param period: The length of the period in seconds
+    :param key: What requests are counted by, one of :code:`'user'`,
+                :code:`'channel'` or :code:`'team'`. Defaults to
+                :code:`'user'`
+    :param burst: The number of requests which can be made at once.
+                  Defaults to :code:`limit`
+    :param stripes: The number of separately locked stripes. Defaults to 16
+    """
+
+    def __init__(
+        self,
+        limit: int,
+        period: float,
+        *,
+        key: str = "user",
+        burst: int | None = None,
+        stripes: int = 16,
+    ) -> None:
+        if limit < 1:
+            raise ValueError("Limit must be at least 1")
+        if period <= 0:
+            raise ValueError("Period must be greater than 0")
+        if key not in RATE_LIMIT_KEYS:
+            raise ValueError(f"Unknown rate limit key {key}")
+        self.limit = limit
+        self.period = period
+        self.key = key
+        self.burst = burst if burst is not None else limit
+        self._rate = limit / period
+        # How long an unused bucket takes to refill, after which it is the
+        # same as a missing one
+        self._idle = self.burst / self._rate
+        self._stripes = tuple(_Stripe() for _ in range(stripes))
+
+    def __len__(self) -> int:
+        return sum(len(stripe.buckets) for stripe in self._stripes)
+
+    def acquire(self, key: str | None) -> float:
+        """
+        Take a token for a key.
+
+        :returns: 0 if the request is allowed, otherwise the number of
+                  seconds until it would be
+        """
+        stripe = self._stripes[hash(key) % len(self._stripes)]
+        now = monotonic()
+        with stripe.lock:
+            buckets = stripe.buckets
+            self._evict(buckets, now)
+            tokens = self._refill(buckets, key, now)
+            if tokens < 1:
+                buckets[key] = (tokens, now)
+                return (1 - tokens) / self._rate
+            buckets[key] = (tokens - 1, now)
+            return 0
+
+    def wait_time(self, key: str | None) -> float:
+        """
+        Check whether a key has a token, without taking it.
+
+        :returns: 0 if a request would be allowed, otherwise the number of
+                  seconds until it would be
+        """
+        stripe = self._stripes[hash(key) % len(self._stripes)]
+        now = monotonic()
+        with stripe.lock:
+            tokens = self._refill(stripe.buckets, key, now)
+        return 0 if tokens >= 1 else (1 - tokens) / self._rate
+
+    def release(self, key: str | None) -> None:
+        """
+        Give back a token taken by :meth:`acquire`.
+
+        For when the request the token was taken for didn't go ahead.
+        """
+        stripe = self._stripes[hash(key) % len(self._stripes)]
+        now = monotonic()
+        with stripe.lock:
+            tokens = self._refill(stripe.buckets, key, now)
+            stripe.buckets[key] = (min(self.burst, tokens + 1), now)
+
+    def check(self, message: "Message") -> float:
+        """
+        Take a token for a message's user, channel or team.
+
+        See :meth:`acquire`.
+        """
+        return self.acquire(getattr(message, self.key))
+
+    def _refill(
+        self,
+        buckets: "OrderedDict[str | None, tuple[float, float]]",
+        key: str | None,
+        now: float,
+    ) -> float:
+        """Get a key's tokens, topped up for the time since they were updated."""
+        entry = buckets.get(key)
+        if entry is None:
+            return float(self.burst)
+        tokens, updated = entry
+        buckets.move_to_end(key)
+        return min(self.burst, tokens + (now - updated) * self._rate)
+
+    def _evict(
+        self,
+        buckets: "OrderedDict[str | None, tuple[float, float]]",
+        now: float,
+    ) -> None:
+        # Buckets are ordered by last use, so stop at the first active one
+        while buckets:
+            key, (_, updated) = next(iter(buckets.items()))
+            if now - updated < self._idle:
+                return
+            del buckets[key]
@@ -0,0 +1,453 @@
+"""Record Socket Mode traffic and replay it against a bot for load testing."""
+
+import argparse
+import asyncio
+import gzip
+import hashlib
+import importlib
+import json
+import logging
+import os
+import re
+import threading
+from collections import Counter
+from collections.abc import Callable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from time import monotonic, perf_counter, sleep
+from typing import IO, TYPE_CHECKING, Any, cast
+
+from slack_sdk.socket_mode.request import SocketModeRequest
+
+from phial.utils import percentiles
+
+if TYPE_CHECKING:  # pragma: no cover
+    from phial import AsyncPhial, Phial
+
+LOGGER = logging.getLogger("phial.bot.replay")
+
+#: The version of the capture format written by :class:`Recorder`
+CAPTURE_VERSION = 1
+
+_MENTION = re.compile(r"<@([UW][A-Z0-9]+)(\|[^>]*)?>")
+_LINK = re.compile(r"<[^>]*>")
+_LETTER = re.compile(r"[^\W\d_]")
+_DIGIT = re.compile(r"\d")
+
+
+class Recorder:
+    """
+    Records Socket Mode envelopes to a gzipped JSON lines capture.
+
+    Add it as a listener on the Socket Mode client, or set the
+    :code:`recordPath` config value to have the bot do so. The first line
+    of a capture is a header, and each following line is an envelope with
+    the number of seconds since recording started.
+
+    Redacted user IDs are replaced with pseudonyms which are consistent
+    within a capture but not between captures. Redacted text keeps its
+    first word, so commands are still routed the same way, and has every
+    other letter replaced with :code:`x` and every digit with :code:`9`.
+
+    :param path: The file to write the capture to
+    :param redact_text: Whether to redact message text. Defaults to False
+    :param redact_users: Whether to redact user IDs. Defaults to False
+    :param flush_interval: How often, in seconds, buffered envelopes are
+                           written to disk. Defaults to 1
+    """
+
+    def __init__(
+        self,
+        path: str,
+        *,
+        redact_text: bool = False,
+        redact_users: bool = False,
+        flush_interval: float = 1,
+    ) -> None:
+        self.path = path
+        self.redact_text = redact_text
+        self.redact_users = redact_users
+        self.flush_interval = flush_interval
+        #: The number of envelopes recorded
+        self.recorded = 0
+        self._salt = os.urandom(16)
+        self._lock = threading.Lock()
+        self._file: IO[str] = gzip.open(path, "wt", encoding="utf-8")  # noqa: SIM115
+        self._start = monotonic()
+        self._flushed = self._start
+        self._write(
+            {
+                "version": CAPTURE_VERSION,
+                "redact_text": redact_text,
+                "redact_users": redact_users,
+            },
+        )
+
+    def __call__(self, _client: object, req: SocketModeRequest) -> None:
+        """Record an envelope. The signature of a Socket Mode listener."""
+        self.record(req)
+
+    async def listen_async(self, _client: object, req: SocketModeRequest) -> None:
+        """Record an envelope. The signature of an asyncio Socket Mode listener."""
+        self.record(req)
+
+    def record(self, req: SocketModeRequest) -> None:
+        """Record an envelope."""
+        payload = self.redact(req.payload) if req.payload else req.payload
+        now = monotonic()
+        with self._lock:
+            if self._file.closed:
+                return
+            self._write(
+                [round(now - self._start, 6), req.type, req.envelope_id, payload],
+            )
+            self.recorded += 1
+            if now - self._flushed >= self.flush_interval:
+                self._file.flush()
+                self._flushed = now
+
+    def redact(self, payload: dict) -> dict:
+        """Get a copy of a payload with its text and user IDs redacted."""
+        if not self.redact_text and not self.redact_users:
+            return payload
+        payload = json.loads(json.dumps(payload))
+        event = payload.get("event")
+        if not isinstance(event, dict):
+            return payload
+        if self.redact_users:
+            user = event.get("user")
+            if isinstance(user, str):
+                event["user"] = self._pseudonym(user)
+            elif isinstance(user, dict) and "id" in user:
+                pseudonym = self._pseudonym(user["id"])
+                event["user"] = {"id": pseudonym, "name": pseudonym}
+        text = event.get("text")
+        if isinstance(text, str):
+            if self.redact_users:
+                text = _MENTION.sub(lambda m: f"<@{self._pseudonym(m[1])}>", text)
+            if self.redact_text:
+                text = _redact_text(text)
+            event["text"] = text
+        return payload
+
+    def close(self) -> None:
+        """Finish writing the capture."""
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+        LOGGER.info(f"Recorded {self.recorded} envelopes to {self.path}")
+
+    def _pseudonym(self, user_id: str) -> str:
+        digest = hashlib.blake2b(user_id.encode(), key=self._salt, digest_size=5)
+        return f"{user_id[0]}{digest.hexdigest().upper()}"
+
+    def _write(self, line: object) -> None:
+        self._file.write(json.dumps(line, separators=(",", ":")))
+        self._file.write("\n")
+
+
+def _redact_text(text: str) -> str:
+    first, _, rest = text.partition(" ")
+    if not rest:
+        return first
+    parts = []
+    end = 0
+    # Keep mentions and links, which were already redacted if needed
+    for match in _LINK.finditer(rest):
+        parts.append(_redact_words(rest[end : match.start()]))
+        parts.append(match[0])
+        end = match.end()
+    parts.append(_redact_words(rest[end:]))
+    return f"{first} {''.join(parts)}"
+
+
+def _redact_words(text: str) -> str:
+    return _DIGIT.sub("9", _LETTER.sub("x", text))
+
+
+def read_capture(path: str) -> Iterator[tuple[float, SocketModeRequest]]:
+    """
+    Read the envelopes from a capture written by :class:`Recorder`.
+
+    :returns: The number of seconds after recording started that each
+              envelope was received, and the envelope
+    :raises ValueError: If the file is not a capture phial can read
+    """
+    with gzip.open(path, "rt", encoding="utf-8") as file:
+        header = json.loads(file.readline() or "{}")
+        if header.get("version") != CAPTURE_VERSION:
+            raise ValueError(f"{path} is not a version {CAPTURE_VERSION} capture")
+        for line in file:
+            offset, type_, envelope_id, payload = json.loads(line)
+            yield (
+                offset,
+                SocketModeRequest(
+                    type=type_,
+                    envelope_id=envelope_id,
+                    payload=payload,
+                ),
+            )
+
+
+class RecordingWebClient:
+    """
+    Stands in for a Slack Web API client, recording calls instead of making them.
+
+    Every method returns :code:`{"ok": True}`.
+
+    :param asynchronous: Whether methods should be coroutines, as with
+                         :class:`slack_sdk.web.async_client.AsyncWebClient`
+    """
+
+    def __init__(self, *, asynchronous: bool = False) -> None:
+        self.asynchronous = asynchronous
+        #: The methods called and their arguments, in the order called
+        self.calls: list[tuple[str, dict[str, Any]]] = []
+        self._lock = threading.Lock()
+
+    def __getattr__(self, method: str) -> Callable[..., Any]:
+        if method.startswith("_"):
+            raise AttributeError(method)
+
+        def call(**kwargs: Any) -> dict[str, Any]:  # noqa: ANN401
+            with self._lock:
+                self.calls.append((method, kwargs))
+            return {"ok": True}
+
+        async def call_async(**kwargs: Any) -> dict[str, Any]:  # noqa: ANN401
+            return call(**kwargs)
+
+        return call_async if self.asynchronous else call
+
+
+class _ReplayClient:
+    """Accepts acknowledgements in place of a Socket Mode client."""
+
+    def __init__(self, web_client: RecordingWebClient) -> None:
+        self.web_client = web_client
+
+    def send_socket_mode_response(self, response: object) -> None:
+        pass
+
+
+class _AsyncReplayClient(_ReplayClient):
+    async def send_socket_mode_response(self, response: object) -> None:  # type: ignore[override]
+        pass
+
+
+class ReplayReport:
+    """
+    The throughput and latency of a replayed capture.
+
+    Latency is measured from when an envelope was due to be delivered,
+    so includes any time spent waiting for a free worker.
+
+    :param events: The number of envelopes replayed
+    :param seconds: How long the replay took
+    :param latencies: The latency of each envelope, in seconds
+    :param calls: The Web API calls the bot made, in the order made
+    """
+
+    def __init__(
+        self,
+        events: int,
+        seconds: float,
+        latencies: list[float],
+        calls: list[tuple[str, dict[str, Any]]],
+    ) -> None:
+        self.events = events
+        self.seconds = seconds
+        self.calls = calls
+        #: The 50th, 90th and 99th percentile latencies, keyed by name
+        self.latency = percentiles(latencies)
+        #: The slowest envelope's latency
+        self.max_latency = max(latencies, default=0.0)
+
+    def __repr__(self) -> str:
+        return f"<ReplayReport: {self.events} events in {self.seconds:.2f}s>"
+
+    @property
+    def events_per_second(self) -> float:
+        """The number of envelopes handled per second."""
+        return self.events / self.seconds if self.seconds else 0.0
+
+    @property
+    def call_counts(self) -> Counter[str]:
+        """The number of calls made to each Web API method."""
+        return Counter(method for method, _ in self.calls)
+
+    def __str__(self) -> str:
+        lines = [
+            f"Replayed {self.events} events in {self.seconds:.2f}s "
+            f"({self.events_per_second:,.1f} events/s)",
+            "Latency: "
+            + ", ".join(
+                f"{name} {value * 1000:.2f}ms"
+                for name, value in [*self.latency.items(), ("max", self.max_latency)]
+            ),
+            "Web API calls:",
+        ]
+        lines.extend(
+            f"  {method}: {count}" for method, count in self.call_counts.most_common()
+        )
+        return "\n".join(lines)
+
+
+def _due(start: float, offset: float, speed: float | None) -> float:
+    """Work out when an envelope should be delivered."""
+    # As fast as possible means each envelope is due as soon as it is read
+    return start + offset / speed if speed else perf_counter()
+
+
+@contextmanager
+def _recording_calls(
+    bot: "Phial",
+    owners: list[Any],
+    web_client: RecordingWebClient,
+) -> Iterator[None]:
+    """Swap each owner's :code:`web_client` for one recording its calls."""
+    originals = [owner.web_client for owner in owners]
+    for owner in owners:
+        owner.web_client = web_client
+    # Calls are made directly, rather than queued to be sent for real later
+    outbox, bot.outbox = bot.outbox, None
+    try:
+        yield
+    finally:
+        bot.outbox = outbox
+        for owner, original in zip(owners, originals, strict=True):
+            owner.web_client = original
+
+
+def replay(
+    bot: "Phial",
+    path: str,
+    *,
+    speed: float | None = 1,
+    workers: int | None = None,
+) -> ReplayReport:
+    """
+    Replay a capture against a bot.
+
+    The Web API clients of the bot and each of its workspaces are replaced
+    with a :class:`RecordingWebClient`, and its outbox is bypassed, for the
+    duration of the replay, so nothing is sent to Slack or queued to be
+    sent later.
+
+    :param bot: The bot to replay the capture against. It does not need to
+                be running
+    :param path: The capture written by :class:`Recorder`
+    :param speed: How many times faster than recorded to deliver envelopes,
+                  or :obj:`None` to deliver them as fast as possible.
+                  Defaults to 1
+    :param workers: The number of envelopes handled at once, as the Socket
+                    Mode client would. Defaults to the :code:`maxThreads`
+                    config value
+    """
+    envelopes = list(read_capture(path))
+    web_client = RecordingWebClient()
+    client = _ReplayClient(web_client)
+    latencies: list[float] = []
+    workers = workers or int(cast(int, bot.config["maxThreads"]))
+
+    def handle(due: float, req: SocketModeRequest) -> None:
+        bot._handle_request(cast(Any, client), req)  # noqa: SLF001
+        latencies.append(perf_counter() - due)
+
+    start = perf_counter()
+    owners = [bot.slack_client, *bot.workspaces]
+    with (
+        _recording_calls(bot, owners, web_client),
+        ThreadPoolExecutor(workers) as pool,
+    ):
+        for offset, req in envelopes:
+            due = _due(start, offset, speed)
+            wait = due - perf_counter()
+            if wait > 0:
+                sleep(wait)
+            pool.submit(handle, due, req)
+    return ReplayReport(
+        len(envelopes),
+        perf_counter() - start,
+        latencies,
+        web_client.calls,
+    )
+
+
+async def replay_async(
+    bot: "AsyncPhial",
+    path: str,
+    *,
+    speed: float | None = 1,
+) -> ReplayReport:
+    """
+    Replay a capture against an :class:`phial.AsyncPhial` bot.
+
+    The asyncio equivalent of :func:`replay`. Envelopes are handled as
+    soon as they are due, with no limit on how many are handled at once.
+    """
+    envelopes = list(read_capture(path))
+    web_client = RecordingWebClient(asynchronous=True)
+    client = _AsyncReplayClient(web_client)
+    latencies: list[float] = []
+
+    async def handle(due: float, req: SocketModeRequest) -> None:
+        await bot._handle_request_async(cast(Any, client), req)  # noqa: SLF001
+        latencies.append(perf_counter() - due)
+
+    start = perf_counter()
+    tasks = []
+    with _recording_calls(bot, [bot, *bot.workspaces], web_client):
+        for offset, req in envelopes:
+            due = _due(start, offset, speed)
+            wait = due - perf_counter()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            tasks.append(asyncio.create_task(handle(due, req)))
+        await asyncio.gather(*tasks)
+    return ReplayReport(
+        len(envelopes),
+        perf_counter() - start,
+        latencies,
+        web_client.calls,
+    )
+
+
+def _load_bot(target: str) -> Any:  # noqa: ANN401
+    module, _, name = target.partition(":")
+    return getattr(importlib.import_module(module), name or "bot")
+
+
+def main(argv: list[str] | None = None) -> None:
+    """
+    Replay a capture from the command line.
+
+    ::
+
+        python -m phial.replay capture.jsonl.gz mybot:bot --speed 10
+    """
+    parser = argparse.ArgumentParser(description="Replay a phial capture")
+    parser.add_argument("capture", help="the capture file to replay")
+    parser.add_argument("bot", help="the bot to replay against, as module:name")
+    parser.add_argument(
+        "--speed",
+        type=float,
+        default=1,
+        help="how many times faster than recorded to replay, 0 for as fast as possible",
+    )
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    from phial.async_bot import AsyncPhial
+
+    bot = _load_bot(args.bot)
+    speed = args.speed or None
+    if isinstance(bot, AsyncPhial):
+        report = asyncio.run(replay_async(bot, args.capture, speed=speed))
+    else:
+        report = replay(bot, args.capture, speed=speed, workers=args.workers)
+    print(report)  # noqa: T201
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
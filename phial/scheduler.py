@@ -1,10 +1,19 @@
 """The classes related to scheduling of regular jobs in phial."""
 
+import asyncio
+import inspect
 import logging
 from collections.abc import Callable
 from datetime import UTC, datetime, timedelta
+from time import perf_counter
 from typing import NamedTuple
 
+from phial.errors import ExecutionTimeoutError
+from phial.metrics import MetricsRegistry
+from phial.profiling import Profiler
+from phial.utils import TimeoutRunner, call_async, run_with_timeout
+from phial.watchdog import Watchdog
+
 LOGGER = logging.getLogger("phial.bot.scheduler")
 
 
@@ -219,14 +228,33 @@ class Schedule:
 
 
 class ScheduledJob:
-    """A function with a schedule."""
+    """
+    A function with a schedule.
+
+    :param schedule: The schedule used to run the function
+    :param func: The function to be run
+    :param timeout: The number of seconds the function may run for before
+                    it is abandoned. Defaults to None, meaning no limit
+    """
 
-    def __init__(self, schedule: Schedule, func: Callable) -> None:
+    def __init__(
+        self,
+        schedule: Schedule,
+        func: Callable,
+        *,
+        timeout: float | None = None,
+    ) -> None:
         self.func = func
         self.schedule = schedule
         self.func = func
+        self.timeout = timeout
         self.next_run = self.schedule.get_next_run_time(datetime.now(tz=UTC))
 
+    @property
+    def name(self) -> str:
+        """The name of the job's function."""
+        return getattr(self.func, "__name__", repr(self.func))
+
     def should_run(self) -> bool:
         """
         Check whether the function needs to be run based on the schedule.
@@ -235,20 +263,123 @@ class ScheduledJob:
         """
         return self.next_run <= datetime.now(tz=UTC)
 
-    def run(self) -> None:
-        """Run the function and calculates + stores the next run time."""
+    def run(
+        self,
+        *,
+        profiler: Profiler | None = None,
+        watchdog: Watchdog | None = None,
+        timeouts: TimeoutRunner | None = None,
+    ) -> None:
+        """
+        Run the function and calculates + stores the next run time.
+
+        :param profiler: The profiler to profile the function with, if the
+                         job is being profiled. Defaults to None
+        :param watchdog: The watchdog used to detect the job running
+                         slowly. Defaults to None
+        :param timeouts: The runner used to run the function if the job has
+                         a timeout. Defaults to one shared by all callers
+        """
+        func = self.func
+        if profiler is not None:
+            func = profiler.wrap(self.name, func)
+        if watchdog is not None:
+            func = watchdog.wrap(f"Scheduled job {self.name}", func)
+        try:
+            if self.timeout is None:
+                func()
+            elif timeouts is not None:
+                timeouts.run(func, self.timeout)
+            else:
+                run_with_timeout(func, self.timeout)
+        except ExecutionTimeoutError as e:
+            self._log_timeout(e)
+        except Exception as e:
+            LOGGER.error(e)
+        self.next_run = self.schedule.get_next_run_time(datetime.now(tz=UTC))
+
+    async def run_async(
+        self,
+        *,
+        profiler: Profiler | None = None,
+        watchdog: Watchdog | None = None,
+    ) -> None:
+        """
+        Run the function and calculates + stores the next run time.
+
+        Coroutine functions are awaited, regular functions are run in a
+        worker thread so they do not block the event loop. Coroutine
+        functions that time out are cancelled.
+
+        :param profiler: The profiler to profile the function with, if the
+                         job is being profiled. Only regular functions are
+                         profiled. Defaults to None
+        :param watchdog: The watchdog used to detect the job running
+                         slowly. Only regular functions are watched.
+                         Defaults to None
+        """
+        func = self.func
+        if not inspect.iscoroutinefunction(func):
+            if profiler is not None:
+                func = profiler.wrap(self.name, func)
+            if watchdog is not None:
+                func = watchdog.wrap(f"Scheduled job {self.name}", func)
         try:
-            self.func()
+            await call_async(func, timeout=self.timeout)
+        except ExecutionTimeoutError as e:
+            self._log_timeout(e)
         except Exception as e:
             LOGGER.error(e)
         self.next_run = self.schedule.get_next_run_time(datetime.now(tz=UTC))
 
+    def _log_timeout(self, error: ExecutionTimeoutError) -> None:
+        LOGGER.error("Scheduled job %s %s\n%s", self.name, error, error.stack)
+
 
 class Scheduler:
-    """A store for Scheduled Jobs."""
+    """
+    A store for Scheduled Jobs.
+
+    :param metrics: The registry to record job metrics in. Defaults to a new
+                    registry
+    :param profiler: The profiler used to profile jobs run by
+                     :meth:`run_pending`. Defaults to None
+    :param watchdog: The watchdog used to detect slow jobs. Defaults to None
+    :param timeouts: The runner used to run jobs with a timeout by
+                     :meth:`run_pending`. Defaults to one shared by all
+                     callers
+    """
 
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        *,
+        metrics: MetricsRegistry | None = None,
+        profiler: Profiler | None = None,
+        watchdog: Watchdog | None = None,
+        timeouts: TimeoutRunner | None = None,
+    ) -> None:
         self.jobs: list[ScheduledJob] = []
+        self.profiler = profiler
+        self.watchdog = watchdog
+        self.timeouts = timeouts
+        #: The jobs which are currently being run
+        self.running_jobs: list[ScheduledJob] = []
+        self.metrics = metrics if metrics is not None else MetricsRegistry()
+        self._lateness_seconds = self.metrics.histogram(
+            "phial_scheduler_lateness_seconds",
+            "How long after their scheduled time jobs started",
+            ("job",),
+        )
+        self._job_seconds = self.metrics.histogram(
+            "phial_scheduled_job_seconds",
+            "Time spent running each scheduled job",
+            ("job",),
+        )
+
+    def _record_start(self, job: ScheduledJob) -> float:
+        lateness = (datetime.now(tz=UTC) - job.next_run).total_seconds()
+        self._lateness_seconds.observe(max(lateness, 0), job.name)
+        return perf_counter()
 
     def add_job(self, job: ScheduledJob) -> None:
         """
@@ -267,4 +398,32 @@ class Scheduler:
         """
         jobs_to_run = [job for job in self.jobs if job.should_run()]
         for job in jobs_to_run:
-            job.run()
+            self.running_jobs.append(job)
+            start = self._record_start(job)
+            try:
+                job.run(
+                    profiler=self.profiler,
+                    watchdog=self.watchdog,
+                    timeouts=self.timeouts,
+                )
+            finally:
+                self.running_jobs.remove(job)
+                self._job_seconds.observe(perf_counter() - start, job.name)
+
+    async def run_pending_async(self) -> None:
+        """
+        Run any pending scheduled jobs concurrently.
+
+        The asyncio equivalent of :meth:`run_pending`.
+        """
+        jobs_to_run = [job for job in self.jobs if job.should_run()]
+        await asyncio.gather(*(self._run_job_async(job) for job in jobs_to_run))
+
+    async def _run_job_async(self, job: ScheduledJob) -> None:
+        self.running_jobs.append(job)
+        start = self._record_start(job)
+        try:
+            await job.run_async(profiler=self.profiler, watchdog=self.watchdog)
+        finally:
+            self.running_jobs.remove(job)
+            self._job_seconds.observe(perf_counter() - start, job.name)
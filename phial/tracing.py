@@ -0,0 +1,123 @@
+"""Hooks for tracing how long each stage of handling a request takes."""
+
+import logging
+from collections.abc import Sequence
+from contextvars import ContextVar
+from time import perf_counter
+from types import TracebackType
+from typing import Any, Self
+
+LOGGER = logging.getLogger("phial.bot.tracing")
+
+_request_id: ContextVar[str | None] = ContextVar("phial_request_id", default=None)
+
+
+def current_request_id() -> str | None:
+    """
+    Get the ID of the request currently being handled.
+
+    The ID is the Socket Mode envelope ID. It is carried through the
+    context, so it is also available in commands, middleware and when
+    messages are sent to Slack.
+
+    :returns: The request ID, or :obj:`None` outside of a request
+    """
+    return _request_id.get()
+
+
+class Tracer:
+    """
+    Receives the spans recorded while phial handles a request.
+
+    Subclass this and override :meth:`on_start` and/or :meth:`on_end`, then
+    register the tracer with :meth:`phial.Phial.add_tracer`. This is
+    intended as an adapter point for forwarding spans to a tracing system.
+
+    .. rubric:: Example
+
+    ::
+
+        class LogTracer(Tracer):
+            def on_end(self, span):
+                print(span.request_id, span.name, span.duration)
+
+        bot.add_tracer(LogTracer())
+    """
+
+    def on_start(self, span: "Span") -> None:
+        """Call when a span starts."""
+
+    def on_end(self, span: "Span") -> None:
+        """Call when a span ends."""
+
+
+class Span:
+    """
+    A timed stage of handling a request.
+
+    :param name: The name of the stage. One of :code:`request`, :code:`ack`,
+                 :code:`middleware`, :code:`routing`, :code:`arguments`,
+                 :code:`command`, :code:`fallback` or :code:`slack_api`
+    :param attributes: Extra information about the stage, for example the
+                       Slack Web API method called
+    :param tracers: The tracers to notify
+    """
+
+    __slots__ = (
+        "_tracers",
+        "attributes",
+        "end",
+        "error",
+        "name",
+        "request_id",
+        "start",
+    )
+
+    def __init__(
+        self,
+        name: str,
+        attributes: dict[str, Any],
+        tracers: Sequence[Tracer],
+    ) -> None:
+        self.name = name
+        self.attributes = attributes
+        #: The ID of the request the span belongs to
+        self.request_id = _request_id.get()
+        #: When the span started, from :func:`time.perf_counter`
+        self.start = 0.0
+        #: When the span ended, from :func:`time.perf_counter`
+        self.end = 0.0
+        #: The exception which ended the span, if any
+        self.error: BaseException | None = None
+        self._tracers = tracers
+
+    def __repr__(self) -> str:
+        return f"<Span: {self.name} in {self.request_id}>"
+
+    @property
+    def duration(self) -> float:
+        """The length of the span in seconds."""
+        return self.end - self.start
+
+    def __enter__(self) -> Self:
+        self.start = perf_counter()
+        for tracer in self._tracers:
+            try:
+                tracer.on_start(self)
+            except Exception:
+                LOGGER.exception(f"Tracer {tracer!r} failed to start {self!r}")
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        self.end = perf_counter()
+        self.error = exc
+        for tracer in self._tracers:
+            try:
+                tracer.on_end(self)
+            except Exception:
+                LOGGER.exception(f"Tracer {tracer!r} failed to end {self!r}")
@@ -1,16 +1,41 @@
 """Helper utilities for phial."""
 
+import asyncio
+import contextvars
+import gc
+import inspect
+import logging
 import re
-from collections.abc import Callable
+import statistics
+import sys
+import threading
+import traceback
+from collections.abc import Callable, Sequence
 from inspect import Parameter, Signature, signature
-from typing import Any, Optional
+from time import monotonic
+from types import FrameType
+from typing import Any, Optional, TypeVar
 
-from phial.errors import ArgumentTypeValidationError, ArgumentValidationError
+from phial.errors import (
+    ArgumentTypeValidationError,
+    ArgumentValidationError,
+    ExecutionTimeoutError,
+)
+from phial.metrics import Gauge
 from phial.wrappers import Message
 
 
-def validate_kwargs(func: Callable, kwargs: dict[str, str]) -> dict[str, Any]:
-    """Validate kwargs match a functions signature."""
+def validate_kwargs(
+    func: Callable,
+    kwargs: dict[str, str],
+    converters: dict[Any, Callable[[str], Any]] | None = None,
+) -> dict[str, Any]:
+    """
+    Validate kwargs match a functions signature.
+
+    Arguments are converted by calling their parameter's annotation, or the
+    converter registered for the annotation in :code:`converters`.
+    """
     func_params = signature(func).parameters
     validated_kwargs: dict[str, Any] = {}
     # If a function is wrapped additional parameters could be injected
@@ -29,8 +54,11 @@ def validate_kwargs(func: Callable, kwargs: dict[str, str]) -> dict[str, Any]:
             value = kwargs[key.name]
 
         if key.annotation is not Signature.empty and value:
+            convert = key.annotation
+            if converters:
+                convert = converters.get(key.annotation, convert)
             try:
-                value = key.annotation(value)
+                value = convert(value)
             except ValueError as e:
                 raise ArgumentTypeValidationError(
                     f"{value} could not be converted to {key.annotation.__name__}",
@@ -78,3 +106,264 @@ def parse_slack_event(slack_event: dict) -> Optional["Message"]:
             bot_id=bot_id,
         )
     return None
+
+
+T = TypeVar("T")
+
+
+def current_frames() -> dict[int, FrameType]:
+    """
+    Get the current frame of every thread.
+
+    Garbage collection is paused while the frames are collected, as a
+    collection during :func:`sys._current_frames` can deadlock on Python
+    3.11 (gh-106883).
+    """
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        return sys._current_frames()  # noqa: SLF001
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+
+def format_thread_stack(thread_id: int | None) -> str:
+    """Get a formatted snapshot of a running thread's stack."""
+    frame = current_frames().get(thread_id) if thread_id else None
+    if frame is None:
+        return "<stack unavailable>"
+    return "".join(traceback.format_stack(frame))
+
+
+def _format_coroutine_stack(coro: Any) -> str:  # noqa: ANN401
+    """Get a formatted snapshot of a suspended coroutine's await chain."""
+    frames = traceback.StackSummary()
+    while coro is not None:
+        frame = getattr(coro, "cr_frame", None) or getattr(coro, "gi_frame", None)
+        if frame is None:
+            break
+        frames.append(
+            traceback.FrameSummary(
+                frame.f_code.co_filename,
+                frame.f_lineno,
+                frame.f_code.co_name,
+            ),
+        )
+        coro = getattr(coro, "cr_await", None) or getattr(coro, "gi_yieldfrom", None)
+    return "".join(frames.format()) or "<stack unavailable>"
+
+
+class TimeoutRunner:
+    """
+    Runs functions, waiting a limited time for each to finish.
+
+    Each function is run in a daemon thread with a copy of the current
+    context. Python threads can not be killed, so a function which times out
+    is left to finish in the background while the caller carries on. Once
+    :code:`max_abandoned` timed out functions are still running, new
+    functions are refused until one finishes, so a function which hangs
+    forever can't leave an unbounded number of threads behind.
+
+    :param max_abandoned: The number of timed out functions which may be
+                          left running at once. Defaults to 16
+    :param gauge: A gauge kept at the number of timed out functions still
+                  running. Defaults to None
+    """
+
+    def __init__(self, max_abandoned: int = 16, gauge: Gauge | None = None) -> None:
+        self.max_abandoned = max_abandoned
+        self._gauge = gauge
+        self._abandoned = 0
+        self._lock = threading.Lock()
+
+    @property
+    def abandoned(self) -> int:
+        """The number of timed out functions still running."""
+        return self._abandoned
+
+    def _set_abandoned(self, abandoned: int) -> None:
+        self._abandoned = abandoned
+        if self._gauge is not None:
+            self._gauge.set(abandoned)
+
+    def run(self, func: Callable[[], T], timeout: float) -> T:
+        """
+        Run a function, waiting at most :code:`timeout` seconds for it to finish.
+
+        :raises ExecutionTimeoutError: If the function does not finish in
+                                       time, or is refused as
+                                       :code:`max_abandoned` timed out
+                                       functions are still running
+        """
+        if self._abandoned >= self.max_abandoned:
+            raise ExecutionTimeoutError(
+                f"Refused as {self._abandoned} timed out functions are still running",
+                stack="<not started>",
+            )
+        context = contextvars.copy_context()
+        outcome: dict[str, Any] = {}
+
+        def target() -> None:
+            try:
+                outcome["result"] = context.run(func)
+            except BaseException as e:
+                outcome["error"] = e
+            finally:
+                with self._lock:
+                    outcome["finished"] = True
+                    if outcome.get("abandoned"):
+                        self._set_abandoned(self._abandoned - 1)
+
+        thread = threading.Thread(target=target, daemon=True)
+        thread.start()
+        thread.join(timeout)
+        with self._lock:
+            if "finished" not in outcome:
+                outcome["abandoned"] = True
+                self._set_abandoned(self._abandoned + 1)
+        if outcome.get("abandoned"):
+            raise ExecutionTimeoutError(
+                f"Timed out after {timeout} seconds",
+                stack=format_thread_stack(thread.ident),
+            )
+        if "error" in outcome:
+            raise outcome["error"]
+        return outcome["result"]  # type: ignore[no-any-return]
+
+
+_default_runner = TimeoutRunner()
+
+
+def run_with_timeout(func: Callable[[], T], timeout: float) -> T:
+    """
+    Run a function, waiting at most :code:`timeout` seconds for it to finish.
+
+    Shares one :class:`TimeoutRunner`, with its default limit on timed out
+    functions left running, with every other caller.
+
+    :raises ExecutionTimeoutError: If the function does not finish in time,
+                                   or is refused as too many timed out
+                                   functions are still running
+    """
+    return _default_runner.run(func, timeout)
+
+
+async def call_async(func: Callable[[], Any], *, timeout: float | None = None) -> Any:  # noqa: ANN401
+    """
+    Call a function from an event loop.
+
+    Coroutine functions are awaited directly. Regular functions are offloaded
+    to a worker thread so a slow function can not block the event loop. The
+    current context, and so :data:`phial.command`, is carried into the thread.
+
+    If a timeout is given and a coroutine function does not finish in time it
+    is cancelled. Functions running in a thread are left to finish in the
+    background.
+
+    :raises ExecutionTimeoutError: If the function does not finish in time
+    """
+    thread_ids: list[int] = []
+    if inspect.iscoroutinefunction(func):
+        coro = func()
+    else:
+
+        def in_thread() -> Any:  # noqa: ANN401
+            thread_ids.append(threading.get_ident())
+            return func()
+
+        coro = asyncio.to_thread(in_thread)
+
+    if timeout is None:
+        result = await coro
+    else:
+        task = asyncio.ensure_future(coro)
+        try:
+            done, _ = await asyncio.wait({task}, timeout=timeout)
+        except asyncio.CancelledError:
+            task.cancel()
+            raise
+        if not done:
+            if thread_ids:
+                stack = format_thread_stack(thread_ids[0])
+            else:
+                stack = _format_coroutine_stack(task.get_coro())
+            task.cancel()
+            raise ExecutionTimeoutError(
+                f"Timed out after {timeout} seconds",
+                stack=stack,
+            )
+        result = task.result()
+
+    if inspect.isawaitable(result):
+        # Functions wrapped by a regular decorator may still return a coroutine
+        result = await result
+    return result
+
+
+class RateLimitedLogger:
+    """
+    Logs a high volume message at most a number of times per period.
+
+    Once the limit is reached further records are dropped until the period
+    ends, and the number dropped is added to the next record which is
+    logged. Nothing is formatted unless a record is actually logged.
+
+    :param logger: The logger to log to
+    :param level: The level to log at
+    :param limit: The maximum number of records to log per period
+    :param period: The length of a period in seconds
+    """
+
+    def __init__(
+        self,
+        logger: logging.Logger,
+        level: int,
+        limit: int,
+        period: float,
+    ) -> None:
+        self.logger = logger
+        self.level = level
+        self.limit = limit
+        self.period = period
+        #: The number of records dropped since the last one was logged
+        self.suppressed = 0
+        self._count = 0
+        self._period_end = 0.0
+        self._lock = threading.Lock()
+
+    def log(self, msg: str, *args: object, **kwargs: Any) -> None:  # noqa: ANN401
+        """Log a record, unless the limit for this period has been reached."""
+        if not self.logger.isEnabledFor(self.level):
+            return
+        now = monotonic()
+        with self._lock:
+            if now >= self._period_end:
+                self._period_end = now + self.period
+                self._count = 0
+            self._count += 1
+            if self._count > self.limit:
+                self.suppressed += 1
+                return
+            suppressed, self.suppressed = self.suppressed, 0
+        if suppressed:
+            msg += " (%d similar messages suppressed)"
+            args = (*args, suppressed)
+        self.logger.log(self.level, msg, *args, **kwargs)
+
+
+#: The percentiles reported by :func:`percentiles`
+PERCENTILES = (50, 90, 99)
+
+
+def percentiles(samples: Sequence[float]) -> dict[str, float]:
+    """
+    Get the :data:`PERCENTILES` of some samples.
+
+    :returns: The value of each percentile keyed by name, e.g. :code:`'p50'`,
+              or an empty dict if there are fewer than two samples
+    """
+    if len(samples) < 2:
+        return {}
+    cuts = statistics.quantiles(samples, n=100, method="inclusive")
+    return {f"p{p}": cuts[p - 1] for p in PERCENTILES}
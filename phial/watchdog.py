@@ -0,0 +1,217 @@
+"""Detects slow commands and scheduled jobs by sampling their stacks."""
+
+import logging
+import threading
+import traceback
+from collections import Counter
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from time import perf_counter
+from typing import TYPE_CHECKING, TypeVar
+
+from phial.utils import current_frames
+
+if TYPE_CHECKING:  # pragma: no cover
+    from types import FrameType
+
+    from phial.wrappers import Message
+
+LOGGER = logging.getLogger("phial.bot.watchdog")
+
+T = TypeVar("T")
+
+
+class _Watch:
+    __slots__ = (
+        "frames",
+        "message",
+        "name",
+        "reported",
+        "samples",
+        "stack",
+        "start",
+        "thread_id",
+    )
+
+    def __init__(self, name: str, message: "Message | None") -> None:
+        self.name = name
+        self.message = message
+        self.thread_id = threading.get_ident()
+        self.start = perf_counter()
+        self.samples = 0
+        self.frames: Counter[str] = Counter()
+        self.stack = ""
+        # When it was last reported as still running
+        self.reported: float | None = None
+
+
+def _describe_frame(frame: "FrameType") -> str:
+    code = frame.f_code
+    return f"{code.co_filename}:{frame.f_lineno} in {code.co_name}"
+
+
+class Watchdog:
+    """
+    Logs commands and scheduled jobs which run for longer than a threshold.
+
+    A background thread samples the stack of anything which has run over
+    the threshold. As soon as it goes over, and every
+    :code:`report_interval` seconds while it's still running, a warning is
+    logged with how long it has been running, the hottest frames so far, its
+    current stack and the message which triggered it, so code which never
+    finishes is still reported. Once it finishes, a warning is logged with
+    how long it took, the hottest frames seen while sampling and the stack
+    when it first went over. Nothing is sampled while everything is within
+    the threshold.
+
+    :param threshold: The number of seconds something may run for before it
+                      is considered slow
+    :param interval: The number of seconds between samples. Defaults to 0.05
+    :param top: The number of hottest frames to log. Defaults to 5
+    :param report_interval: The number of seconds between warnings about
+                            something which is still running. Defaults to 60
+    """
+
+    def __init__(
+        self,
+        threshold: float,
+        *,
+        interval: float = 0.05,
+        top: int = 5,
+        report_interval: float = 60,
+    ) -> None:
+        self.threshold = threshold
+        self.interval = interval
+        self.top = top
+        self.report_interval = report_interval
+        self._watches: dict[int, _Watch] = {}
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    @contextmanager
+    def watch(self, name: str, *, message: "Message | None" = None) -> Iterator[None]:
+        """
+        Watch a block of code running on the current thread.
+
+        ::
+
+            with watchdog.watch("report", message=message):
+                report()
+
+        :param name: The name to log if the block is slow
+        :param message: The message which triggered the block, if any
+        """
+        watch = _Watch(name, message)
+        key = id(watch)
+        with self._lock:
+            self._watches[key] = watch
+            self._ensure_running()
+        try:
+            yield
+        finally:
+            with self._lock:
+                del self._watches[key]
+            duration = perf_counter() - watch.start
+            if duration >= self.threshold:
+                self._report(watch, duration)
+
+    def wrap(
+        self,
+        name: str,
+        func: Callable[[], T],
+        *,
+        message: "Message | None" = None,
+    ) -> Callable[[], T]:
+        """
+        Watch a function on whichever thread ends up calling it.
+
+        See :meth:`watch` for the parameters.
+        """
+
+        def watched() -> T:
+            with self.watch(name, message=message):
+                return func()
+
+        return watched
+
+    def sample(self) -> None:
+        """
+        Sample the stack of everything currently over the threshold.
+
+        Anything which has just gone over the threshold, or was last
+        reported over :code:`report_interval` seconds ago, is reported as
+        still running.
+        """
+        now = perf_counter()
+        with self._lock:
+            overdue = [
+                watch
+                for watch in self._watches.values()
+                if now - watch.start >= self.threshold
+            ]
+        if not overdue:
+            return
+        frames = current_frames()
+        for watch in overdue:
+            frame = frames.get(watch.thread_id)
+            if frame is None:
+                continue
+            stack = "".join(traceback.format_stack(frame))
+            if not watch.samples:
+                watch.stack = stack
+            watch.samples += 1
+            watch.frames[_describe_frame(frame)] += 1
+            if watch.reported is None or now - watch.reported >= self.report_interval:
+                watch.reported = now
+                self._report(watch, now - watch.start, current_stack=stack)
+
+    def stop(self) -> None:
+        """Stop the sampling thread. It is restarted by the next watch."""
+        self._stopped.set()
+        thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+        self._thread = None
+
+    def _ensure_running(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(
+            target=self._run,
+            name="phial-watchdog",
+            daemon=True,
+        )
+        self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            try:
+                self.sample()
+            except Exception:
+                LOGGER.exception("Watchdog failed to sample stacks")
+
+    def _report(
+        self,
+        watch: _Watch,
+        duration: float,
+        *,
+        current_stack: str | None = None,
+    ) -> None:
+        verb = "took" if current_stack is None else "has been running for"
+        lines = [
+            f"{watch.name} {verb} {duration:.3f}s, over the {self.threshold}s "
+            f"threshold, on {watch.message}",
+        ]
+        if watch.samples:
+            lines.append(f"Hottest frames over {watch.samples} samples:")
+            lines.extend(
+                f"  {count / watch.samples:4.0%} {location}"
+                for location, count in watch.frames.most_common(self.top)
+            )
+        if current_stack is not None:
+            lines.append(f"Current stack:\n{current_stack}")
+        elif watch.samples:
+            lines.append(f"Stack when first over the threshold:\n{watch.stack}")
+        LOGGER.warning("\n".join(lines))
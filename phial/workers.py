@@ -0,0 +1,301 @@
+"""Runs commands in worker processes fed by the process holding the connections."""
+
+import bisect
+import hashlib
+import importlib
+import logging
+import multiprocessing
+import signal
+import threading
+from collections import deque
+from collections.abc import Callable, Hashable, Iterable
+from concurrent.futures import Executor
+from time import monotonic
+from typing import TYPE_CHECKING, Any, NamedTuple, cast
+
+from phial.wrappers import Message
+
+if TYPE_CHECKING:  # pragma: no cover
+    from multiprocessing.connection import Connection
+    from multiprocessing.process import BaseProcess
+
+    from phial.bot import Phial
+
+LOGGER = logging.getLogger("phial.bot.workers")
+
+
+class Work(NamedTuple):
+    """A message handed to a worker process to be handled."""
+
+    message: Message
+    event_type: str | None
+    team: str | None = None
+    request_id: str | None = None
+
+
+class DirectoryEvent(NamedTuple):
+    """A user or channel event, sent to every worker to keep its directory fresh."""
+
+    event: dict[str, Any]
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest())
+
+
+class HashRing:
+    """
+    Maps keys onto nodes with consistent hashing.
+
+    Each node is placed on the ring :code:`replicas` times, so keys are
+    spread evenly and adding or removing a node only moves the keys that
+    belong to it.
+
+    :param nodes: The nodes to place on the ring
+    :param replicas: The number of points per node. Defaults to 100
+    """
+
+    def __init__(self, nodes: Iterable[Hashable], replicas: int = 100) -> None:
+        self.replicas = replicas
+        self._points: list[int] = []
+        self._nodes: list[Hashable] = []
+        for node in nodes:
+            self.add(node)
+
+    def __len__(self) -> int:
+        return len(self._points) // self.replicas
+
+    def add(self, node: Hashable) -> None:
+        """Place a node on the ring."""
+        for replica in range(self.replicas):
+            point = _hash(f"{node}:{replica}")
+            index = bisect.bisect(self._points, point)
+            self._points.insert(index, point)
+            self._nodes.insert(index, node)
+
+    def remove(self, node: Hashable) -> None:
+        """Take a node off the ring."""
+        kept = [
+            (point, other)
+            for point, other in zip(self._points, self._nodes, strict=True)
+            if other != node
+        ]
+        self._points = [point for point, _ in kept]
+        self._nodes = [other for _, other in kept]
+
+    def node(self, key: str) -> Hashable:
+        """Get the node a key belongs to."""
+        if not self._points:
+            raise LookupError("The hash ring has no nodes")
+        index = bisect.bisect(self._points, _hash(key)) % len(self._points)
+        return self._nodes[index]
+
+
+class ChannelLanes:
+    """
+    Runs work on an executor, one item at a time per channel.
+
+    Work for different channels runs concurrently, while work for the same
+    channel runs in the order it was submitted.
+
+    :param executor: Runs the work
+    """
+
+    def __init__(self, executor: Executor) -> None:
+        self.executor = executor
+        self._lanes: dict[str, deque[Callable[[], None]]] = {}
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+
+    def submit(self, channel: str, work: Callable[[], None]) -> None:
+        """Run work once any earlier work for its channel has finished."""
+        with self._lock:
+            lane = self._lanes.get(channel)
+            if lane is not None:
+                lane.append(work)
+                return
+            self._lanes[channel] = deque()
+        self.executor.submit(self._run, channel, work)
+
+    def wait(self, timeout: float | None = None) -> bool:
+        """Wait for all submitted work to finish, returning whether it did."""
+        with self._idle:
+            return self._idle.wait_for(lambda: not self._lanes, timeout)
+
+    def _run(self, channel: str, work: Callable[[], None]) -> None:
+        while True:
+            try:
+                work()
+            except Exception as e:
+                LOGGER.error(e)
+            with self._lock:
+                lane = self._lanes[channel]
+                if not lane:
+                    del self._lanes[channel]
+                    self._idle.notify_all()
+                    return
+                work = lane.popleft()
+
+
+def import_bot(path: str) -> "Phial":
+    """
+    Import a bot from a :code:`module:attribute` path.
+
+    :param path: Where to find the bot, e.g. :code:`mybot.app:bot`
+    :returns: The bot
+    """
+    module_name, _, attribute = path.partition(":")
+    if not module_name or not attribute:
+        raise ValueError(f"Expected a 'module:attribute' path, not {path!r}")
+    bot = importlib.import_module(module_name)
+    for name in attribute.split("."):
+        bot = getattr(bot, name)
+    return bot  # type: ignore[return-value]
+
+
+def _worker_main(
+    app: str,
+    number: int,
+    connection: "Connection",
+) -> None:  # pragma: no cover
+    # Runs in the worker process, which imports its own copy of the bot. The
+    # process holding the connections decides when workers stop, so ignore
+    # the Ctrl+C sent to the whole process group
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    bot = import_bot(app)
+    bot.logger.info(f"Worker {number} running")
+    bot._serve_worker(connection)  # noqa: SLF001
+
+
+def receive(connection: "Connection") -> Work | DirectoryEvent | None:
+    """
+    Receive the next item sent to a worker.
+
+    :returns: The item, or None once the worker should stop
+    """
+    try:
+        return cast(Work | DirectoryEvent | None, connection.recv())
+    except EOFError:
+        # The process holding the connections has gone away
+        return None
+
+
+class WorkerPool:
+    """
+    Worker processes which each import the bot and handle its messages.
+
+    The process holding the Socket Mode connections acknowledges envelopes
+    and submits each message to a worker chosen by hashing its channel, so
+    messages in a channel are handled in order while different channels
+    are spread over every process. Workers make their own Web API calls.
+
+    Each worker reads from its own pipe, so a worker that dies can be
+    restarted without losing the messages still waiting in its pipe.
+    Messages it had already read, including any it was handling, are not
+    tracked by this process and are lost. Submitting blocks while a
+    worker's pipe is full.
+
+    Each worker has its own copy of the bot, so its rate limiters and
+    command cache only see the messages it handles. As a channel's messages
+    always go to the same worker, limits counted by channel hold across the
+    pool, but limits counted by user or team allow up to :code:`processes`
+    times as many commands. Cached responses are only reused by the worker
+    which cached them.
+
+    Workers are started with the :code:`spawn` method, so the bot must be
+    importable from :code:`app` without it being run.
+
+    :param app: Where to import the bot from, e.g. :code:`mybot.app:bot`
+    :param processes: The number of worker processes
+    """
+
+    def __init__(self, app: str, processes: int) -> None:
+        if processes < 1:
+            raise ValueError("A worker pool needs at least one process")
+        self.app = app
+        self._context = multiprocessing.get_context("spawn")
+        self._pipes = [self._context.Pipe(duplex=False) for _ in range(processes)]
+        self._send_locks = [threading.Lock() for _ in range(processes)]
+        self.processes: list[BaseProcess | None] = [None] * processes
+        self.ring = HashRing(range(processes))
+        #: The number of workers restarted after dying
+        self.restarts = 0
+
+    def start(self) -> None:
+        """Start every worker process."""
+        for number in range(len(self.processes)):
+            self._start_worker(number)
+
+    def submit(self, work: Work) -> None:
+        """Hand a message to the worker for its channel."""
+        self._send(self.worker_for(work.message.channel), work)
+
+    def broadcast(self, item: DirectoryEvent) -> None:
+        """Send an item to every worker."""
+        for number in range(len(self.processes)):
+            self._send(number, item)
+
+    def worker_for(self, channel: str) -> int:
+        """Get the number of the worker which handles a channel's messages."""
+        return self.ring.node(channel)  # type: ignore[return-value]
+
+    def check(self) -> int:
+        """
+        Restart any workers which have died.
+
+        Messages still waiting in a dead worker's pipe are kept, and
+        handled once it restarts. Those it had already read are lost.
+
+        :returns: The number of workers restarted
+        """
+        restarted = 0
+        for number, process in enumerate(self.processes):
+            if process is not None and not process.is_alive():
+                LOGGER.error(
+                    f"Worker {number} exited with code {process.exitcode}, "
+                    "restarting. Messages it had already read are lost",
+                )
+                self._start_worker(number)
+                restarted += 1
+        self.restarts += restarted
+        return restarted
+
+    def stop(self, timeout: float) -> int:
+        """
+        Stop the workers once they've handled the messages already submitted.
+
+        :param timeout: The number of seconds to wait for the workers
+        :returns: The number of workers killed for not stopping in time
+        """
+        for number, process in enumerate(self.processes):
+            if process is not None and process.is_alive():
+                self._send(number, None)
+        killed = 0
+        deadline = monotonic() + timeout
+        for process in self.processes:
+            if process is None:
+                continue
+            process.join(max(0, deadline - monotonic()))
+            if process.is_alive():
+                process.kill()
+                process.join()
+                killed += 1
+        for reader, writer in self._pipes:
+            reader.close()
+            writer.close()
+        return killed
+
+    def _send(self, number: int, item: Work | DirectoryEvent | None) -> None:
+        # Messages are sent from the Socket Mode client's listener threads
+        with self._send_locks[number]:
+            self._pipes[number][1].send(item)
+
+    def _start_worker(self, number: int) -> None:
+        process = self._context.Process(
+            target=_worker_main,
+            args=(self.app, number, self._pipes[number][0]),
+            name=f"phial-worker-{number}",
+            daemon=True,
+        )
+        process.start()
+        self.processes[number] = process
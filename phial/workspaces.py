@@ -0,0 +1,64 @@
+"""Serving several Slack workspaces from one bot."""
+
+from contextvars import ContextVar
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:  # pragma: no cover
+    from slack_sdk.socket_mode.request import SocketModeRequest
+
+_team: ContextVar[str | None] = ContextVar("phial_team", default=None)
+
+
+def current_team() -> str | None:
+    """
+    Get the team ID of the workspace being served.
+
+    Set while an envelope is handled, and inside
+    :meth:`phial.Phial.workspace`. Web API calls are made with the bot
+    token of this workspace.
+
+    :returns: The team ID, or None outside of a workspace
+    """
+    return _team.get()
+
+
+def envelope_team(req: "SocketModeRequest") -> str | None:
+    """
+    Get the team ID of the workspace an envelope was sent to.
+
+    The envelope's :code:`team_id` is the workspace the app is installed
+    in, so it is preferred to the event's :code:`team`, which for shared
+    channels can be the sender's workspace.
+    """
+    payload = req.payload or {}
+    event = payload.get("event") or {}
+    return payload.get("team_id") or event.get("team")
+
+
+class Workspace:
+    """
+    A workspace served by a bot, alongside the one it was created for.
+
+    Created by :meth:`phial.Phial.add_workspace`.
+
+    :param app_token: The app-level token used to connect to Socket Mode
+    :param web_client: The Web API client for the workspace's bot token
+    :param team: The workspace's team ID. Defaults to None, meaning it is
+                 looked up with :code:`auth.test` when the bot starts
+    """
+
+    __slots__ = ("app_token", "team", "web_client")
+
+    def __init__(
+        self,
+        app_token: str,
+        web_client: Any,  # noqa: ANN401
+        *,
+        team: str | None = None,
+    ) -> None:
+        self.app_token = app_token
+        self.web_client = web_client
+        self.team = team
+
+    def __repr__(self) -> str:
+        return f"<Workspace {self.team}>"
@@ -1,9 +1,18 @@
 """Contains models for phial to use."""
 
+import copy
 import re
 from collections.abc import Callable
 from re import Pattern
-from typing import IO
+from typing import IO, Any
+
+from phial.cache import TTLCache
+from phial.payloads import JsonDumps, dumps
+from phial.ratelimit import RateLimiter
+
+
+def _public_fields(obj: object) -> dict[str, Any]:
+    return {k: v for k, v in obj.__dict__.items() if not k.startswith("_")}
 
 
 class Response:
@@ -24,6 +33,13 @@ class Response:
                         message-attachments#attachment_structure>`_
     :param ephemeral: Whether to send the message as an ephemeral message
     :param user: The user id to display the ephemeral message to
+    :param blocks: Any Slack `Block Kit <https://api.slack.com/block-kit>`_
+                   blocks
+
+    Attachments and blocks are serialized the first time the response is
+    sent, and reused when it is sent again or copied with :meth:`replace`.
+    To send different ones, assign a new list rather than changing the
+    existing one.
 
     .. rubric:: Examples
 
@@ -48,6 +64,16 @@ class Response:
             return Response(reaction="x",
                             channel='channel_id',
                             original_ts='original_ts')
+
+    The following would send the same prebuilt message to several channels,
+    serializing its blocks once ::
+
+        DEPLOYED = Response(channel="", blocks=[...])
+
+        @slackbot.scheduled(Schedule().every().day())
+        def announce():
+            for channel in ("channel-1", "channel-2"):
+                slackbot.send_message(DEPLOYED.replace(channel=channel))
     """
 
     def __init__(
@@ -60,6 +86,7 @@ class Response:
         user: str | None = None,
         attachments: list[dict[str, str | int | float | bool | list]] | None = None,
         ephemeral: bool = False,
+        blocks: list[dict[str, Any]] | None = None,
     ) -> None:
         self.channel = channel
         self.text = text
@@ -68,12 +95,68 @@ class Response:
         self.ephemeral = ephemeral
         self.user = user
         self.attachments = attachments
+        self.blocks = blocks
+        # Maps a payload's name to the value serialized, the function that
+        # serialized it and the JSON. Shared by copies, which start with the
+        # same values
+        self._payloads: dict[str, tuple[Any, JsonDumps, str]] = {}
 
     def __repr__(self) -> str:
         return f"<Response: {self.text}>"
 
     def __eq__(self, other: object) -> bool:
-        return self.__dict__ == other.__dict__
+        # The cached JSON doesn't change what is sent
+        return _public_fields(self) == _public_fields(other)
+
+    def __getstate__(self) -> dict[str, Any]:
+        # Serializing functions may not be picklable, and the JSON is cheap
+        # to rebuild in another process
+        return {**self.__dict__, "_payloads": {}}
+
+    def __copy__(self) -> "Response":
+        # Copies share the cached JSON, which is checked against their values
+        response = type(self).__new__(type(self))
+        response.__dict__.update(self.__dict__)
+        return response
+
+    def replace(self, **changes: Any) -> "Response":  # noqa: ANN401
+        """
+        Copy the response with some attributes changed.
+
+        The copy shares the response's serialized attachments and blocks,
+        so a template response can be sent to many channels while only
+        being serialized once.
+
+        :param changes: The attributes to change, e.g. :code:`channel`
+        :returns: The copy
+        """
+        response = copy.copy(self)
+        for name, value in changes.items():
+            if name.startswith("_") or not hasattr(response, name):
+                raise TypeError(f"Response has no attribute {name}")
+            setattr(response, name, value)
+        return response
+
+    def serialize(self, name: str, json_dumps: JsonDumps = dumps) -> str | None:
+        """
+        Get the JSON for the response's attachments or blocks.
+
+        The JSON is cached until the attribute is assigned a new value.
+
+        :param name: :code:`'attachments'` or :code:`'blocks'`
+        :param json_dumps: Serializes the value. Defaults to the standard
+                           library's :func:`json.dumps`
+        :returns: The JSON, or None if the response has none
+        """
+        value = getattr(self, name)
+        if value is None:
+            return None
+        cached = self._payloads.get(name)
+        if cached is not None and cached[0] is value and cached[1] is json_dumps:
+            return cached[2]
+        payload = json_dumps(value)
+        self._payloads[name] = (value, json_dumps, payload)
+        return payload
 
 
 class Attachment:
@@ -141,8 +224,118 @@ class Message:
         return self.__dict__ == other.__dict__
 
 
+class User:
+    """
+    A Slack user.
+
+    Annotate a command's parameter with :class:`User` to have a user ID or
+    mention resolved to the user. See :class:`phial.directory.Directory`.
+
+    :param id: The user's ID
+    :param name: The user's username
+    :param real_name: The user's full name
+    :param display_name: The name shown in Slack, if the user has set one
+    :param is_bot: Whether the user is a bot
+    :param profile: The user's Slack profile
+    """
+
+    def __init__(
+        self,
+        id: str,
+        name: str,
+        *,
+        real_name: str | None = None,
+        display_name: str | None = None,
+        is_bot: bool = False,
+        profile: dict | None = None,
+    ) -> None:
+        self.id = id
+        self.name = name
+        self.real_name = real_name
+        self.display_name = display_name
+        self.is_bot = is_bot
+        self.profile = profile if profile is not None else {}
+
+    @classmethod
+    def from_slack(cls, data: dict) -> "User":
+        """Create a user from a Slack Web API or Events API user object."""
+        profile = data.get("profile", {})
+        return cls(
+            data["id"],
+            data.get("name", ""),
+            real_name=data.get("real_name") or profile.get("real_name"),
+            display_name=profile.get("display_name") or None,
+            is_bot=data.get("is_bot", False),
+            profile=profile,
+        )
+
+    def __repr__(self) -> str:
+        return f"<User: {self.name} ({self.id})>"
+
+    def __eq__(self, other: object) -> bool:
+        return self.__dict__ == other.__dict__
+
+    def __hash__(self) -> int:
+        # Equal objects have the same ID, so they can be used in cache keys
+        return hash(self.id)
+
+
+class Channel:
+    """
+    A Slack channel.
+
+    Annotate a command's parameter with :class:`Channel` to have a channel
+    ID or link resolved to the channel. See
+    :class:`phial.directory.Directory`.
+
+    :param id: The channel's ID
+    :param name: The channel's name
+    :param is_private: Whether the channel is private
+    :param topic: The channel's topic
+    """
+
+    def __init__(
+        self,
+        id: str,
+        name: str,
+        *,
+        is_private: bool = False,
+        topic: str | None = None,
+    ) -> None:
+        self.id = id
+        self.name = name
+        self.is_private = is_private
+        self.topic = topic
+
+    @classmethod
+    def from_slack(cls, data: dict) -> "Channel":
+        """Create a channel from a Slack Web API or Events API channel object."""
+        return cls(
+            data["id"],
+            data.get("name", ""),
+            is_private=data.get("is_private", False),
+            topic=data.get("topic", {}).get("value") or None,
+        )
+
+    def __repr__(self) -> str:
+        return f"<Channel: #{self.name} ({self.id})>"
+
+    def __eq__(self, other: object) -> bool:
+        return self.__dict__ == other.__dict__
+
+    def __hash__(self) -> int:
+        # Equal objects have the same ID, so they can be used in cache keys
+        return hash(self.id)
+
+
 PhialResponse = None | str | Response | Attachment
 
+#: The places a command's function can be run
+COMMAND_EXECUTORS = (None, "process")
+
+#: What a command's cached results can be shared between
+COMMAND_CACHE_SCOPES = (None, "user", "channel")
+
 
 class Command:
     """
@@ -158,6 +351,24 @@ class Command:
                                standard help command
     :param hide_from_help_command: Prevents function from being displayed by
                                    the standard help command
+    :param executor: Where the command's function should be run. :obj:`None`
+                     runs it on the thread handling the message,
+                     :code:`'process'` runs it in a worker process
+    :param timeout: The number of seconds the command may run for before
+                    it is abandoned
+    :param cache_ttl: The number of seconds to cache the command's results
+                      for. :obj:`None` disables caching
+    :param cache_size: The maximum number of results to cache
+    :param cache_scope: What cached results are shared between.
+                        :obj:`None` shares them between everyone,
+                        :code:`'user'` or :code:`'channel'` only between
+                        messages from the same user or channel
+    :param rate_limit: The number of times the command can be run, and the
+                       period in seconds, e.g. :code:`(5, 60)`. :obj:`None`
+                       disables rate limiting
+    :param rate_limit_key: What the rate limit is counted by, one of
+                           :code:`'user'`, :code:`'channel'` or
+                           :code:`'team'`
     """
 
     def __init__(
@@ -168,7 +379,18 @@ class Command:
         help_text_override: str | None = None,
         case_sensitive: bool = False,
         hide_from_help_command: bool | None = False,
+        executor: str | None = None,
+        timeout: float | None = None,
+        cache_ttl: float | None = None,
+        cache_size: int = 128,
+        cache_scope: str | None = None,
+        rate_limit: tuple[int, float] | None = None,
+        rate_limit_key: str = "user",
     ):
+        if executor not in COMMAND_EXECUTORS:
+            raise ValueError(f"Unknown executor {executor}")
+        if cache_scope not in COMMAND_CACHE_SCOPES:
+            raise ValueError(f"Unknown cache scope {cache_scope}")
         self.pattern_string = pattern
         self.pattern = self._build_pattern_regex(pattern, case_sensitive=case_sensitive)
         self.alias_patterns = self._get_alias_patterns(func)
@@ -176,6 +398,17 @@ class Command:
         self.case_sensitive = case_sensitive
         self.help_text_override = help_text_override
         self.hide_from_help_command = hide_from_help_command
+        self.executor = executor
+        self.timeout = timeout
+        self.cache_scope = cache_scope
+        #: The command's cached results, if caching is enabled
+        self.cache: TTLCache[tuple[PhialResponse, Message]] | None = None
+        if cache_ttl is not None:
+            self.cache = TTLCache(cache_ttl, cache_size)
+        #: Limits how often the command can be run, if rate limited
+        self.rate_limiter: RateLimiter | None = None
+        if rate_limit is not None:
+            self.rate_limiter = RateLimiter(*rate_limit, key=rate_limit_key)
 
     def __repr__(self) -> str:
         return f"<Command: {self.pattern_string}>"
@@ -1,5 +1,15 @@
 """Partial type stubs for freezegun."""
 
-from typing import Callable
+from typing import Any, Callable, TypeVar
 
-def freeze_time(time: str) -> Callable: ...
+_F = TypeVar("_F", bound=Callable[..., Any])
+
+class FrozenDateTimeFactory:
+    def tick(self, delta: float = 1) -> Any: ...
+
+class _freeze_time:
+    def __call__(self, func: _F) -> _F: ...
+    def __enter__(self) -> FrozenDateTimeFactory: ...
+    def __exit__(self, *args: object) -> None: ...
+
+def freeze_time(time: str) -> _freeze_time: ...
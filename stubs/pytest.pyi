@@ -1,7 +1,49 @@
 """Partial type stubs for pytest."""
 
-from typing import Any, ContextManager, Optional, Type
+import logging
+from typing import (
+    Any,
+    Callable,
+    ContextManager,
+    Iterable,
+    Optional,
+    Sequence,
+    Type,
+    TypeVar,
+    Union,
+)
+
+_F = TypeVar("_F", bound=Callable[..., Any])
 
 def raises(
     exc_type: Type[BaseException], match: Optional[str] = None
 ) -> ContextManager[Any]: ...
+def fixture(function: _F) -> _F: ...
+def approx(
+    expected: Any, rel: Optional[float] = None, abs: Optional[float] = None
+) -> Any: ...
+def importorskip(modname: str, minversion: Optional[str] = None) -> Any: ...
+
+class MarkDecorator:
+    def __call__(self, function: _F) -> _F: ...
+
+class _Mark:
+    def parametrize(
+        self,
+        argnames: Union[str, Sequence[str]],
+        argvalues: Iterable[Any],
+    ) -> MarkDecorator: ...
+    def skipif(self, condition: bool, *, reason: str) -> MarkDecorator: ...
+
+mark: _Mark
+
+class MonkeyPatch:
+    def setattr(self, target: Any, name: Any, value: Any = ...) -> None: ...
+    def setenv(self, name: str, value: str) -> None: ...
+
+class LogCaptureFixture:
+    records: list[logging.LogRecord]
+    text: str
+    def at_level(
+        self, level: Union[int, str], logger: Optional[str] = None
+    ) -> ContextManager[None]: ...
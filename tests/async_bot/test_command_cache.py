@@ -0,0 +1,49 @@
+"""Test caching AsyncPhial command responses."""
+
+import asyncio
+from typing import Any, cast
+
+from slack_sdk.socket_mode.aiohttp import SocketModeClient
+
+from phial import AsyncPhial
+from tests.async_bot.test_handle_request import MockClient
+from tests.bot.test_handle_request import build_request
+
+
+def test_concurrent_requests_run_command_once() -> None:
+    """Test concurrent requests for an uncached response share one call."""
+    bot = AsyncPhial("app-token", "bot-token")
+    sent: list[tuple[Any, str]] = []
+
+    async def send_response(response: Any, channel: str) -> None:
+        sent.append((response, channel))
+
+    bot._send_response_async = send_response  # type: ignore
+    calls: list[int] = []
+
+    @bot.command("deploys", cache_ttl=60)
+    async def deploys() -> str:
+        calls.append(1)
+        await asyncio.sleep(0.1)
+        return "No deploys"
+
+    async def run() -> None:
+        client = cast(SocketModeClient, MockClient())
+        await asyncio.gather(
+            *(
+                bot._handle_request_async(
+                    client,
+                    build_request("!deploys", channel, "user", "ts", "team"),
+                )
+                for channel in ["a", "b", "c"]
+            ),
+        )
+
+    asyncio.run(run())
+
+    assert len(calls) == 1
+    assert sorted(sent) == [
+        ("No deploys", "a"),
+        ("No deploys", "b"),
+        ("No deploys", "c"),
+    ]
@@ -0,0 +1,335 @@
+"""Test AsyncPhial's handle_request."""
+
+import asyncio
+import threading
+import time
+from typing import Any, cast
+
+import pytest
+from slack_sdk.socket_mode.aiohttp import SocketModeClient
+
+from phial import AsyncPhial, Message, Response, User, command
+from tests.bot.test_handle_request import build_request
+from tests.directory.test_directory import FakeWebApi
+
+
+class MockClient:
+    """Mock async client for testing."""
+
+    def __init__(self) -> None:
+        self.acks: list[Any] = []
+
+    async def send_socket_mode_response(self, response: Any) -> None:
+        """Mock send_socket_mode_response."""
+        self.acks.append(response)
+
+
+def test_request_acknowledged() -> None:
+    """Test requests are acknowledged."""
+    bot = AsyncPhial("app-token", "bot-token")
+    mock_client = MockClient()
+    request = build_request("text", "channel", "user", "timestamp", "team")
+    asyncio.run(bot._handle_request_async(cast(SocketModeClient, mock_client), request))
+    assert len(mock_client.acks) == 1
+
+
+def test_coroutine_command_called_correctly() -> None:
+    """Test coroutine commands are awaited with the message in context."""
+    bot = AsyncPhial("app-token", "bot-token")
+    calls: list[tuple[str, str]] = []
+
+    @bot.command("greet <name>")
+    async def greet(name: str) -> None:
+        await asyncio.sleep(0)
+        calls.append((name, command.user))
+
+    request = build_request("!greet jim", "channel", "user", "timestamp", "team")
+    client = cast(SocketModeClient, MockClient())
+    asyncio.run(bot._handle_request_async(client, request))
+    assert calls == [("jim", "user")]
+
+
+def test_sync_command_offloaded_to_thread() -> None:
+    """Test regular commands do not run on the event loop's thread."""
+    bot = AsyncPhial("app-token", "bot-token")
+    threads: list[int] = []
+
+    @bot.command("test")
+    def test() -> None:
+        assert command.channel == "channel"
+        threads.append(threading.get_ident())
+
+    request = build_request("!test", "channel", "user", "timestamp", "team")
+    client = cast(SocketModeClient, MockClient())
+    asyncio.run(bot._handle_request_async(client, request))
+    assert len(threads) == 1
+    assert threads[0] != threading.get_ident()
+
+
+def test_coroutine_commands_run_concurrently() -> None:
+    """Test slow coroutine commands do not block one another."""
+    bot = AsyncPhial("app-token", "bot-token")
+    finished = [0]
+
+    @bot.command("slow")
+    async def slow() -> None:
+        await asyncio.sleep(0.2)
+        finished[0] += 1
+
+    async def run() -> None:
+        client = cast(SocketModeClient, MockClient())
+        requests = [
+            build_request("!slow", "channel", "user", str(i), "team")
+            for i in range(200)
+        ]
+        await asyncio.gather(*(bot._handle_request_async(client, r) for r in requests))
+
+    start = time.monotonic()
+    asyncio.run(run())
+    assert finished[0] == 200
+    assert time.monotonic() - start < 2
+
+
+def test_coroutine_middleware_can_intercept() -> None:
+    """Test coroutine middleware can stop a message being processed."""
+    bot = AsyncPhial("app-token", "bot-token")
+    command_calls = [0]
+
+    @bot.middleware()
+    async def intercept(message: Message) -> None:
+        return None
+
+    @bot.command("test")
+    async def test() -> None:
+        command_calls[0] += 1
+
+    request = build_request("!test", "channel", "user", "timestamp", "team")
+    client = cast(SocketModeClient, MockClient())
+    asyncio.run(bot._handle_request_async(client, request))
+    assert command_calls[0] == 0
+
+
+def test_fallback_and_response_sent() -> None:
+    """Test the fallback command is awaited and its response sent."""
+    bot = AsyncPhial("app-token", "bot-token")
+    sent: list[tuple[Any, str]] = []
+
+    async def mock_send_response(response: Any, channel: str) -> None:
+        sent.append((response, channel))
+
+    bot._send_response_async = mock_send_response  # type: ignore
+
+    @bot.fallback_command()
+    async def fallback(message: Message) -> str:
+        return f"{message.text} not found"
+
+    request = build_request("!missing", "channel", "user", "timestamp", "team")
+    client = cast(SocketModeClient, MockClient())
+    asyncio.run(bot._handle_request_async(client, request))
+    assert sent == [("!missing not found", "channel")]
+
+
+def test_argument_validation_error_sent() -> None:
+    """Test argument validation errors are sent back to the channel."""
+    bot = AsyncPhial("app-token", "bot-token")
+    sent: list[Any] = []
+
+    async def mock_send_response(response: Any, channel: str) -> None:
+        sent.append(response)
+
+    bot._send_response_async = mock_send_response  # type: ignore
+
+    @bot.command("age <age>")
+    async def age(age: int) -> None:
+        raise Exception("Should not be called")
+
+    request = build_request("!age old", "channel", "user", "timestamp", "team")
+    client = cast(SocketModeClient, MockClient())
+    asyncio.run(bot._handle_request_internal_async(client, request))
+    assert sent == ["old could not be converted to int"]
+
+
+def test_coroutine_command_cancelled_on_timeout() -> None:
+    """Test coroutine commands are cancelled when they time out."""
+    bot = AsyncPhial("app-token", "bot-token", config={"timeoutResponse": "Slow"})
+    sent: list[Any] = []
+    cancelled = [False]
+
+    async def mock_send_response(response: Any, channel: str) -> None:
+        sent.append(response)
+
+    bot._send_response_async = mock_send_response  # type: ignore
+
+    @bot.command("hang", timeout=0.1)
+    async def hang() -> str:
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled[0] = True
+            raise
+        return "finished"
+
+    async def run() -> None:
+        request = build_request("!hang", "channel", "user", "timestamp", "team")
+        await bot._handle_request_async(cast(SocketModeClient, MockClient()), request)
+        await asyncio.sleep(0)
+
+    asyncio.run(run())
+    assert sent == ["Slow"]
+    assert cancelled[0]
+
+
+def test_stop_cancels_coroutines_past_deadline() -> None:
+    """Test stop cancels in-flight coroutines which overrun the deadline."""
+    bot = AsyncPhial("app-token", "bot-token")
+    cancelled = [False]
+
+    @bot.command("hang")
+    async def hang() -> None:
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled[0] = True
+            raise
+
+    async def run() -> Any:
+        client = cast(SocketModeClient, MockClient())
+        request = build_request("!hang", "channel", "user", "timestamp", "team")
+        task = asyncio.create_task(bot._handle_request_async(client, request))
+        await asyncio.sleep(0.05)
+        report = await bot.stop_async(timeout=0.1)
+        await asyncio.gather(task, return_exceptions=True)
+        return report
+
+    report = asyncio.run(run())
+    assert report.abandoned_requests == ["envelope_id"]
+    assert cancelled[0]
+
+
+def test_sync_command_sends_message() -> None:
+    """Test regular commands can send messages, on the bot's event loop."""
+    bot = AsyncPhial("app-token", "bot-token")
+    sent: list[tuple[str, bool]] = []
+
+    async def send_message_async(message: Response) -> None:
+        sent.append((message.text or "", asyncio.get_running_loop() is loop))
+
+    bot.send_message_async = send_message_async  # type: ignore
+
+    @bot.command("test")
+    def test() -> None:
+        bot.send_message(Response(channel="channel", text="Hi"))
+
+    async def run() -> None:
+        request = build_request("!test", "channel", "user", "timestamp", "team")
+        await bot._handle_request_async(cast(SocketModeClient, MockClient()), request)
+
+    loop = asyncio.new_event_loop()
+    loop.run_until_complete(run())
+    loop.close()
+    assert sent == [("Hi", True)]
+
+
+def test_blocking_send_on_event_loop() -> None:
+    """Test blocking sends from a coroutine raise rather than deadlock."""
+    bot = AsyncPhial("app-token", "bot-token")
+    errors: list[str] = []
+
+    @bot.command("test")
+    async def test() -> None:
+        try:
+            bot.send_message(Response(channel="channel", text="Hi"))
+        except RuntimeError as e:
+            errors.append(str(e))
+
+    request = build_request("!test", "channel", "user", "timestamp", "team")
+    client = cast(SocketModeClient, MockClient())
+    asyncio.run(bot._handle_request_async(client, request))
+    assert len(errors) == 1
+    assert "await the _async version" in errors[0]
+
+
+def test_only_regular_functions_profiled() -> None:
+    """Test coroutines and the dispatch path can't be profiled."""
+    bot = AsyncPhial("app-token", "bot-token")
+    sent: list[Any] = []
+
+    async def send_response(response: Any, _: str) -> None:
+        sent.append(response)
+
+    bot._send_response_async = send_response  # type: ignore
+
+    @bot.command("slow")
+    async def slow() -> None:
+        pass
+
+    @bot.command("report")
+    def report() -> str:
+        return "Done"
+
+    for target in ["dispatch", "slow"]:
+        with pytest.raises(ValueError, match="can not be profiled"):
+            bot.profile(target)
+    bot.profile("report")
+    request = build_request("!report", "channel", "user", "timestamp", "team")
+    client = cast(SocketModeClient, MockClient())
+    asyncio.run(bot._handle_request_async(client, request))
+
+    assert sent == ["Done"]
+    assert "report" in bot.profiler.results
+
+
+def test_user_argument_resolved() -> None:
+    """Test User arguments are looked up with the async Web API."""
+    bot = AsyncPhial("app-token", "bot-token")
+    api = FakeWebApi()
+
+    async def call(method: str, **kwargs: Any) -> dict:
+        return api(method, **kwargs)
+
+    bot.directory._call_async = call
+    sent: list[Any] = []
+
+    async def send_response(response: Any, _: str) -> None:
+        sent.append(response)
+
+    bot._send_response_async = send_response  # type: ignore
+
+    @bot.command("whois <user>")
+    async def whois(user: User) -> str:
+        return user.name
+
+    client = cast(SocketModeClient, MockClient())
+    for text in ["!whois <@U1>", "!whois U9"]:
+        request = build_request(text, "channel", "user", "timestamp", "team")
+        asyncio.run(bot._handle_request_async(client, request))
+
+    assert sent == ["alice", "U9 could not be converted to User"]
+
+
+def test_coroutine_middleware_filters() -> None:
+    """Test coroutine middleware is skipped when its filters do not match."""
+    bot = AsyncPhial("app-token", "bot-token")
+    calls: list[str] = []
+
+    @bot.middleware(channels=["C1"], command_only=True)
+    async def audit(message: Message) -> Message:
+        calls.append(message.channel)
+        return message
+
+    @bot.command("test")
+    async def test() -> None:
+        pass
+
+    async def send(*_: Any) -> None:
+        pass
+
+    bot._send_response_async = send  # type: ignore
+    client = cast(SocketModeClient, MockClient())
+    for channel in ["C1", "C2"]:
+        request = build_request("!test", channel, "user", "timestamp", "team")
+        asyncio.run(bot._handle_request_async(client, request))
+    request = build_request("hi", "C1", "u", "t", "t")
+    asyncio.run(bot._handle_request_async(client, request))
+
+    assert calls == ["C1"]
@@ -0,0 +1,42 @@
+"""Test AsyncPhial's outbound calls."""
+
+import asyncio
+from typing import Any
+
+import pytest
+from slack_sdk.web.async_client import AsyncWebClient
+
+from phial import AsyncPhial, Response
+
+
+def test_send_message_awaits_web_client(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test send_message awaits the async web client."""
+    calls: list[dict] = []
+
+    async def mock_api_call(*_: Any, **kwargs: Any) -> None:
+        calls.append(kwargs)
+
+    monkeypatch.setattr(AsyncWebClient, "chat_postMessage", mock_api_call)
+
+    bot = AsyncPhial("app-token", "bot-token")
+    asyncio.run(bot._send_response_async("message", "channel"))
+
+    assert len(calls) == 1
+    assert calls[0]["channel"] == "channel"
+    assert calls[0]["text"] == "message"
+
+
+def test_send_reaction_awaits_web_client(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test reactions are sent with the async web client."""
+    calls: list[dict] = []
+
+    async def mock_api_call(*_: Any, **kwargs: Any) -> None:
+        calls.append(kwargs)
+
+    monkeypatch.setattr(AsyncWebClient, "reactions_add", mock_api_call)
+
+    bot = AsyncPhial("app-token", "bot-token")
+    response = Response("channel", original_ts="ts", reaction="tada")
+    asyncio.run(bot._send_response_async(response, "channel"))
+
+    assert calls == [{"channel": "channel", "timestamp": "ts", "name": "tada"}]
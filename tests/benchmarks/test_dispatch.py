@@ -0,0 +1,24 @@
+"""Test the dispatch benchmark."""
+
+from benchmarks import dispatch
+
+
+def test_envelopes_are_seeded() -> None:
+    """Test the same seed builds the same envelopes."""
+    first = dispatch.build_envelopes(10, 20, seed=1)
+    second = dispatch.build_envelopes(10, 20, seed=1)
+
+    assert [e.payload for e in first] == [e.payload for e in second]
+
+
+def test_run_reports_stages() -> None:
+    """Test a short run reports throughput and stage latencies."""
+    result = dispatch.run(10, 200, seed=0)
+
+    assert result["events"] == 200
+    assert result["events_per_second"] > 0
+    assert {"request", "routing", "arguments", "command", "slack_api"} <= set(
+        result["stages"],
+    )
+    assert set(result["stages"]["request"]) == {"count", "p50", "p90", "p99"}
+    assert "10 commands" in dispatch.report([result])
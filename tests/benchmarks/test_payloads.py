@@ -0,0 +1,15 @@
+"""Test the payload benchmark."""
+
+from benchmarks import payloads
+
+
+def test_run_reports_build_latency() -> None:
+    """Test a short run reports throughput and build latencies."""
+    new = payloads.run(10, 100, "json", cached=False)
+    template = payloads.run(10, 100, "json", cached=True)
+
+    assert new["sends"] == template["sends"] == 100
+    assert new["bytes"] == template["bytes"] > 0
+    assert new["sends_per_second"] > 0
+    assert set(new["build"]) == {"p50", "p90", "p99"}
+    assert "template" in payloads.report([new, template])
@@ -0,0 +1,14 @@
+"""Test the Socket Mode benchmark."""
+
+from benchmarks import socket_mode
+
+
+def test_run_reports_latencies() -> None:
+    """Test a short run replies to every message and reports latencies."""
+    result = socket_mode.run(20, timeout=10)
+
+    assert result["replies"] == 20
+    assert result["ack"]["count"] == 20
+    assert set(result["reply"]) == {"count", "p50", "p90", "p99"}
+    assert result["events_per_second"] > 0
+    assert "20 of 20 replied to" in socket_mode.report(result)
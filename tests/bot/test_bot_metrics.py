@@ -0,0 +1,70 @@
+"""Test the metrics recorded by Phial."""
+
+from datetime import UTC, datetime, timedelta
+from typing import Any, cast
+
+import pytest
+import slack_sdk
+from slack_sdk.socket_mode import SocketModeClient
+
+from phial import Message, Phial, Response, Schedule
+from tests.bot.test_handle_request import MockClient, build_request
+
+
+def test_dispatch_metrics_recorded() -> None:
+    """Test envelopes, middleware, routing and commands are measured."""
+    bot = Phial("app-token", "bot-token")
+    bot._send_response = lambda *_: None  # type: ignore
+
+    @bot.middleware()
+    def passthrough(message: Message) -> Message:
+        return message
+
+    @bot.command("age <age>")
+    def age(age: int) -> None:
+        pass
+
+    client = cast(SocketModeClient, MockClient())
+    bot._handle_request(client, build_request("!age 3", "c", "u", "ts", "t"))
+    bot._handle_request(client, build_request("!age x", "c", "u", "ts", "t"))
+
+    metrics = bot._metrics
+    assert metrics.envelopes.value("events_api") == 2
+    assert metrics.middleware_seconds.count("passthrough") == 2
+    assert metrics.routing_seconds.count() == 2
+    assert metrics.command_seconds.count("!age <age>") == 1
+    assert metrics.commands.value("!age <age>", "ok") == 1
+    assert metrics.commands.value("!age <age>", "invalid_arguments") == 1
+    assert "phial_commands_total" in bot.metrics.render()
+
+
+def test_slack_api_metrics_recorded(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test Web API latency and errors are recorded by method."""
+
+    def mock_api_call(*_: Any, **kwargs: Any) -> None:
+        raise RuntimeError("Slack is down")
+
+    monkeypatch.setattr(slack_sdk.WebClient, "reactions_add", mock_api_call)
+    bot = Phial("app-token", "bot-token")
+
+    with pytest.raises(RuntimeError):
+        bot.send_reaction(Response("channel", original_ts="ts", reaction="tada"))
+
+    assert bot._metrics.slack_api_seconds.count("reactions_add") == 1
+    assert bot._metrics.slack_api_errors.value("reactions_add") == 1
+
+
+def test_scheduler_lateness_recorded() -> None:
+    """Test scheduled jobs record how late they started."""
+    bot = Phial("app-token", "bot-token")
+
+    @bot.scheduled(Schedule().every().minute())
+    def job() -> None:
+        pass
+
+    bot.scheduler.jobs[0].next_run = datetime.now(tz=UTC) - timedelta(seconds=5)
+    bot.scheduler.run_pending()
+
+    lateness = bot.metrics.histogram("phial_scheduler_lateness_seconds", "")
+    assert lateness.count("job") == 1
+    assert lateness.sum("job") >= 5
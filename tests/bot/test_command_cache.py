@@ -0,0 +1,134 @@
+"""Test caching command responses."""
+
+import io
+from typing import Any, cast
+
+import pytest
+from slack_sdk.socket_mode import SocketModeClient
+
+from phial import Attachment, Phial, Response, command
+from tests.bot.test_handle_request import MockClient, build_request
+
+
+def run(bot: Phial, text: str, channel: str = "channel", user: str = "user") -> None:
+    """Handle a message sent to the bot."""
+    request = build_request(text, channel, user, f"ts-{channel}", "team")
+    bot._handle_request(cast(SocketModeClient, MockClient()), request)
+
+
+def test_cached_response_reused() -> None:
+    """Test a cached command is only run once within its TTL."""
+    bot = Phial("app-token", "bot-token")
+    sent: list[tuple[Any, str]] = []
+    bot._send_response = lambda r, c: sent.append((r, c))  # type: ignore
+    calls: list[str] = []
+
+    @bot.command("status <service>", cache_ttl=60)
+    def status(service: str) -> str:
+        calls.append(service)
+        return f"{service} is up"
+
+    run(bot, "!status api")
+    run(bot, "!status api", channel="other")
+    run(bot, "!status web")
+
+    assert calls == ["api", "web"]
+    assert sent == [
+        ("api is up", "channel"),
+        ("api is up", "other"),
+        ("web is up", "channel"),
+    ]
+    assert (
+        bot.metrics.counter("phial_command_cache_total", "").value(
+            "!status <service>",
+            "hit",
+        )
+        == 1
+    )
+
+
+def test_cached_response_rewritten_for_channel() -> None:
+    """Test a cached Response is sent to the requesting channel."""
+    bot = Phial("app-token", "bot-token")
+    sent: list[Response] = []
+    bot._send_response = lambda r, _: sent.append(r)  # type: ignore
+
+    @bot.command("oncall", cache_ttl=60)
+    def oncall() -> Response:
+        return Response(
+            command.channel,
+            text="Alice",
+            original_ts=command.timestamp,
+            user=command.user,
+            ephemeral=True,
+        )
+
+    run(bot, "!oncall")
+    run(bot, "!oncall", channel="other", user="someone")
+
+    assert sent[1].channel == "other"
+    assert sent[1].original_ts == "ts-other"
+    assert sent[1].user == "someone"
+    assert sent[0].channel == "channel"
+
+
+def test_response_to_other_channel_not_rewritten() -> None:
+    """Test responses deliberately sent elsewhere are left alone."""
+    bot = Phial("app-token", "bot-token")
+    sent: list[Response] = []
+    bot._send_response = lambda r, _: sent.append(r)  # type: ignore
+
+    @bot.command("announce", cache_ttl=60)
+    def announce() -> Response:
+        return Response("announcements", text="Hello")
+
+    run(bot, "!announce")
+    run(bot, "!announce", channel="other")
+
+    assert [r.channel for r in sent] == ["announcements", "announcements"]
+
+
+@pytest.mark.parametrize(
+    ("scope", "expected_calls"),
+    [(None, 1), ("user", 2), ("channel", 1)],
+)
+def test_cache_scope(scope: str | None, expected_calls: int) -> None:
+    """Test cached responses are only shared within their scope."""
+    bot = Phial("app-token", "bot-token")
+    bot._send_response = lambda *_: None  # type: ignore
+    calls: list[int] = []
+
+    @bot.command("me", cache_ttl=60, cache_scope=scope)
+    def me() -> str:
+        calls.append(1)
+        return "you"
+
+    run(bot, "!me", user="a")
+    run(bot, "!me", user="b")
+
+    assert len(calls) == expected_calls
+
+
+def test_attachments_not_cached() -> None:
+    """Test file uploads are never served from the cache."""
+    bot = Phial("app-token", "bot-token")
+    bot._send_response = lambda *_: None  # type: ignore
+    calls: list[int] = []
+
+    @bot.command("file", cache_ttl=60)
+    def file() -> Attachment:
+        calls.append(1)
+        return Attachment("channel", "file.txt", io.BytesIO(b"content"))
+
+    run(bot, "!file")
+    run(bot, "!file")
+
+    assert len(calls) == 2
+
+
+def test_unknown_cache_scope() -> None:
+    """Test an invalid cache scope is rejected."""
+    bot = Phial("app-token", "bot-token")
+
+    with pytest.raises(ValueError, match="Unknown cache scope team"):
+        bot.add_command("test", lambda: None, cache_ttl=60, cache_scope="team")
@@ -0,0 +1,96 @@
+"""Test command timeouts."""
+
+import threading
+import time
+from typing import Any, cast
+
+import pytest
+from slack_sdk.socket_mode import SocketModeClient
+
+from phial import Phial, command
+from tests.bot.test_handle_request import MockClient, build_request
+
+
+def test_command_timeout_sends_timeout_response(
+    caplog: pytest.LogCaptureFixture,
+) -> None:
+    """Test a command that runs too long is abandoned."""
+    bot = Phial("app-token", "bot-token")
+    sent: list[tuple[Any, str]] = []
+    bot._send_response = lambda r, c: sent.append((r, c))  # type: ignore
+
+    @bot.command("hang", timeout=0.1)
+    def hang() -> str:
+        assert command.channel == "channel"
+        time.sleep(1)
+        return "finished"
+
+    request = build_request("!hang", "channel", "user", "timestamp", "team")
+    start = time.monotonic()
+    bot._handle_request(cast(SocketModeClient, MockClient()), request)
+
+    assert time.monotonic() - start < 0.5
+    assert sent == [("Sorry, that command took too long to run", "channel")]
+    assert "time.sleep(1)" in caplog.text
+
+
+def test_global_command_timeout_used() -> None:
+    """Test the commandTimeout config applies to every command."""
+    bot = Phial(
+        "app-token",
+        "bot-token",
+        config={"commandTimeout": 0.1, "timeoutResponse": "Too slow"},
+    )
+    sent: list[Any] = []
+    bot._send_response = lambda r, _: sent.append(r)  # type: ignore
+
+    @bot.command("hang")
+    def hang() -> None:
+        time.sleep(1)
+
+    request = build_request("!hang", "channel", "user", "timestamp", "team")
+    bot._handle_request(cast(SocketModeClient, MockClient()), request)
+
+    assert sent == ["Too slow"]
+
+
+def test_command_within_timeout_responds() -> None:
+    """Test a command which finishes in time is unaffected."""
+    bot = Phial("app-token", "bot-token")
+    sent: list[Any] = []
+    bot._send_response = lambda r, _: sent.append(r)  # type: ignore
+
+    @bot.command("quick <name>", timeout=1)
+    def quick(name: str) -> str:
+        return f"{name} {command.user}"
+
+    request = build_request("!quick jim", "channel", "user", "timestamp", "team")
+    bot._handle_request(cast(SocketModeClient, MockClient()), request)
+
+    assert sent == ["jim user"]
+
+
+def test_timed_out_commands_counted() -> None:
+    """Test commands left running after timing out are exported as a metric."""
+    bot = Phial("app-token", "bot-token", config={"maxAbandonedThreads": 1})
+    sent: list[Any] = []
+    bot._send_response = lambda r, _: sent.append(r)  # type: ignore
+    release = threading.Event()
+    ran: list[str] = []
+
+    @bot.command("hang", timeout=0.05)
+    def hang() -> None:
+        ran.append("hang")
+        release.wait()
+
+    try:
+        for _ in range(2):
+            request = build_request("!hang", "channel", "user", "timestamp", "team")
+            bot._handle_request(cast(SocketModeClient, MockClient()), request)
+        rendered = bot.metrics.render()
+    finally:
+        release.set()
+
+    assert ran == ["hang"]
+    assert sent == ["Sorry, that command took too long to run"] * 2
+    assert "phial_abandoned_threads 1.0" in rendered
@@ -0,0 +1,96 @@
+"""Test the bot's directory and argument converters."""
+
+from typing import Any, cast
+
+from slack_sdk.socket_mode import SocketModeClient
+from slack_sdk.socket_mode.request import SocketModeRequest
+
+from phial import Channel, Phial, User
+from tests.bot.test_handle_request import MockClient, build_request
+from tests.directory.test_directory import FakeWebApi
+
+
+def make_bot() -> tuple[Phial, list[Any]]:
+    """Create a bot with a fake Web API, recording what it sends."""
+    bot = Phial("app-token", "bot-token")
+    bot._call_web_api = FakeWebApi()  # type: ignore
+    bot.directory._call = bot._call_web_api
+    sent: list[Any] = []
+    bot._send_response = lambda r, _: sent.append(r)  # type: ignore
+    return bot, sent
+
+
+def test_user_argument_resolved() -> None:
+    """Test parameters annotated with User are looked up."""
+    bot, sent = make_bot()
+
+    @bot.command("whois <user>")
+    def whois(user: User) -> str:
+        return f"{user.name} ({user.id})"
+
+    request = build_request("!whois <@U1>", "channel", "user", "ts", "team")
+    bot._handle_request(cast(SocketModeClient, MockClient()), request)
+
+    assert sent == ["alice (U1)"]
+
+
+def test_user_argument_cached() -> None:
+    """Test commands with a User argument can have their responses cached."""
+    bot, sent = make_bot()
+    calls: list[User] = []
+
+    @bot.command("whois <user>", cache_ttl=60)
+    def whois(user: User) -> str:
+        calls.append(user)
+        return user.name
+
+    for _ in range(2):
+        request = build_request("!whois <@U1>", "channel", "user", "ts", "team")
+        bot._handle_request(cast(SocketModeClient, MockClient()), request)
+
+    assert sent == ["alice", "alice"]
+    assert len(calls) == 1
+
+
+def test_unknown_user_argument() -> None:
+    """Test unknown users are reported like other conversion errors."""
+    bot, sent = make_bot()
+
+    @bot.command("whois <user>")
+    def whois(user: User) -> str:
+        return user.name
+
+    request = build_request("!whois U9", "channel", "user", "ts", "team")
+    bot._handle_request(cast(SocketModeClient, MockClient()), request)
+
+    assert sent == ["U9 could not be converted to User"]
+
+
+def test_custom_converter() -> None:
+    """Test converters can be registered for other annotations."""
+    bot, sent = make_bot()
+    bot.add_converter(Channel, lambda value: Channel(value, value.lower()))
+
+    @bot.command("topic <channel>")
+    def topic(channel: Channel) -> str:
+        return channel.name
+
+    request = build_request("!topic GENERAL", "channel", "user", "ts", "team")
+    bot._handle_request(cast(SocketModeClient, MockClient()), request)
+
+    assert sent == ["general"]
+
+
+def test_directory_events_update_cache() -> None:
+    """Test user_change events refresh the directory."""
+    bot, sent = make_bot()
+    request = SocketModeRequest(
+        type="events_api",
+        envelope_id="envelope_id",
+        payload={"event": {"type": "user_change", "user": {"id": "U1", "name": "al"}}},
+    )
+
+    bot._handle_request(cast(SocketModeClient, MockClient()), request)
+
+    assert bot.directory.get_user("U1") == User("U1", "al")
+    assert sent == []
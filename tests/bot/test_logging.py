@@ -0,0 +1,67 @@
+"""Test logging while handling requests."""
+
+import logging
+from typing import cast
+
+import pytest
+from slack_sdk.socket_mode import SocketModeClient
+
+from phial import Phial
+from phial.wrappers import Message
+from tests.bot.test_handle_request import MockClient, build_request
+
+
+def test_debug_logging_is_lazy(
+    caplog: pytest.LogCaptureFixture,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Test messages are not formatted when debug logging is off."""
+    bot = Phial("app-token", "bot-token")
+    bot._send_response = lambda *_: None  # type: ignore
+    bot.add_middleware(lambda message: message)
+
+    def fail(_: Message) -> str:
+        raise AssertionError("Message formatted")
+
+    def fail_fields(_: Message, **__: str) -> dict:
+        raise AssertionError("Log fields built")
+
+    monkeypatch.setattr(Message, "__repr__", fail)
+    bot._log_fields = fail_fields  # type: ignore
+    request = build_request("!help", "channel", "user", "timestamp", "team")
+    with caplog.at_level(logging.INFO, logger="phial.bot"):
+        bot._handle_request(cast(SocketModeClient, MockClient()), request)
+
+    assert caplog.records == []
+
+
+def test_debug_logging_has_fields(caplog: pytest.LogCaptureFixture) -> None:
+    """Test hot path log records carry structured fields."""
+    bot = Phial("app-token", "bot-token")
+    bot._send_response = lambda *_: None  # type: ignore
+
+    request = build_request("!help", "channel", "user", "timestamp", "team")
+    with caplog.at_level(logging.DEBUG, logger="phial.bot"):
+        bot._handle_request(cast(SocketModeClient, MockClient()), request)
+
+    record = next(r for r in caplog.records if r.msg == "Ran command: %s on %s")
+    assert record.command == "!help"  # type: ignore[attr-defined]
+    assert record.channel == "channel"  # type: ignore[attr-defined]
+    assert record.user == "user"  # type: ignore[attr-defined]
+    assert record.request_id == "envelope_id"  # type: ignore[attr-defined]
+
+
+def test_command_not_found_is_rate_limited(caplog: pytest.LogCaptureFixture) -> None:
+    """Test floods of unmatched messages are only logged a few times."""
+    bot = Phial("app-token", "bot-token", config={"logRateLimit": 2})
+    client = cast(SocketModeClient, MockClient())
+
+    for _ in range(5):
+        request = build_request("!missing", "channel", "user", "ts", "team")
+        bot._handle_request(client, request)
+
+    not_found = [r for r in caplog.records if r.msg.startswith("Command %s")]
+    assert [r.getMessage() for r in not_found] == [
+        "Command !missing not found",
+        "Command !missing not found",
+    ]
@@ -0,0 +1,157 @@
+"""Test middleware filters and priorities."""
+
+from typing import Any, cast
+
+from slack_sdk.socket_mode import SocketModeClient
+
+from phial import Message, Phial
+from tests.bot.test_handle_request import MockClient, build_request
+
+
+def test_filtered_middleware_skipped() -> None:
+    """Test middleware is not called on messages its filters exclude."""
+    bot = Phial("app-token", "bot-token")
+    bot._send_response = lambda *_: None  # type: ignore
+    calls: list[str] = []
+
+    @bot.middleware(channels=["C1"])
+    def channel(message: Message) -> Message:
+        calls.append("channel")
+        return message
+
+    @bot.middleware(users=["U1"])
+    def user(message: Message) -> Message:
+        calls.append("user")
+        return message
+
+    @bot.middleware(event_types=["app_mention"])
+    def mention(message: Message) -> Message:
+        calls.append("mention")
+        return message
+
+    client = cast(SocketModeClient, MockClient())
+    bot._handle_request(client, build_request("hi", "C1", "U2", "ts", "team"))
+    bot._handle_request(client, build_request("hi", "C2", "U1", "ts", "team"))
+
+    assert calls == ["channel", "user"]
+
+
+def test_command_only_middleware() -> None:
+    """Test command only middleware skips messages without a command."""
+    bot = Phial("app-token", "bot-token")
+    bot._send_response = lambda *_: None  # type: ignore
+    calls: list[str] = []
+
+    @bot.middleware(command_only=True)
+    def audit(message: Message) -> Message:
+        calls.append(message.text)
+        return message
+
+    @bot.command("test")
+    def test() -> None:
+        pass
+
+    client = cast(SocketModeClient, MockClient())
+    bot._handle_request(client, build_request("!test", "c", "u", "ts", "team"))
+    bot._handle_request(client, build_request("!nope", "c", "u", "ts", "team"))
+    bot._handle_request(client, build_request("hello", "c", "u", "ts", "team"))
+
+    assert calls == ["!test"]
+
+
+def test_command_only_middleware_sees_rewritten_text() -> None:
+    """Test command only filters see changes made by earlier middleware."""
+    bot = Phial("app-token", "bot-token")
+    sent: list[Any] = []
+    bot._send_response = lambda r, _: sent.append(r)  # type: ignore
+    calls: list[str] = []
+
+    @bot.middleware(priority=-1)
+    def rewrite(message: Message) -> Message:
+        message.text = "!test"
+        return message
+
+    @bot.middleware(command_only=True)
+    def audit(message: Message) -> Message:
+        calls.append(message.text)
+        return message
+
+    @bot.command("test")
+    def test() -> str:
+        return "ran"
+
+    request = build_request("rewrite me", "c", "u", "ts", "team")
+    bot._handle_request(cast(SocketModeClient, MockClient()), request)
+
+    assert calls == ["!test"]
+    assert sent == ["ran"]
+
+
+def test_middleware_runs_in_priority_order() -> None:
+    """Test middleware runs by priority, then in the order it was added."""
+    bot = Phial("app-token", "bot-token")
+    calls: list[str] = []
+
+    def record(name: str) -> Any:
+        def middleware(message: Message) -> Message:
+            calls.append(name)
+            return message
+
+        return middleware
+
+    bot.add_middleware(record("late"), priority=10)
+    bot.add_middleware(record("first"))
+    bot.add_middleware(record("early"), priority=-10)
+    bot.add_middleware(record("second"))
+    bot.middleware_functions.append(record("appended"))
+
+    request = build_request("hi", "c", "u", "ts", "team")
+    bot._handle_request(cast(SocketModeClient, MockClient()), request)
+
+    assert calls == ["early", "first", "second", "appended", "late"]
+
+
+def test_short_circuits_counted() -> None:
+    """Test middleware which stops a message is counted."""
+    bot = Phial("app-token", "bot-token")
+    calls: list[str] = []
+
+    @bot.middleware()
+    def intercept(message: Message) -> None:
+        return None
+
+    @bot.middleware(priority=1)
+    def after(message: Message) -> Message:
+        calls.append("after")
+        return message
+
+    request = build_request("hi", "c", "u", "ts", "team")
+    bot._handle_request(cast(SocketModeClient, MockClient()), request)
+
+    short_circuits = bot.metrics.counter("phial_middleware_short_circuits_total", "")
+    assert short_circuits.value("intercept") == 1
+    assert calls == []
+    timings = bot.metrics.histogram("phial_middleware_seconds", "")
+    assert timings.count("intercept") == 1
+    assert timings.count("after") == 0
+
+
+def test_replaced_middleware_runs() -> None:
+    """Test replacing a middleware function rebuilds the plan."""
+    bot = Phial("app-token", "bot-token")
+    calls: list[str] = []
+
+    def record(name: str) -> Any:
+        def middleware(message: Message) -> Message:
+            calls.append(name)
+            return message
+
+        return middleware
+
+    bot.add_middleware(record("old"))
+    client = cast(SocketModeClient, MockClient())
+    bot._handle_request(client, build_request("hi", "c", "u", "ts", "team"))
+    bot.middleware_functions[0] = record("new")
+    bot._handle_request(client, build_request("hi", "c", "u", "ts2", "team"))
+
+    assert calls == ["old", "new"]
@@ -33,6 +33,57 @@ def test_config_override() -> None:
         "loopDelay": 0.5,
         "hotReload": True,
         "maxThreads": 1,
+        "maxProcesses": None,
+        "commandTimeout": None,
+        "timeoutResponse": "Sorry, that command took too long to run",
+        "maxAbandonedThreads": 16,
+        "shutdownTimeout": 30,
+        "handleSignals": True,
+        "handoverPath": None,
+        "handoverInterval": 1,
+        "metricsPort": None,
+        "metricsHost": "127.0.0.1",
+        "registerProfileCommand": False,
+        "adminUsers": [],
+        "slowThreshold": None,
+        "slowSampleInterval": 0.05,
+        "slowReportInterval": 60,
+        "logRateLimit": 10,
+        "logRatePeriod": 60,
+        "preloadDirectory": False,
+        "directoryTTL": 3600,
+        "helpPageSize": 4000,
+        "rateLimit": None,
+        "rateLimitKey": "user",
+        "rateLimitResponse": (
+            "You're sending commands too quickly, try again in {retry_after} seconds"
+        ),
+        "recordPath": None,
+        "recordRedactText": False,
+        "recordRedactUsers": False,
+        "apiUrl": None,
+        "connections": 1,
+        "connectionStagger": 1,
+        "workers": 0,
+        "workerApp": None,
+        "outboxPath": None,
+        "outboxBatchSize": 100,
+        "outboxRetryDelay": 1,
+        "outboxMaxRetryDelay": 60,
+        "outboxMaxAttempts": 10,
+        "circuitBreaker": False,
+        "circuitErrorRate": 0.5,
+        "circuitMinCalls": 10,
+        "circuitWindow": 30,
+        "circuitSlowCall": None,
+        "circuitOpenSeconds": 5,
+        "circuitMaxOpenSeconds": 120,
+        "circuitProbes": 3,
+        "broadcastConcurrency": 8,
+        "broadcastRateLimit": (10, 1),
+        "broadcastChannelRateLimit": (1, 1),
+        "broadcastRetries": 3,
+        "jsonBackend": "json",
     }
 
 
@@ -0,0 +1,90 @@
+"""Test commands run with the process executor."""
+
+import os
+import threading
+import time
+from typing import Any, cast
+
+import pytest
+from slack_sdk.socket_mode import SocketModeClient
+
+from phial import Phial, command
+from tests.bot.test_handle_request import MockClient, build_request
+
+
+def report(name: str) -> str:
+    """Return the worker's pid and the message's channel."""
+    return f"{name} {os.getpid()} {command.channel}"
+
+
+def busy() -> str:
+    """Hold a CPU for a while."""
+    end = time.monotonic() + 1
+    while time.monotonic() < end:
+        pass
+    return "done"
+
+
+def test_invalid_executor_throws() -> None:
+    """Test add_command rejects unknown executors."""
+    bot = Phial("app-token", "bot-token")
+    with pytest.raises(ValueError):
+        bot.add_command("report", report, executor="fibre")
+
+
+def test_process_command_runs_in_worker_process() -> None:
+    """Test process commands run in another process with the message."""
+    bot = Phial("app-token", "bot-token", config={"maxProcesses": 1})
+    sent: list[tuple[Any, str]] = []
+
+    def mock_send_response(response: Any, channel: str) -> None:
+        sent.append((response, channel))
+
+    bot._send_response = mock_send_response  # type: ignore
+    bot.add_command("report <name>", report, executor="process")
+    request = build_request("!report daily", "channel", "user", "ts", "team")
+    bot._handle_request_internal(cast(SocketModeClient, MockClient()), request)
+
+    assert len(sent) == 1
+    name, pid, channel = sent[0][0].split(" ")
+    assert name == "daily"
+    assert int(pid) != os.getpid()
+    assert channel == "channel"
+    assert sent[0][1] == "channel"
+
+
+def test_other_commands_responsive_during_process_command() -> None:
+    """Test a CPU bound process command does not starve other commands."""
+    bot = Phial("app-token", "bot-token", config={"maxProcesses": 1})
+    sent: list[Any] = []
+    bot._send_response = lambda response, _: sent.append(response)  # type: ignore
+    bot.add_command("busy", busy, executor="process")
+
+    @bot.command("ping")
+    def ping() -> str:
+        return "pong"
+
+    client = cast(SocketModeClient, MockClient())
+    # Start the worker process before timing anything
+    bot._get_process_pool().submit(os.getpid).result()
+
+    slow = threading.Thread(
+        target=bot._handle_request,
+        args=(client, build_request("!busy", "channel", "user", "ts", "team")),
+    )
+    slow.start()
+    time.sleep(0.1)
+
+    start = time.monotonic()
+    for _ in range(50):
+        bot._handle_request(
+            client,
+            build_request("!ping", "channel", "user", "ts", "team"),
+        )
+    elapsed = time.monotonic() - start
+
+    assert slow.is_alive()
+    assert elapsed < 0.5
+    slow.join()
+    assert sent.count("pong") == 50
+    assert sent[-1] == "done"
@@ -0,0 +1,138 @@
+"""Test profiling commands, scheduled jobs and dispatch."""
+
+from typing import Any, cast
+
+from slack_sdk.socket_mode import SocketModeClient
+
+from phial import Phial, Schedule
+from tests.bot.test_handle_request import MockClient, build_request
+
+
+def test_profile_command() -> None:
+    """Test a command is profiled when it runs."""
+    bot = Phial("app-token", "bot-token")
+    bot._send_response = lambda *_: None  # type: ignore
+
+    @bot.command("hello")
+    def hello() -> str:
+        return "world"
+
+    bot.profile("hello")
+    request = build_request("!hello", "channel", "user", "timestamp", "team")
+    bot._handle_request(cast(SocketModeClient, MockClient()), request)
+
+    assert "hello" in bot.profiler.results["hello"]
+    assert not bot.profiler.active
+
+
+def test_profile_command_with_timeout() -> None:
+    """Test a command run in a worker thread is profiled."""
+    bot = Phial("app-token", "bot-token", config={"commandTimeout": 5})
+    bot._send_response = lambda *_: None  # type: ignore
+
+    @bot.command("hello")
+    def hello() -> str:
+        return "world"
+
+    bot.profile("hello")
+    request = build_request("!hello", "channel", "user", "timestamp", "team")
+    bot._handle_request(cast(SocketModeClient, MockClient()), request)
+
+    assert "hello" in bot.profiler.results["hello"]
+
+
+def test_profile_dispatch() -> None:
+    """Test the whole dispatch path can be profiled."""
+    bot = Phial("app-token", "bot-token")
+    bot._send_response = lambda *_: None  # type: ignore
+
+    bot.profile("dispatch")
+    request = build_request("!help", "channel", "user", "timestamp", "team")
+    bot._handle_request(cast(SocketModeClient, MockClient()), request)
+
+    assert "_process_request" in bot.profiler.results["dispatch"]
+
+
+def test_profile_scheduled_job() -> None:
+    """Test a scheduled job is profiled when it runs."""
+    bot = Phial("app-token", "bot-token")
+
+    def beep() -> None:
+        pass
+
+    bot.add_scheduled(Schedule().every().second(), beep)
+    job = bot.scheduler.jobs[0]
+    job.next_run = job.next_run.replace(year=2000)
+    bot.profile("beep")
+    bot.scheduler.run_pending()
+
+    assert "beep" in bot.profiler.results["beep"]
+
+
+def test_profile_command_not_registered_by_default() -> None:
+    """Test the profile command is opt in."""
+    bot = Phial("app-token", "bot-token")
+
+    assert not any("profile" in c.pattern_string for c in bot.commands)
+
+
+def test_profile_command_starts_profiling() -> None:
+    """Test admins can start profiling from Slack."""
+    bot = Phial(
+        "app-token",
+        "bot-token",
+        config={"registerProfileCommand": True, "adminUsers": ["admin"]},
+    )
+    sent: list[Any] = []
+    bot._send_response = lambda r, _: sent.append(r)  # type: ignore
+
+    request = build_request("!profile help 3", "channel", "admin", "ts", "team")
+    bot._handle_request(cast(SocketModeClient, MockClient()), request)
+
+    assert sent == ["Profiling the next 3 invocations of help"]
+    assert bot.profiler.active
+    assert all(
+        c.hide_from_help_command for c in bot.commands if "profile" in c.pattern_string
+    )
+
+
+def test_profile_command_ignores_other_users() -> None:
+    """Test users who are not admins can not profile the bot."""
+    bot = Phial(
+        "app-token",
+        "bot-token",
+        config={"registerProfileCommand": True, "adminUsers": ["admin"]},
+    )
+    sent: list[Any] = []
+    bot._send_response = lambda r, _: sent.append(r)  # type: ignore
+
+    request = build_request("!profile help 3", "channel", "user", "ts", "team")
+    bot._handle_request(cast(SocketModeClient, MockClient()), request)
+
+    assert sent == [None]
+    assert not bot.profiler.active
+
+
+def test_profile_command_stop() -> None:
+    """Test admins can stop profiling and get a summary."""
+    bot = Phial(
+        "app-token",
+        "bot-token",
+        config={"registerProfileCommand": True, "adminUsers": ["admin"]},
+    )
+    sent: list[Any] = []
+    bot._send_response = lambda r, _: sent.append(r)  # type: ignore
+    client = cast(SocketModeClient, MockClient())
+
+    @bot.command("hello")
+    def hello() -> str:
+        return "world"
+
+    for text in ["!profile x stop", "!profile x 0", "!hello", "!profile hello stop"]:
+        if text == "!hello":
+            bot.profile("hello", 2)
+        bot._handle_request(client, build_request(text, "c", "admin", "ts", "t"))
+
+    assert sent[0] == "x has not been profiled"
+    assert sent[1] == "The number of invocations must be a positive whole number"
+    assert sent[3].startswith("```Profile of hello over 1 invocations")
@@ -0,0 +1,118 @@
+"""Test rate limiting commands."""
+
+from typing import Any, cast
+
+import pytest
+from slack_sdk.socket_mode import SocketModeClient
+
+from phial import Phial, Response
+from tests.bot.test_handle_request import MockClient, build_request
+
+
+def test_command_rate_limited() -> None:
+    """Test a command over its limit is not run and the user is told."""
+    bot = Phial("app-token", "bot-token")
+    sent: list[Any] = []
+    bot._send_response = lambda r, _: sent.append(r)  # type: ignore
+    calls = [0]
+
+    @bot.command("deploy", rate_limit=(1, 60))
+    def deploy() -> str:
+        calls[0] += 1
+        return "deploying"
+
+    client = cast(SocketModeClient, MockClient())
+    for _ in range(2):
+        bot._handle_request(client, build_request("!deploy", "c", "u", "ts", "t"))
+    bot._handle_request(client, build_request("!deploy", "c", "other", "ts", "t"))
+
+    assert calls[0] == 2
+    assert sent[0] == "deploying"
+    assert sent[1] == Response(
+        channel="c",
+        text="You're sending commands too quickly, try again in 60 seconds",
+        ephemeral=True,
+        user="u",
+    )
+    assert sent[2] == "deploying"
+    commands = bot.metrics.counter("phial_commands_total", "")
+    assert commands.value("!deploy", "rate_limited") == 1
+
+
+def test_rate_limit_checked_before_arguments() -> None:
+    """Test throttled messages are not validated."""
+    bot = Phial("app-token", "bot-token")
+    sent: list[Any] = []
+    bot._send_response = lambda r, _: sent.append(r)  # type: ignore
+
+    @bot.command("add <number>", rate_limit=(1, 60))
+    def add(number: int) -> int:
+        return number
+
+    client = cast(SocketModeClient, MockClient())
+    for _ in range(2):
+        bot._handle_request(client, build_request("!add x", "c", "u", "ts", "t"))
+
+    assert isinstance(sent[0], str)
+    assert isinstance(sent[1], Response)
+
+
+def test_global_rate_limit() -> None:
+    """Test the rateLimit config value limits every command."""
+    bot = Phial(
+        "app-token",
+        "bot-token",
+        config={
+            "rateLimit": (2, 60),
+            "rateLimitKey": "channel",
+            "rateLimitResponse": "Slow down, {retry_after}s to go",
+        },
+    )
+    sent: list[Any] = []
+    bot._send_response = lambda r, _: sent.append(r)  # type: ignore
+
+    @bot.command("one")
+    def one() -> str:
+        return "one"
+
+    @bot.command("two")
+    def two() -> str:
+        return "two"
+
+    client = cast(SocketModeClient, MockClient())
+    for text, user in [("!one", "a"), ("!two", "b"), ("!one", "c")]:
+        bot._handle_request(client, build_request(text, "c", user, "ts", "t"))
+
+    assert sent[:2] == ["one", "two"]
+    assert sent[2].text == "Slow down, 30s to go"
+
+
+def test_global_refusal_keeps_command_token() -> None:
+    """Test a message refused by the global limit doesn't use the command's."""
+    bot = Phial(
+        "app-token",
+        "bot-token",
+        config={"rateLimit": (1, 60), "rateLimitKey": "channel"},
+    )
+    sent: list[Any] = []
+    bot._send_response = lambda r, _: sent.append(r)  # type: ignore
+
+    @bot.command("one", rate_limit=(1, 60))
+    def one() -> str:
+        return "one"
+
+    client = cast(SocketModeClient, MockClient())
+    for channel, user in [("C1", "a"), ("C1", "b"), ("C2", "b")]:
+        bot._handle_request(client, build_request("!one", channel, user, "ts", "t"))
+
+    assert sent[0] == "one"
+    assert isinstance(sent[1], Response)
+    assert sent[2] == "one"
+
+
+def test_invalid_rate_limit_key() -> None:
+    """Test unknown rate limit keys are rejected."""
+    bot = Phial("app-token", "bot-token")
+
+    with pytest.raises(ValueError, match="Unknown rate limit key"):
+        bot.add_command("test", lambda: None, rate_limit=(1, 1), rate_limit_key="x")
@@ -6,19 +6,19 @@ import pytest
 import slack_sdk
 
 from phial import Phial, Response
-from tests.helpers import wildpatch
 
 
-def test_send_message() -> None:
+def test_send_message(monkeypatch: pytest.MonkeyPatch) -> None:
     """Test send_message works correctly."""
 
     def mock_api_call(*_: Any, **kwargs: Any) -> None:
         assert kwargs["channel"] == "channel"
         assert kwargs["text"] == "message"
-        assert kwargs["attachments"] == "null"
+        assert "attachments" not in kwargs
+        assert "blocks" not in kwargs
         assert kwargs["thread_ts"] is None
 
-    wildpatch(slack_sdk.WebClient, "chat_postMessage", mock_api_call)
+    monkeypatch.setattr(slack_sdk.WebClient, "chat_postMessage", mock_api_call)
 
     response = Response("channel", text="message")
     bot = Phial("app-token", "bot-token")
@@ -26,7 +26,7 @@ def test_send_message() -> None:
     bot.send_message(response)
 
 
-def test_send_full_message() -> None:
+def test_send_full_message(monkeypatch: pytest.MonkeyPatch) -> None:
     """Test send message works correctly when all properties populated."""
 
     def mock_api_call(*_: Any, **kwargs: Any) -> None:
@@ -37,7 +37,7 @@ def test_send_full_message() -> None:
 
         assert "reaction" not in kwargs
 
-    wildpatch(slack_sdk.WebClient, "chat_postMessage", mock_api_call)
+    monkeypatch.setattr(slack_sdk.WebClient, "chat_postMessage", mock_api_call)
 
     response = Response(
         "channel",
@@ -52,7 +52,7 @@ def test_send_full_message() -> None:
     bot.send_message(response)
 
 
-def test_send_ephemeral_message() -> None:
+def test_send_ephemeral_message(monkeypatch: pytest.MonkeyPatch) -> None:
     """Test sending ephemeral messages works."""
 
     def mock_api_call(*_: Any, **kwargs: Any) -> None:
@@ -63,7 +63,7 @@ def test_send_ephemeral_message() -> None:
 
         assert "reaction" not in kwargs
 
-    wildpatch(slack_sdk.WebClient, "chat_postEphemeral", mock_api_call)
+    monkeypatch.setattr(slack_sdk.WebClient, "chat_postEphemeral", mock_api_call)
 
     response = Response(
         "channel",
@@ -6,10 +6,9 @@ import pytest
 import slack_sdk
 
 from phial import Phial, Response
-from tests.helpers import wildpatch
 
 
-def test_send_reaction() -> None:
+def test_send_reaction(monkeypatch: pytest.MonkeyPatch) -> None:
     """Test send_reaction."""
 
     def mock_api_call(*_: Any, **kwargs: Any) -> None:
@@ -21,7 +20,7 @@ def test_send_reaction() -> None:
         assert "user" not in kwargs
         assert "attachments" not in kwargs
 
-    wildpatch(slack_sdk.WebClient, "reactions_add", mock_api_call)
+    monkeypatch.setattr(slack_sdk.WebClient, "reactions_add", mock_api_call)
 
     response = Response(
         "channel",
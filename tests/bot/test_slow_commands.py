@@ -0,0 +1,90 @@
+"""Test slow commands and scheduled jobs are detected."""
+
+import time
+from typing import cast
+
+import pytest
+from slack_sdk.socket_mode import SocketModeClient
+
+from phial import Phial, Schedule
+from tests.bot.test_handle_request import MockClient, build_request
+
+
+def test_watchdog_disabled_by_default() -> None:
+    """Test the watchdog is opt in."""
+    bot = Phial("app-token", "bot-token")
+
+    assert bot.watchdog is None
+    assert bot.scheduler.watchdog is None
+
+
+def test_slow_command_logged(caplog: pytest.LogCaptureFixture) -> None:
+    """Test a command over the threshold is logged with its message."""
+    bot = Phial(
+        "app-token",
+        "bot-token",
+        config={"slowThreshold": 0.1, "slowSampleInterval": 0.01},
+    )
+    bot._send_response = lambda *_: None  # type: ignore
+
+    @bot.command("slow")
+    def slow() -> str:
+        time.sleep(0.3)
+        return "done"
+
+    request = build_request("!slow", "channel", "user", "timestamp", "team")
+    bot._handle_request(cast(SocketModeClient, MockClient()), request)
+    assert bot.watchdog is not None
+    bot.watchdog.stop()
+
+    assert "Command !slow took" in caplog.text
+    assert "channel" in caplog.text
+    assert "in slow" in caplog.text
+
+
+def test_slow_command_with_timeout_logged(caplog: pytest.LogCaptureFixture) -> None:
+    """Test a command run in a worker thread is sampled on that thread."""
+    bot = Phial(
+        "app-token",
+        "bot-token",
+        config={
+            "slowThreshold": 0.1,
+            "slowSampleInterval": 0.01,
+            "commandTimeout": 5,
+        },
+    )
+    bot._send_response = lambda *_: None  # type: ignore
+
+    @bot.command("slow")
+    def slow() -> str:
+        time.sleep(0.3)
+        return "done"
+
+    request = build_request("!slow", "channel", "user", "timestamp", "team")
+    bot._handle_request(cast(SocketModeClient, MockClient()), request)
+    assert bot.watchdog is not None
+    bot.watchdog.stop()
+
+    assert "in slow" in caplog.text
+
+
+def test_slow_scheduled_job_logged(caplog: pytest.LogCaptureFixture) -> None:
+    """Test a scheduled job over the threshold is logged."""
+    bot = Phial(
+        "app-token",
+        "bot-token",
+        config={"slowThreshold": 0.1, "slowSampleInterval": 0.01},
+    )
+
+    @bot.scheduled(Schedule().every().second())
+    def slow_job() -> None:
+        time.sleep(0.3)
+
+    job = bot.scheduler.jobs[0]
+    job.next_run = job.next_run.replace(year=2000)
+    bot.scheduler.run_pending()
+    assert bot.watchdog is not None
+    bot.watchdog.stop()
+
+    assert "Scheduled job slow_job took" in caplog.text
+    assert "in slow_job" in caplog.text
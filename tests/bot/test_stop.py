@@ -0,0 +1,107 @@
+"""Test stop."""
+
+import threading
+import time
+from typing import cast
+from unittest.mock import MagicMock
+
+from slack_sdk.socket_mode import SocketModeClient
+
+from phial import Phial
+from phial.scheduler import Schedule, ScheduledJob
+from tests.bot.test_handle_request import build_request
+
+
+class CountingClient:
+    """Mock client which counts acknowledgements."""
+
+    def __init__(self) -> None:
+        self.acks = 0
+
+    def send_socket_mode_response(self, *_: object) -> None:
+        """Mock send_socket_mode_response."""
+        self.acks += 1
+
+
+def test_stop_waits_for_in_flight_commands() -> None:
+    """Test stop lets running commands finish."""
+    bot = Phial("app-token", "bot-token")
+    bot.slack_client = MagicMock()
+    finished = [False]
+    started = threading.Event()
+
+    @bot.command("slow")
+    def slow() -> None:
+        started.set()
+        time.sleep(0.2)
+        finished[0] = True
+
+    client = cast(SocketModeClient, CountingClient())
+    request = build_request("!slow", "channel", "user", "timestamp", "team")
+    thread = threading.Thread(target=bot._handle_request, args=(client, request))
+    thread.start()
+    started.wait()
+
+    report = bot.stop(timeout=5)
+
+    assert finished[0]
+    assert report.clean
+    bot.slack_client.close.assert_called_once()
+
+
+def test_stop_reports_abandoned_requests() -> None:
+    """Test stop gives up on commands which run past the deadline."""
+    bot = Phial("app-token", "bot-token")
+    bot.slack_client = MagicMock()
+    started = threading.Event()
+    release = threading.Event()
+
+    @bot.command("hang")
+    def hang() -> None:
+        started.set()
+        release.wait()
+
+    client = cast(SocketModeClient, CountingClient())
+    request = build_request("!hang", "channel", "user", "timestamp", "team")
+    thread = threading.Thread(target=bot._handle_request, args=(client, request))
+    thread.start()
+    started.wait()
+
+    report = bot.stop(timeout=0.1)
+    release.set()
+    thread.join()
+
+    assert report.abandoned_requests == ["envelope_id"]
+    assert not report.clean
+    bot.slack_client.disconnect.assert_called_once()
+    assert bot.stop() is report
+
+
+def test_requests_not_acknowledged_after_stop() -> None:
+    """Test new envelopes are left for Slack to redeliver once stopping."""
+    bot = Phial("app-token", "bot-token")
+    bot.slack_client = MagicMock()
+    command = MagicMock()
+    bot.add_command("test", command)
+
+    bot.stop(timeout=0)
+    client = CountingClient()
+    request = build_request("!test", "channel", "user", "timestamp", "team")
+    bot._handle_request(cast(SocketModeClient, client), request)
+
+    assert client.acks == 0
+    command.assert_not_called()
+
+
+def test_stop_reports_running_scheduled_jobs() -> None:
+    """Test scheduled jobs still running after the deadline are reported."""
+    bot = Phial("app-token", "bot-token")
+    bot.slack_client = MagicMock()
+
+    def nightly() -> None:
+        pass
+
+    bot.scheduler.running_jobs.append(ScheduledJob(Schedule().every().day(), nightly))
+    report = bot.stop(timeout=0)
+
+    assert report.abandoned_jobs == ["nightly"]
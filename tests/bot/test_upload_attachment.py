@@ -3,13 +3,13 @@
 import io
 from typing import Any
 
+import pytest
 import slack_sdk
 
 from phial import Attachment, Phial
-from tests.helpers import wildpatch
 
 
-def test_send_attachment() -> None:
+def test_send_attachment(monkeypatch: pytest.MonkeyPatch) -> None:
     """Test send attachments calls correctly."""
 
     def mock_api_call(*_: Any, **kwargs: Any) -> None:
@@ -18,7 +18,7 @@ def test_send_attachment() -> None:
         assert kwargs["file"].getvalue() == "content"
         assert kwargs["title"] == "file_name"
 
-    wildpatch(slack_sdk.WebClient, "files_upload_v2", mock_api_call)
+    monkeypatch.setattr(slack_sdk.WebClient, "files_upload_v2", mock_api_call)
     output = io.StringIO()
     output.write("content")
     attachment = Attachment("channel", "file_name", output)
@@ -0,0 +1,216 @@
+"""Test pausing calls to failing Slack Web API methods."""
+
+import asyncio
+import time
+from typing import Any, cast
+
+import pytest
+
+from phial import AsyncPhial, Phial, Response
+from phial.breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitBreakers
+from phial.errors import CircuitOpenError
+from phial.outbox import retry_delay
+from tests.outbox.test_outbox import slack_error
+
+
+def fail(breaker: CircuitBreaker, error: Exception | None = None) -> None:
+    """Make a failing call through a breaker."""
+    with pytest.raises(type(error or ConnectionError())), breaker.call():
+        raise error or ConnectionError
+
+
+def succeed(breaker: CircuitBreaker) -> None:
+    """Make a successful call through a breaker."""
+    with breaker.call():
+        pass
+
+
+def test_opens_at_error_rate() -> None:
+    """Test the breaker opens once enough calls fail, then fails fast."""
+    changes: list[tuple[str, str]] = []
+    breaker = CircuitBreaker(
+        "chat_postMessage",
+        min_calls=4,
+        open_seconds=10,
+        on_change=lambda *change: changes.append(change),
+    )
+
+    succeed(breaker)
+    succeed(breaker)
+    fail(breaker)
+    assert breaker.state == CLOSED
+    fail(breaker)
+
+    assert breaker.state == OPEN
+    assert changes == [("chat_postMessage", OPEN)]
+    with pytest.raises(CircuitOpenError) as error, breaker.call():
+        raise AssertionError("Should not be called")
+    assert error.value.method == "chat_postMessage"
+    assert 5 <= error.value.retry_after <= 10
+
+
+def test_needs_minimum_calls() -> None:
+    """Test a few failures don't open the breaker."""
+    breaker = CircuitBreaker("chat_postMessage", min_calls=3)
+
+    fail(breaker)
+    fail(breaker)
+
+    assert breaker.state == CLOSED
+
+
+def test_rejected_requests_are_not_failures() -> None:
+    """Test errors for bad requests don't count, as Slack is working."""
+    breaker = CircuitBreaker("chat_postMessage", min_calls=2)
+
+    fail(breaker, slack_error(404))
+    fail(breaker, slack_error(404))
+    assert breaker.state == CLOSED
+    fail(breaker, slack_error(503))
+    fail(breaker, slack_error(429))
+    assert breaker.state == OPEN
+
+
+def test_slow_calls_are_failures() -> None:
+    """Test calls slower than the slow call threshold count as failures."""
+    breaker = CircuitBreaker("chat_postMessage", min_calls=2, slow_call=0.01)
+
+    for _ in range(2):
+        with breaker.call():
+            time.sleep(0.02)
+
+    assert breaker.state == OPEN
+
+
+def test_old_calls_forgotten() -> None:
+    """Test only calls within the window count."""
+    breaker = CircuitBreaker("chat_postMessage", min_calls=2, window=0.05)
+
+    fail(breaker)
+    time.sleep(0.06)
+    succeed(breaker)
+    succeed(breaker)
+    fail(breaker)
+
+    assert breaker.state == CLOSED
+
+
+def test_half_open_probes_close() -> None:
+    """Test a few probes are let through once open, closing it if they succeed."""
+    breaker = CircuitBreaker(
+        "chat_postMessage",
+        min_calls=1,
+        open_seconds=0.01,
+        probes=2,
+    )
+    fail(breaker)
+    time.sleep(0.01)
+
+    with breaker.call(), breaker.call():
+        assert breaker.state == HALF_OPEN
+        with pytest.raises(CircuitOpenError), breaker.call():
+            pass
+    assert breaker.state == CLOSED
+
+
+def test_failed_probe_reopens_for_longer() -> None:
+    """Test a failed probe opens the breaker again, backing off."""
+    breaker = CircuitBreaker("chat_postMessage", min_calls=1, open_seconds=0.01)
+    fail(breaker)
+    time.sleep(0.01)
+
+    fail(breaker)
+
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpenError) as error, breaker.call():
+        pass
+    assert 0.005 < error.value.retry_after <= 0.02
+
+
+def test_breaker_per_method() -> None:
+    """Test each method gets its own breaker."""
+    breakers = CircuitBreakers(min_calls=1)
+
+    fail(breakers["chat_postMessage"])
+
+    assert breakers["reactions_add"] is breakers["reactions_add"]
+    assert breakers.states() == {"chat_postMessage": OPEN, "reactions_add": CLOSED}
+
+
+def test_outbox_waits_for_breaker() -> None:
+    """Test calls in the outbox are retried once the breaker is due to close."""
+    assert retry_delay(CircuitOpenError("chat_postMessage", 12)) == 12
+
+
+class FailingWebClient:
+    """A Web API client whose calls fail, counting them."""
+
+    def __init__(self) -> None:
+        self.calls = 0
+
+    def chat_postMessage(self, **_: Any) -> None:  # noqa: N802
+        """Fail to post a message."""
+        self.calls += 1
+        raise ConnectionError("Slack is down")
+
+
+def test_bot_fails_fast() -> None:
+    """Test a bot stops calling a failing method, counting the change."""
+    bot = Phial(
+        "app-token",
+        "bot-token",
+        config={"circuitBreaker": True, "circuitMinCalls": 2},
+    )
+    web_client = FailingWebClient()
+    bot.slack_client.web_client = cast(Any, web_client)
+
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            bot.send_message(Response(channel="C1", text="Hi"))
+    with pytest.raises(CircuitOpenError):
+        bot.send_message(Response(channel="C1", text="Hi"))
+
+    assert web_client.calls == 2
+    assert bot._metrics.circuit_breaker_changes.value("chat_postMessage", OPEN) == 1
+    assert bot._metrics.slack_api_errors.value("chat_postMessage") == 2
+
+
+def test_breaker_disabled_by_default() -> None:
+    """Test calls are always made unless the breaker is configured."""
+    bot = Phial("app-token", "bot-token")
+    web_client = FailingWebClient()
+    bot.slack_client.web_client = cast(Any, web_client)
+
+    for _ in range(20):
+        with pytest.raises(ConnectionError):
+            bot.send_message(Response(channel="C1", text="Hi"))
+
+    assert bot.breakers is None
+    assert web_client.calls == 20
+
+
+def test_async_bot_fails_fast() -> None:
+    """Test AsyncPhial stops calling a failing method."""
+    bot = AsyncPhial(
+        "app-token",
+        "bot-token",
+        config={"circuitBreaker": True, "circuitMinCalls": 1},
+    )
+    calls = []
+
+    class AsyncFailingWebClient:
+        async def chat_postMessage(self, **_: Any) -> None:  # noqa: N802
+            calls.append(1)
+            raise ConnectionError("Slack is down")
+
+    bot.web_client = AsyncFailingWebClient()
+
+    async def run() -> None:
+        with pytest.raises(ConnectionError):
+            await bot.send_message_async(Response(channel="C1", text="Hi"))
+        with pytest.raises(CircuitOpenError):
+            await bot.send_message_async(Response(channel="C1", text="Hi"))
+
+    asyncio.run(run())
+
+    assert len(calls) == 1
@@ -0,0 +1,289 @@
+"""Test sending one message to many channels."""
+
+import asyncio
+import threading
+import time
+from typing import Any, cast
+
+import pytest
+
+from phial import AsyncPhial, Phial, Response
+from phial.broadcast import FAILED, SENT, Broadcaster, BroadcastResult, ChannelDelivery
+from phial.replay import RecordingWebClient
+from tests.outbox.test_outbox import slack_error
+
+
+def fast_broadcaster(**options: Any) -> Broadcaster:  # noqa: ANN401
+    """Build a broadcaster with limits which don't slow tests down."""
+    defaults: dict[str, Any] = {
+        "rate_limit": (1000, 1),
+        "channel_rate_limit": (1000, 1),
+        "retry_delay": 0,
+    }
+    return Broadcaster(**{**defaults, **options})
+
+
+def test_sends_to_every_channel() -> None:
+    """Test the call is made once per channel, with the channel replaced."""
+    calls: list[tuple[str, dict[str, Any]]] = []
+    broadcaster = fast_broadcaster()
+
+    result = broadcaster.broadcast(
+        lambda method, **kwargs: calls.append((method, kwargs)),
+        "chat_postMessage",
+        {"channel": "", "text": "Hi"},
+        ["C1", "C2", "C3"],
+    )
+
+    assert sorted(calls, key=lambda call: call[1]["channel"]) == [
+        ("chat_postMessage", {"channel": "C1", "text": "Hi"}),
+        ("chat_postMessage", {"channel": "C2", "text": "Hi"}),
+        ("chat_postMessage", {"channel": "C3", "text": "Hi"}),
+    ]
+    assert result.ok
+    assert result.sent == ["C1", "C2", "C3"]
+    assert result.failed == []
+    assert result.done == result.total == 3
+    assert result.deliveries["C1"] == ChannelDelivery("C1", SENT, 1)
+
+
+def test_duplicate_channels_sent_once() -> None:
+    """Test a channel listed twice only gets the message once."""
+    calls: list[str] = []
+    broadcaster = fast_broadcaster()
+
+    result = broadcaster.broadcast(
+        lambda _, **kwargs: calls.append(kwargs["channel"]),
+        "chat_postMessage",
+        {},
+        ["C1", "C2", "C1"],
+    )
+
+    assert sorted(calls) == ["C1", "C2"]
+    assert result.channels == ["C1", "C2"]
+
+
+def test_retries_transient_failures() -> None:
+    """Test sends failing with server and connection errors are retried."""
+    failures: dict[str, list[Exception]] = {
+        "C1": [slack_error(500)],
+        "C2": [ConnectionError(), ConnectionError()],
+    }
+    lock = threading.Lock()
+
+    def send(_: str, **kwargs: Any) -> None:  # noqa: ANN401
+        with lock:
+            errors = failures.get(kwargs["channel"])
+            if errors:
+                raise errors.pop()
+
+    result = fast_broadcaster().broadcast(
+        send,
+        "chat_postMessage",
+        {},
+        ["C1", "C2", "C3"],
+    )
+
+    assert result.ok
+    assert sorted(result.retried) == ["C1", "C2"]
+    assert result.deliveries["C2"].attempts == 3
+
+
+def test_gives_up() -> None:
+    """Test rejected sends fail straight away, and failing ones after retrying."""
+
+    def send(_: str, **kwargs: Any) -> None:  # noqa: ANN401
+        if kwargs["channel"] == "C1":
+            raise slack_error(404)
+        if kwargs["channel"] == "C2":
+            raise ConnectionError("Unreachable")
+
+    result = fast_broadcaster(retries=2).broadcast(
+        send,
+        "chat_postMessage",
+        {},
+        ["C1", "C2", "C3"],
+    )
+
+    assert not result.ok
+    assert result.sent == ["C3"]
+    assert sorted(result.failed) == ["C1", "C2"]
+    assert result.deliveries["C1"].attempts == 1
+    assert result.deliveries["C2"] == ChannelDelivery("C2", FAILED, 3, "Unreachable")
+
+
+def test_rate_limited_pauses_every_send() -> None:
+    """Test a 429 holds back every send until its Retry-After has passed."""
+    sent: dict[str, float] = {}
+    limited = [slack_error(429, {"Retry-After": "0.2"})]
+    lock = threading.Lock()
+
+    def send(_: str, **kwargs: Any) -> None:  # noqa: ANN401
+        with lock:
+            if limited:
+                raise limited.pop()
+            sent[kwargs["channel"]] = time.monotonic()
+
+    start = time.monotonic()
+    result = fast_broadcaster(concurrency=1).broadcast(
+        send,
+        "chat_postMessage",
+        {},
+        ["C1", "C2"],
+    )
+
+    assert result.ok
+    assert result.retried == ["C1"]
+    assert min(sent.values()) - start >= 0.2
+
+
+def test_bounded_concurrency() -> None:
+    """Test no more than the configured number of sends are in flight."""
+    in_flight = 0
+    most = 0
+    lock = threading.Lock()
+
+    def send(_: str, **__: Any) -> None:  # noqa: ANN401
+        nonlocal in_flight, most
+        with lock:
+            in_flight += 1
+            most = max(most, in_flight)
+        time.sleep(0.01)
+        with lock:
+            in_flight -= 1
+
+    channels = [f"C{number}" for number in range(20)]
+    result = fast_broadcaster(concurrency=3).broadcast(send, "m", {}, channels)
+
+    assert result.ok
+    assert most == 3
+
+
+def test_global_rate_limit() -> None:
+    """Test sends across every channel are held to the global rate limit."""
+    sent: list[float] = []
+    broadcaster = fast_broadcaster(rate_limit=(5, 0.5))
+
+    start = time.monotonic()
+    broadcaster.broadcast(
+        lambda *_, **__: sent.append(time.monotonic()),
+        "m",
+        {},
+        [f"C{number}" for number in range(8)],
+    )
+
+    # Five go at once, then the rest once tokens refill
+    assert len(sent) == 8
+    assert max(sent) - start >= 0.2
+
+
+def test_channel_rate_limit_shared() -> None:
+    """Test the per-channel limit carries over between broadcasts."""
+    broadcaster = fast_broadcaster(channel_rate_limit=(1, 0.2))
+
+    start = time.monotonic()
+    broadcaster.broadcast(lambda *_, **__: None, "m", {}, ["C1"])
+    broadcaster.broadcast(lambda *_, **__: None, "m", {}, ["C1"])
+
+    assert time.monotonic() - start >= 0.15
+
+
+def test_channel_limit_keeps_global_token() -> None:
+    """Test a send held back by its channel doesn't use a global token."""
+    broadcaster = fast_broadcaster(rate_limit=(2, 60), channel_rate_limit=(1, 60))
+
+    assert broadcaster._wait_time("C1") == 0
+    assert broadcaster._wait_time("C1") > 0
+    assert broadcaster._wait_time("C1") > 0
+
+    assert broadcaster._wait_time("C2") == 0
+
+
+def test_progress_callback() -> None:
+    """Test progress is reported for each channel, even if the callback fails."""
+    progress: list[tuple[str, int]] = []
+
+    def on_progress(delivery: ChannelDelivery, result: BroadcastResult) -> None:
+        progress.append((delivery.channel, result.done))
+        raise ValueError("Callback broken")
+
+    result = fast_broadcaster().broadcast(
+        lambda *_, **__: None,
+        "m",
+        {},
+        ["C1", "C2", "C3"],
+        on_progress=on_progress,
+    )
+
+    assert result.ok
+    assert sorted(channel for channel, _ in progress) == ["C1", "C2", "C3"]
+    assert [done for _, done in progress] == [1, 2, 3]
+
+
+def test_bot_broadcast() -> None:
+    """Test a bot builds the message once and sends it to each channel."""
+    bot = Phial("app-token", "bot-token")
+    web_client = RecordingWebClient()
+    bot.slack_client.web_client = cast(Any, web_client)
+
+    result = bot.broadcast(
+        Response(channel="", text="Deploying", attachments=[{"text": "v2"}]),
+        ["C1", "C2"],
+    )
+
+    assert result.ok
+    assert sorted((m, kw["channel"], kw["text"]) for m, kw in web_client.calls) == [
+        ("chat_postMessage", "C1", "Deploying"),
+        ("chat_postMessage", "C2", "Deploying"),
+    ]
+    # The attachments are serialized once, not per channel
+    first, second = (kwargs["attachments"] for _, kwargs in web_client.calls)
+    assert first is second
+
+
+def test_async_bot_broadcast() -> None:
+    """Test an async bot broadcasts with its async client."""
+    bot = AsyncPhial("app-token", "bot-token")
+    web_client = RecordingWebClient(asynchronous=True)
+    bot.web_client = web_client
+    progress: list[str] = []
+
+    result = asyncio.run(
+        bot.broadcast_async(
+            Response(channel="", text="Deploying"),
+            ["C1", "C2", "C3"],
+            on_progress=lambda delivery, _: progress.append(delivery.channel),
+        ),
+    )
+
+    assert result.ok
+    assert sorted(kwargs["channel"] for _, kwargs in web_client.calls) == [
+        "C1",
+        "C2",
+        "C3",
+    ]
+    assert sorted(progress) == ["C1", "C2", "C3"]
+
+
+def test_async_retries() -> None:
+    """Test async sends are retried and rejected ones fail."""
+    failures = [ConnectionError()]
+
+    async def send(_: str, **kwargs: Any) -> None:  # noqa: ANN401
+        if kwargs["channel"] == "C1" and failures:
+            raise failures.pop()
+        if kwargs["channel"] == "C2":
+            raise slack_error(404)
+
+    result = asyncio.run(
+        fast_broadcaster().broadcast_async(send, "m", {}, ["C1", "C2"]),
+    )
+
+    assert result.retried == ["C1"]
+    assert result.failed == ["C2"]
+
+
+def test_concurrency_validated() -> None:
+    """Test a broadcaster needs to send at least one message at a time."""
+    with pytest.raises(ValueError, match="at least 1"):
+        Broadcaster(concurrency=0)
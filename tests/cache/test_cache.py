@@ -0,0 +1,165 @@
+"""Test the TTL cache."""
+
+import asyncio
+import threading
+import time
+
+import pytest
+from freezegun import freeze_time
+
+from phial.cache import TTLCache
+
+
+def test_get_and_set() -> None:
+    """Test values can be cached."""
+    cache: TTLCache[str] = TTLCache(10)
+
+    cache.set("key", "value")
+
+    assert cache.get("key") == "value"
+    assert cache.get("missing", "default") == "default"
+
+
+def test_entries_expire() -> None:
+    """Test entries are dropped once their TTL has passed."""
+    with freeze_time("2025-01-01 00:00:00") as frozen:
+        cache: TTLCache[str] = TTLCache(10)
+        cache.set("key", "value")
+        frozen.tick(11)
+
+        assert cache.get("key") is None
+        assert len(cache) == 0
+
+
+def test_least_recently_used_evicted() -> None:
+    """Test the least recently used entry is evicted once full."""
+    cache: TTLCache[int] = TTLCache(10, maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+
+    cache.set("c", 3)
+
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+
+
+def test_clear() -> None:
+    """Test the cache can be emptied."""
+    cache: TTLCache[int] = TTLCache(10)
+    cache.set("a", 1)
+
+    cache.clear()
+
+    assert len(cache) == 0
+
+
+def test_invalid_arguments() -> None:
+    """Test a cache must have a positive TTL and size."""
+    with pytest.raises(ValueError, match="TTL"):
+        TTLCache(0)
+    with pytest.raises(ValueError, match="size"):
+        TTLCache(1, maxsize=0)
+
+
+def test_get_or_call_caches_result() -> None:
+    """Test the function is only called on a miss."""
+    cache: TTLCache[int] = TTLCache(10)
+    calls: list[int] = []
+
+    def func() -> int:
+        calls.append(1)
+        return 42
+
+    assert cache.get_or_call("key", func) == (42, False)
+    assert cache.get_or_call("key", func) == (42, True)
+    assert len(calls) == 1
+
+
+def test_get_or_call_store() -> None:
+    """Test values can be excluded from the cache."""
+    cache: TTLCache[int] = TTLCache(10)
+
+    cache.get_or_call("key", lambda: 1, store=lambda _: False)
+
+    assert len(cache) == 0
+
+
+def test_get_or_call_does_not_cache_errors() -> None:
+    """Test exceptions are raised and not cached."""
+    cache: TTLCache[int] = TTLCache(10)
+
+    def fail() -> int:
+        raise RuntimeError("Failed")
+
+    with pytest.raises(RuntimeError):
+        cache.get_or_call("key", fail)
+
+    assert cache.get_or_call("key", lambda: 1) == (1, False)
+
+
+def test_get_or_call_single_flight() -> None:
+    """Test concurrent misses only call the function once."""
+    cache: TTLCache[int] = TTLCache(10)
+    calls: list[int] = []
+    results: list[tuple[int, bool]] = []
+
+    def slow() -> int:
+        calls.append(1)
+        time.sleep(0.2)
+        return 42
+
+    threads = [
+        threading.Thread(target=lambda: results.append(cache.get_or_call("k", slow)))
+        for _ in range(5)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert [value for value, _ in results] == [42] * 5
+
+
+def test_get_or_call_async_single_flight() -> None:
+    """Test concurrent async misses only await the function once."""
+    cache: TTLCache[int] = TTLCache(10)
+    calls: list[int] = []
+
+    async def slow() -> int:
+        calls.append(1)
+        await asyncio.sleep(0.1)
+        return 42
+
+    async def run() -> list[tuple[int, bool]]:
+        return await asyncio.gather(
+            *(cache.get_or_call_async("key", slow) for _ in range(5)),
+        )
+
+    results = asyncio.run(run())
+
+    assert len(calls) == 1
+    assert [value for value, _ in results] == [42] * 5
+    assert asyncio.run(cache.get_or_call_async("key", slow)) == (42, True)
+
+
+def test_get_or_call_async_errors_reach_waiters() -> None:
+    """Test callers waiting on a failed call see its exception."""
+    cache: TTLCache[int] = TTLCache(10)
+
+    async def fail() -> int:
+        await asyncio.sleep(0.1)
+        raise RuntimeError("Failed")
+
+    async def run() -> list[object]:
+        return await asyncio.gather(
+            *(cache.get_or_call_async("key", fail) for _ in range(2)),
+            return_exceptions=True,
+        )
+
+    results = asyncio.run(run())
+
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert len(cache) == 0
@@ -1,7 +1,12 @@
 """Test help command."""
 
+from typing import Any, cast
+
+from slack_sdk.socket_mode import SocketModeClient
+
 from phial import Phial
-from phial.commands import help_command
+from phial.commands import HelpIndex, help_command
+from tests.bot.test_handle_request import MockClient, build_request
 
 
 def test_returns_help_string_correctly() -> None:
@@ -85,3 +90,86 @@ def test_returns_help_string_correctly_when_no_base() -> None:
     help_text = help_command(bot)
     expected_help_text = "*test* - Help.\n"
     assert help_text == expected_help_text
+
+
+def test_help_is_cached() -> None:
+    """Test the help text is only rendered once."""
+    bot = Phial("app-token", "bot-token")
+
+    assert bot.help_index is bot.help_index
+
+
+def test_help_is_rebuilt_when_command_added() -> None:
+    """Test adding a command invalidates the cached help text."""
+    bot = Phial("app-token", "bot-token")
+    help_command(bot)
+
+    @bot.command("test")
+    def test() -> None:
+        """Help."""
+
+    assert "*!test* - Help." in help_command(bot)
+
+
+def test_help_is_split_into_pages() -> None:
+    """Test help text longer than a page is split into pages."""
+    bot = Phial("app-token", "bot-token", config={"helpPageSize": 200})
+    for number in range(10):
+        bot.add_command(f"command{number}", lambda: None, help_text_override="x" * 30)
+
+    pages = bot.help_index.pages
+
+    assert len(pages) > 1
+    assert all(len(page) <= 200 for page in pages)
+    assert pages[0].startswith("All available commands:\n")
+    assert pages[0].endswith(f"Page 1 of {len(pages)}, use !help <page> to see more\n")
+    assert "".join(pages).count("*!command") == 10
+    assert help_command(bot, "2") == pages[1]
+    assert help_command(bot, "99") == f"There are only {len(pages)} pages of help"
+
+
+def test_help_search() -> None:
+    """Test searching matches word prefixes in patterns and help text."""
+    bot = Phial("app-token", "bot-token")
+    bot.add_command(
+        "deploy <service>",
+        lambda service: service,
+        help_text_override="Ship",
+    )
+    bot.add_command(
+        "rollback <service>",
+        lambda service: service,
+        help_text_override="Undo a deploy",
+    )
+    bot.add_command("weather", lambda: None, help_text_override="Today's forecast")
+
+    assert help_command(bot, "deploy") == (
+        "*!deploy <service>* - Ship\n*!rollback <service>* - Undo a deploy\n"
+    )
+    assert help_command(bot, "undo dep") == "*!rollback <service>* - Undo a deploy\n"
+    assert help_command(bot, "fore") == "*!weather* - Today's forecast\n"
+    assert help_command(bot, "service") == "No commands found matching service"
+
+
+def test_help_index_skips_hidden_commands() -> None:
+    """Test hidden commands can not be found by searching."""
+    bot = Phial("app-token", "bot-token")
+    bot.add_command("secret", lambda: None, hide_from_help_command=True)
+
+    assert HelpIndex(bot.commands).search("secret") == []
+
+
+def test_help_with_term_command() -> None:
+    """Test the help command can be searched from Slack."""
+    bot = Phial("app-token", "bot-token")
+    sent: list[Any] = []
+    bot._send_response = lambda r, _: sent.append(r)  # type: ignore
+
+    @bot.command("weather")
+    def weather() -> None:
+        """Today's forecast."""
+
+    request = build_request("!help forecast", "channel", "user", "ts", "team")
+    bot._handle_request(cast(SocketModeClient, MockClient()), request)
+
+    assert sent == ["*!weather* - Today's forecast.\n"]
@@ -0,0 +1,303 @@
+"""Test spreading Socket Mode intake over several connections."""
+
+import asyncio
+import threading
+import time
+from itertools import pairwise
+from typing import Any, cast
+
+import pytest
+from slack_sdk.socket_mode import SocketModeClient
+from slack_sdk.socket_mode.aiohttp import SocketModeClient as AsyncSocketModeClient
+
+from phial import AsyncPhial, Phial
+from phial.connections import AsyncConnectionPool, ConnectionPool, EnvelopeDeduper
+from tests.bot.test_handle_request import MockClient, build_request
+from tests.fake_slack.server import FakeSlack
+
+
+class FakeClient:
+    """Records when it connects, taking a little time to do so."""
+
+    def __init__(self, log: list[tuple[str, float, float]], name: str) -> None:
+        self.log = log
+        self.name = name
+        self.socket_mode_request_listeners: list[Any] = []
+
+    def connect(self) -> None:
+        """Record a connection."""
+        start = time.monotonic()
+        time.sleep(0.01)
+        self.log.append((self.name, start, time.monotonic()))
+
+    def connect_to_new_endpoint(self, _force: bool = False) -> None:  # noqa: FBT001, FBT002
+        """Record a reconnection."""
+        self.connect()
+
+
+class AsyncFakeClient:
+    """Records when it connects, asynchronously."""
+
+    def __init__(self, log: list[tuple[str, float, float]], name: str) -> None:
+        self.log = log
+        self.name = name
+        self.socket_mode_request_listeners: list[Any] = []
+
+    async def connect(self) -> None:
+        """Record a connection."""
+        start = time.monotonic()
+        await asyncio.sleep(0.01)
+        self.log.append((self.name, start, time.monotonic()))
+
+    async def connect_to_new_endpoint(self, _force: bool = False) -> None:  # noqa: FBT001, FBT002
+        """Record a reconnection."""
+        await self.connect()
+
+
+def build_pool(count: int, stagger: float = 0.05) -> tuple[ConnectionPool, list]:
+    """Build a pool of fake clients and the log of their connections."""
+    log: list[tuple[str, float, float]] = []
+    clients = [FakeClient(log, f"client{number}") for number in range(count)]
+    return ConnectionPool(cast(list[SocketModeClient], clients), stagger=stagger), log
+
+
+def test_deduper() -> None:
+    """Test envelope IDs are only first once, and old IDs forgotten."""
+    deduper = EnvelopeDeduper(size=2)
+
+    assert deduper.first("a")
+    assert not deduper.first("a")
+    assert deduper.first("b")
+    assert deduper.first("c")
+    assert len(deduper) == 2
+    assert deduper.first("a")
+
+
+def test_first_delivery() -> None:
+    """Test duplicate envelopes are counted and reported."""
+    duplicates: list[str] = []
+    pool = ConnectionPool(
+        [cast(SocketModeClient, FakeClient([], "client"))],
+        on_duplicate=lambda req: duplicates.append(req.envelope_id),
+    )
+    request = build_request("hello", "C1", "U1", "1", "T1")
+
+    assert pool.first_delivery(request)
+    assert not pool.first_delivery(request)
+    assert pool.duplicates == 1
+    assert duplicates == ["envelope_id"]
+
+
+def test_empty_pool() -> None:
+    """Test a pool needs at least one client."""
+    with pytest.raises(ValueError, match="at least one client"):
+        ConnectionPool([])
+
+
+def test_add_listener() -> None:
+    """Test listeners are added to every client."""
+    pool, _ = build_pool(3)
+
+    pool.add_listener(print)
+
+    assert all(
+        client.socket_mode_request_listeners == [print] for client in pool.clients
+    )
+
+
+def test_connections_staggered() -> None:
+    """Test the first connection opens straight away and the rest are staggered."""
+    pool, log = build_pool(3)
+
+    pool.connect()
+    assert [name for name, _, _ in log] == ["client0"]
+    deadline = time.monotonic() + 2
+    while len(log) < 3 and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert [name for name, _, _ in log] == ["client0", "client1", "client2"]
+    assert all(later[1] - earlier[2] >= 0.05 for earlier, later in pairwise(log))
+    assert pool.connects == 3
+
+
+def test_reconnects_one_at_a_time() -> None:
+    """Test clients reconnecting at once take turns, staggered."""
+    pool, log = build_pool(3)
+    threads = [
+        threading.Thread(target=client.connect_to_new_endpoint, args=(True,))
+        for client in pool.clients
+    ]
+
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    spans = sorted((start, end) for _, start, end in log)
+    assert len(spans) == 3
+    assert all(later[0] - earlier[1] >= 0.05 for earlier, later in pairwise(spans))
+
+
+def test_lone_connection_not_delayed() -> None:
+    """Test a single connection reconnects without waiting."""
+    pool, log = build_pool(1, stagger=10)
+
+    pool.connect()
+    pool.clients[0].connect_to_new_endpoint()
+
+    assert len(log) == 2
+
+
+def test_close_stops_connecting() -> None:
+    """Test closing the pool stops opening staggered connections."""
+    pool, log = build_pool(2, stagger=10)
+
+    pool.connect()
+    pool.close()
+    time.sleep(0.05)
+
+    assert [name for name, _, _ in log] == ["client0"]
+
+
+def test_async_connections_staggered() -> None:
+    """Test the async pool staggers connections and reconnects."""
+    log: list[tuple[str, float, float]] = []
+    clients = [AsyncFakeClient(log, f"client{number}") for number in range(2)]
+    pool = AsyncConnectionPool(
+        cast(list[AsyncSocketModeClient], clients),
+        stagger=0.05,
+    )
+
+    async def run() -> None:
+        await pool.connect()
+        assert len(log) == 1
+        await asyncio.sleep(0.1)
+        await pool.clients[0].connect_to_new_endpoint()
+        pool.close()
+
+    asyncio.run(run())
+
+    assert [name for name, _, _ in log] == ["client0", "client1", "client0"]
+    assert all(later[1] - earlier[2] >= 0.05 for earlier, later in pairwise(log))
+
+
+def test_duplicate_envelopes_handled_once() -> None:
+    """Test an envelope received twice is acknowledged twice but handled once."""
+    bot = Phial("app-token", "bot-token")
+    bot.connections = bot._create_connections()
+    calls: list[str] = []
+    acks: list[Any] = []
+
+    @bot.command("hello")
+    def hello() -> None:
+        calls.append("hello")
+
+    client = MockClient()
+    client.send_socket_mode_response = acks.append  # type: ignore[method-assign]
+    request = build_request("!hello", "C1", "U1", "1", "T1")
+    bot._handle_request(cast(SocketModeClient, client), request)
+    bot._handle_request(cast(SocketModeClient, client), request)
+
+    assert calls == ["hello"]
+    assert len(acks) == 2
+    assert bot._metrics.duplicate_envelopes.value("events_api") == 1
+    assert bot._metrics.envelopes.value("events_api") == 1
+
+
+def test_failed_ack_not_deduplicated() -> None:
+    """Test an envelope whose acknowledgement failed is handled when resent."""
+    bot = Phial("app-token", "bot-token")
+    bot.connections = bot._create_connections()
+    calls: list[str] = []
+
+    @bot.command("hello")
+    def hello() -> None:
+        calls.append("hello")
+
+    class FailingClient:
+        def send_socket_mode_response(self, _: Any) -> None:
+            raise ConnectionError
+
+    request = build_request("!hello", "C1", "U1", "1", "T1")
+    bot._handle_request(cast(SocketModeClient, FailingClient()), request)
+    bot._handle_request(cast(SocketModeClient, MockClient()), request)
+
+    assert calls == ["hello"]
+
+
+def test_async_duplicate_envelopes_handled_once() -> None:
+    """Test AsyncPhial handles an envelope received twice once."""
+    bot = AsyncPhial("app-token", "bot-token")
+    log: list[tuple[str, float, float]] = []
+    bot.connections = AsyncConnectionPool(
+        [cast(AsyncSocketModeClient, AsyncFakeClient(log, "c"))],
+    )
+    calls: list[str] = []
+
+    @bot.command("hello")
+    async def hello() -> None:
+        calls.append("hello")
+
+    class AsyncMockClient:
+        async def send_socket_mode_response(self, _: Any) -> None:
+            pass
+
+    async def run() -> None:
+        request = build_request("!hello", "C1", "U1", "1", "T1")
+        client = cast(AsyncSocketModeClient, AsyncMockClient())
+        await bot._handle_request_async(client, request)
+        await bot._handle_request_async(client, request)
+
+    asyncio.run(run())
+
+    assert calls == ["hello"]
+
+
+def test_invalid_connections() -> None:
+    """Test the connections config value must be at least 1."""
+    bot = Phial("app-token", "bot-token", config={"connections": 0})
+
+    with pytest.raises(ValueError, match="at least 1"):
+        bot._create_connections()
+
+
+def test_multiple_connections_end_to_end() -> None:
+    """Test a bot with two connections keeps handling envelopes through reconnects."""
+    with FakeSlack(disconnect_grace=0.2) as slack:
+        bot = Phial(
+            "xapp-token",
+            "xoxb-token",
+            config={
+                "apiUrl": slack.api_url,
+                "handleSignals": False,
+                "connections": 2,
+                "connectionStagger": 0.05,
+            },
+        )
+
+        @bot.command("echo <text>")
+        def echo(text: str) -> str:
+            return text
+
+        thread = threading.Thread(target=bot.run, daemon=True)
+        thread.start()
+        try:
+            assert slack.wait_for_connection(2)
+            for number in range(10):
+                slack.send_message(f"!echo {number}")
+            assert slack.wait_for_calls(10, method="chat.postMessage")
+
+            slack.disconnect()
+            for number in range(10, 20):
+                slack.send_message(f"!echo {number}")
+            assert slack.wait_for_calls(20, method="chat.postMessage")
+            assert slack.wait_for_connection(2)
+        finally:
+            bot.stop()
+            thread.join(5)
+
+    replies = [
+        call.params["text"] for call in slack.calls if call.method == "chat.postMessage"
+    ]
+    assert sorted(replies, key=int) == [str(number) for number in range(20)]
+    assert slack.connections >= 4
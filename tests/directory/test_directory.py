@@ -0,0 +1,193 @@
+"""Test the users and channels directory."""
+
+import asyncio
+from typing import Any
+
+import pytest
+from slack_sdk.errors import SlackApiError
+
+from phial import Channel, User
+from phial.directory import Directory, parse_id
+
+USERS: dict[str, dict[str, Any]] = {
+    "U1": {"id": "U1", "name": "alice", "profile": {"display_name": "Al"}},
+    "U2": {"id": "U2", "name": "bob", "real_name": "Bob B", "is_bot": True},
+}
+CHANNELS: dict[str, dict[str, Any]] = {
+    "C1": {"id": "C1", "name": "general", "topic": {"value": "Chat"}},
+    "C2": {"id": "C2", "name": "secret", "is_private": True},
+}
+
+
+def api_error(error: str) -> SlackApiError:
+    """Build the error the Web API client raises for an error code."""
+    return SlackApiError("Failed", {"ok": False, "error": error})  # type: ignore[no-untyped-call]
+
+
+class FakeWebApi:
+    """A fake Slack Web API serving a small workspace."""
+
+    def __init__(self) -> None:
+        self.calls: list[tuple[str, dict[str, Any]]] = []
+
+    def __call__(self, method: str, **kwargs: Any) -> dict:
+        """Call a Web API method."""
+        self.calls.append((method, kwargs))
+        if method == "users_info":
+            if kwargs["user"] not in USERS:
+                raise api_error("user_not_found")
+            return {"user": USERS[kwargs["user"]]}
+        if method == "conversations_info":
+            if kwargs["channel"] not in CHANNELS:
+                raise api_error("channel_not_found")
+            return {"channel": CHANNELS[kwargs["channel"]]}
+        if method == "users_list":
+            return self._page("members", list(USERS.values()), kwargs)
+        if method == "conversations_list":
+            return self._page("channels", list(CHANNELS.values()), kwargs)
+        raise api_error("ratelimited")
+
+    @staticmethod
+    def _page(key: str, items: list[dict], kwargs: dict[str, Any]) -> dict:
+        # One item per page, with the index of the next item as the cursor
+        start = int(kwargs["cursor"] or 0)
+        next_cursor = str(start + 1) if start + 1 < len(items) else ""
+        return {
+            key: items[start : start + 1],
+            "response_metadata": {"next_cursor": next_cursor},
+        }
+
+
+@pytest.mark.parametrize(
+    ("value", "expected"),
+    [("U1", "U1"), ("<@U1>", "U1"), ("<@U1|alice>", "U1"), ("<#C1|general>", "C1")],
+)
+def test_parse_id(value: str, expected: str) -> None:
+    """Test IDs are taken from mentions and channel links."""
+    assert parse_id(value) == expected
+
+
+def test_user_lookup_cached() -> None:
+    """Test a user is only fetched once."""
+    api = FakeWebApi()
+    directory = Directory(api)
+
+    user = directory.user("<@U1>")
+
+    assert user == User(
+        "U1",
+        "alice",
+        display_name="Al",
+        profile={"display_name": "Al"},
+    )
+    assert directory.user("U1") is user
+    assert api.calls == [("users_info", {"user": "U1"})]
+
+
+def test_channel_lookup() -> None:
+    """Test channels are looked up."""
+    directory = Directory(FakeWebApi())
+
+    assert directory.channel("C1") == Channel("C1", "general", topic="Chat")
+    assert directory.get_channel("C1") is not None
+    assert directory.get_channel("C2") is None
+
+
+def test_unknown_user_and_channel() -> None:
+    """Test unknown IDs raise ValueError."""
+    directory = Directory(FakeWebApi())
+
+    with pytest.raises(ValueError, match="Unknown user U9"):
+        directory.user("U9")
+    with pytest.raises(ValueError, match="Unknown channel C9"):
+        directory.channel("C9")
+
+
+def test_other_errors_raised() -> None:
+    """Test errors other than not found are not hidden."""
+
+    def fail(method: str, **_: Any) -> dict:
+        raise api_error("ratelimited")
+
+    with pytest.raises(SlackApiError):
+        Directory(fail).user("U1")
+
+
+def test_preload_pages_through_lists() -> None:
+    """Test preloading fetches every page of users and channels."""
+    api = FakeWebApi()
+    directory = Directory(api, page_size=1)
+
+    directory.preload()
+
+    assert [method for method, _ in api.calls] == [
+        "users_list",
+        "users_list",
+        "conversations_list",
+        "conversations_list",
+    ]
+    assert api.calls[0][1]["limit"] == 1
+    assert directory.get_user("U2") == User("U2", "bob", real_name="Bob B", is_bot=True)
+    assert directory.get_channel("C2") == Channel("C2", "secret", is_private=True)
+    directory.user("U1")
+    assert len(api.calls) == 4
+
+
+def test_handle_user_change() -> None:
+    """Test user_change events update the cache."""
+    directory = Directory(FakeWebApi())
+    directory.user("U1")
+
+    handled = directory.handle_event(
+        {"type": "user_change", "user": {"id": "U1", "name": "alice2"}},
+    )
+
+    assert handled
+    assert directory.user("U1").name == "alice2"
+
+
+def test_handle_channel_rename() -> None:
+    """Test channel_rename events update the name of a cached channel."""
+    directory = Directory(FakeWebApi())
+    directory.channel("C1")
+
+    directory.handle_event(
+        {"type": "channel_rename", "channel": {"id": "C1", "name": "random"}},
+    )
+
+    assert directory.channel("C1") == Channel("C1", "random", topic="Chat")
+
+
+def test_handle_other_events() -> None:
+    """Test unrelated events are ignored."""
+    directory = Directory(FakeWebApi())
+
+    assert not directory.handle_event({"type": "message", "text": "hi"})
+    assert not directory.handle_event({})
+
+
+def test_async_lookups() -> None:
+    """Test users and channels can be looked up from an event loop."""
+    api = FakeWebApi()
+
+    async def call(method: str, **kwargs: Any) -> dict:
+        await asyncio.sleep(0)
+        return api(method, **kwargs)
+
+    directory = Directory(call_async=call, page_size=1)
+
+    async def run() -> tuple[User, Channel]:
+        await directory.preload_async()
+        return await directory.user_async("U1"), await directory.channel_async("C1")
+
+    user, channel = asyncio.run(run())
+
+    assert user.name == "alice"
+    assert channel.name == "general"
+    assert [method for method, _ in api.calls].count("users_info") == 0
+
+
+def test_missing_client() -> None:
+    """Test using the wrong flavour of lookup is reported."""
+    with pytest.raises(RuntimeError):
+        Directory().user("U1")
@@ -0,0 +1,474 @@
+"""A local stand-in for Slack, for testing bots end to end without a workspace."""
+
+import asyncio
+import itertools
+import json
+import logging
+import threading
+from collections.abc import Callable, Coroutine
+from concurrent.futures import Future
+from time import perf_counter, time
+from typing import TYPE_CHECKING, Any, NamedTuple, Self
+
+if TYPE_CHECKING:  # pragma: no cover
+    from aiohttp import web
+
+LOGGER = logging.getLogger(__name__)
+
+#: The Web API methods answered by :class:`FakeSlack`
+WEB_API_METHODS = frozenset(
+    (
+        "apps.connections.open",
+        "auth.test",
+        "chat.postEphemeral",
+        "chat.postMessage",
+        "files.completeUploadExternal",
+        "files.getUploadURLExternal",
+        "reactions.add",
+    ),
+)
+
+
+class FakeCall(NamedTuple):
+    """A Web API call received by :class:`FakeSlack`."""
+
+    #: The method called, e.g. :code:`chat.postMessage`
+    method: str
+    #: The arguments the method was called with
+    params: dict[str, Any]
+    #: When the call was received, from :func:`time.perf_counter`
+    received: float
+
+
+class FakeSlack:
+    """
+    A local server which speaks Slack's Socket Mode and Web API protocols.
+
+    The real Socket Mode clients connect to it, so a bot can be tested or
+    benchmarked from receiving an envelope over a websocket to posting its
+    reply, all offline. Point a bot at it with the :code:`apiUrl` config
+    value::
+
+        with FakeSlack(latency=0.05) as slack:
+            bot = Phial("xapp-token", "xoxb-token", config={"apiUrl": slack.api_url})
+            threading.Thread(target=bot.run, daemon=True).start()
+            slack.send_message("!hello")
+            slack.wait_for_calls(1)
+
+    Requires aiohttp, which is installed with the :code:`async` extra.
+
+    :param latency: The number of seconds to wait before answering each
+                    Web API call. Defaults to 0
+    :param rate_limit_every: Answer every nth Web API call with a 429
+                             :code:`ratelimited` error. Defaults to None,
+                             meaning calls are never rate limited
+    :param retry_after: The :code:`Retry-After` header sent with 429s.
+                        Defaults to 1
+    :param disconnect_every: Send a :code:`disconnect` message and close
+                             the websocket after every n envelopes sent on
+                             it. Defaults to None, meaning only
+                             :meth:`disconnect` disconnects clients
+    :param disconnect_grace: The number of seconds a disconnected client has
+                             to reconnect and acknowledge envelopes before
+                             its websocket is closed, as Slack allows.
+                             Defaults to 1
+    :param host: The address to listen on. Defaults to 127.0.0.1
+    :param port: The port to listen on. Defaults to 0, meaning any free port
+    """
+
+    def __init__(
+        self,
+        *,
+        latency: float = 0,
+        rate_limit_every: int | None = None,
+        retry_after: int = 1,
+        disconnect_every: int | None = None,
+        disconnect_grace: float = 1,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ) -> None:
+        self.latency = latency
+        self.rate_limit_every = rate_limit_every
+        self.retry_after = retry_after
+        self.disconnect_every = disconnect_every
+        self.disconnect_grace = disconnect_grace
+        self.host = host
+        self.port = port
+        #: The Web API calls received, in the order received
+        self.calls: list[FakeCall] = []
+        #: When each envelope was first sent, by envelope ID
+        self.sent: dict[str, float] = {}
+        #: When each envelope was first acknowledged, by envelope ID
+        self.acks: dict[str, float] = {}
+        #: The number of websocket connections made
+        self.connections = 0
+        #: The files uploaded, by file ID
+        self.uploads: dict[str, bytes] = {}
+        # The connected sockets envelopes are sent on, in turn, and every
+        # open socket including those waiting to be closed
+        self._sockets: list[web.WebSocketResponse] = []
+        self._open: set[web.WebSocketResponse] = set()
+        self._closing: set[asyncio.Task] = set()
+        # Envelopes waiting for a connection, and those sent but not yet
+        # acknowledged, which are sent again if their connection closes
+        self._pending: list[tuple[str, str]] = []
+        self._unacked: dict[str, tuple[str, web.WebSocketResponse]] = {}
+        self._stopping = False
+        self._sent_on: dict[int, int] = {}
+        self._changed = threading.Condition()
+        self._ids = itertools.count(1)
+        self._rate_limit_count = 0
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._runner: web.AppRunner | None = None
+        self._thread: threading.Thread | None = None
+
+    def __enter__(self) -> Self:
+        self.start()
+        return self
+
+    def __exit__(self, *_: object) -> None:
+        self.stop()
+
+    @property
+    def url(self) -> str:
+        """The server's base URL."""
+        return f"http://{self.host}:{self.port}"
+
+    @property
+    def api_url(self) -> str:
+        """The Web API base URL, for the :code:`apiUrl` config value."""
+        return f"{self.url}/api/"
+
+    def start(self) -> None:
+        """Start the server in a background thread."""
+        try:
+            from aiohttp import web
+        except ImportError as e:  # pragma: no cover
+            raise ImportError(
+                "FakeSlack requires aiohttp. "
+                "Install it with 'pip install phial-slack[async]'",
+            ) from e
+
+        started: Future[None] = Future()
+
+        async def serve() -> None:
+            app = web.Application()
+            app.router.add_post("/api/{method}", self._web_api)
+            app.router.add_post("/upload/{file_id}", self._upload)
+            app.router.add_get("/link", self._socket)
+            self._runner = web.AppRunner(app)
+            await self._runner.setup()
+            site = web.TCPSite(self._runner, self.host, self.port)
+            await site.start()
+            self.port = self._runner.addresses[0][1]
+
+        def run() -> None:
+            loop = self._loop = asyncio.new_event_loop()
+            try:
+                loop.run_until_complete(serve())
+            except BaseException as e:
+                started.set_exception(e)
+                return
+            started.set_result(None)
+            loop.run_forever()
+            loop.close()
+
+        self._thread = threading.Thread(
+            target=run,
+            name="phial-fake-slack",
+            daemon=True,
+        )
+        self._thread.start()
+        started.result()
+        LOGGER.info(f"Fake Slack listening on {self.url}")
+
+    def stop(self) -> None:
+        """Close every connection and stop the server."""
+        if self._loop is None or self._thread is None:
+            return
+
+        async def shutdown() -> None:
+            self._stopping = True
+            for task in self._closing:
+                task.cancel()
+            for socket in list(self._open):
+                await socket.close()
+            if self._runner is not None:
+                await self._runner.cleanup()
+
+        asyncio.run_coroutine_threadsafe(shutdown(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop = None
+        self._thread = None
+
+    def send_message(
+        self,
+        text: str,
+        *,
+        channel: str = "C1",
+        user: str = "U1",
+        team: str = "T1",
+        event_type: str = "message",
+    ) -> str:
+        """
+        Send a message event to a connected client.
+
+        :returns: The envelope's ID
+        """
+        ts = f"{time():.6f}"
+        return self.send_envelope(
+            "events_api",
+            {
+                "team_id": team,
+                "event": {
+                    "type": event_type,
+                    "channel": channel,
+                    "user": user,
+                    "text": text,
+                    "ts": ts,
+                    "team": team,
+                },
+                "type": "event_callback",
+            },
+        )
+
+    def send_envelope(self, type_: str, payload: dict[str, Any]) -> str:
+        """
+        Send an envelope to a connected client.
+
+        Envelopes sent while no client is connected are sent once one
+        connects. Clients are sent envelopes in turn, and like Slack,
+        envelopes a connection closes without acknowledging are sent again
+        on another.
+
+        :param type_: The envelope type, e.g. :code:`events_api`
+        :param payload: The envelope's payload
+        :returns: The envelope's ID
+        """
+        envelope_id = f"envelope-{next(self._ids)}"
+        envelope = json.dumps(
+            {
+                "envelope_id": envelope_id,
+                "type": type_,
+                "payload": payload,
+                "accepts_response_payload": False,
+            },
+        )
+        self._run(self._send(envelope_id, envelope))
+        return envelope_id
+
+    def disconnect(self, reason: str = "refresh_requested") -> None:
+        """
+        Ask every connected client to reconnect.
+
+        Their websockets are closed after :code:`disconnect_grace` seconds.
+        """
+
+        async def disconnect_all() -> None:
+            for socket in list(self._sockets):
+                await self._disconnect(socket, reason)
+
+        self._run(disconnect_all())
+
+    def wait_for_calls(
+        self,
+        count: int,
+        *,
+        method: str | None = None,
+        timeout: float = 5,
+    ) -> bool:
+        """
+        Wait until a number of Web API calls have been received.
+
+        :param count: The number of calls to wait for
+        :param method: Only count calls to this method. Defaults to
+                       counting every call except
+                       :code:`apps.connections.open`
+        :param timeout: The maximum number of seconds to wait
+        :returns: Whether the calls were received in time
+        """
+
+        def received() -> bool:
+            return sum(1 for call in self.calls if _counts(call, method)) >= count
+
+        return self._wait_for(received, timeout)
+
+    def wait_for_acks(self, count: int, *, timeout: float = 5) -> bool:
+        """
+        Wait until a number of envelopes have been acknowledged.
+
+        :returns: Whether the envelopes were acknowledged in time
+        """
+        return self._wait_for(lambda: len(self.acks) >= count, timeout)
+
+    def wait_for_connection(self, count: int = 1, *, timeout: float = 5) -> bool:
+        """
+        Wait until a number of clients are connected.
+
+        :param count: The number of connected clients to wait for.
+                      Defaults to 1
+        :param timeout: The maximum number of seconds to wait
+        :returns: Whether the clients connected in time
+        """
+        return self._wait_for(lambda: len(self._sockets) >= count, timeout)
+
+    def _wait_for(self, predicate: Callable[[], bool], timeout: float) -> bool:
+        with self._changed:
+            return self._changed.wait_for(predicate, timeout)
+
+    def _notify(self) -> None:
+        with self._changed:
+            self._changed.notify_all()
+
+    def _run(self, coro: Coroutine[Any, Any, None]) -> None:
+        if self._loop is None:
+            coro.close()
+            raise RuntimeError("FakeSlack is not running, call start() first")
+        asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    async def _send(self, envelope_id: str, envelope: str) -> None:
+        # Retries keep the time the envelope was first sent
+        self.sent.setdefault(envelope_id, perf_counter())
+        if not self._sockets:
+            self._pending.append((envelope_id, envelope))
+            return
+        # Rotate through the connections, as Slack spreads envelopes over them
+        socket = self._sockets.pop(0)
+        self._sockets.append(socket)
+        self._unacked[envelope_id] = (envelope, socket)
+        await socket.send_str(envelope)
+        sent = self._sent_on[id(socket)] = self._sent_on.get(id(socket), 0) + 1
+        if self.disconnect_every and sent >= self.disconnect_every:
+            await self._disconnect(socket, "refresh_requested")
+
+    async def _disconnect(self, socket: "web.WebSocketResponse", reason: str) -> None:
+        if socket in self._sockets:
+            self._sockets.remove(socket)
+        await socket.send_str(json.dumps({"type": "disconnect", "reason": reason}))
+
+        async def close() -> None:
+            await asyncio.sleep(self.disconnect_grace)
+            await socket.close()
+
+        task = asyncio.create_task(close())
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
+
+    async def _socket(self, request: "web.Request") -> "web.WebSocketResponse":
+        from aiohttp import WSMsgType, web
+
+        socket = web.WebSocketResponse(autoping=True)
+        await socket.prepare(request)
+        self.connections += 1
+        self._open.add(socket)
+        await socket.send_str(
+            json.dumps(
+                {
+                    "type": "hello",
+                    "num_connections": len(self._sockets) + 1,
+                    "debug_info": {"host": "fake-slack"},
+                    "connection_info": {"app_id": "A1"},
+                },
+            ),
+        )
+        self._sockets.append(socket)
+        self._notify()
+        pending, self._pending = self._pending, []
+        for envelope_id, envelope in pending:
+            self._unacked[envelope_id] = (envelope, socket)
+            await socket.send_str(envelope)
+
+        try:
+            async for message in socket:
+                if message.type != WSMsgType.TEXT:
+                    continue
+                envelope_id = json.loads(message.data).get("envelope_id")
+                if envelope_id is not None:
+                    self.acks.setdefault(envelope_id, perf_counter())
+                    self._unacked.pop(envelope_id, None)
+                    self._notify()
+        finally:
+            self._open.discard(socket)
+            if socket in self._sockets:
+                self._sockets.remove(socket)
+            self._sent_on.pop(id(socket), None)
+            self._notify()
+        if not self._stopping:
+            await self._retry(socket)
+        return socket
+
+    async def _retry(self, socket: "web.WebSocketResponse") -> None:
+        # Like Slack, send envelopes a closed connection didn't acknowledge
+        # again, on another connection
+        unacked = [
+            (envelope_id, envelope)
+            for envelope_id, (envelope, sent_on) in self._unacked.items()
+            if sent_on is socket
+        ]
+        for envelope_id, envelope in unacked:
+            del self._unacked[envelope_id]
+            await self._send(envelope_id, envelope)
+
+    async def _web_api(self, request: "web.Request") -> "web.Response":
+        from aiohttp import web
+
+        method = request.match_info["method"]
+        params: dict[str, Any] = dict(request.query)
+        if request.content_type == "application/json":
+            params.update(json.loads(await request.read() or b"{}"))
+        else:
+            params.update(await request.post())
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        if method != "apps.connections.open" and self.rate_limit_every:
+            self._rate_limit_count += 1
+            if self._rate_limit_count % self.rate_limit_every == 0:
+                return web.json_response(
+                    {"ok": False, "error": "ratelimited"},
+                    status=429,
+                    headers={"Retry-After": str(self.retry_after)},
+                )
+
+        self.calls.append(FakeCall(method, params, perf_counter()))
+        self._notify()
+        return web.json_response(self._respond(method, params))
+
+    def _respond(self, method: str, params: dict[str, Any]) -> dict[str, Any]:
+        ts = f"{time():.6f}"
+        if method == "apps.connections.open":
+            return {"ok": True, "url": f"ws://{self.host}:{self.port}/link"}
+        if method == "auth.test":
+            return {"ok": True, "user_id": "UBOT", "bot_id": "BBOT", "team_id": "T1"}
+        if method == "chat.postMessage":
+            return {"ok": True, "channel": params.get("channel"), "ts": ts}
+        if method == "chat.postEphemeral":
+            return {"ok": True, "message_ts": ts}
+        if method == "files.getUploadURLExternal":
+            file_id = f"F{next(self._ids)}"
+            return {
+                "ok": True,
+                "file_id": file_id,
+                "upload_url": f"{self.url}/upload/{file_id}",
+            }
+        if method == "files.completeUploadExternal":
+            files = params.get("files", "[]")
+            files = json.loads(files) if isinstance(files, str) else files
+            return {"ok": True, "files": [{"id": f["id"]} for f in files]}
+        if method in WEB_API_METHODS:
+            return {"ok": True}
+        return {"ok": False, "error": "unknown_method"}
+
+    async def _upload(self, request: "web.Request") -> "web.Response":
+        from aiohttp import web
+
+        file_id = request.match_info["file_id"]
+        self.uploads[file_id] = await request.read()
+        return web.Response(text=f"OK - {len(self.uploads[file_id])}")
+
+
+def _counts(call: FakeCall, method: str | None) -> bool:
+    if method is None:
+        return call.method != "apps.connections.open"
+    return call.method == method
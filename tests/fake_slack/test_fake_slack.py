@@ -0,0 +1,130 @@
+"""Test the local fake Slack server."""
+
+import threading
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+import pytest
+from slack_sdk.errors import SlackApiError
+from slack_sdk.web import WebClient
+
+from phial import Phial
+from tests.fake_slack.server import FakeSlack
+
+
+@pytest.fixture
+def slack() -> Iterator[FakeSlack]:
+    """Run a fake Slack server for a test."""
+    with FakeSlack() as server:
+        yield server
+
+
+@contextmanager
+def run_bot(slack: FakeSlack) -> Iterator[Phial]:
+    """Run a bot connected to the fake Slack server in a thread."""
+    bot = Phial(
+        "xapp-token",
+        "xoxb-token",
+        config={"apiUrl": slack.api_url, "handleSignals": False},
+    )
+
+    @bot.command("echo <text>")
+    def echo(text: str) -> str:
+        return text
+
+    thread = threading.Thread(target=bot.run, daemon=True)
+    thread.start()
+    assert slack.wait_for_connection()
+    yield bot
+    bot.stop()
+    thread.join(5)
+
+
+@pytest.fixture
+def bot(slack: FakeSlack) -> Iterator[Phial]:
+    """Run a bot connected to the fake Slack server."""
+    with run_bot(slack) as bot:
+        yield bot
+
+
+def test_round_trip(slack: FakeSlack, bot: Phial) -> None:
+    """Test messages sent over the websocket are acked and replied to."""
+    envelope_id = slack.send_message("!echo hi", channel="C42")
+
+    assert slack.wait_for_calls(1, method="chat.postMessage")
+    assert slack.wait_for_acks(1)
+    call = next(call for call in slack.calls if call.method == "chat.postMessage")
+    assert call.params["channel"] == "C42"
+    assert call.params["text"] == "hi"
+    assert slack.acks[envelope_id] >= slack.sent[envelope_id]
+
+
+def test_reconnect(slack: FakeSlack, bot: Phial) -> None:
+    """Test clients reconnect after being disconnected."""
+    slack.disconnect()
+    assert slack.wait_for_connection()
+    slack.send_message("!echo again")
+
+    assert slack.wait_for_calls(1, method="chat.postMessage")
+    assert slack.connections == 2
+
+
+def test_disconnect_every(slack: FakeSlack, bot: Phial) -> None:
+    """Test clients are disconnected after a number of envelopes."""
+    slack.disconnect_every = 2
+    for number in range(4):
+        assert slack.wait_for_connection()
+        slack.send_message(f"!echo {number}")
+
+    assert slack.wait_for_calls(4, method="chat.postMessage")
+    assert slack.connections >= 2
+
+
+def test_envelopes_wait_for_connection(slack: FakeSlack) -> None:
+    """Test envelopes sent before a client connects are delivered once it does."""
+    slack.send_message("!echo early")
+
+    with run_bot(slack):
+        assert slack.wait_for_calls(1, method="chat.postMessage")
+
+
+def test_rate_limit_every(slack: FakeSlack) -> None:
+    """Test every nth Web API call is rate limited."""
+    slack.rate_limit_every = 2
+    slack.retry_after = 3
+    client = WebClient("xoxb-token", base_url=slack.api_url)
+
+    client.reactions_add(channel="C1", timestamp="1.0", name="tada")
+    with pytest.raises(SlackApiError) as error:
+        client.reactions_add(channel="C1", timestamp="1.0", name="tada")
+
+    assert error.value.response.status_code == 429
+    assert error.value.response.headers["Retry-After"] == "3"
+    assert [call.method for call in slack.calls] == ["reactions.add"]
+
+
+def test_file_upload(slack: FakeSlack) -> None:
+    """Test files can be uploaded with the v2 upload flow."""
+    client = WebClient("xoxb-token", base_url=slack.api_url)
+
+    client.files_upload_v2(channel="C1", content="file contents", filename="a.txt")
+
+    assert list(slack.uploads.values()) == [b"file contents"]
+    assert [call.method for call in slack.calls] == [
+        "files.getUploadURLExternal",
+        "files.completeUploadExternal",
+    ]
+
+
+def test_unknown_method(slack: FakeSlack) -> None:
+    """Test unknown Web API methods return an error."""
+    client = WebClient("xoxb-token", base_url=slack.api_url)
+
+    with pytest.raises(SlackApiError, match="unknown_method"):
+        client.api_call("users.list")
+
+
+def test_not_started() -> None:
+    """Test envelopes can't be sent before the server is started."""
+    with pytest.raises(RuntimeError, match="not running"):
+        FakeSlack().send_message("hello")
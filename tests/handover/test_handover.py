@@ -0,0 +1,114 @@
+"""Test Handover class."""
+
+import asyncio
+import os
+import subprocess
+import sys
+from pathlib import Path
+from unittest.mock import AsyncMock, MagicMock
+
+from phial import AsyncPhial, Phial
+from phial.handover import Handover
+
+
+def test_first_process_owns_scheduler(tmp_path: Path) -> None:
+    """Test a process with nothing to take over from owns the scheduler."""
+    handover = Handover(tmp_path, pid=100)
+    handover.announce()
+
+    assert handover.owner() == 100
+    assert handover.owns_scheduler
+    assert not handover.superseded
+
+
+def test_handover_transfers_scheduler_once(tmp_path: Path) -> None:
+    """Test the scheduler only moves once the old process releases it."""
+    # Use a live PID so the new process has to wait to be released
+    old = Handover(tmp_path, interval=0, pid=os.getpid())
+    old.announce()
+    new = Handover(tmp_path, interval=0, pid=200)
+    new.announce()
+
+    assert new.previous_owner == os.getpid()
+    assert not new.owns_scheduler
+
+    old.poll()
+    assert old.superseded
+    assert not old.owns_scheduler
+
+    old.release()
+    new.poll()
+    assert new.owns_scheduler
+    assert not (tmp_path / f"released-{os.getpid()}").exists()
+
+
+def test_scheduler_taken_over_from_dead_process(tmp_path: Path) -> None:
+    """Test a process which died without releasing is taken over from."""
+    process = subprocess.Popen([sys.executable, "-c", "pass"])  # noqa: S603
+    process.wait()
+    Handover(tmp_path, pid=process.pid).announce()
+
+    new = Handover(tmp_path, interval=0, pid=200)
+    new.announce()
+
+    assert new.previous_owner == process.pid
+    assert new.owns_scheduler
+
+
+def test_polls_rate_limited(tmp_path: Path) -> None:
+    """Test handover files are only checked every interval."""
+    old = Handover(tmp_path, interval=60, pid=100)
+    old.announce()
+    Handover(tmp_path, pid=200).announce()
+
+    old.poll()
+    assert not old.superseded
+    old.poll(force=True)
+    assert old.superseded
+
+
+def test_superseded_bot_stops(tmp_path: Path) -> None:
+    """Test a bot stops taking new envelopes once it has been superseded."""
+    bot = Phial(
+        "app-token",
+        "bot-token",
+        config={"handoverPath": str(tmp_path), "handoverInterval": 0},
+    )
+    bot.slack_client = MagicMock()
+    assert bot.handover is not None
+    bot.handover.announce()
+    assert bot._poll_handover()
+
+    Handover(tmp_path, pid=200).announce()
+    assert not bot._poll_handover()
+    assert bot._stopping.is_set()
+    bot.slack_client.disconnect.assert_called_once()
+    assert not bot.slack_client.auto_reconnect_enabled
+
+    bot.stop(timeout=0)
+    assert (tmp_path / f"released-{os.getpid()}").exists()
+
+
+def test_superseded_async_bot_disconnects(tmp_path: Path) -> None:
+    """Test an AsyncPhial disconnects once superseded, before it drains."""
+    bot = AsyncPhial(
+        "app-token",
+        "bot-token",
+        config={"handoverPath": str(tmp_path), "handoverInterval": 0},
+    )
+    client = AsyncMock()
+    bot.slack_client = client
+    assert bot.handover is not None
+    bot.handover.announce()
+    Handover(tmp_path, pid=200).announce()
+
+    async def run() -> None:
+        assert not bot._poll_handover()
+        await asyncio.sleep(0)
+        client.disconnect.assert_awaited_once()
+        client.close.assert_not_awaited()
+        await bot.stop_async(timeout=0)
+
+    asyncio.run(run())
+    assert not client.auto_reconnect_enabled
+    client.close.assert_awaited_once()
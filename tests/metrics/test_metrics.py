@@ -0,0 +1,81 @@
+"""Test metrics."""
+
+import urllib.request
+
+import pytest
+
+from phial.metrics import Counter, Histogram, MetricsRegistry
+
+
+def test_counter_counts_by_label() -> None:
+    """Test counters track each set of labels separately."""
+    counter = Counter("requests_total", "Requests", ("type",))
+    counter.inc("a")
+    counter.inc("a", amount=2)
+    counter.inc("b")
+
+    assert counter.value("a") == 3
+    assert counter.value("b") == 1
+    assert counter.value("c") == 0
+
+
+def test_histogram_renders_cumulative_buckets() -> None:
+    """Test histograms render in the Prometheus text format."""
+    histogram = Histogram("latency_seconds", "Latency", ("method",), (0.1, 1))
+    histogram.observe(0.05, "post")
+    histogram.observe(0.5, "post")
+    histogram.observe(5, "post")
+
+    assert list(histogram.collect()) == [
+        "# HELP latency_seconds Latency",
+        "# TYPE latency_seconds histogram",
+        'latency_seconds_bucket{method="post",le="0.1"} 1',
+        'latency_seconds_bucket{method="post",le="1.0"} 2',
+        'latency_seconds_bucket{method="post",le="+Inf"} 3',
+        'latency_seconds_sum{method="post"} 5.55',
+        'latency_seconds_count{method="post"} 3',
+    ]
+    assert histogram.count("post") == 3
+
+
+def test_histogram_time_observes_duration() -> None:
+    """Test histogram.time records one observation."""
+    histogram = Histogram("work_seconds", "Work")
+    with histogram.time():
+        pass
+
+    assert histogram.count() == 1
+
+
+def test_registry_returns_existing_metric() -> None:
+    """Test registering a metric twice returns the same metric."""
+    registry = MetricsRegistry()
+    counter = registry.counter("events_total", "Events")
+
+    assert registry.counter("events_total", "Events") is counter
+    with pytest.raises(ValueError):
+        registry.histogram("events_total", "Events")
+
+
+def test_registry_render_escapes_labels() -> None:
+    """Test label values are escaped when rendered."""
+    registry = MetricsRegistry()
+    registry.counter("events_total", "Events", ("name",)).inc('say "hi"')
+
+    assert 'events_total{name="say \\"hi\\""} 1.0' in registry.render()
+
+
+def test_registry_served_over_http() -> None:
+    """Test metrics are served from /metrics."""
+    registry = MetricsRegistry()
+    registry.counter("events_total", "Events").inc()
+    server = registry.serve(0)
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+        with urllib.request.urlopen(url) as response:  # noqa: S310
+            body = response.read().decode()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert "events_total 1.0" in body
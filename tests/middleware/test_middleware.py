@@ -0,0 +1,98 @@
+"""Test middleware filters and plans."""
+
+from phial import Message
+from phial.middleware import Middleware, MiddlewarePlan
+
+
+def passthrough(message: Message) -> Message:
+    """Return the message unchanged."""
+    return message
+
+
+def never_called(message: Message) -> bool:
+    """Fail if a command match is checked."""
+    raise AssertionError
+
+
+def test_unfiltered_middleware_applies_to_everything() -> None:
+    """Test middleware without filters applies to every message."""
+    middleware = Middleware(passthrough)
+    message = Message("text", "channel", "user", "ts", "team")
+
+    assert not middleware.filtered
+    assert middleware.applies(message, None, never_called)
+
+
+def test_channel_user_and_event_type_filters() -> None:
+    """Test the channel, user and event type filters must all match."""
+    middleware = Middleware(
+        passthrough,
+        channels=["C1"],
+        users=["U1"],
+        event_types=["app_mention"],
+    )
+
+    assert middleware.filtered
+    assert middleware.applies(
+        Message("text", "C1", "U1", "ts", "team"),
+        "app_mention",
+        never_called,
+    )
+    assert not middleware.applies(
+        Message("text", "C2", "U1", "ts", "team"),
+        "app_mention",
+        never_called,
+    )
+    assert not middleware.applies(
+        Message("text", "C1", "U2", "ts", "team"),
+        "app_mention",
+        never_called,
+    )
+    assert not middleware.applies(
+        Message("text", "C1", "U1", "ts", "team"),
+        "message",
+        never_called,
+    )
+
+
+def test_command_only_filter_checked_last() -> None:
+    """Test commands are only matched once the cheaper filters pass."""
+    middleware = Middleware(passthrough, channels=["C1"], command_only=True)
+
+    assert not middleware.applies(
+        Message("!test", "C2", "user", "ts", "team"),
+        "message",
+        never_called,
+    )
+    assert middleware.applies(
+        Message("!test", "C1", "user", "ts", "team"),
+        "message",
+        lambda message: message.text == "!test",
+    )
+
+
+def test_plan_orders_by_priority() -> None:
+    """Test plans run lower priorities first, keeping the order added."""
+    first = Middleware(passthrough, priority=-1)
+    second = Middleware(passthrough)
+    third = Middleware(passthrough)
+    last = Middleware(passthrough, priority=5)
+
+    plan = MiddlewarePlan([last, second, first, third])
+
+    assert plan.stages == (first, second, third, last)
+    assert len(plan) == 4
+
+
+def test_plan_stale_when_functions_change() -> None:
+    """Test plans are stale when their functions are replaced, not just added."""
+
+    def other(message: Message) -> Message:
+        return message
+
+    plan = MiddlewarePlan([Middleware(passthrough), Middleware(other)])
+
+    assert not plan.is_stale([passthrough, other])
+    assert plan.is_stale([passthrough])
+    assert plan.is_stale([other, passthrough])
+    assert plan.is_stale([passthrough, passthrough])
@@ -0,0 +1,429 @@
+"""Test the durable queue of outbound Web API calls."""
+
+import asyncio
+import io
+import os
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, cast
+
+import pytest
+from slack_sdk.errors import SlackApiError, SlackRequestError
+from slack_sdk.web.slack_response import SlackResponse
+
+from phial import AsyncPhial, Attachment, Phial, Response
+from phial.handover import _start_time
+from phial.outbox import Outbox, OutboxEntry, retry_delay
+from phial.replay import RecordingWebClient
+from tests.fake_slack.server import FakeSlack
+
+
+def slack_error(status: int, headers: dict[str, str] | None = None) -> SlackApiError:
+    """Build a Slack API error with a status code."""
+    response = SlackResponse(
+        client=None,
+        http_verb="POST",
+        api_url="https://slack.com/api/chat.postMessage",
+        req_args={},
+        data={"ok": False, "error": "oops"},
+        headers=headers or {},
+        status_code=status,
+    )
+    return SlackApiError("The request to the Slack API failed.", response)  # type: ignore[no-untyped-call]
+
+
+def dead_pid() -> int:
+    """Get the PID of a process which has exited."""
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+
+def test_calls_delivered_in_order(tmp_path: Path) -> None:
+    """Test calls are delivered in the order they were put, then removed."""
+    outbox = Outbox(tmp_path / "outbox.db")
+    sent: list[OutboxEntry] = []
+    for number in range(3):
+        outbox.put("chat_postMessage", {"channel": "C1", "text": str(number)})
+
+    assert outbox.deliver(sent.append) == 3
+
+    assert [entry.kwargs["text"] for entry in sent] == ["0", "1", "2"]
+    assert len(outbox) == 0
+    assert outbox.delivered == 3
+    assert outbox.next_delay() is None
+
+
+def test_calls_removed_as_sent(tmp_path: Path) -> None:
+    """Test each call is removed once sent, rather than with its batch."""
+    outbox = Outbox(tmp_path / "outbox.db")
+    for number in range(3):
+        outbox.put("chat_postMessage", {"channel": "C1", "text": str(number)})
+    left: list[int] = []
+
+    outbox.deliver(lambda _: left.append(len(outbox)))
+
+    assert left == [3, 2, 1]
+
+
+def test_batch_size(tmp_path: Path) -> None:
+    """Test calls are read a batch at a time."""
+    outbox = Outbox(tmp_path / "outbox.db", batch_size=2)
+    for number in range(3):
+        outbox.put("chat_postMessage", {"text": str(number)})
+
+    assert outbox.deliver(lambda _: None) == 2
+    assert outbox.deliver(lambda _: None) == 1
+
+
+def test_files_stored(tmp_path: Path) -> None:
+    """Test files are read into the outbox, so can be sent once closed."""
+    outbox = Outbox(tmp_path / "outbox.db")
+    file = io.BytesIO(b"content")
+    outbox.put("files_upload_v2", {"channels": "C1", "file": file}, team="T1")
+    file.close()
+
+    (entry,) = outbox.due()
+
+    assert entry.kwargs == {"channels": "C1", "file": b"content"}
+    assert entry.team == "T1"
+
+
+def test_failed_calls_retried(tmp_path: Path) -> None:
+    """Test a failed call holds back later calls until it's retried."""
+    outbox = Outbox(tmp_path / "outbox.db", retry_delay=0.05)
+    sent: list[str] = []
+    failures = iter([ConnectionError("Slack is down")])
+
+    def send(entry: OutboxEntry) -> None:
+        error = next(failures, None)
+        if error is not None:
+            raise error
+        sent.append(entry.kwargs["text"])
+
+    outbox.put("chat_postMessage", {"text": "first"})
+    outbox.put("chat_postMessage", {"text": "second"})
+
+    assert outbox.deliver(send) == 0
+    assert outbox.due() == []
+    assert 0 < cast(float, outbox.next_delay()) <= 0.05
+    time.sleep(0.05)
+    assert outbox.deliver(send) == 2
+    assert sent == ["first", "second"]
+
+
+def test_rejected_calls_dropped(tmp_path: Path) -> None:
+    """Test calls Slack rejects are dropped without holding back others."""
+    outbox = Outbox(tmp_path / "outbox.db")
+    sent: list[str] = []
+
+    def send(entry: OutboxEntry) -> None:
+        if entry.kwargs["channel"] == "missing":
+            raise slack_error(400)
+        sent.append(entry.kwargs["channel"])
+
+    outbox.put("chat_postMessage", {"channel": "missing"})
+    outbox.put("chat_postMessage", {"channel": "C1"})
+
+    assert outbox.deliver(send) == 2
+    assert sent == ["C1"]
+    assert (outbox.delivered, outbox.dropped) == (1, 1)
+    assert len(outbox) == 0
+
+
+def test_retry_delay() -> None:
+    """Test which failures are retried, and after how long."""
+    assert retry_delay(ConnectionError()) == 0
+    assert retry_delay(TimeoutError()) == 0
+    assert retry_delay(slack_error(500)) == 0
+    assert retry_delay(slack_error(429, {"Retry-After": "30"})) == 30
+    assert retry_delay(slack_error(404)) is None
+    assert retry_delay(SlackRequestError("Invalid arguments")) is None
+    assert retry_delay(TypeError()) is None
+    assert retry_delay(ValueError()) is None
+
+
+def test_other_channels_not_held_back(tmp_path: Path) -> None:
+    """Test a call waiting to be retried only holds back its own channel."""
+    outbox = Outbox(tmp_path / "outbox.db", retry_delay=10)
+    sent: list[str] = []
+
+    def send(entry: OutboxEntry) -> None:
+        if entry.kwargs["text"] == "fails":
+            raise ConnectionError("Slack is down")
+        sent.append(entry.kwargs["text"])
+
+    outbox.put("chat_postMessage", {"channel": "C1", "text": "fails"})
+    outbox.put("chat_postMessage", {"channel": "C1", "text": "after"})
+    outbox.put("chat_postMessage", {"channel": "C2", "text": "other"})
+    outbox.put("files_upload_v2", {"channels": "C1", "text": "upload"})
+
+    assert outbox.deliver(send) == 1
+    assert sent == ["other"]
+    assert outbox.deliver(send) == 0
+    assert outbox.due() == []
+    assert 5 <= cast(float, outbox.next_delay()) <= 10
+
+
+def test_gives_up_after_max_attempts(tmp_path: Path) -> None:
+    """Test calls which keep failing are moved to the dead letters."""
+    outbox = Outbox(tmp_path / "outbox.db", max_attempts=2)
+    outbox.put("chat_postMessage", {"channel": "C1", "text": "hello"})
+    outbox.put("chat_postMessage", {"channel": "C2", "text": "hi"})
+
+    def fail(_: OutboxEntry) -> None:
+        raise ConnectionError("Slack is down")
+
+    outbox.deliver(fail)
+    outbox._db.execute("UPDATE outbox SET due = 0")
+
+    assert outbox.deliver(fail) == 2
+    assert len(outbox) == 0
+    assert outbox.dropped == 2
+    (first, second) = outbox.dead_letters()
+    assert first.entry.kwargs == {"channel": "C1", "text": "hello"}
+    assert first.entry.attempts == 2
+    assert first.error == "Slack is down"
+    assert second.entry.kwargs["text"] == "hi"
+
+
+def test_invalid_calls_not_retried(tmp_path: Path) -> None:
+    """Test calls with invalid arguments are dropped without holding back others."""
+    outbox = Outbox(tmp_path / "outbox.db")
+    sent: list[str] = []
+
+    def send(entry: OutboxEntry) -> None:
+        if "bad" in entry.kwargs:
+            raise TypeError("unexpected keyword argument 'bad'")
+        sent.append(entry.kwargs["text"])
+
+    outbox.put("chat_postMessage", {"channel": "C1", "bad": True})
+    outbox.put("chat_postMessage", {"channel": "C1", "text": "good"})
+
+    assert outbox.deliver(send) == 2
+    assert sent == ["good"]
+    (dead,) = outbox.dead_letters()
+    assert dead.entry.attempts == 1
+    assert "unexpected keyword" in dead.error
+
+
+def test_backoff_capped(tmp_path: Path) -> None:
+    """Test retries back off exponentially up to the maximum delay."""
+    outbox = Outbox(tmp_path / "outbox.db", retry_delay=1, max_retry_delay=4)
+    outbox.put("chat_postMessage", {"text": "hello"})
+    delays = []
+
+    def fail(_: OutboxEntry) -> None:
+        raise ConnectionError
+
+    for _ in range(5):
+        outbox._db.execute("UPDATE outbox SET due = 0")
+        outbox.deliver(fail)
+        delays.append(cast(float, outbox.next_delay()))
+
+    assert all(0.5 * 2**n - 0.1 <= delay <= 2**n for n, delay in enumerate(delays[:3]))
+    assert all(2 - 0.1 <= delay <= 4 for delay in delays[3:])
+
+
+def test_calls_from_dead_processes_adopted(tmp_path: Path) -> None:
+    """Test calls left by a process which died are sent, ahead of newer calls."""
+    crashed = Outbox(tmp_path / "outbox.db", pid=dead_pid())
+    crashed.put("chat_postMessage", {"text": "left behind"})
+    crashed.close()
+    alive = Outbox(tmp_path / "outbox.db", pid=1)
+    alive.put("chat_postMessage", {"text": "someone else's"})
+    alive.close()
+
+    outbox = Outbox(tmp_path / "outbox.db")
+    outbox.put("chat_postMessage", {"text": "new"})
+    sent: list[str] = []
+    outbox.deliver(lambda entry: sent.append(entry.kwargs["text"]))
+
+    assert sent == ["left behind", "new"]
+    assert outbox.adopt() == 0
+
+
+@pytest.mark.skipif(
+    _start_time(os.getpid()) is None,
+    reason="Process start times are unavailable",
+)
+def test_calls_adopted_after_pid_reused(tmp_path: Path) -> None:
+    """Test calls left by a process whose PID has been reused are adopted."""
+    parent = os.getppid()
+    crashed = Outbox(tmp_path / "outbox.db", pid=parent)
+    # Pretend the calls were put by an earlier process given the same PID
+    crashed._owner = f"{parent}:{cast(int, _start_time(parent)) + 1}"
+    crashed.put("chat_postMessage", {"text": "left behind"})
+    crashed.close()
+
+    outbox = Outbox(tmp_path / "outbox.db")
+    sent: list[str] = []
+    outbox.deliver(lambda entry: sent.append(entry.kwargs["text"]))
+
+    assert sent == ["left behind"]
+
+
+def test_background_delivery(tmp_path: Path) -> None:
+    """Test calls are sent in the background, and due calls sent when stopping."""
+    outbox = Outbox(tmp_path / "outbox.db")
+    sent: list[str] = []
+    delivered = threading.Event()
+
+    def send(entry: OutboxEntry) -> None:
+        sent.append(entry.kwargs["text"])
+        if len(sent) == 2:
+            delivered.set()
+
+    outbox.start(send)
+    outbox.put("chat_postMessage", {"text": "first"})
+    outbox.put("chat_postMessage", {"text": "second"})
+    assert delivered.wait(5)
+    outbox.put("chat_postMessage", {"text": "third"})
+
+    assert outbox.stop(5) == 0
+    assert sent == ["first", "second", "third"]
+    outbox.close()
+
+
+def test_not_closed_while_delivering(tmp_path: Path) -> None:
+    """Test the database stays open until a delivery thread which overran stops."""
+    outbox = Outbox(tmp_path / "outbox.db")
+    sending, release = threading.Event(), threading.Event()
+
+    def send(_: OutboxEntry) -> None:
+        sending.set()
+        release.wait(5)
+
+    outbox.put("chat_postMessage", {"text": "slow"})
+    outbox.start(send)
+    assert sending.wait(5)
+    assert outbox.stop(0.01) == 1
+    outbox.close()
+
+    release.set()
+    cast(threading.Thread, outbox._thread).join(5)
+    assert outbox.delivered == 1
+    with pytest.raises(sqlite3.ProgrammingError):
+        len(outbox)
+
+
+def test_bot_sends_through_outbox(tmp_path: Path) -> None:
+    """Test a bot's messages, reactions and uploads go through its outbox."""
+    bot = Phial("app-token", "bot-token", config={"outboxPath": tmp_path / "outbox.db"})
+    web_client = RecordingWebClient()
+    bot.slack_client.web_client = cast(Any, web_client)
+    other = RecordingWebClient()
+    bot.add_workspace(
+        "other-app-token",
+        "other-bot-token",
+        team="T2",
+    ).web_client = other
+
+    bot.send_message(Response(channel="C1", text="Hi"))
+    bot.send_reaction(Response(channel="C1", original_ts="1", reaction="wave"))
+    with bot.workspace("T2"):
+        bot.upload_attachment(Attachment("C2", "file.txt", io.BytesIO(b"content")))
+    outbox = cast(Outbox, bot.outbox)
+    assert web_client.calls == []
+    assert len(outbox) == 3
+
+    bot._start_outbox()
+    bot._stop_outbox(time.monotonic() + 5)
+
+    assert [method for method, _ in web_client.calls] == [
+        "chat_postMessage",
+        "reactions_add",
+    ]
+    assert other.calls == [
+        (
+            "files_upload_v2",
+            {
+                "channels": "C2",
+                "filename": "file.txt",
+                "file": b"content",
+                "title": "file.txt",
+            },
+        ),
+    ]
+
+
+def test_bot_replays_outbox(tmp_path: Path) -> None:
+    """Test calls left by a crashed bot are sent when a bot next starts."""
+    crashed = Outbox(tmp_path / "outbox.db", pid=dead_pid())
+    crashed.put("chat_postMessage", {"channel": "C1", "text": "Hi"})
+    crashed.close()
+    bot = Phial("app-token", "bot-token", config={"outboxPath": tmp_path / "outbox.db"})
+    web_client = RecordingWebClient()
+    bot.slack_client.web_client = cast(Any, web_client)
+
+    bot._start_outbox()
+    bot._stop_outbox(time.monotonic() + 5)
+
+    assert web_client.calls == [("chat_postMessage", {"channel": "C1", "text": "Hi"})]
+
+
+def test_async_bot_sends_through_outbox(tmp_path: Path) -> None:
+    """Test AsyncPhial sends through its outbox in a task."""
+    bot = AsyncPhial(
+        "app-token",
+        "bot-token",
+        config={"outboxPath": tmp_path / "outbox.db"},
+    )
+    web_client = RecordingWebClient(asynchronous=True)
+    bot.web_client = web_client
+    outbox = cast(Outbox, bot.outbox)
+
+    async def run() -> None:
+        await bot.send_message_async(Response(channel="C1", text="Hi"))
+        assert web_client.calls == []
+        bot._outbox_task = asyncio.create_task(
+            outbox.run_async(bot._send_from_outbox_async),
+        )
+        await bot._stop_outbox_async(5)
+
+    asyncio.run(run())
+
+    assert [
+        (method, kwargs["channel"], kwargs["text"])
+        for method, kwargs in web_client.calls
+    ] == [("chat_postMessage", "C1", "Hi")]
+
+
+def test_replies_survive_rate_limiting(tmp_path: Path) -> None:
+    """Test every reply is delivered while Slack rate limits calls."""
+    with FakeSlack(rate_limit_every=3, retry_after=0) as slack:
+        bot = Phial(
+            "xapp-token",
+            "xoxb-token",
+            config={
+                "apiUrl": slack.api_url,
+                "handleSignals": False,
+                "outboxPath": tmp_path / "outbox.db",
+                "outboxRetryDelay": 0.01,
+            },
+        )
+
+        @bot.command("echo <text>")
+        def echo(text: str) -> str:
+            return text
+
+        thread = threading.Thread(target=bot.run, daemon=True)
+        thread.start()
+        try:
+            assert slack.wait_for_connection()
+            for number in range(10):
+                slack.send_message(f"!echo {number}")
+            assert slack.wait_for_calls(10, method="chat.postMessage")
+        finally:
+            bot.stop()
+            thread.join(5)
+
+    replies = [
+        call.params["text"] for call in slack.calls if call.method == "chat.postMessage"
+    ]
+    assert sorted(replies, key=int) == [str(number) for number in range(10)]
+    assert cast(Outbox, bot.outbox).delivered == 10
@@ -0,0 +1,132 @@
+"""Test serializing and caching message payloads."""
+
+import json
+import pickle
+from typing import Any
+
+import pytest
+
+from phial import Phial, Response
+from phial.payloads import dumps, json_backend
+
+BLOCKS = [{"type": "section", "text": {"type": "mrkdwn", "text": "*Hi*"}}]
+
+
+class CountingDumps:
+    """Serializes with the standard library, counting each call."""
+
+    def __init__(self) -> None:
+        self.calls = 0
+
+    def __call__(self, value: Any) -> str:  # noqa: ANN401
+        """Serialize a value."""
+        self.calls += 1
+        return json.dumps(value)
+
+
+def test_serialize_cached() -> None:
+    """Test a response's payload is only serialized once."""
+    json_dumps = CountingDumps()
+    response = Response("channel", blocks=BLOCKS)
+
+    first = response.serialize("blocks", json_dumps)
+    second = response.serialize("blocks", json_dumps)
+
+    assert first is second
+    assert json.loads(first or "") == BLOCKS
+    assert json_dumps.calls == 1
+
+
+def test_serialize_missing() -> None:
+    """Test a response without a payload has no JSON for it."""
+    assert Response("channel", text="Hi").serialize("attachments") is None
+
+
+def test_new_value_reserialized() -> None:
+    """Test assigning a new payload invalidates the cached JSON."""
+    json_dumps = CountingDumps()
+    response = Response("channel", attachments=[{"text": "one"}])
+    response.serialize("attachments", json_dumps)
+
+    response.attachments = [{"text": "two"}]
+
+    assert response.serialize("attachments", json_dumps) == '[{"text": "two"}]'
+    assert json_dumps.calls == 2
+
+
+def test_replace_shares_cache() -> None:
+    """Test copies of a template reuse its serialized payload."""
+    json_dumps = CountingDumps()
+    template = Response("", blocks=BLOCKS)
+
+    copies = [template.replace(channel=channel) for channel in ("C1", "C2")]
+    payloads = [response.serialize("blocks", json_dumps) for response in copies]
+
+    assert [response.channel for response in copies] == ["C1", "C2"]
+    assert template.channel == ""
+    assert payloads[0] is payloads[1]
+    assert json_dumps.calls == 1
+
+
+def test_replace_unknown_attribute() -> None:
+    """Test only a response's attributes can be replaced."""
+    with pytest.raises(TypeError, match="no attribute colour"):
+        Response("channel").replace(colour="red")
+
+
+def test_cache_ignored_by_equality_and_pickling() -> None:
+    """Test the cached JSON doesn't affect comparing or pickling responses."""
+    response = Response("channel", blocks=BLOCKS)
+    response.serialize("blocks", lambda value: json.dumps(value))
+
+    copy = pickle.loads(pickle.dumps(response))  # noqa: S301
+
+    assert copy == response == Response("channel", blocks=BLOCKS)
+    assert copy.serialize("blocks") == dumps(BLOCKS)
+
+
+def test_json_backends() -> None:
+    """Test backends can be chosen by name or function."""
+
+    def custom(value: Any) -> str:  # noqa: ANN401
+        return str(value)
+
+    assert json_backend("json") is dumps
+    assert json_backend(custom) is custom
+    assert dumps({"a": [1, 2]}) == '{"a":[1,2]}'
+    with pytest.raises(ValueError, match="Unknown JSON backend yaml"):
+        json_backend("yaml")
+
+
+def test_orjson_backend() -> None:
+    """Test the orjson backend serializes to a string."""
+    pytest.importorskip("orjson")
+
+    assert json_backend("orjson")({"a": [1, 2]}) == '{"a":[1,2]}'
+
+
+def test_bot_sends_blocks_with_backend() -> None:
+    """Test a bot serializes blocks with its configured backend, once."""
+    json_dumps = CountingDumps()
+    bot = Phial("app-token", "bot-token", config={"jsonBackend": json_dumps})
+    template = Response("", text="Hi", blocks=BLOCKS)
+
+    calls = [bot._build_message_call(template.replace(channel=c)) for c in "AB"]
+
+    assert [(method, kwargs["channel"]) for method, kwargs in calls] == [
+        ("chat_postMessage", "A"),
+        ("chat_postMessage", "B"),
+    ]
+    assert json.loads(calls[0][1]["blocks"]) == BLOCKS
+    assert "attachments" not in calls[0][1]
+    assert json_dumps.calls == 1
+
+
+def test_blocks_only_response_sent() -> None:
+    """Test a command can reply with only blocks."""
+    bot = Phial("app-token", "bot-token")
+
+    route = bot._route_response(Response("channel", blocks=BLOCKS), "channel")
+
+    assert route is not None
+    assert route[0] == "send_message"
@@ -0,0 +1,174 @@
+"""Test the profiler."""
+
+import pstats
+import threading
+from pathlib import Path
+
+import pytest
+
+from phial.profiling import Profiler
+
+
+def work() -> int:
+    """Do something worth profiling."""
+    return sum(range(1000))
+
+
+def test_profile_does_nothing_when_not_profiling() -> None:
+    """Test profiling an inactive target is a no-op."""
+    profiler = Profiler()
+
+    with profiler.profile("work"):
+        work()
+
+    assert not profiler.active
+    assert profiler.results == {}
+    assert profiler.wrap("work", work) is work
+
+
+def test_profiles_for_number_of_invocations() -> None:
+    """Test a target stops being profiled after its invocations."""
+    profiler = Profiler()
+    profiler.start("work", 2)
+
+    with profiler.profile("work"):
+        work()
+    assert profiler.active
+    assert profiler.results == {}
+    with profiler.profile("work"):
+        work()
+
+    assert not profiler.active
+    assert "over 2 invocations" in profiler.results["work"]
+    assert "work" in profiler.results["work"]
+
+
+def test_other_targets_not_profiled() -> None:
+    """Test only the target being profiled counts invocations."""
+    profiler = Profiler()
+    profiler.start("work")
+
+    with profiler.profile("other"):
+        work()
+
+    assert profiler.active
+
+
+def test_wrap_profiles_on_calling_thread() -> None:
+    """Test a wrapped function is profiled on the thread calling it."""
+    profiler = Profiler()
+    profiler.start("work")
+    func = profiler.wrap("work", work)
+
+    thread = threading.Thread(target=func)
+    thread.start()
+    thread.join()
+
+    assert "work" in profiler.results
+
+
+def test_writes_stats_to_output(tmp_path: Path) -> None:
+    """Test stats are written to disk when an output is given."""
+    output = tmp_path / "work.prof"
+    profiler = Profiler()
+    profiler.start("work", output=str(output))
+
+    with profiler.profile("work"):
+        work()
+
+    stats = pstats.Stats(str(output))
+    assert any(name == "work" for _, _, name in stats.stats)  # type: ignore
+
+
+def test_nested_profiles_are_ignored() -> None:
+    """Test an inner target is profiled as part of an outer one."""
+    profiler = Profiler()
+    profiler.start("dispatch")
+    profiler.start("work")
+
+    with profiler.profile("dispatch"), profiler.profile("work"):
+        work()
+
+    assert "dispatch" in profiler.results
+    assert "work" not in profiler.results
+    assert profiler.active
+
+
+def test_stop_returns_summary() -> None:
+    """Test stopping early summarises the invocations so far."""
+    profiler = Profiler()
+    profiler.start("work", 5)
+    with profiler.profile("work"):
+        work()
+
+    summary = profiler.stop("work")
+
+    assert summary is not None
+    assert "over 1 invocations" in summary
+    assert not profiler.active
+
+
+def test_stop_before_any_invocations() -> None:
+    """Test stopping before the target ran."""
+    profiler = Profiler()
+    profiler.start("work")
+
+    assert profiler.stop("work") == "Profile of work: no invocations recorded"
+    assert profiler.stop("work") is None
+
+
+def test_invocations_must_be_positive() -> None:
+    """Test an invalid number of invocations is rejected."""
+    profiler = Profiler()
+
+    with pytest.raises(ValueError, match="at least 1"):
+        profiler.start("work", 0)
+
+
+def test_overlapping_sessions() -> None:
+    """Test only one invocation is profiled at a time, across targets."""
+    profiler = Profiler()
+    profiler.start("slow")
+    profiler.start("work")
+    entered, release = threading.Event(), threading.Event()
+
+    def slow() -> None:
+        with profiler.profile("slow"):
+            entered.set()
+            release.wait(5)
+
+    thread = threading.Thread(target=slow)
+    thread.start()
+    entered.wait(5)
+    with profiler.profile("work"):
+        work()
+    release.set()
+    thread.join()
+
+    assert "slow" in profiler.results
+    assert "work" not in profiler.results
+    with profiler.profile("work"):
+        work()
+    assert "work" in profiler.results
+
+
+class BusyProfile:
+    """A profile which fails as if another profiling tool were active."""
+
+    def enable(self) -> None:
+        """Fail to enable the profile."""
+        raise ValueError("Another profiling tool is already active")
+
+
+def test_profiling_tool_already_active() -> None:
+    """Test invocations run unprofiled if a profile can't be enabled."""
+    profiler = Profiler()
+    profiler.start("work")
+    profiler._sessions["work"].profile = BusyProfile()  # type: ignore  # noqa: SLF001
+
+    with profiler.profile("work"):
+        result = work()
+
+    assert result == 499500
+    assert profiler.active
+    assert profiler.results == {}
@@ -0,0 +1,131 @@
+"""Test the token bucket rate limiter."""
+
+import threading
+
+import pytest
+
+from phial import Message
+from phial.ratelimit import RateLimiter
+
+
+class Clock:
+    """A clock which only moves when told to."""
+
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        """Get the current time."""
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch: pytest.MonkeyPatch) -> Clock:
+    """Replace the rate limiter's clock."""
+    clock = Clock()
+    monkeypatch.setattr("phial.ratelimit.monotonic", clock)
+    return clock
+
+
+def test_allows_up_to_limit(clock: Clock) -> None:
+    """Test requests over the limit are refused until tokens refill."""
+    limiter = RateLimiter(2, 10)
+
+    assert limiter.acquire("user") == 0
+    assert limiter.acquire("user") == 0
+    assert limiter.acquire("user") == pytest.approx(5)
+    clock.now += 5
+    assert limiter.acquire("user") == 0
+    assert limiter.acquire("user") == pytest.approx(5)
+
+
+def test_keys_limited_separately(clock: Clock) -> None:
+    """Test each key has its own bucket."""
+    limiter = RateLimiter(1, 10)
+
+    assert limiter.acquire("a") == 0
+    assert limiter.acquire("b") == 0
+    assert limiter.acquire("a") > 0
+
+
+def test_burst(clock: Clock) -> None:
+    """Test burst allows more requests at once than the limit."""
+    limiter = RateLimiter(1, 10, burst=3)
+
+    assert [limiter.acquire("user") for _ in range(3)] == [0, 0, 0]
+    assert limiter.acquire("user") == pytest.approx(10)
+
+
+def test_idle_keys_evicted(clock: Clock) -> None:
+    """Test buckets are dropped once they have refilled."""
+    limiter = RateLimiter(1, 10, stripes=1)
+    limiter.acquire("a")
+    clock.now += 5
+    limiter.acquire("b")
+    assert len(limiter) == 2
+
+    clock.now += 6
+    limiter.acquire("c")
+
+    assert len(limiter) == 2
+    clock.now += 100
+    limiter.acquire("a")
+    assert len(limiter) == 1
+
+
+def test_check_uses_key() -> None:
+    """Test messages are counted by the configured key."""
+    limiter = RateLimiter(1, 60, key="channel")
+
+    assert limiter.check(Message("a", "channel", "user1", "ts", "team")) == 0
+    assert limiter.check(Message("b", "channel", "user2", "ts", "team")) > 0
+
+
+def test_invalid_arguments() -> None:
+    """Test invalid limits are rejected."""
+    with pytest.raises(ValueError, match="Limit"):
+        RateLimiter(0, 10)
+    with pytest.raises(ValueError, match="Period"):
+        RateLimiter(1, 0)
+    with pytest.raises(ValueError, match="Unknown rate limit key"):
+        RateLimiter(1, 10, key="command")
+
+
+def test_concurrent_acquires() -> None:
+    """Test concurrent requests never take more tokens than allowed."""
+    limiter = RateLimiter(100, 3600)
+    allowed: list[bool] = []
+
+    def worker() -> None:
+        allowed.extend(limiter.acquire("user") == 0 for _ in range(50))
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert allowed.count(True) == 100
+
+
+def test_wait_time_does_not_take_token(clock: Clock) -> None:
+    """Test checking for a token leaves it for the next request."""
+    limiter = RateLimiter(1, 10)
+
+    assert limiter.wait_time("user") == 0
+    assert limiter.acquire("user") == 0
+    assert limiter.wait_time("user") == pytest.approx(10)
+    clock.now += 4
+    assert limiter.wait_time("user") == pytest.approx(6)
+
+
+def test_release_gives_back_token(clock: Clock) -> None:
+    """Test a released token can be taken again, up to the burst."""
+    limiter = RateLimiter(1, 10)
+
+    assert limiter.acquire("user") == 0
+    limiter.release("user")
+    limiter.release("user")
+
+    assert limiter.acquire("user") == 0
+    assert limiter.acquire("user") == pytest.approx(10)
@@ -0,0 +1,177 @@
+"""Test recording and replaying Socket Mode traffic."""
+
+import asyncio
+import gzip
+import json
+from pathlib import Path
+
+import pytest
+
+from phial import AsyncPhial, Phial
+from phial.replay import Recorder, ReplayReport, read_capture, replay, replay_async
+from tests.bot.test_handle_request import build_request
+
+
+def record(path: Path, *texts: str, **options: bool) -> Recorder:
+    """Record a message envelope for each text."""
+    recorder = Recorder(str(path), **options)
+    for number, text in enumerate(texts):
+        recorder(None, build_request(text, "C1", f"U{number}", "ts", "T1"))
+    recorder.close()
+    return recorder
+
+
+def test_record_and_read(tmp_path: Path) -> None:
+    """Test recorded envelopes can be read back in order."""
+    path = tmp_path / "capture.jsonl.gz"
+    recorder = record(path, "!hello", "!echo hi")
+
+    envelopes = list(read_capture(str(path)))
+
+    assert recorder.recorded == 2
+    assert [req.payload["event"]["text"] for _, req in envelopes] == [
+        "!hello",
+        "!echo hi",
+    ]
+    assert all(req.type == "events_api" for _, req in envelopes)
+    assert envelopes[0][0] <= envelopes[1][0]
+
+
+def test_redaction(tmp_path: Path) -> None:
+    """Test text and user IDs are redacted but commands kept."""
+    path = tmp_path / "capture.jsonl.gz"
+    recorder = Recorder(str(path), redact_text=True, redact_users=True)
+    payload = build_request("!echo Secret 42 <@U1|bob>", "C1", "U1", "ts", "T1").payload
+
+    event = recorder.redact(payload)["event"]
+    recorder.close()
+
+    pseudonym = event["user"]
+    assert pseudonym.startswith("U")
+    assert pseudonym != "U1"
+    assert event["text"] == f"!echo xxxxxx 99 <@{pseudonym}>"
+    assert payload["event"]["user"] == "U1"
+
+
+def test_invalid_capture(tmp_path: Path) -> None:
+    """Test files which are not captures are rejected."""
+    path = tmp_path / "capture.jsonl.gz"
+    with gzip.open(path, "wt") as file:
+        file.write(json.dumps({"version": 99}))
+
+    with pytest.raises(ValueError, match="not a version 1 capture"):
+        list(read_capture(str(path)))
+
+
+def test_replay(tmp_path: Path) -> None:
+    """Test a capture is replayed with outbound calls recorded."""
+    path = tmp_path / "capture.jsonl.gz"
+    record(path, "!hello", "!hello", "nothing", "!hello")
+    bot = Phial("app-token", "bot-token")
+    web_client = bot.slack_client.web_client
+
+    @bot.command("hello")
+    def hello() -> str:
+        return "world"
+
+    report = replay(bot, str(path), speed=None)
+
+    assert report.events == 4
+    assert report.call_counts == {"chat_postMessage": 3}
+    assert report.calls[0][1]["text"] == "world"
+    assert set(report.latency) == {"p50", "p90", "p99"}
+    assert report.events_per_second > 0
+    assert bot.slack_client.web_client is web_client
+    assert "chat_postMessage: 3" in str(report)
+
+
+def test_replay_bypasses_outbox(tmp_path: Path) -> None:
+    """Test replayed replies are recorded rather than queued in the outbox."""
+    path = tmp_path / "capture.jsonl.gz"
+    record(path, "!hello")
+    bot = Phial("app-token", "bot-token", config={"outboxPath": tmp_path / "out.db"})
+    outbox = bot.outbox
+
+    @bot.command("hello")
+    def hello() -> str:
+        return "world"
+
+    report = replay(bot, str(path), speed=None)
+
+    assert report.call_counts == {"chat_postMessage": 1}
+    assert bot.outbox is outbox
+    assert outbox is not None
+    assert len(outbox) == 0
+
+
+def test_replay_keeps_pace(tmp_path: Path) -> None:
+    """Test envelopes are delivered at the recorded pace times the speed."""
+    path = tmp_path / "capture.jsonl.gz"
+    with gzip.open(path, "wt") as file:
+        file.write(json.dumps({"version": 1}) + "\n")
+        for offset in (0, 1, 2):
+            req = build_request("!hello", "C1", "U1", "ts", "T1")
+            file.write(json.dumps([offset, req.type, "id", req.payload]) + "\n")
+    bot = Phial("app-token", "bot-token")
+
+    report = replay(bot, str(path), speed=10)
+
+    assert 0.2 <= report.seconds < 1
+
+
+def test_replay_async(tmp_path: Path) -> None:
+    """Test a capture can be replayed against an AsyncPhial bot."""
+    path = tmp_path / "capture.jsonl.gz"
+    record(path, "!hello", "!hello")
+    bot = AsyncPhial("app-token", "bot-token")
+
+    @bot.command("hello")
+    async def hello() -> str:
+        return "world"
+
+    report = asyncio.run(replay_async(bot, str(path), speed=None))
+
+    assert isinstance(report, ReplayReport)
+    assert report.call_counts == {"chat_postMessage": 2}
+
+
+def test_replay_workspaces(tmp_path: Path) -> None:
+    """Test calls for every workspace are recorded rather than sent."""
+    path = tmp_path / "capture.jsonl.gz"
+    recorder = Recorder(str(path))
+    for team in ("T1", "T2"):
+        recorder(None, build_request("!hello", "C1", "U1", "ts", team))
+    recorder.close()
+    bot = Phial("app-token", "bot-token")
+    workspace = bot.add_workspace("other-app-token", "other-bot-token", team="T2")
+    web_client = workspace.web_client
+
+    @bot.command("hello")
+    def hello() -> str:
+        return "world"
+
+    report = replay(bot, str(path), speed=None)
+
+    assert report.call_counts == {"chat_postMessage": 2}
+    assert workspace.web_client is web_client
+
+
+def test_replay_async_workspaces(tmp_path: Path) -> None:
+    """Test calls for every workspace are recorded when replaying asynchronously."""
+    path = tmp_path / "capture.jsonl.gz"
+    recorder = Recorder(str(path))
+    for team in ("T1", "T2"):
+        recorder(None, build_request("!hello", "C1", "U1", "ts", team))
+    recorder.close()
+    bot = AsyncPhial("app-token", "bot-token")
+    workspace = bot.add_workspace("other-app-token", "other-bot-token", team="T2")
+    web_client = workspace.web_client
+
+    @bot.command("hello")
+    async def hello() -> str:
+        return "world"
+
+    report = asyncio.run(replay_async(bot, str(path), speed=None))
+
+    assert report.call_counts == {"chat_postMessage": 2}
+    assert workspace.web_client is web_client
@@ -1,8 +1,11 @@
 """Test ScheduledJob class."""
 
+import asyncio
+import time
 from datetime import UTC, datetime, timedelta
 from unittest.mock import MagicMock
 
+import pytest
 from freezegun import freeze_time
 
 from phial.scheduler import Schedule, ScheduledJob
@@ -51,3 +54,45 @@ def test_job_reschedules_after_failure() -> None:
 
     job.run()
     assert job.next_run is not None
+
+
+def test_job_run_async_awaits_coroutine() -> None:
+    """Test ScheduledJob awaits coroutine functions."""
+    calls = [0]
+
+    async def test() -> None:
+        calls[0] += 1
+
+    schedule = Schedule().every().day().at(12, 00)
+    job = ScheduledJob(schedule, test)
+
+    asyncio.run(job.run_async())
+    assert calls[0] == 1
+
+
+def test_job_run_async_runs_sync_function() -> None:
+    """Test ScheduledJob runs regular functions when run asynchronously."""
+    test_func = MagicMock()
+    schedule = Schedule().every().day().at(12, 00)
+    job = ScheduledJob(schedule, test_func)
+
+    asyncio.run(job.run_async())
+    test_func.assert_called_once()
+
+
+def test_job_abandoned_after_timeout(caplog: pytest.LogCaptureFixture) -> None:
+    """Test ScheduledJobs that run too long are abandoned and rescheduled."""
+
+    def test() -> None:
+        time.sleep(1)
+
+    schedule = Schedule().every().day().at(12, 00)
+    job = ScheduledJob(schedule, test, timeout=0.1)
+    job.next_run = datetime.now(tz=UTC)
+
+    start = time.monotonic()
+    job.run()
+    assert time.monotonic() - start < 0.5
+    assert job.next_run > datetime.now(tz=UTC)
+    assert "Timed out after 0.1 seconds" in caplog.text
+    assert "time.sleep(1)" in caplog.text
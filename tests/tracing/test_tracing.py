@@ -0,0 +1,137 @@
+"""Test tracing hooks."""
+
+import asyncio
+from typing import Any, cast
+
+import pytest
+import slack_sdk
+from slack_sdk.socket_mode import SocketModeClient
+from slack_sdk.socket_mode.aiohttp import SocketModeClient as AsyncSocketModeClient
+
+from phial import AsyncPhial, Message, Phial
+from phial.tracing import Span, Tracer, current_request_id
+from tests.async_bot.test_handle_request import MockClient as AsyncMockClient
+from tests.bot.test_handle_request import MockClient, build_request
+
+
+class RecordingTracer(Tracer):
+    """Tracer which records every span."""
+
+    def __init__(self) -> None:
+        self.started: list[str] = []
+        self.ended: list[Span] = []
+
+    def on_start(self, span: Span) -> None:
+        """Record the span starting."""
+        self.started.append(span.name)
+
+    def on_end(self, span: Span) -> None:
+        """Record the span ending."""
+        self.ended.append(span)
+
+
+def test_spans_recorded_for_each_stage(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test each stage of a request is traced with the request's ID."""
+    monkeypatch.setattr(slack_sdk.WebClient, "chat_postMessage", lambda *_, **__: None)
+    request_ids: list[str | None] = []
+    tracer = RecordingTracer()
+    bot = Phial("app-token", "bot-token")
+    bot.add_tracer(tracer)
+
+    @bot.middleware()
+    def passthrough(message: Message) -> Message:
+        return message
+
+    @bot.command("greet <name>")
+    def greet(name: str) -> str:
+        request_ids.append(current_request_id())
+        return f"Hello {name}"
+
+    request = build_request("!greet jim", "channel", "user", "ts", "team")
+    bot._handle_request(cast(SocketModeClient, MockClient()), request)
+
+    assert tracer.started == [
+        "request",
+        "ack",
+        "middleware",
+        "routing",
+        "arguments",
+        "command",
+        "slack_api",
+    ]
+    assert {span.request_id for span in tracer.ended} == {"envelope_id"}
+    assert request_ids == ["envelope_id"]
+    slack_api = next(span for span in tracer.ended if span.name == "slack_api")
+    assert slack_api.attributes == {"method": "chat_postMessage"}
+    assert tracer.ended[-1].name == "request"
+    assert tracer.ended[-1].duration >= slack_api.duration
+    assert current_request_id() is None
+
+
+def test_span_records_error() -> None:
+    """Test spans which end with an exception record it."""
+    tracer = RecordingTracer()
+    bot = Phial("app-token", "bot-token")
+    bot.add_tracer(tracer)
+
+    @bot.command("fail")
+    def fail() -> None:
+        raise RuntimeError("Oops")
+
+    request = build_request("!fail", "channel", "user", "ts", "team")
+    bot._handle_request(cast(SocketModeClient, MockClient()), request)
+
+    command_span = next(span for span in tracer.ended if span.name == "command")
+    assert isinstance(command_span.error, RuntimeError)
+
+
+def test_failing_tracer_does_not_break_dispatch() -> None:
+    """Test an exception in a tracer does not stop commands running."""
+
+    class BrokenTracer(Tracer):
+        def on_start(self, _: Span) -> None:
+            raise RuntimeError("Broken")
+
+    calls = [0]
+    bot = Phial("app-token", "bot-token")
+    bot.add_tracer(BrokenTracer())
+
+    @bot.command("test")
+    def test() -> None:
+        calls[0] += 1
+
+    request = build_request("!test", "channel", "user", "ts", "team")
+    bot._handle_request(cast(SocketModeClient, MockClient()), request)
+    assert calls[0] == 1
+
+
+def test_no_span_created_without_tracers() -> None:
+    """Test tracing is skipped when no tracers are registered."""
+    bot = Phial("app-token", "bot-token")
+    assert not isinstance(bot._trace("request"), Span)
+
+
+def test_async_spans_carry_request_id() -> None:
+    """Test AsyncPhial traces requests and carries the request ID."""
+    request_ids: list[str | None] = []
+    tracer = RecordingTracer()
+    bot = AsyncPhial("app-token", "bot-token")
+    bot.add_tracer(tracer)
+
+    @bot.command("test")
+    async def test() -> None:
+        request_ids.append(current_request_id())
+
+    @bot.command("sync")
+    def sync() -> None:
+        request_ids.append(current_request_id())
+
+    async def run() -> Any:
+        client = cast(AsyncSocketModeClient, AsyncMockClient())
+        for text, ts in (("!test", "1"), ("!sync", "2")):
+            request = build_request(text, "c", "u", ts, "t")
+            await bot._handle_request_async(client, request)
+
+    asyncio.run(run())
+    assert request_ids == ["envelope_id", "envelope_id"]
+    assert tracer.started.count("command") == 2
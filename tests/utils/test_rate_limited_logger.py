@@ -0,0 +1,56 @@
+"""Test rate limited logging."""
+
+import logging
+
+import pytest
+from freezegun import freeze_time
+
+from phial.utils import RateLimitedLogger
+
+LOGGER = logging.getLogger("tests.rate_limited")
+
+
+def test_logs_up_to_limit(caplog: pytest.LogCaptureFixture) -> None:
+    """Test records over the limit are dropped."""
+    log = RateLimitedLogger(LOGGER, logging.WARNING, 2, 60)
+
+    for i in range(5):
+        log.log("Record %d", i)
+
+    assert [r.getMessage() for r in caplog.records] == ["Record 0", "Record 1"]
+    assert log.suppressed == 3
+
+
+def test_reports_suppressed_count(caplog: pytest.LogCaptureFixture) -> None:
+    """Test the next record logged says how many were dropped."""
+    with freeze_time("2025-01-01 00:00:00") as frozen:
+        log = RateLimitedLogger(LOGGER, logging.WARNING, 1, 60)
+        for i in range(3):
+            log.log("Record %d", i)
+        frozen.tick(61)
+        log.log("Record %d", 3)
+
+    assert caplog.records[-1].getMessage() == (
+        "Record 3 (2 similar messages suppressed)"
+    )
+    assert log.suppressed == 0
+
+
+def test_passes_extra_fields(caplog: pytest.LogCaptureFixture) -> None:
+    """Test structured fields are attached to the record."""
+    log = RateLimitedLogger(LOGGER, logging.WARNING, 1, 60)
+
+    log.log("Record", extra={"channel": "channel"})
+
+    assert caplog.records[0].channel == "channel"  # type: ignore[attr-defined]
+
+
+def test_skips_disabled_level(caplog: pytest.LogCaptureFixture) -> None:
+    """Test nothing is counted when the level is disabled."""
+    log = RateLimitedLogger(LOGGER, logging.DEBUG, 1, 60)
+
+    with caplog.at_level(logging.INFO, logger="tests.rate_limited"):
+        log.log("Record")
+
+    assert caplog.records == []
+    assert log._count == 0
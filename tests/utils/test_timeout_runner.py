@@ -0,0 +1,70 @@
+"""Test running functions with a timeout."""
+
+import threading
+import time
+
+import pytest
+
+from phial.errors import ExecutionTimeoutError
+from phial.metrics import Gauge
+from phial.utils import TimeoutRunner
+
+
+def test_returns_result() -> None:
+    """Test a function which finishes in time returns its result."""
+    runner = TimeoutRunner()
+
+    assert runner.run(lambda: "done", 1) == "done"
+    assert runner.abandoned == 0
+
+
+def test_reraises_error() -> None:
+    """Test an error raised by the function is raised to the caller."""
+
+    def fail() -> None:
+        raise ValueError("Bad")
+
+    with pytest.raises(ValueError, match="Bad"):
+        TimeoutRunner().run(fail, 1)
+
+
+def test_counts_abandoned_functions() -> None:
+    """Test timed out functions are counted until they finish."""
+    gauge = Gauge("abandoned", "Abandoned functions")
+    runner = TimeoutRunner(gauge=gauge)
+    release = threading.Event()
+
+    with pytest.raises(ExecutionTimeoutError, match="Timed out"):
+        runner.run(release.wait, 0.01)
+
+    assert runner.abandoned == 1
+    assert gauge.value() == 1
+    release.set()
+    deadline = time.monotonic() + 1
+    while runner.abandoned and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert runner.abandoned == 0
+    assert gauge.value() == 0
+
+
+def test_refuses_work_at_limit() -> None:
+    """Test new functions are refused while too many are still running."""
+    runner = TimeoutRunner(max_abandoned=2)
+    release = threading.Event()
+    started: list[str] = []
+
+    def hang() -> None:
+        started.append("hang")
+        release.wait()
+
+    try:
+        for _ in range(2):
+            with pytest.raises(ExecutionTimeoutError, match="Timed out"):
+                runner.run(hang, 0.01)
+        with pytest.raises(ExecutionTimeoutError, match="Refused") as info:
+            runner.run(hang, 0.01)
+    finally:
+        release.set()
+
+    assert len(started) == 2
+    assert info.value.stack == "<not started>"
@@ -0,0 +1,101 @@
+"""Test the slow command watchdog."""
+
+import logging
+import threading
+import time
+
+import pytest
+
+from phial.watchdog import Watchdog
+from phial.wrappers import Message
+
+
+def slow_function() -> None:
+    """Sleep for long enough to be sampled."""
+    time.sleep(0.3)
+
+
+def test_fast_code_not_reported(caplog: pytest.LogCaptureFixture) -> None:
+    """Test nothing is logged for code within the threshold."""
+    watchdog = Watchdog(1, interval=0.01)
+
+    with watchdog.watch("fast"):
+        pass
+    watchdog.stop()
+
+    assert caplog.records == []
+
+
+def test_slow_code_reported_with_hottest_frames(
+    caplog: pytest.LogCaptureFixture,
+) -> None:
+    """Test slow code is logged with the frames it spent its time in."""
+    watchdog = Watchdog(0.1, interval=0.01)
+    message = Message("!slow", "channel", "user", "timestamp", "team")
+
+    with watchdog.watch("Command !slow", message=message):
+        slow_function()
+    watchdog.stop()
+
+    record = caplog.records[-1]
+    assert record.levelno == logging.WARNING
+    assert record.message.startswith("Command !slow took 0.3")
+    assert "over the 0.1s threshold" in record.message
+    assert repr(message) in record.message
+    assert "Hottest frames over" in record.message
+    assert "in slow_function" in record.message
+    assert "time.sleep(0.3)" in record.message
+
+
+def test_running_code_reported(caplog: pytest.LogCaptureFixture) -> None:
+    """Test code which hasn't finished is reported, and again at an interval."""
+    watchdog = Watchdog(0.05, interval=0.01, report_interval=0.1)
+
+    with watchdog.watch("Command !hang"):
+        time.sleep(0.35)
+        running = [record.message for record in caplog.records]
+    watchdog.stop()
+
+    assert len(running) >= 2
+    assert all(m.startswith("Command !hang has been running for") for m in running)
+    assert "Current stack:" in running[0]
+    assert "time.sleep(0.35)" in running[0]
+    assert caplog.records[-1].message.startswith("Command !hang took 0.3")
+
+
+def test_wrap_watches_calling_thread(caplog: pytest.LogCaptureFixture) -> None:
+    """Test a wrapped function is sampled on the thread calling it."""
+    watchdog = Watchdog(0.1, interval=0.01)
+    func = watchdog.wrap("job", slow_function)
+
+    thread = threading.Thread(target=func)
+    thread.start()
+    thread.join()
+    watchdog.stop()
+
+    assert "in slow_function" in caplog.text
+
+
+def test_sample_skips_code_within_threshold() -> None:
+    """Test only code over the threshold is sampled."""
+    watchdog = Watchdog(10, interval=10)
+
+    with watchdog.watch("fast"):
+        watchdog.sample()
+        watch = next(iter(watchdog._watches.values()))
+        assert watch.samples == 0
+    watchdog.stop()
+
+
+def test_restarts_after_stop(caplog: pytest.LogCaptureFixture) -> None:
+    """Test watching again after stopping restarts sampling."""
+    watchdog = Watchdog(0.1, interval=0.01)
+    with watchdog.watch("first"):
+        pass
+    watchdog.stop()
+
+    with watchdog.watch("second"):
+        slow_function()
+    watchdog.stop()
+
+    assert "Hottest frames" in caplog.text
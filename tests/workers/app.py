@@ -0,0 +1,17 @@
+"""A bot imported by the worker processes started in the worker tests."""
+
+import os
+
+from phial import Phial
+
+bot = Phial(
+    "xapp-token",
+    "xoxb-token",
+    config={"apiUrl": os.environ.get("PHIAL_TEST_API_URL"), "handleSignals": False},
+)
+
+
+@bot.command("echo <text>")
+def echo(text: str) -> str:
+    """Reply with the text and the ID of the process that handled it."""
+    return f"{text} {os.getpid()}"
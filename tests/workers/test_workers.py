@@ -0,0 +1,238 @@
+"""Test handling messages in worker processes."""
+
+import multiprocessing
+import os
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, cast
+
+import pytest
+from slack_sdk.socket_mode import SocketModeClient
+
+from phial import Message, Phial
+from phial.replay import RecordingWebClient
+from phial.tracing import current_request_id
+from phial.workers import (
+    ChannelLanes,
+    DirectoryEvent,
+    HashRing,
+    Work,
+    WorkerPool,
+    import_bot,
+)
+from phial.workspaces import current_team
+from tests.bot.test_handle_request import MockClient, build_request
+from tests.fake_slack.server import FakeSlack
+
+
+def test_hash_ring_spreads_keys() -> None:
+    """Test keys are spread over every node, and always map to the same node."""
+    ring = HashRing(range(4))
+    channels = [f"C{number}" for number in range(1000)]
+
+    counts = Counter(ring.node(channel) for channel in channels)
+
+    assert len(ring) == 4
+    assert set(counts) == {0, 1, 2, 3}
+    assert min(counts.values()) > 150
+    assert [ring.node(channel) for channel in channels] == [
+        HashRing(range(4)).node(channel) for channel in channels
+    ]
+
+
+def test_hash_ring_is_consistent() -> None:
+    """Test removing a node only moves the keys that belonged to it."""
+    ring = HashRing(range(4))
+    channels = [f"C{number}" for number in range(1000)]
+    before = {channel: ring.node(channel) for channel in channels}
+
+    ring.remove(3)
+
+    for channel in channels:
+        if before[channel] != 3:
+            assert ring.node(channel) == before[channel]
+        else:
+            assert ring.node(channel) != 3
+
+
+def test_empty_hash_ring() -> None:
+    """Test an empty ring can't map keys."""
+    with pytest.raises(LookupError):
+        HashRing([]).node("C1")
+
+
+def test_channel_lanes_keep_order() -> None:
+    """Test work for a channel runs in order, while channels run concurrently."""
+    handled: list[tuple[str, int]] = []
+    running: set[str] = set()
+    overlapped = threading.Event()
+    lock = threading.Lock()
+
+    def work(channel: str, number: int) -> None:
+        with lock:
+            running.add(channel)
+            if len(running) > 1:
+                overlapped.set()
+        time.sleep(0.005)
+        with lock:
+            running.discard(channel)
+            handled.append((channel, number))
+        if number == 2:
+            raise ValueError("Should be logged, not stop the lane")
+
+    with ThreadPoolExecutor(4) as executor:
+        lanes = ChannelLanes(executor)
+        for number in range(5):
+            for channel in ("C1", "C2"):
+                lanes.submit(channel, partial(work, channel, number))
+        assert lanes.wait(5)
+
+    for channel in ("C1", "C2"):
+        assert [n for c, n in handled if c == channel] == list(range(5))
+    assert overlapped.is_set()
+
+
+def test_import_bot() -> None:
+    """Test bots are imported from module:attribute paths."""
+    from tests.workers.app import bot
+
+    assert import_bot("tests.workers.app:bot") is bot
+    with pytest.raises(ValueError, match="module:attribute"):
+        import_bot("tests.workers.app")
+
+
+def test_create_workers() -> None:
+    """Test a worker pool is only created when workers are configured."""
+    assert Phial("app-token", "bot-token")._create_workers() is None
+
+    bot = Phial("app-token", "bot-token", config={"workers": 2})
+    with pytest.raises(ValueError, match="workerApp"):
+        bot._create_workers()
+
+    bot.config["workerApp"] = "tests.workers.app:bot"
+    workers = bot._create_workers()
+    assert workers is not None
+    assert len(workers.processes) == 2
+    assert workers.processes == [None, None]
+    # The intake hands envelopes off from one thread, to keep them in order
+    assert bot.slack_client.message_workers._max_workers == 1
+
+
+def test_messages_handed_to_workers() -> None:
+    """Test the intake acknowledges and parses envelopes, then hands them off."""
+    bot = Phial("app-token", "bot-token")
+
+    class FakeWorkers:
+        def __init__(self) -> None:
+            self.submitted: list[Any] = []
+
+        def submit(self, work: Work) -> None:
+            self.submitted.append(work)
+
+        def broadcast(self, item: DirectoryEvent) -> None:
+            self.submitted.append(item)
+
+    @bot.command("hello")
+    def hello() -> None:
+        raise Exception("Should be run by a worker")
+
+    workers = FakeWorkers()
+    bot.workers = cast(WorkerPool, workers)
+    client = cast(SocketModeClient, MockClient())
+    bot._handle_request(client, build_request("!hello", "C1", "U1", "1", "T1"))
+    request = build_request("", "C1", "U1", "2", "T1")
+    request.payload["event"] = {"type": "channel_created", "channel": {"id": "C2"}}
+    bot._handle_request(client, request)
+
+    assert workers.submitted == [
+        Work(Message("!hello", "C1", "U1", "1", "T1"), "message", "T1", "envelope_id"),
+        DirectoryEvent({"type": "channel_created", "channel": {"id": "C2"}}),
+    ]
+
+
+def test_serve_worker() -> None:
+    """Test a worker handles its messages in order per channel, then stops."""
+    bot = Phial("app-token", "bot-token", config={"maxThreads": 4})
+    web_client = RecordingWebClient()
+    bot.slack_client.web_client = cast(Any, web_client)
+    contexts: set[tuple[str | None, str | None]] = set()
+
+    @bot.command("echo <text>")
+    def echo(text: str) -> str:
+        contexts.add((current_team(), current_request_id()))
+        time.sleep(0.001)
+        return text
+
+    reader, writer = multiprocessing.Pipe(duplex=False)
+    for number in range(10):
+        for channel in ("C1", "C2"):
+            message = Message(f"!echo {number}", channel, "U1", str(number), "T1")
+            writer.send(Work(message, "message", "T1", f"envelope{number}"))
+    writer.send(None)
+
+    bot._serve_worker(reader)
+
+    for channel in ("C1", "C2"):
+        assert [
+            kwargs["text"]
+            for _, kwargs in web_client.calls
+            if kwargs["channel"] == channel
+        ] == [str(number) for number in range(10)]
+    assert contexts == {("T1", f"envelope{number}") for number in range(10)}
+
+
+def test_workers_end_to_end(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test replies are sent by workers, in order per channel, surviving a crash."""
+    channels = ["C1", "C2", "C3", "C4"]
+    with FakeSlack() as slack:
+        monkeypatch.setenv("PHIAL_TEST_API_URL", slack.api_url)
+        bot = Phial(
+            "xapp-token",
+            "xoxb-token",
+            config={
+                "apiUrl": slack.api_url,
+                "handleSignals": False,
+                "workers": 2,
+                "workerApp": "tests.workers.app:bot",
+            },
+        )
+        thread = threading.Thread(target=bot.run, daemon=True)
+        thread.start()
+        try:
+            assert slack.wait_for_connection(timeout=10)
+            for number in range(10):
+                for channel in channels:
+                    slack.send_message(f"!echo {number}", channel=channel)
+            assert slack.wait_for_calls(40, method="chat.postMessage", timeout=30)
+
+            workers = cast(WorkerPool, bot.workers)
+            dead = cast(Any, workers.processes[0])
+            dead.kill()
+            dead.join()
+            deadline = time.monotonic() + 5
+            while workers.restarts == 0 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            assert workers.restarts == 1
+            for channel in channels:
+                slack.send_message("!echo 10", channel=channel)
+            assert slack.wait_for_calls(44, method="chat.postMessage", timeout=30)
+        finally:
+            bot.stop()
+            thread.join(10)
+
+    replies = [call.params for call in slack.calls if call.method == "chat.postMessage"]
+    pids = {reply["text"].split()[1] for reply in replies}
+    assert str(os.getpid()) not in pids
+    assert len(pids) == 3
+    for channel in channels:
+        assert [
+            int(reply["text"].split()[0])
+            for reply in replies
+            if reply["channel"] == channel
+        ] == list(range(11))
+    assert all(
+        process is not None and not process.is_alive() for process in workers.processes
+    )
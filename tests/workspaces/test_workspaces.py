@@ -0,0 +1,180 @@
+"""Test serving several workspaces from one bot."""
+
+import asyncio
+import threading
+from typing import Any, cast
+
+from slack_sdk.socket_mode import SocketModeClient
+from slack_sdk.socket_mode.aiohttp import SocketModeClient as AsyncSocketModeClient
+from slack_sdk.socket_mode.request import SocketModeRequest
+
+from phial import AsyncPhial, Phial, Response
+from phial.replay import RecordingWebClient
+from phial.workspaces import Workspace, current_team, envelope_team
+from tests.bot.test_handle_request import MockClient, build_request
+
+
+def build_bot() -> tuple[Phial, RecordingWebClient, RecordingWebClient]:
+    """Build a bot serving a second workspace, recording each one's calls."""
+    bot = Phial("app-token", "bot-token")
+    default = RecordingWebClient()
+    other = RecordingWebClient()
+    bot.slack_client.web_client = cast(Any, default)
+    workspace = bot.add_workspace("other-app-token", "other-bot-token", team="T2")
+    workspace.web_client = other
+
+    @bot.command("hello")
+    def hello() -> str:
+        return "Hi"
+
+    return bot, default, other
+
+
+def test_envelope_team() -> None:
+    """Test the envelope's team is preferred to the event's."""
+    request = build_request("hello", "C1", "U1", "1", "T1")
+
+    assert envelope_team(request) == "T1"
+    request.payload["team_id"] = "T2"
+    assert envelope_team(request) == "T2"
+    assert envelope_team(SocketModeRequest("hello", "envelope_id", {})) is None
+
+
+def test_add_workspace() -> None:
+    """Test workspaces get their own web client, indexed by team."""
+    bot = Phial("app-token", "bot-token")
+
+    workspace = bot.add_workspace("other-app-token", "other-bot-token", team="T2")
+
+    assert bot.workspaces == [workspace]
+    assert (workspace.app_token, workspace.web_client.token) == (
+        "other-app-token",
+        "other-bot-token",
+    )
+    assert workspace.web_client is not bot.slack_client.web_client
+    assert repr(workspace) == "<Workspace T2>"
+
+
+def test_replies_routed_by_team() -> None:
+    """Test replies are sent with the web client of the envelope's workspace."""
+    bot, default, other = build_bot()
+    client = cast(SocketModeClient, MockClient())
+
+    bot._handle_request(client, build_request("!hello", "C1", "U1", "1", "T1"))
+    bot._handle_request(client, build_request("!hello", "C2", "U2", "2", "T2"))
+
+    assert [(call, kwargs["channel"]) for call, kwargs in default.calls] == [
+        ("chat_postMessage", "C1"),
+    ]
+    assert [(call, kwargs["channel"]) for call, kwargs in other.calls] == [
+        ("chat_postMessage", "C2"),
+    ]
+    assert current_team() is None
+
+
+def test_workspace_context() -> None:
+    """Test code outside of commands can pick the workspace to call."""
+    bot, default, other = build_bot()
+
+    with bot.workspace("T2"):
+        assert current_team() == "T2"
+        bot.send_message(Response(channel="C2", text="Hi"))
+    bot.send_message(Response(channel="C1", text="Hi"))
+
+    assert [kwargs["channel"] for _, kwargs in other.calls] == ["C2"]
+    assert [kwargs["channel"] for _, kwargs in default.calls] == ["C1"]
+
+
+def test_workspace_context_per_thread() -> None:
+    """Test one thread's workspace doesn't leak into another's calls."""
+    bot, default, other = build_bot()
+    entered = threading.Event()
+    sent = threading.Event()
+
+    def in_workspace() -> None:
+        with bot.workspace("T2"):
+            entered.set()
+            sent.wait(5)
+
+    thread = threading.Thread(target=in_workspace)
+    thread.start()
+    entered.wait(5)
+    bot.send_message(Response(channel="C1", text="Hi"))
+    sent.set()
+    thread.join(5)
+
+    assert [kwargs["channel"] for _, kwargs in default.calls] == ["C1"]
+    assert other.calls == []
+
+
+def test_resolve_workspaces() -> None:
+    """Test workspaces without a team ID have it looked up when starting."""
+    bot = Phial("app-token", "bot-token")
+
+    class AuthClient:
+        def auth_test(self) -> dict[str, Any]:
+            return {"ok": True, "team_id": "T2"}
+
+    class FailingClient:
+        def auth_test(self) -> dict[str, Any]:
+            raise ConnectionError("Slack is down")
+
+    found = bot.add_workspace("other-app-token", "other-bot-token")
+    found.web_client = AuthClient()
+    missing = bot.add_workspace("another-app-token", "another-bot-token")
+    missing.web_client = FailingClient()
+
+    bot._resolve_workspaces()
+
+    assert found.team == "T2"
+    assert missing.team is None
+    assert bot._workspace_teams == {"T2": found}
+
+
+def test_connections_per_workspace() -> None:
+    """Test each workspace gets the configured number of connections."""
+    bot = Phial("app-token", "bot-token", config={"connections": 2})
+    bot.add_workspace("other-app-token", "other-bot-token", team="T2")
+
+    pool = bot._create_connections()
+
+    assert [client.app_token for client in pool.clients] == [
+        "app-token",
+        "app-token",
+        "other-app-token",
+        "other-app-token",
+    ]
+    assert [client.web_client.token for client in pool.clients[2:]] == [
+        "other-bot-token",
+        "other-bot-token",
+    ]
+
+
+def test_async_replies_routed_by_team() -> None:
+    """Test AsyncPhial sends replies with the envelope's workspace's client."""
+    bot = AsyncPhial("app-token", "bot-token")
+    default = RecordingWebClient(asynchronous=True)
+    other = RecordingWebClient(asynchronous=True)
+    bot.web_client = default
+    workspace = bot.add_workspace("other-app-token", "other-bot-token", team="T2")
+    workspace.web_client = other
+    assert isinstance(workspace, Workspace)
+
+    @bot.command("hello")
+    async def hello() -> str:
+        return "Hi"
+
+    class AsyncMockClient:
+        async def send_socket_mode_response(self, _: Any) -> None:
+            pass
+
+    async def run() -> None:
+        client = cast(AsyncSocketModeClient, AsyncMockClient())
+        for channel, team in (("C1", "T1"), ("C2", "T2")):
+            request = build_request("!hello", channel, "U1", "1", team)
+            await bot._handle_request_async(client, request)
+
+    asyncio.run(run())
+
+    assert [kwargs["channel"] for _, kwargs in default.calls] == ["C1"]
+    assert [kwargs["channel"] for _, kwargs in other.calls] == ["C2"]